@@ -0,0 +1,77 @@
+"""spool usage ledger.
+
+Revision ID: 8ee3dcd08569
+Revises: 9c1d5f2a7b31
+Create Date: 2026-10-17 12:00:00.000000
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8ee3dcd08569"
+down_revision = "9c1d5f2a7b31"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Add the usage ledger and its hourly and daily rollups."""
+    """Usage from before this revision is not backfilled, since only the current used weight of"""
+    """each spool is known, not when it was used."""
+    op.create_table(
+        "spool_usage",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("spool_id", sa.Integer(), nullable=False),
+        sa.Column("filament_id", sa.Integer(), nullable=False, comment="The filament of the spool at the time of use."),
+        sa.Column("weight", sa.Float(), nullable=False, comment="The change in used weight, in grams."),
+        sa.Column("time", sa.DateTime(), nullable=False),
+        sa.Column("source", sa.String(length=16), nullable=False, comment="What reported the usage: use or measure."),
+        sa.ForeignKeyConstraint(
+            ["spool_id"],
+            ["spool.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["filament_id"],
+            ["filament.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_spool_usage_id"), "spool_usage", ["id"], unique=False)
+    op.create_index(op.f("ix_spool_usage_spool_id"), "spool_usage", ["spool_id"], unique=False)
+    op.create_index(op.f("ix_spool_usage_filament_id"), "spool_usage", ["filament_id"], unique=False)
+    op.create_index(op.f("ix_spool_usage_time"), "spool_usage", ["time"], unique=False)
+
+    for table in ("spool_usage_hourly", "spool_usage_daily"):
+        op.create_table(
+            table,
+            sa.Column("period_start", sa.DateTime(), nullable=False),
+            sa.Column("spool_id", sa.Integer(), nullable=False),
+            sa.Column("filament_id", sa.Integer(), nullable=False),
+            sa.Column("weight", sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(
+                ["spool_id"],
+                ["spool.id"],
+            ),
+            sa.ForeignKeyConstraint(
+                ["filament_id"],
+                ["filament.id"],
+            ),
+            sa.PrimaryKeyConstraint("period_start", "spool_id", "filament_id"),
+        )
+        op.create_index(op.f(f"ix_{table}_spool_id"), table, ["spool_id"], unique=False)
+        op.create_index(op.f(f"ix_{table}_filament_id"), table, ["filament_id"], unique=False)
+
+
+def downgrade() -> None:
+    """Perform the downgrade."""
+    for table in ("spool_usage_daily", "spool_usage_hourly"):
+        op.drop_index(op.f(f"ix_{table}_filament_id"), table_name=table)
+        op.drop_index(op.f(f"ix_{table}_spool_id"), table_name=table)
+        op.drop_table(table)
+
+    op.drop_index(op.f("ix_spool_usage_time"), table_name="spool_usage")
+    op.drop_index(op.f("ix_spool_usage_filament_id"), table_name="spool_usage")
+    op.drop_index(op.f("ix_spool_usage_spool_id"), table_name="spool_usage")
+    op.drop_index(op.f("ix_spool_usage_id"), table_name="spool_usage")
+    op.drop_table("spool_usage")
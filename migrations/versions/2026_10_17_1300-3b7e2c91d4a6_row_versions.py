@@ -0,0 +1,38 @@
+"""row versions.
+
+Revision ID: 3b7e2c91d4a6
+Revises: 8ee3dcd08569
+Create Date: 2026-10-17 13:00:00.000000
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3b7e2c91d4a6"
+down_revision = "8ee3dcd08569"
+branch_labels = None
+depends_on = None
+
+TABLES = ("spool", "filament", "vendor")
+
+
+def upgrade() -> None:
+    """Add a version to spools, filaments and vendors, for the ETags of the single item endpoints."""
+    for table in TABLES:
+        op.add_column(
+            table,
+            sa.Column(
+                "version",
+                sa.Integer(),
+                nullable=False,
+                server_default="1",
+                comment="Incremented on every change, including to the extra fields.",
+            ),
+        )
+
+
+def downgrade() -> None:
+    """Remove the versions."""
+    for table in TABLES:
+        op.drop_column(table, "version")
@@ -0,0 +1,42 @@
+"""search indexes.
+
+Revision ID: 5d8a0f3c17e2
+Revises: 3b7e2c91d4a6
+Create Date: 2026-10-17 14:00:00.000000
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5d8a0f3c17e2"
+down_revision = "3b7e2c91d4a6"
+branch_labels = None
+depends_on = None
+
+# The indexes by name, with their tables and columns.
+INDEXES = {
+    "ix_spool_filament_id": ("spool", ["filament_id"]),
+    "ix_filament_vendor_id": ("filament", ["vendor_id"]),
+    "ix_spool_archived_last_used": ("spool", ["archived", "last_used"]),
+    "ix_spool_location": ("spool", ["location"]),
+    "ix_filament_material": ("filament", ["material"]),
+    "ix_vendor_field_key_vendor_id": ("vendor_field", ["key", "vendor_id"]),
+    "ix_filament_field_key_filament_id": ("filament_field", ["key", "filament_id"]),
+    "ix_spool_field_key_spool_id": ("spool_field", ["key", "spool_id"]),
+}
+
+
+def upgrade() -> None:
+    """Add indexes for the joins, filters and sorts of the searches."""
+    for name, (table, columns) in INDEXES.items():
+        op.create_index(name, table, columns, unique=False)
+    # SQLite's query planner only knows how selective the new indexes are from the statistics,
+    # which are updated daily from then on.
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("ANALYZE")
+
+
+def downgrade() -> None:
+    """Remove the indexes."""
+    for name, (table, _) in reversed(INDEXES.items()):
+        op.drop_index(name, table_name=table)
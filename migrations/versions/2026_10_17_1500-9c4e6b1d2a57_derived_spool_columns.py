@@ -0,0 +1,37 @@
+"""derived spool columns.
+
+Revision ID: 9c4e6b1d2a57
+Revises: 5d8a0f3c17e2
+Create Date: 2026-10-17 15:00:00.000000
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9c4e6b1d2a57"
+down_revision = "5d8a0f3c17e2"
+branch_labels = None
+depends_on = None
+
+# The columns with their comments. Each is indexed as ix_spool_<column>.
+COLUMNS = {
+    "remaining_weight": "Derived, for sorting.",
+    "remaining_length": "Derived, for sorting.",
+    "used_length": "Derived, for sorting.",
+    "effective_price": "Derived, for sorting: the price of the spool, or else of its filament.",
+}
+
+
+def upgrade() -> None:
+    """Add the columns derived from a spool and its filament, for sorting."""
+    for column, comment in COLUMNS.items():
+        op.add_column("spool", sa.Column(column, sa.Float(), nullable=True, comment=comment))
+        op.create_index(f"ix_spool_{column}", "spool", [column], unique=False)
+
+
+def downgrade() -> None:
+    """Remove the derived columns."""
+    for column in reversed(COLUMNS):
+        op.drop_index(f"ix_spool_{column}", table_name="spool")
+        op.drop_column("spool", column)
@@ -0,0 +1,68 @@
+"""derived spool columns population.
+
+Revision ID: e1f7a3c05b68
+Revises: 9c4e6b1d2a57
+Create Date: 2026-10-17 15:10:00.000000
+"""
+
+import math
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e1f7a3c05b68"
+down_revision = "9c4e6b1d2a57"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Compute the derived spool columns of the existing spools, as spoolman.database.derived does."""
+    # This must be done in a separate migration because of CockroachDB's execution of alembic
+    # migrations, which cannot write to the columns in the transaction that adds them.
+    filament = sa.Table(
+        "filament",
+        sa.MetaData(),
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("price", sa.Float(), nullable=True),
+        sa.Column("density", sa.Float(), nullable=False),
+        sa.Column("diameter", sa.Float(), nullable=False),
+        sa.Column("weight", sa.Float(), nullable=True),
+    )
+    spool = sa.Table(
+        "spool",
+        sa.MetaData(),
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("filament_id", sa.Integer),
+        sa.Column("price", sa.Float(), nullable=True),
+        sa.Column("initial_weight", sa.Float(), nullable=True),
+        sa.Column("used_weight", sa.Float(), nullable=False),
+        sa.Column("remaining_weight", sa.Float(), nullable=True),
+        sa.Column("remaining_length", sa.Float(), nullable=True),
+        sa.Column("used_length", sa.Float(), nullable=True),
+        sa.Column("effective_price", sa.Float(), nullable=True),
+    )
+
+    def of_filament(column: sa.Column) -> sa.ScalarSelect:
+        return sa.select(column).where(filament.c.id == spool.c.filament_id).scalar_subquery()
+
+    radius = of_filament(filament.c.diameter) / 2.0
+    section = sa.func.nullif(of_filament(filament.c.density) * math.pi * radius * radius, 0.0)
+    remaining = sa.func.coalesce(spool.c.initial_weight, of_filament(filament.c.weight)) - spool.c.used_weight
+    remaining = sa.case((remaining < 0, 0.0), else_=remaining)
+    op.execute(
+        sa.update(spool).values(
+            remaining_weight=remaining,
+            remaining_length=remaining * 1000.0 / section,
+            used_length=spool.c.used_weight * 1000.0 / section,
+            effective_price=sa.func.coalesce(spool.c.price, of_filament(filament.c.price)),
+        ),
+    )
+    # SQLite's query planner only knows how selective the new indexes are from the statistics.
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("ANALYZE")
+
+
+def downgrade() -> None:
+    """Perform the downgrade."""
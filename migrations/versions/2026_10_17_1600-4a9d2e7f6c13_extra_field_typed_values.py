@@ -0,0 +1,41 @@
+"""extra field typed values.
+
+Revision ID: 4a9d2e7f6c13
+Revises: e1f7a3c05b68
+Create Date: 2026-10-17 16:00:00.000000
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "4a9d2e7f6c13"
+down_revision = "e1f7a3c05b68"
+branch_labels = None
+depends_on = None
+
+TABLES = ("vendor_field", "filament_field", "spool_field")
+
+# The columns, each indexed along with the key as ix_<table>_key_<column>.
+COLUMNS = {
+    "value_text": sa.String(255),
+    "value_num": sa.Float(),
+    "value_num_hi": sa.Float(),
+    "value_bool": sa.Boolean(),
+}
+
+
+def upgrade() -> None:
+    """Add typed copies of the extra field values, for filtering and sorting by them."""
+    for table in TABLES:
+        for column, column_type in COLUMNS.items():
+            op.add_column(table, sa.Column(column, column_type, nullable=True))
+            op.create_index(f"ix_{table}_key_{column}", table, ["key", column], unique=False)
+
+
+def downgrade() -> None:
+    """Remove the typed copies of the extra field values."""
+    for table in reversed(TABLES):
+        for column in reversed(COLUMNS):
+            op.drop_index(f"ix_{table}_key_{column}", table_name=table)
+            op.drop_column(table, column)
@@ -0,0 +1,100 @@
+"""extra field typed values population.
+
+Revision ID: b7c3f9a1e240
+Revises: 4a9d2e7f6c13
+Create Date: 2026-10-17 16:10:00.000000
+"""
+
+import json
+import math
+from typing import Any
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b7c3f9a1e240"
+down_revision = "4a9d2e7f6c13"
+branch_labels = None
+depends_on = None
+
+TABLES = {"vendor_field": "vendor_id", "filament_field": "filament_id", "spool_field": "spool_id"}
+
+VALUE_TEXT_LENGTH = 255
+
+BATCH_SIZE = 1000
+
+
+def _is_number(value: object) -> bool:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    try:
+        return math.isfinite(float(value))
+    except OverflowError:
+        return False
+
+
+def _is_bound(value: object) -> bool:
+    return value is None or _is_number(value)
+
+
+def _typed_values(value: str | None) -> dict[str, Any]:
+    """Decode a value the way spoolman.database.models.field_values does at the time of writing."""
+    values: dict[str, Any] = {"value_text": None, "value_num": None, "value_num_hi": None, "value_bool": None}
+    try:
+        decoded = json.loads(value) if value is not None else None
+    except ValueError:
+        return values
+    if isinstance(decoded, bool):
+        values["value_bool"] = decoded
+    elif isinstance(decoded, str):
+        values["value_text"] = decoded[:VALUE_TEXT_LENGTH]
+    elif _is_number(decoded):
+        values["value_num"] = float(decoded)
+    elif isinstance(decoded, list) and len(decoded) == 2 and all(_is_bound(item) for item in decoded):  # noqa: PLR2004
+        values["value_num"], values["value_num_hi"] = (float(item) if item is not None else None for item in decoded)
+    return values
+
+
+def upgrade() -> None:
+    """Fill in the typed copies of the existing extra field values."""
+    # This must be done in a separate migration because of CockroachDB's execution of alembic
+    # migrations, which cannot write to the columns in the transaction that adds them.
+    conn = op.get_bind()
+    for name, id_column in TABLES.items():
+        table = sa.Table(
+            name,
+            sa.MetaData(),
+            sa.Column(id_column, sa.Integer, primary_key=True),
+            sa.Column("key", sa.String(64), primary_key=True),
+            sa.Column("value", sa.Text()),
+            sa.Column("value_text", sa.String(VALUE_TEXT_LENGTH)),
+            sa.Column("value_num", sa.Float()),
+            sa.Column("value_num_hi", sa.Float()),
+            sa.Column("value_bool", sa.Boolean()),
+        )
+        update = (
+            sa.update(table)
+            .where(table.c[id_column] == sa.bindparam("b_id"), table.c.key == sa.bindparam("b_key"))
+            .values(
+                value_text=sa.bindparam("b_value_text"),
+                value_num=sa.bindparam("b_value_num"),
+                value_num_hi=sa.bindparam("b_value_num_hi"),
+                value_bool=sa.bindparam("b_value_bool"),
+            )
+        )
+        rows = conn.execute(sa.select(table.c[id_column], table.c.key, table.c.value)).all()
+        params = []
+        for entity_id, key, value in rows:
+            typed = _typed_values(value)
+            if any(typed_value is not None for typed_value in typed.values()):
+                params.append({"b_id": entity_id, "b_key": key, **{f"b_{k}": v for k, v in typed.items()}})
+        for start in range(0, len(params), BATCH_SIZE):
+            conn.execute(update, params[start : start + BATCH_SIZE])
+    # SQLite's query planner only knows how selective the new indexes are from the statistics.
+    if conn.dialect.name == "sqlite":
+        op.execute("ANALYZE")
+
+
+def downgrade() -> None:
+    """Perform the downgrade."""
@@ -0,0 +1,41 @@
+"""cache generation.
+
+Revision ID: 5d8e2c4b9f31
+Revises: b7c3f9a1e240
+Create Date: 2026-10-17 17:00:00.000000
+"""
+
+import datetime
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5d8e2c4b9f31"
+down_revision = "b7c3f9a1e240"
+branch_labels = None
+depends_on = None
+
+setting = sa.Table(
+    "setting",
+    sa.MetaData(),
+    sa.Column("key", sa.String(64), primary_key=True),
+    sa.Column("value", sa.Text()),
+    sa.Column("last_updated", sa.DateTime()),
+)
+
+
+def upgrade() -> None:
+    """Add the row that the processes on the database learn of each other's writes from, see spoolman.cache_sync."""
+    op.execute(
+        sa.insert(setting).values(
+            key="cache_generation",
+            value='""',
+            last_updated=datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0, tzinfo=None),
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Perform the downgrade."""
+    op.execute(sa.delete(setting).where(setting.c.key == "cache_generation"))
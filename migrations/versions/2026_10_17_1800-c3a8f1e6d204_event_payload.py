@@ -0,0 +1,38 @@
+"""event payload.
+
+Revision ID: c3a8f1e6d204
+Revises: 5d8e2c4b9f31
+Create Date: 2026-10-17 18:00:00.000000
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c3a8f1e6d204"
+down_revision = "5d8e2c4b9f31"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Add the table that the postgres event bus passes on events too large to notify through."""
+    op.create_table(
+        "event_payload",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.Column(
+            "payload",
+            sa.Text(),
+            nullable=False,
+            comment="A websocket event too large for a PostgreSQL notification.",
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_event_payload_created"), "event_payload", ["created"], unique=False)
+
+
+def downgrade() -> None:
+    """Perform the downgrade."""
+    op.drop_index(op.f("ix_event_payload_created"), table_name="event_payload")
+    op.drop_table("event_payload")
@@ -0,0 +1,187 @@
+"""spool usage history.
+
+Revision ID: e41b7a9c2d05
+Revises: c3a8f1e6d204
+Create Date: 2026-10-17 19:00:00.000000
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e41b7a9c2d05"
+down_revision = "c3a8f1e6d204"
+branch_labels = None
+depends_on = None
+
+ROLLUPS = ("spool_usage_hourly", "spool_usage_daily")
+
+spool = sa.table("spool", sa.column("id", sa.Integer), sa.column("location", sa.String))
+filament = sa.table("filament", sa.column("id", sa.Integer), sa.column("material", sa.String))
+
+
+def _ledger_table(name: str, *, history: bool) -> sa.Table:
+    """Create the ledger table, in the layout of this revision if history is set or else of the one before."""
+    if history:
+        columns = [
+            sa.Column("spool_id", sa.Integer(), nullable=True, comment="Null once the spool is deleted."),
+            sa.Column(
+                "filament_id",
+                sa.Integer(),
+                nullable=True,
+                comment="The filament of the spool at the time of use. Null once the filament is deleted.",
+            ),
+            sa.Column(
+                "material",
+                sa.String(length=64),
+                nullable=True,
+                comment="The filament material at the time of use.",
+            ),
+            sa.Column(
+                "location",
+                sa.String(length=64),
+                nullable=True,
+                comment="The spool location at the time of use.",
+            ),
+        ]
+        ondelete = "SET NULL"
+    else:
+        columns = [
+            sa.Column("spool_id", sa.Integer(), nullable=False),
+            sa.Column(
+                "filament_id",
+                sa.Integer(),
+                nullable=False,
+                comment="The filament of the spool at the time of use.",
+            ),
+        ]
+        ondelete = None
+    return op.create_table(
+        name,
+        sa.Column("id", sa.Integer(), nullable=False),
+        *columns,
+        sa.Column("weight", sa.Float(), nullable=False, comment="The change in used weight, in grams."),
+        sa.Column("time", sa.DateTime(), nullable=False),
+        sa.Column("source", sa.String(length=16), nullable=False, comment="What reported the usage: use or measure."),
+        sa.ForeignKeyConstraint(["spool_id"], ["spool.id"], ondelete=ondelete),
+        sa.ForeignKeyConstraint(["filament_id"], ["filament.id"], ondelete=ondelete),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def _rollup_table(name: str, *, history: bool) -> sa.Table:
+    """Create a rollup table, in the layout of this revision if history is set or else of the one before."""
+    if history:
+        return op.create_table(
+            name,
+            sa.Column("period_start", sa.DateTime(), nullable=False),
+            sa.Column("spool_id", sa.Integer(), nullable=False, comment="0 once the spool is deleted."),
+            sa.Column("filament_id", sa.Integer(), nullable=False, comment="0 once the filament is deleted."),
+            sa.Column("material", sa.String(length=64), nullable=False, comment="Empty if unset."),
+            sa.Column("location", sa.String(length=64), nullable=False, comment="Empty if unset."),
+            sa.Column("weight", sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint("period_start", "spool_id", "filament_id", "material", "location"),
+        )
+    return op.create_table(
+        name,
+        sa.Column("period_start", sa.DateTime(), nullable=False),
+        sa.Column("spool_id", sa.Integer(), nullable=False),
+        sa.Column("filament_id", sa.Integer(), nullable=False),
+        sa.Column("weight", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["spool_id"], ["spool.id"]),
+        sa.ForeignKeyConstraint(["filament_id"], ["filament.id"]),
+        sa.PrimaryKeyConstraint("period_start", "spool_id", "filament_id"),
+    )
+
+
+def _replace(name: str, new: sa.Table, indexes: list[str]) -> None:
+    """Drop a table, and give its name and indexes to the table that replaces it."""
+    # The indexes go with the table. Dropping them first fails on MySQL, which needs an index on each
+    # column with a foreign key for as long as the foreign key exists.
+    op.drop_table(name)
+    op.rename_table(new.name, name)
+    for column in indexes:
+        op.create_index(op.f(f"ix_{name}_{column}"), name, [column], unique=False)
+
+
+def upgrade() -> None:
+    """Keep usage once its spool or filament is deleted, with the material and location at the time of use."""
+    """The tables are rebuilt, as their foreign keys were created without a name to alter them by."""
+    """Existing usage gets the current material and location, the closest there is to go by."""
+    old = sa.table(
+        "spool_usage",
+        *(sa.column(name) for name in ("spool_id", "filament_id", "weight", "time", "source")),
+    )
+    new = _ledger_table("spool_usage_new", history=True)
+    op.execute(
+        new.insert().from_select(
+            ["spool_id", "filament_id", "material", "location", "weight", "time", "source"],
+            sa.select(
+                old.c.spool_id,
+                old.c.filament_id,
+                filament.c.material,
+                spool.c.location,
+                old.c.weight,
+                old.c.time,
+                old.c.source,
+            )
+            .select_from(old)
+            .outerjoin(spool, spool.c.id == old.c.spool_id)
+            .outerjoin(filament, filament.c.id == old.c.filament_id),
+        ),
+    )
+    _replace("spool_usage", new, ["id", "spool_id", "filament_id", "time"])
+
+    for name in ROLLUPS:
+        old = sa.table(name, *(sa.column(column) for column in ("period_start", "spool_id", "filament_id", "weight")))
+        new = _rollup_table(f"{name}_new", history=True)
+        # Each old row has a single spool and filament, so no two of them end up with the same key.
+        op.execute(
+            new.insert().from_select(
+                ["period_start", "spool_id", "filament_id", "material", "location", "weight"],
+                sa.select(
+                    old.c.period_start,
+                    old.c.spool_id,
+                    old.c.filament_id,
+                    sa.func.coalesce(filament.c.material, ""),
+                    sa.func.coalesce(spool.c.location, ""),
+                    old.c.weight,
+                )
+                .select_from(old)
+                .outerjoin(spool, spool.c.id == old.c.spool_id)
+                .outerjoin(filament, filament.c.id == old.c.filament_id),
+            ),
+        )
+        _replace(name, new, ["spool_id", "filament_id"])
+
+
+def downgrade() -> None:
+    """Perform the downgrade. Usage of deleted spools and filaments is dropped."""
+    old = sa.table(
+        "spool_usage",
+        *(sa.column(name) for name in ("spool_id", "filament_id", "weight", "time", "source")),
+    )
+    new = _ledger_table("spool_usage_new", history=False)
+    op.execute(
+        new.insert().from_select(
+            ["spool_id", "filament_id", "weight", "time", "source"],
+            sa.select(old.c.spool_id, old.c.filament_id, old.c.weight, old.c.time, old.c.source)
+            .join(spool, spool.c.id == old.c.spool_id)
+            .join(filament, filament.c.id == old.c.filament_id),
+        ),
+    )
+    _replace("spool_usage", new, ["id", "spool_id", "filament_id", "time"])
+
+    for name in ROLLUPS:
+        old = sa.table(name, *(sa.column(column) for column in ("period_start", "spool_id", "filament_id", "weight")))
+        new = _rollup_table(f"{name}_new", history=False)
+        op.execute(
+            new.insert().from_select(
+                ["period_start", "spool_id", "filament_id", "weight"],
+                sa.select(old.c.period_start, old.c.spool_id, old.c.filament_id, sa.func.sum(old.c.weight))
+                .join(spool, spool.c.id == old.c.spool_id)
+                .join(filament, filament.c.id == old.c.filament_id)
+                .group_by(old.c.period_start, old.c.spool_id, old.c.filament_id),
+            ),
+        )
+        _replace(name, new, ["spool_id", "filament_id"])
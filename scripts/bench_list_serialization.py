@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Measure how long it takes to turn a list of spools into the body of a GET /spool response.
+
+Compares converting every spool on its own and encoding the result with jsonable_encoder, as the
+list endpoints used to, with converting each shared filament and vendor once and serializing the
+list with pydantic-core, as they do now. Runs in-process on generated spools, so no database or
+running server is needed, and checks that both produce the same bytes:
+
+    python scripts/bench_list_serialization.py
+    python scripts/bench_list_serialization.py --spools 5000 --filaments 40 --vendors 8
+
+Also available as `uv run poe bench-list-serialization <args>`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from spoolman.api.v1.models import FromDbMemo, ModelResponse, Spool
+from spoolman.database import models
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+REGISTERED = datetime(2026, 1, 1)  # noqa: DTZ001
+
+
+def generate(spools: int, filaments: int, vendors: int) -> list[models.Spool]:
+    """Build database spool objects, sharing the filaments and vendors round-robin."""
+    vendor_items = [
+        models.Vendor(
+            id=i,
+            registered=REGISTERED,
+            name=f"Vendor {i}",
+            empty_spool_weight=200,
+            extra=[models.VendorField(key="website", value='"https://example.com"')],
+        )
+        for i in range(1, vendors + 1)
+    ]
+    filament_items = [
+        models.Filament(
+            id=i,
+            registered=REGISTERED,
+            name=f"Filament {i}",
+            vendor=vendor_items[i % vendors],
+            material="PLA",
+            price=20,
+            density=1.24,
+            diameter=1.75,
+            weight=1000,
+            spool_weight=200,
+            color_hex="FF0000",
+            settings_extruder_temp=210,
+            extra=[models.FilamentField(key="finish", value='"matte"')],
+        )
+        for i in range(1, filaments + 1)
+    ]
+    return [
+        models.Spool(
+            id=i,
+            registered=REGISTERED,
+            first_used=REGISTERED,
+            last_used=REGISTERED,
+            filament=filament_items[i % filaments],
+            initial_weight=1000,
+            used_weight=i % 1000,
+            location=f"Shelf {i % 10}",
+            archived=False,
+            extra=[models.SpoolField(key="dry", value="true")],
+        )
+        for i in range(1, spools + 1)
+    ]
+
+
+def encode_each(items: list[models.Spool]) -> bytes:
+    """Render the response body the way the list endpoints used to."""
+    return JSONResponse(content=jsonable_encoder((Spool.from_db(item) for item in items), exclude_none=True)).body
+
+
+def encode_memoized(items: list[models.Spool]) -> bytes:
+    """Render the response body the way the list endpoints do now."""
+    memo = FromDbMemo()
+    return ModelResponse(content=[Spool.from_db(item, memo) for item in items]).body
+
+
+def measure(func: Callable[[list[models.Spool]], bytes], items: list[models.Spool], rounds: int) -> float:
+    """Get the median time of a number of runs, in milliseconds."""
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(items)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--spools", type=int, default=5000, help="Number of spools in the list.")
+    parser.add_argument("--filaments", type=int, default=40, help="Number of filaments the spools share.")
+    parser.add_argument("--vendors", type=int, default=8, help="Number of vendors the filaments share.")
+    parser.add_argument("--rounds", type=int, default=10, help="Number of runs to take the median of.")
+    args = parser.parse_args()
+
+    items = generate(args.spools, args.filaments, args.vendors)
+    body = encode_each(items)
+    if encode_memoized(items) != body:
+        raise SystemExit("The two ways of encoding gave different responses.")
+
+    before = measure(encode_each, items, args.rounds)
+    after = measure(encode_memoized, items, args.rounds)
+    print(f"{args.spools} spools, {args.filaments} filaments, {args.vendors} vendors, {len(body) / 1024:.0f} KiB")
+    print(f"  from_db per spool + jsonable_encoder: {before:8.1f} ms")
+    print(f"  memoized from_db + pydantic-core:     {after:8.1f} ms  ({before / after:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
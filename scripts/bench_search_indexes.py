@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Measure how long the common searches take on a SQLite database without and with the search indexes.
+
+Runs the searches the list endpoints make, through the same functions, on two copies of a database:
+one with the indexes of the search_indexes, derived_spool_columns and extra_field_typed_values
+migrations dropped, and one with them. Fill a development instance with scripts/stress_seed.py
+first, stop it, and point this at its database:
+
+    python scripts/bench_search_indexes.py ~/.local/share/spoolman/spoolman.db
+    python scripts/bench_search_indexes.py spoolman.db --rounds 50
+
+The database itself is left as it is. Also available as `uv run poe bench-search-indexes <args>`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import sqlalchemy
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from spoolman.database import filament, models, spool
+from spoolman.database.data_version import data_version
+from spoolman.database.utils import SortOrder
+from spoolman.extra_field_registry import EntityType, ExtraFieldType, get_extra_fields
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+# The indexes added by the search_indexes, derived_spool_columns and extra_field_typed_values migrations.
+INDEXES = (
+    "ix_spool_filament_id",
+    "ix_filament_vendor_id",
+    "ix_spool_archived_last_used",
+    "ix_spool_location",
+    "ix_filament_material",
+    "ix_vendor_field_key_vendor_id",
+    "ix_filament_field_key_filament_id",
+    "ix_spool_field_key_spool_id",
+    "ix_spool_remaining_weight",
+    "ix_spool_remaining_length",
+    "ix_spool_used_length",
+    "ix_spool_effective_price",
+    *(
+        f"ix_{table}_key_{column}"
+        for table in ("vendor_field", "filament_field", "spool_field")
+        for column in models.VALUE_COLUMNS
+    ),
+)
+
+Search = tuple[str, "Callable[[AsyncSession], Awaitable[Any]]"]
+
+
+async def most_common(db: AsyncSession, column: sqlalchemy.ColumnElement[Any]) -> Any:
+    """Get the most common value of a column, so that a search for it has something to find."""
+    stmt = (
+        sqlalchemy.select(column)
+        .where(column.is_not(None))
+        .group_by(column)
+        .order_by(sqlalchemy.func.count().desc())
+        .limit(1)
+    )
+    return (await db.execute(stmt)).scalar_one()
+
+
+async def searches(db: AsyncSession) -> list[Search]:
+    """Build the searches to time, for values the database has."""
+    location = await most_common(db, models.Spool.location)
+    material = await most_common(db, models.Filament.material)
+    vendor_id = await most_common(db, models.Filament.vendor_id)
+    filament_id = await most_common(db, models.Spool.filament_id)
+    page = {"limit": 50}
+    timed: list[Search] = []
+    fields = await get_extra_fields(db, EntityType.spool)
+    text_fields = [field.key for field in fields if field.field_type == ExtraFieldType.text]
+    if text_fields:
+        key = text_fields[0]
+        stmt = sqlalchemy.select(models.SpoolField.value).where(models.SpoolField.key == key).limit(1)
+        value = json.loads((await db.execute(stmt)).scalar_one())
+        timed += [
+            ("spools by extra field", lambda db: spool.find(db=db, extra_field_filters={key: f'"{value}"'}, **page)),
+            (
+                "spools sorted by extra field",
+                lambda db: spool.find(db=db, sort_by={f"extra.{key}": SortOrder.ASC}, **page),
+            ),
+        ]
+    # Filters on several extra fields, as a saved view does, each by the field's most common value.
+    several: dict[str, str] = {}
+    filtered_types = (ExtraFieldType.text, ExtraFieldType.choice, ExtraFieldType.boolean, ExtraFieldType.integer)
+    for field in fields:
+        if field.field_type not in filtered_types or field.multi_choice or len(several) == 4:
+            continue
+        column = sqlalchemy.select(models.SpoolField.value).where(models.SpoolField.key == field.key).subquery()
+        value = json.loads(await most_common(db, column.c.value))
+        several[field.key] = f'"{value}"' if isinstance(value, str) else json.dumps(value)
+    if len(several) > 1:
+        timed.append(
+            ("spools by several extra fields", lambda db: spool.find(db=db, extra_field_filters=several, **page)),
+        )
+    # Sorts by several extra fields, of different types, as a table with a few extra columns does.
+    sort_fields = list({field.field_type: field.key for field in reversed(fields)}.values())
+    for count, name in ((2, "two"), (3, "three")):
+        if len(sort_fields) >= count:
+            sort_by = {f"extra.{key}": SortOrder.ASC for key in sort_fields[:count]}
+            timed.append(
+                (
+                    f"spools sorted by {name} extra fields",
+                    lambda db, sort_by=sort_by: spool.find(db=db, sort_by=sort_by, **page),
+                ),
+            )
+    return [
+        ("spools by last use", lambda db: spool.find(db=db, sort_by={"last_used": SortOrder.DESC}, **page)),
+        (
+            "spools by least remaining",
+            lambda db: spool.find(db=db, sort_by={"remaining_weight": SortOrder.ASC}, **page),
+        ),
+        (
+            "spools by most remaining",
+            lambda db: spool.find(db=db, sort_by={"remaining_length": SortOrder.DESC}, **page),
+        ),
+        ("spools by price", lambda db: spool.find(db=db, sort_by={"price": SortOrder.ASC}, **page)),
+        ("spools at a location", lambda db: spool.find(db=db, location=f'"{location}"', **page)),
+        ("spools of a material", lambda db: spool.find(db=db, filament_material=f'"{material}"', **page)),
+        ("spools of a vendor", lambda db: spool.find(db=db, vendor_id=vendor_id, **page)),
+        ("spools of a filament", lambda db: spool.find(db=db, filament_id=filament_id, **page)),
+        ("filaments of a vendor", lambda db: filament.find(db=db, vendor_id=vendor_id, **page)),
+        *timed,
+    ]
+
+
+async def measure(engines: list[AsyncEngine], search: Search, rounds: int) -> list[float]:
+    """Get the median time of a number of runs of a search on each database, in milliseconds.
+
+    The runs on the databases take turns, so that whatever else the machine is doing slows them down
+    alike.
+    """
+    session_makers = [async_sessionmaker(engine, expire_on_commit=False) for engine in engines]
+    times: list[list[float]] = [[] for _ in engines]
+    for _ in range(rounds):
+        for session_maker, engine_times in zip(session_makers, times, strict=True):
+            # Makes the counts of the last run stale, so that each run counts again.
+            data_version.bump()
+            async with session_maker() as db:
+                start = time.perf_counter()
+                await search[1](db)
+                engine_times.append((time.perf_counter() - start) * 1000)
+    return [statistics.median(engine_times) for engine_times in times]
+
+
+def set_indexes(conn: sqlalchemy.Connection, *, create: bool) -> None:
+    """Drop or create the search indexes."""
+    for table in models.Base.metadata.tables.values():
+        for index in table.indexes:
+            if index.name in INDEXES:
+                if create:
+                    index.create(conn, checkfirst=True)
+                else:
+                    index.drop(conn, checkfirst=True)
+    # As the migration and the daily update of the statistics do.
+    conn.execute(sqlalchemy.text("ANALYZE"))
+
+
+async def run(database: Path, rounds: int) -> None:
+    """Run the benchmark on a copy of the database without the indexes, and one with them."""
+    with tempfile.TemporaryDirectory() as directory:
+        engines = []
+        for create in (False, True):
+            copy = Path(directory) / f"{'with' if create else 'without'}.db"
+            shutil.copyfile(database, copy)
+            engine = create_async_engine(f"sqlite+aiosqlite:///{copy}")
+            async with engine.begin() as conn:
+                await conn.run_sync(set_indexes, create=create)
+            engines.append(engine)
+
+        async with AsyncSession(engines[0]) as db:
+            spools = (await db.execute(sqlalchemy.select(sqlalchemy.func.count(models.Spool.id)))).scalar_one()
+            timed = await searches(db)
+        results = [await measure(engines, search, rounds) for search in timed]
+        for engine in engines:
+            await engine.dispose()
+
+    print(f"{spools} spools, median of {rounds} runs")
+    print(f"  {'search':<36} {'without':>9} {'with':>9}")
+    for (name, _), (before, after) in zip(timed, results, strict=True):
+        print(f"  {name:<36} {before:6.1f} ms {after:6.1f} ms  ({before / after:.1f}x)")
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("database", type=Path, help="The SQLite database of a stress-seeded instance.")
+    parser.add_argument("--rounds", type=int, default=20, help="Number of runs to take the median of.")
+    args = parser.parse_args()
+    asyncio.run(run(args.database, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,12 +6,13 @@ from enum import Enum
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from spoolman.database import filament, spool, vendor
+from spoolman.api.v1.models import EmbedMode, Message
+from spoolman.database import filament, models, spool, vendor
 from spoolman.database.database import get_db_session
-from spoolman.database.models import Base
-from spoolman.export import dump_as_csv, dump_as_json
+from spoolman.export import dump_as_csv, dump_as_json, dump_as_json_side_loaded
 
 # ruff: noqa: D103
 router = APIRouter(
@@ -25,10 +26,21 @@ class ExportFormat(Enum):
     JSON = "json"
 
 
+def _embed_query(embedded: str) -> object:
+    return Query(
+        description=(
+            f"How to include the {embedded} data. full embeds it in every row. none leaves it out, but for the "
+            f"IDs. ids also leaves it out, and lists each of the {embedded} objects once by ID next to the rows, "
+            "which only the JSON format can do."
+        ),
+    )
+
+
 @router.get(
     "/spools",
     name="Export spools",
     description="Export the list of spools in various formats. Filament and vendor data is included.",
+    responses={400: {"model": Message}},
 )
 async def export_spools(
     *,
@@ -38,23 +50,26 @@ async def export_spools(
         bool,
         Query(description="Whether to include archived spools in the export."),
     ] = False,
+    embed: Annotated[EmbedMode, _embed_query("filament and vendor")] = EmbedMode.FULL,
 ) -> Response:
-    all_spools, _ = await spool.find(db=db, allow_archived=allow_archived)
-    return await _export(all_spools, fmt, "spools")
+    all_spools, _, _ = await spool.find(db=db, allow_archived=allow_archived)
+    return await _export(models.Spool, all_spools, fmt, embed)
 
 
 @router.get(
     "/filaments",
     name="Export filaments",
     description="Export the list of filaments in various formats. Vendor data is included.",
+    responses={400: {"model": Message}},
 )
 async def export_filaments(
     *,
     db: Annotated[AsyncSession, Depends(get_db_session)],
     fmt: ExportFormat,
+    embed: Annotated[EmbedMode, _embed_query("vendor")] = EmbedMode.FULL,
 ) -> Response:
-    all_filaments, _ = await filament.find(db=db)
-    return await _export(all_filaments, fmt, "filaments")
+    all_filaments, _, _ = await filament.find(db=db)
+    return await _export(models.Filament, all_filaments, fmt, embed)
 
 
 @router.get(
@@ -67,21 +82,35 @@ async def export_vendors(
     db: Annotated[AsyncSession, Depends(get_db_session)],
     fmt: ExportFormat,
 ) -> Response:
-    all_vendors, _ = await vendor.find(db=db)
-    return await _export(all_vendors, fmt, "vendors")
+    all_vendors, _, _ = await vendor.find(db=db)
+    return await _export(models.Vendor, all_vendors, fmt)
 
 
-async def _export(objects: Iterable[Base], fmt: ExportFormat, name: str) -> Response:
+async def _export(
+    model: type[models.Base],
+    objects: Iterable[models.Base],
+    fmt: ExportFormat,
+    embed: EmbedMode = EmbedMode.FULL,
+) -> Response:
     """Export the objects in various formats."""
+    name = f"{model.__tablename__}s"
     buffer = io.StringIO()
     media_type = ""
 
     if fmt == ExportFormat.CSV:
+        if embed == EmbedMode.IDS:
+            return JSONResponse(
+                status_code=400,
+                content=Message(message="embed=ids is only supported by the JSON format.").dict(),
+            )
         media_type = "text/csv"
-        await dump_as_csv(objects, buffer)
+        await dump_as_csv(objects, buffer, embed=embed == EmbedMode.FULL)
     elif fmt == ExportFormat.JSON:
         media_type = "application/json"
-        await dump_as_json(objects, buffer)
+        if embed == EmbedMode.IDS:
+            await dump_as_json_side_loaded(model, objects, buffer)
+        else:
+            await dump_as_json(objects, buffer, embed=embed == EmbedMode.FULL)
     else:
         raise ValueError(f"Unknown export format: {fmt}")
 
@@ -89,6 +118,6 @@ async def _export(objects: Iterable[Base], fmt: ExportFormat, name: str) -> Resp
         content=buffer.getvalue(),
         media_type=media_type,
         # Offer it as a download with a sensible name rather than letting the browser render it.
-        # `name` is a fixed literal per endpoint, never user input.
+        # `name` comes from the table name, never from user input.
         headers={"Content-Disposition": f'attachment; filename="{name}.{fmt.value}"'},
     )
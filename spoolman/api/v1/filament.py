@@ -1,28 +1,34 @@
 """Filament related endpoints."""
 
-import asyncio
 import logging
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Query, Request, WebSocket, WebSocketDisconnect
-from fastapi.encoders import jsonable_encoder
+from fastapi import APIRouter, Depends, Header, Query, Request, Response, WebSocket
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, field_validator, model_validator
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from spoolman import response_cache
 from spoolman.api.v1.models import (
+    CountMode,
     Filament,
     FilamentEvent,
+    FromDbMemo,
+    JSONStreamResponse,
     Message,
+    ModelResponse,
     MultiColorDirection,
+    WebsocketMode,
     extra_fields_request_description,
+    render_models,
+    stream_json_array,
 )
 from spoolman.database import filament
 from spoolman.database.database import get_db_session
-from spoolman.database.utils import parse_sort
+from spoolman.database.utils import ItemStream, parse_sort
 from spoolman.exceptions import ItemDeleteError
 from spoolman.extra_fields import EntityType, get_extra_fields, validate_extra_field_dict
-from spoolman.ws import websocket_manager
+from spoolman.ws import WebsocketModeQuery, websocket_manager
 
 logger = logging.getLogger(__name__)
 
@@ -326,9 +332,40 @@ async def find(
     ] = None,
     limit: Annotated[
         int | None,
-        Query(title="Limit", description="Maximum number of items in the response."),
+        Query(
+            title="Limit",
+            description=(
+                "Maximum number of items in the response. Without it, all matching items are sent, in parts as "
+                "they are read."
+            ),
+        ),
     ] = None,
     offset: Annotated[int, Query(title="Offset", description="Offset in the full result set if a limit is set.")] = 0,
+    cursor: Annotated[
+        str | None,
+        Query(
+            title="Cursor",
+            description=(
+                "Continue after the last item of a previous page, instead of at an offset. Pass the "
+                "x-next-cursor header of that page, which is only set if there are more items. The sort must "
+                "be the same as for that page."
+            ),
+        ),
+    ] = None,
+    count: Annotated[
+        CountMode,
+        Query(
+            title="Count",
+            description=(
+                "How to count the matching items for the x-total-count header if a limit or cursor is set. "
+                "exact counts them, which takes a query of its own unless nothing changed since the same search "
+                "last counted them. estimate takes the count of the last time, however old. none leaves the "
+                "header out. Without a limit or cursor, the list is sent in batches as they are read, and the "
+                "header is the number of items that matched when it started, each of which is sent once, in "
+                "the order it had then. An item that is deleted or stops matching meanwhile is left out."
+            ),
+        ),
+    ] = CountMode.EXACT,
 ) -> JSONResponse:
     try:
         sort_by = parse_sort(sort)
@@ -359,7 +396,7 @@ async def find(
             extra_field_filters[field_key] = value
 
     try:
-        db_items, total_count = await filament.find(
+        db_items, total_count, next_cursor = await filament.find(
             db=db,
             ids=filter_by_ids,
             vendor_name=vendor_name if vendor_name is not None else vendor_name_old,
@@ -372,17 +409,28 @@ async def find(
             sort_by=sort_by,
             limit=limit,
             offset=offset,
+            cursor=cursor,
+            count=count,
+            stream=True,
         )
     except ValueError as e:
         return JSONResponse(status_code=400, content=Message(message=str(e)).dict())
 
-    # Set x-total-count header for pagination
-    return JSONResponse(
-        content=jsonable_encoder(
-            (Filament.from_db(db_item) for db_item in db_items),
-            exclude_none=True,
-        ),
-        headers={"x-total-count": str(total_count)},
+    # Set x-total-count and x-next-cursor headers for pagination
+    headers: dict[str, str] = {}
+    if total_count is not None:
+        headers["x-total-count"] = str(total_count)
+    if next_cursor is not None:
+        headers["x-next-cursor"] = next_cursor
+    memo = FromDbMemo()
+    if isinstance(db_items, ItemStream):
+        arrays = (
+            render_models([Filament.from_db(db_item, memo) for db_item in batch]) async for batch in db_items.batches()
+        )
+        return JSONStreamResponse(stream_json_array(arrays), headers=headers)
+    return ModelResponse(
+        content=[Filament.from_db(db_item, memo) for db_item in db_items],
+        headers=headers,
     )
 
 
@@ -392,16 +440,9 @@ async def find(
 )
 async def notify_any(
     websocket: WebSocket,
+    mode: WebsocketModeQuery = WebsocketMode.FULL,
 ) -> None:
-    await websocket.accept()
-    websocket_manager.connect(("filament",), websocket)
-    try:
-        while True:
-            await asyncio.sleep(0.5)
-            if await websocket.receive_text():
-                await websocket.send_json({"status": "healthy"})
-    except WebSocketDisconnect:
-        websocket_manager.disconnect(("filament",), websocket)
+    await websocket_manager.serve(websocket, ("filament",), mode)
 
 
 @router.get(
@@ -409,16 +450,30 @@ async def notify_any(
     name="Get filament",
     description=(
         "Get a specific filament. A websocket is served on the same path to listen for changes to the filament. "
-        "See the HTTP Response code 299 for the content of the websocket messages."
+        "See the HTTP Response code 299 for the content of the websocket messages. "
+        "The response carries an ETag, which changes whenever the filament does; send it back in If-None-Match "
+        "to get an empty 304 response if it hasn't changed since."
     ),
     response_model_exclude_none=True,
-    responses={404: {"model": Message}, 299: {"model": FilamentEvent, "description": "Websocket message"}},
+    response_model=Filament,
+    responses={
+        304: {"description": "The filament has not changed since the ETag in If-None-Match."},
+        404: {"model": Message},
+        299: {"model": FilamentEvent, "description": "Websocket message"},
+    },
 )
-async def get(
+async def get(  # noqa: ANN201
     db: Annotated[AsyncSession, Depends(get_db_session)],
     filament_id: int,
-) -> Filament:
+    response: Response,
+    if_none_match: Annotated[str | None, Header()] = None,
+):
+    if if_none_match is not None:
+        etag = await filament.get_etag(db, filament_id)
+        if response_cache.none_match(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
     db_item = await filament.get_by_id(db, filament_id)
+    response.headers["ETag"] = filament.etag(db_item)
     return Filament.from_db(db_item)
 
 
@@ -429,16 +484,9 @@ async def get(
 async def notify(
     websocket: WebSocket,
     filament_id: int,
+    mode: WebsocketModeQuery = WebsocketMode.FULL,
 ) -> None:
-    await websocket.accept()
-    websocket_manager.connect(("filament", str(filament_id)), websocket)
-    try:
-        while True:
-            await asyncio.sleep(0.5)
-            if await websocket.receive_text():
-                await websocket.send_json({"status": "healthy"})
-    except WebSocketDisconnect:
-        websocket_manager.disconnect(("filament", str(filament_id)), websocket)
+    await websocket_manager.serve(websocket, ("filament", str(filament_id)), mode)
 
 
 @router.post(
@@ -489,19 +537,24 @@ async def create(  # noqa: ANN201
     name="Update filament",
     description=(
         "Update any attribute of a filament. Only fields specified in the request will be affected. "
-        "If extra is set, all existing extra fields will be removed and replaced with the new ones."
+        "If extra is set, all existing extra fields will be removed and replaced with the new ones. "
+        "To not overwrite a change made by someone else, send the ETag the filament was read with in If-Match; "
+        "if the filament has changed since, nothing is updated and 412 is returned."
     ),
     response_model_exclude_none=True,
     response_model=Filament,
     responses={
         400: {"model": Message},
         404: {"model": Message},
+        412: {"model": Message},
     },
 )
 async def update(  # noqa: ANN201
     db: Annotated[AsyncSession, Depends(get_db_session)],
     filament_id: int,
     body: FilamentUpdateParameters,
+    response: Response,
+    if_match: Annotated[str | None, Header()] = None,
 ):
     patch_data = body.model_dump(exclude_unset=True)
 
@@ -516,8 +569,10 @@ async def update(  # noqa: ANN201
         db=db,
         filament_id=filament_id,
         data=patch_data,
+        if_match=if_match,
     )
 
+    response.headers["ETag"] = filament.etag(db_item)
     return Filament.from_db(db_item)
 
 
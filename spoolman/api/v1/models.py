@@ -1,13 +1,17 @@
 """Pydantic data models for typing the FastAPI request/responses."""
 
+from collections.abc import AsyncIterable, AsyncIterator, Sequence
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from enum import Enum
-from typing import TYPE_CHECKING, Annotated, Literal
+from typing import TYPE_CHECKING, Annotated, Any, Literal
 
-from pydantic import BaseModel, Field, PlainSerializer
+from pydantic import BaseModel, Field, PlainSerializer, TypeAdapter, create_model
+from starlette.responses import Response, StreamingResponse
 
+from spoolman.colors import sanitize_color_hex, sanitize_multi_color_hexes
 from spoolman.database import models
-from spoolman.math import length_from_weight
+from spoolman.math import length_from_weight, remaining_length, remaining_weight
 from spoolman.settings import SettingDefinition, SettingType
 
 if TYPE_CHECKING:
@@ -25,30 +29,50 @@ def datetime_to_str(dt: datetime) -> str:
 
 SpoolmanDateTime = Annotated[datetime, PlainSerializer(datetime_to_str)]
 
+# Serializes each model of a list, or of a mapping by ID, by its own type.
+_model_list = TypeAdapter(list[Any])
+_model_map = TypeAdapter(dict[int, Any])
 
-def _sanitize_color_hex(value: str | None) -> str | None:
-    """Normalize a color code read from the database.
 
-    Older releases could store a value with a leading ``#`` (see #780). Strip it and
-    drop anything that still isn't a valid 6 or 8 character code, so that one bad row
-    doesn't make the whole filament list unserializable.
+class ModelResponse(Response):
+    """A JSON response with a model or a list of models, leaving out their unset fields.
+
+    Serialized by pydantic-core in one go, rather than having jsonable_encoder turn every model into
+    dicts first for the json module to serialize after. The output is the same.
     """
-    if not value:
-        return None
-    clr = value.upper().removeprefix("#")
-    if len(clr) not in (6, 8) or any(c not in "0123456789ABCDEF" for c in clr):
-        return None
-    return clr
+
+    media_type = "application/json"
+
+    def render(self, content: BaseModel | Sequence[BaseModel]) -> bytes:
+        """Serialize the models."""
+        if isinstance(content, BaseModel):
+            return content.model_dump_json(exclude_none=True).encode()
+        return render_models(content)
+
+
+class JSONStreamResponse(StreamingResponse):
+    """A JSON response that is sent in parts as they are rendered, e.g. by stream_json_array."""
+
+    media_type = "application/json"
 
 
-def _sanitize_multi_color_hexes(value: str | None) -> str | None:
-    """Normalize a comma-separated list of color codes read from the database."""
-    if not value:
-        return None
-    colors = [c for c in (_sanitize_color_hex(part) for part in value.split(",")) if c is not None]
-    if len(colors) < 2:  # noqa: PLR2004
-        return None
-    return ",".join(colors)
+def render_models(items: Sequence[BaseModel]) -> bytes:
+    """Serialize a list of models the way ModelResponse does."""
+    return _model_list.dump_json(list(items), exclude_none=True)
+
+
+async def stream_json_array(arrays: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """Join JSON arrays into one as they come, e.g. the rendered batches of a streamed list.
+
+    Each of them is sent on as it comes, so only one is held at a time. The result is the same as
+    rendering all of their items as one array.
+    """
+    separator = b"["
+    async for array in arrays:
+        if array != b"[]":
+            yield separator + array[1:-1]
+            separator = b","
+    yield b"[]" if separator == b"[" else b"]"
 
 
 def _extra_fields_description(entity: str) -> str:
@@ -255,13 +279,16 @@ class Filament(BaseModel):
     )
 
     @staticmethod
-    def from_db(item: models.Filament) -> "Filament":
+    def from_db(item: models.Filament, memo: "FromDbMemo | None" = None) -> "Filament":
         """Create a new Pydantic filament object from a database filament object."""
+        vendor = None
+        if item.vendor is not None:
+            vendor = memo.vendor(item.vendor) if memo is not None else Vendor.from_db(item.vendor)
         return Filament(
             id=item.id,
             registered=item.registered,
             name=item.name,
-            vendor=Vendor.from_db(item.vendor) if item.vendor is not None else None,
+            vendor=vendor,
             material=item.material,
             price=item.price,
             density=item.density,
@@ -272,8 +299,8 @@ class Filament(BaseModel):
             comment=item.comment,
             settings_extruder_temp=item.settings_extruder_temp,
             settings_bed_temp=item.settings_bed_temp,
-            color_hex=_sanitize_color_hex(item.color_hex),
-            multi_color_hexes=_sanitize_multi_color_hexes(item.multi_color_hexes),
+            color_hex=sanitize_color_hex(item.color_hex),
+            multi_color_hexes=sanitize_multi_color_hexes(item.multi_color_hexes),
             multi_color_direction=(
                 MultiColorDirection(item.multi_color_direction) if item.multi_color_direction is not None else None
             ),
@@ -364,27 +391,9 @@ class Spool(BaseModel):
     )
 
     @staticmethod
-    def from_db(item: models.Spool) -> "Spool":
+    def from_db(item: models.Spool, memo: "FromDbMemo | None" = None) -> "Spool":
         """Create a new Pydantic spool object from a database spool object."""
-        filament = Filament.from_db(item.filament)
-
-        remaining_weight: float | None = None
-        remaining_length: float | None = None
-
-        if item.initial_weight is not None:
-            remaining_weight = max(item.initial_weight - item.used_weight, 0)
-            remaining_length = length_from_weight(
-                weight=remaining_weight,
-                density=filament.density,
-                diameter=filament.diameter,
-            )
-        elif filament.weight is not None:
-            remaining_weight = max(filament.weight - item.used_weight, 0)
-            remaining_length = length_from_weight(
-                weight=remaining_weight,
-                density=filament.density,
-                diameter=filament.diameter,
-            )
+        filament = memo.filament(item.filament) if memo is not None else Filament.from_db(item.filament)
 
         used_length = length_from_weight(
             weight=item.used_weight,
@@ -403,8 +412,18 @@ class Spool(BaseModel):
             spool_weight=item.spool_weight,
             used_weight=item.used_weight,
             used_length=used_length,
-            remaining_weight=remaining_weight,
-            remaining_length=remaining_length,
+            remaining_weight=remaining_weight(
+                initial_weight=item.initial_weight,
+                filament_weight=filament.weight,
+                used_weight=item.used_weight,
+            ),
+            remaining_length=remaining_length(
+                initial_weight=item.initial_weight,
+                filament_weight=filament.weight,
+                used_weight=item.used_weight,
+                density=filament.density,
+                diameter=filament.diameter,
+            ),
             location=item.location,
             lot_nr=item.lot_nr,
             comment=item.comment,
@@ -413,6 +432,114 @@ class Spool(BaseModel):
         )
 
 
+@dataclass
+class FromDbMemo:
+    """The filaments and vendors converted so far for one response, by ID.
+
+    The spools of a list mostly share a few filaments, and the filaments a few vendors. Pass one
+    memo to every from_db call of a response to convert each of them once, and share the result.
+    """
+
+    filaments: dict[int, Filament] = field(default_factory=dict)
+    vendors: dict[int, Vendor] = field(default_factory=dict)
+
+    def filament(self, item: models.Filament) -> Filament:
+        """Convert a database filament object, or get the one converted before."""
+        filament = self.filaments.get(item.id)
+        if filament is None:
+            filament = self.filaments[item.id] = Filament.from_db(item, self)
+        return filament
+
+    def vendor(self, item: models.Vendor) -> Vendor:
+        """Convert a database vendor object, or get the one converted before."""
+        vendor = self.vendors.get(item.id)
+        if vendor is None:
+            vendor = self.vendors[item.id] = Vendor.from_db(item)
+        return vendor
+
+
+class EmbedMode(str, Enum):
+    """How a list of spools includes their filaments and vendors."""
+
+    FULL = "full"
+    IDS = "ids"
+    NONE = "none"
+
+
+def _refer_by_id(model: type[BaseModel], name: str, embedded: str, description: str) -> type[BaseModel]:
+    """Derive a model from one that embeds an object, which only has the ID of that object instead.
+
+    The ID takes the place of the object among the fields, so the fields keep their order.
+    """
+    fields: dict[str, Any] = {}
+    for field_name, info in model.model_fields.items():
+        if field_name != embedded:
+            fields[field_name] = (info.annotation, info)
+        elif info.is_required():
+            fields[f"{embedded}_id"] = (int, Field(description=description))
+        else:
+            fields[f"{embedded}_id"] = (int | None, Field(None, description=description))
+    return create_model(name, __doc__=f"{model.__name__}, with {description[0].lower()}{description[1:]}", **fields)
+
+
+def _to_ids(item: BaseModel, model: type[BaseModel], embedded: str) -> BaseModel:
+    """Turn a model into the one derived from it with _refer_by_id."""
+    values = dict(item)
+    related = values.pop(embedded)
+    values[f"{embedded}_id"] = related.id if related is not None else None
+    return model.model_construct(**values)
+
+
+NormalizedFilament = _refer_by_id(Filament, "NormalizedFilament", "vendor", "The ID of the vendor of this filament.")
+NormalizedSpool = _refer_by_id(Spool, "NormalizedSpool", "filament", "The ID of the filament type of this spool.")
+
+
+class NormalizedSpoolList(BaseModel):
+    """A list of spools that only have the IDs of their filaments, along with those filaments and their vendors.
+
+    Returned by the spool list when ``embed=ids``. A large inventory shares a few filaments and
+    vendors among many spools, so sending each of them once makes for a far smaller response.
+    """
+
+    spools: list[NormalizedSpool] = Field(description="The spools.")  # type: ignore[valid-type]
+    filaments: dict[int, NormalizedFilament] = Field(  # type: ignore[valid-type]
+        description="The filaments of the spools, by ID.",
+    )
+    vendors: dict[int, Vendor] = Field(description="The vendors of the filaments, by ID.")
+
+    @staticmethod
+    def from_spools(spools: Sequence[Spool], memo: FromDbMemo) -> "NormalizedSpoolList":
+        """Create the list from spools converted with the given memo, which holds their filaments and vendors."""
+        return NormalizedSpoolList(
+            spools=[normalize_spool(spool) for spool in spools],
+            filaments=_normalize_filaments(memo),
+            vendors=memo.vendors,
+        )
+
+    @staticmethod
+    async def stream(batches: AsyncIterable[Sequence[Spool]], memo: FromDbMemo) -> AsyncIterator[bytes]:
+        """Render the list as batches of spools converted with the given memo come, like from_spools would.
+
+        The filaments and vendors come after the spools, once all of them are known.
+        """
+        yield b'{"spools":'
+        arrays = (render_models([normalize_spool(spool) for spool in batch]) async for batch in batches)
+        async for part in stream_json_array(arrays):
+            yield part
+        yield b',"filaments":' + _model_map.dump_json(_normalize_filaments(memo), exclude_none=True)
+        yield b',"vendors":' + _model_map.dump_json(memo.vendors, exclude_none=True) + b"}"
+
+
+def _normalize_filaments(memo: FromDbMemo) -> dict[int, BaseModel]:
+    """Turn the filaments of a memo into ones that only have the IDs of their vendors."""
+    return {id_: _to_ids(filament, NormalizedFilament, "vendor") for id_, filament in memo.filaments.items()}
+
+
+def normalize_spool(spool: Spool) -> BaseModel:
+    """Turn a spool into one that only has the ID of its filament."""
+    return _to_ids(spool, NormalizedSpool, "filament")
+
+
 class SpoolGroup(BaseModel):
     """A group of spools with server-computed aggregates.
 
@@ -458,6 +585,22 @@ class SpoolGroup(BaseModel):
     )
 
 
+class UsageTotal(BaseModel):
+    """Filament used by one group of spools over a time range, as returned by the ``/usage`` endpoint."""
+
+    group_by: str = Field(description="What the usage is summed per.", examples=["material"])
+    key: str | None = Field(
+        None,
+        description=(
+            "The group key. For group_by=spool/filament this is the entity ID as a string; for "
+            "material/location it is the value. Null when the spool or filament has been deleted, or the "
+            "material or location was unset."
+        ),
+        examples=["PETG"],
+    )
+    used_weight: float = Field(description="Filament used in the time range, in grams.", examples=[1240.5])
+
+
 class SearchResultSpool(BaseModel):
     """A spool that matched a search, with which field matched."""
 
@@ -495,15 +638,13 @@ class SearchResultFilamentSpool(BaseModel):
     @staticmethod
     def from_db(item: "search.FilamentSpool", filament_weight: float | None) -> "SearchResultFilamentSpool":
         """Create the compact spool object, deriving its weight the way `Spool.from_db` does."""
-        remaining_weight: float | None = None
-        if item.initial_weight is not None:
-            remaining_weight = max(item.initial_weight - item.used_weight, 0)
-        elif filament_weight is not None:
-            remaining_weight = max(filament_weight - item.used_weight, 0)
-
         return SearchResultFilamentSpool(
             id=item.id,
-            remaining_weight=remaining_weight,
+            remaining_weight=remaining_weight(
+                initial_weight=item.initial_weight,
+                filament_weight=filament_weight,
+                used_weight=item.used_weight,
+            ),
             location=item.location,
             archived=item.archived,
         )
@@ -644,3 +785,55 @@ class SettingEvent(Event):
 
     payload: SettingKV = Field(description="Updated setting.")
     resource: Literal["setting"] = Field(description="Resource type.")
+
+
+class CountMode(str, Enum):
+    """How a paginated search counts the items it matches."""
+
+    EXACT = "exact"
+    ESTIMATE = "estimate"
+    NONE = "none"
+
+
+class WebsocketMode(str, Enum):
+    """What the websocket messages of a subscription contain."""
+
+    FULL = "full"
+    DELTA = "delta"
+
+
+class DeltaEvent(BaseModel):
+    """Event, as sent to websocket subscriptions in delta mode."""
+
+    type: EventType = Field(description="Event type.")
+    resource: str = Field(description="Resource type.")
+    date: SpoolmanDateTime = Field(description="When the event occured. UTC Timezone.")
+    id: str = Field(description="ID of the item, or key of the setting, that changed.", examples=["1"])
+    epoch: str = Field(
+        description=(
+            "The server process that numbered the versions. Each process numbers them on its own, from the start "
+            "every time it starts, so versions of different epochs cannot be compared. If it is not the epoch of "
+            "the last message you received, after a reconnect to another process or a restart, fetch the items "
+            "you hold again."
+        ),
+        examples=["9f2c4e1a7b3d4c58a0e6f1b2c3d4e5f6"],
+    )
+    version: int = Field(
+        description="Version of the item after this event. Versions increase with every event of the same epoch.",
+        examples=[42],
+    )
+    base_version: int | None = Field(
+        description=(
+            "Version of the item that the patch applies to. If it is not the last version you received for the "
+            "item, you missed an event and should fetch the item again. Null if the patch is the full item."
+        ),
+        examples=[41],
+    )
+    patch: dict[str, Any] | None = Field(
+        description=(
+            "JSON merge patch (RFC 7396) from the base version to this version of the item: changed fields with "
+            "their new value, unset fields as null, and nested objects patched the same way. The full item if "
+            "there is no base version. Null for deleted items."
+        ),
+        examples=[{"used_weight": 153.2, "last_used": "2026-10-17T12:00:00Z"}],
+    )
@@ -2,21 +2,22 @@
 
 # ruff: noqa: D103
 
-import asyncio
 import logging
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket
 from fastapi.responses import JSONResponse
 from starlette.requests import Request
 from starlette.responses import Response
 
 from spoolman import env
+from spoolman.cache_sync import CacheSyncMiddleware
 from spoolman.database.database import backup_global_db
-from spoolman.exceptions import ItemNotFoundError
+from spoolman.exceptions import ItemNotFoundError, PreconditionFailedError
 from spoolman.externaldb import get_external_db_name
-from spoolman.ws import websocket_manager
+from spoolman.response_cache import ResponseCacheMiddleware
+from spoolman.ws import WebsocketModeQuery, websocket_manager
 
-from . import export, externaldb, field, filament, models, other, search, setting, spool, vendor
+from . import export, externaldb, field, filament, models, other, search, setting, spool, usage, vendor
 
 logger = logging.getLogger(__name__)
 
@@ -30,9 +31,16 @@ app = FastAPI(
 
     Some endpoints also serve a websocket on the same path. The websocket is used to listen for changes to the data
     that the endpoint serves. The websocket messages are JSON objects. Additionally, there is a root-level websocket
-    endpoint that listens for changes to any data in the database.
+    endpoint that listens for changes to any data in the database. Connect with `?mode=delta` to get only the fields
+    that changed since the previous message for the same item, as a JSON merge patch.
+
+    The list endpoints send an `ETag` with their responses. Send it back in `If-None-Match` to get a
+    `304 Not Modified` without a body if the list has not changed.
     """,
 )
+app.add_middleware(ResponseCacheMiddleware)
+# Outside of the response cache, so that the writes of other processes are seen before it is read.
+app.add_middleware(CacheSyncMiddleware)
 
 
 @app.exception_handler(ItemNotFoundError)
@@ -44,6 +52,15 @@ async def itemnotfounderror_exception_handler(_request: Request, exc: ItemNotFou
     )
 
 
+@app.exception_handler(PreconditionFailedError)
+async def preconditionfailederror_exception_handler(_request: Request, exc: PreconditionFailedError) -> Response:
+    logger.debug(exc)
+    return JSONResponse(
+        status_code=412,
+        content={"message": exc.args[0]},
+    )
+
+
 # Add a general info endpoint
 @app.get("/info")
 async def info() -> models.Info:
@@ -93,16 +110,9 @@ async def backup():  # noqa: ANN201
 )
 async def notify(
     websocket: WebSocket,
+    mode: WebsocketModeQuery = models.WebsocketMode.FULL,
 ) -> None:
-    await websocket.accept()
-    websocket_manager.connect((), websocket)
-    try:
-        while True:
-            await asyncio.sleep(0.5)
-            if await websocket.receive_text():
-                await websocket.send_json({"status": "healthy"})
-    except WebSocketDisconnect:
-        websocket_manager.disconnect((), websocket)
+    await websocket_manager.serve(websocket, (), mode)
 
 
 # Add routers
@@ -115,3 +125,4 @@ app.include_router(other.router)
 app.include_router(externaldb.router)
 app.include_router(export.router)
 app.include_router(search.router)
+app.include_router(usage.router)
@@ -7,14 +7,13 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from spoolman.api.v1.models import (
-    Filament,
+    FromDbMemo,
     SearchResultFilament,
     SearchResultFilamentSpool,
     SearchResults,
     SearchResultSpool,
     SearchResultVendor,
     Spool,
-    Vendor,
 )
 from spoolman.database import search
 from spoolman.database.database import get_db_session
@@ -110,11 +109,14 @@ async def search_endpoint(
         allow_archived=allow_archived,
         spools_per_filament=spools_per_filament,
     )
+    memo = FromDbMemo()
     return SearchResults(
-        spools=[SearchResultSpool(spool=Spool.from_db(m.spool), match_field=m.match_field) for m in result.spools],
+        spools=[
+            SearchResultSpool(spool=Spool.from_db(m.spool, memo), match_field=m.match_field) for m in result.spools
+        ],
         filaments=[
             SearchResultFilament(
-                filament=Filament.from_db(m.filament),
+                filament=memo.filament(m.filament),
                 match_field=m.match_field,
                 spools=(
                     None
@@ -125,8 +127,6 @@ async def search_endpoint(
             )
             for m in result.filaments
         ],
-        vendors=[
-            SearchResultVendor(vendor=Vendor.from_db(m.vendor), match_field=m.match_field) for m in result.vendors
-        ],
+        vendors=[SearchResultVendor(vendor=memo.vendor(m.vendor), match_field=m.match_field) for m in result.vendors],
         is_color_query=result.is_color_query,
     )
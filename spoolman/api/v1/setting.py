@@ -1,20 +1,19 @@
 """Vendor related endpoints."""
 
-import asyncio
 import logging
 from typing import Annotated
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, WebSocket
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from spoolman.api.v1.models import Message, SettingEvent, SettingResponse
+from spoolman.api.v1.models import Message, SettingEvent, SettingResponse, WebsocketMode
 from spoolman.database import setting
 from spoolman.database.database import get_db_session
 from spoolman.exceptions import ItemNotFoundError
 from spoolman.extra_field_registry import invalidate_extra_field_cache, validate_extra_field_setting
 from spoolman.settings import SETTINGS, parse_setting
-from spoolman.ws import websocket_manager
+from spoolman.ws import WebsocketModeQuery, websocket_manager
 
 router = APIRouter(
     prefix="/setting",
@@ -62,16 +61,9 @@ async def require_json_content_type(request: Request) -> None:
 )
 async def notify_any(
     websocket: WebSocket,
+    mode: WebsocketModeQuery = WebsocketMode.FULL,
 ) -> None:
-    await websocket.accept()
-    websocket_manager.connect(("setting",), websocket)
-    try:
-        while True:
-            await asyncio.sleep(0.5)
-            if await websocket.receive_text():
-                await websocket.send_json({"status": "healthy"})
-    except WebSocketDisconnect:
-        websocket_manager.disconnect(("setting",), websocket)
+    await websocket_manager.serve(websocket, ("setting",), mode)
 
 
 @router.get(
@@ -155,6 +147,7 @@ async def find(
 async def notify(
     websocket: WebSocket,
     key: str,
+    mode: WebsocketModeQuery = WebsocketMode.FULL,
 ) -> None:
     try:
         parse_setting(key)
@@ -162,15 +155,7 @@ async def notify(
         await websocket.close(code=4040, reason=str(e))
         return
 
-    await websocket.accept()
-    websocket_manager.connect(("setting", str(key)), websocket)
-    try:
-        while True:
-            await asyncio.sleep(0.5)
-            if await websocket.receive_text():
-                await websocket.send_json({"status": "healthy"})
-    except WebSocketDisconnect:
-        websocket_manager.disconnect(("setting", str(key)), websocket)
+    await websocket_manager.serve(websocket, ("setting", str(key)), mode)
 
 
 @router.post(
@@ -1,32 +1,47 @@
 """Spool related endpoints."""
 
-import asyncio
+import json
 import logging
+from collections.abc import Sequence
 from datetime import datetime
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Path, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, Header, Path, Query, Request, Response, WebSocket
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, field_validator
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.datastructures import QueryParams
 
+from spoolman import response_cache
 from spoolman.api.v1.models import (
+    CountMode,
+    EmbedMode,
     Filament,
+    FromDbMemo,
+    JSONStreamResponse,
     Message,
+    ModelResponse,
+    NormalizedSpool,
+    NormalizedSpoolList,
     Spool,
     SpoolEvent,
     SpoolGroup,
     Vendor,
+    WebsocketMode,
     extra_fields_request_description,
+    normalize_spool,
+    render_models,
+    stream_json_array,
 )
-from spoolman.database import spool
+from spoolman.database import models, spool
 from spoolman.database.database import get_db_session
-from spoolman.database.utils import parse_sort
+from spoolman.database.spool_fields import SparseFieldset, parse_fields
+from spoolman.database.spool_filter import SpoolFilter
+from spoolman.database.utils import ItemStream, parse_sort
 from spoolman.exceptions import ItemCreateError, SpoolMeasureError
 from spoolman.extra_fields import EntityType, get_extra_fields, validate_extra_field_dict
-from spoolman.ws import websocket_manager
+from spoolman.ws import WebsocketModeQuery, websocket_manager
 
 logger = logging.getLogger(__name__)
 
@@ -59,6 +74,55 @@ def _parse_extra_field_filters(
     return buckets["spool"], buckets["filament"], buckets["vendor"]
 
 
+# The spool search's filters, by query parameter, including the deprecated spellings.
+_SUBSCRIPTION_FILTER_PARAMS = {
+    "filament.name": "filament_name",
+    "filament_name": "filament_name",
+    "filament.id": "filament_id",
+    "filament_id": "filament_id",
+    "filament.material": "filament_material",
+    "filament_material": "filament_material",
+    "filament.multi_color_direction": "filament_multi_color_direction",
+    "filament.vendor.name": "vendor_name",
+    "vendor_name": "vendor_name",
+    "filament.vendor.id": "vendor_id",
+    "vendor_id": "vendor_id",
+    "location": "location",
+    "lot_nr": "lot_nr",
+    "allow_archived": "allow_archived",
+    "first_used": "first_used",
+    "last_used": "last_used",
+    "registered": "registered",
+}
+
+
+def _parse_subscription_filter(query_params: QueryParams) -> SpoolFilter | None:
+    """Parse the spool search filters given to the spool websocket, or None if there are none."""
+    spool_extra, filament_extra, vendor_extra = _parse_extra_field_filters(query_params)
+    params = {
+        _SUBSCRIPTION_FILTER_PARAMS[key]: value
+        for key, value in query_params.items()
+        if key in _SUBSCRIPTION_FILTER_PARAMS
+    }
+    if not params and not spool_extra and not filament_extra and not vendor_extra:
+        return None
+
+    for key in ("filament_id", "vendor_id"):
+        if key in params:
+            try:
+                params[key] = tuple(int(item) for item in params[key].split(","))
+            except ValueError:
+                raise ValueError(f"Invalid {key} filter '{params[key]}', expected comma-separated IDs.") from None
+    if "allow_archived" in params:
+        params["allow_archived"] = params["allow_archived"].lower() in ("1", "true", "yes", "on")
+    return SpoolFilter(
+        **params,
+        extra_field_filters=tuple(spool_extra.items()),
+        filament_extra_field_filters=tuple(filament_extra.items()),
+        vendor_extra_field_filters=tuple(vendor_extra.items()),
+    )
+
+
 def _date_query(field: str, title: str) -> Query:
     """Build the Query() for a datetime filter on `field`.
 
@@ -170,6 +234,10 @@ class SpoolUseParameters(BaseModel):
     use_weight: float | None = Field(None, description="Filament weight to reduce by, in g.", examples=[5.3])
 
 
+class SpoolUseBatchItem(SpoolUseParameters):
+    spool_id: int = Field(description="The ID of the spool to use filament from.", examples=[1])
+
+
 class SpoolMeasureParameters(BaseModel):
     weight: float = Field(description="Current gross weight of the spool, in g.", examples=[200])
 
@@ -180,11 +248,15 @@ class SpoolMeasureParameters(BaseModel):
     description=(
         "Get a list of spools that matches the search query. "
         "A websocket is served on the same path to listen for updates to any spool, or added or deleted spools. "
+        "Give it any of the filters below, except sort, limit and offset, to only listen to the spools that match "
+        "them. Such a subscription is sent a spool as added when it comes to match, and as deleted when it no "
+        "longer does. Filters on filament and vendor fields are checked when a spool changes, not when its "
+        "filament or vendor does. "
         "See the HTTP Response code 299 for the content of the websocket messages."
     ),
     response_model_exclude_none=True,
     responses={
-        200: {"model": list[Spool]},
+        200: {"model": list[Spool] | NormalizedSpoolList | list[NormalizedSpool]},  # type: ignore[valid-type]
         299: {"model": SpoolEvent, "description": "Websocket message"},
     },
 )
@@ -343,12 +415,70 @@ async def find(
     ] = None,
     limit: Annotated[
         int | None,
-        Query(title="Limit", description="Maximum number of items in the response."),
+        Query(
+            title="Limit",
+            description=(
+                "Maximum number of items in the response. Without it, all matching items are sent, in parts as "
+                "they are read."
+            ),
+        ),
     ] = None,
     offset: Annotated[int, Query(title="Offset", description="Offset in the full result set if a limit is set.")] = 0,
+    cursor: Annotated[
+        str | None,
+        Query(
+            title="Cursor",
+            description=(
+                "Continue after the last item of a previous page, instead of at an offset. Pass the "
+                "x-next-cursor header of that page, which is only set if there are more items. The sort must "
+                "be the same as for that page."
+            ),
+        ),
+    ] = None,
+    count: Annotated[
+        CountMode,
+        Query(
+            title="Count",
+            description=(
+                "How to count the matching items for the x-total-count header if a limit or cursor is set. "
+                "exact counts them, which takes a query of its own unless nothing changed since the same search "
+                "last counted them. estimate takes the count of the last time, however old. none leaves the "
+                "header out. Without a limit or cursor, the list is sent in batches as they are read, and the "
+                "header is the number of items that matched when it started, each of which is sent once, in "
+                "the order it had then. An item that is deleted or stops matching meanwhile is left out."
+            ),
+        ),
+    ] = CountMode.EXACT,
+    embed: Annotated[
+        EmbedMode,
+        Query(
+            title="Embed",
+            description=(
+                "How to include the filaments and vendors of the spools. full embeds them in every spool. ids "
+                "gives each spool a filament_id and each filament a vendor_id instead, and returns an object "
+                "with the spools and, by ID, each of their filaments and vendors once. none returns the spools "
+                "with only a filament_id, for a client that has the filaments already."
+            ),
+        ),
+    ] = EmbedMode.FULL,
+    fields: Annotated[
+        str | None,
+        Query(
+            title="Fields",
+            description=(
+                "Only return these fields of the spools, separated by commas. Name a field by its path in the "
+                "spool, e.g. remaining_weight or filament.vendor.name, and an extra field by its key, e.g. "
+                "extra.shelf. filament, filament.vendor and extra stand for all of their fields. Only the columns "
+                "needed for the fields are read, so this is the fastest way to list many spools. Cannot be "
+                "combined with embed."
+            ),
+            examples=["id,remaining_weight,location", "id,filament.name,extra.shelf"],
+        ),
+    ] = None,
 ) -> JSONResponse:
     try:
         sort_by = parse_sort(sort)
+        fieldset = _parse_fields(fields, embed)
     except ValueError as e:
         return JSONResponse(status_code=400, content=Message(message=str(e)).dict())
 
@@ -369,7 +499,7 @@ async def find(
     spool_extra, filament_extra, vendor_extra = _parse_extra_field_filters(request.query_params)
 
     try:
-        db_items, total_count = await spool.find(
+        db_items, total_count, next_cursor = await spool.find(
             db=db,
             filament_name=filament_name if filament_name is not None else filament_name_old,
             filament_id=filament_ids,
@@ -389,18 +519,71 @@ async def find(
             sort_by=sort_by,
             limit=limit,
             offset=offset,
+            cursor=cursor,
+            count=count,
+            columns=fieldset.columns if fieldset is not None else None,
+            stream=True,
         )
     except ValueError as e:
         return JSONResponse(status_code=400, content=Message(message=str(e)).dict())
 
-    # Set x-total-count header for pagination
-    return JSONResponse(
-        content=jsonable_encoder(
-            (Spool.from_db(db_item) for db_item in db_items),
-            exclude_none=True,
-        ),
-        headers={"x-total-count": str(total_count)},
-    )
+    # Set x-total-count and x-next-cursor headers for pagination
+    headers: dict[str, str] = {}
+    if total_count is not None:
+        headers["x-total-count"] = str(total_count)
+    if next_cursor is not None:
+        headers["x-next-cursor"] = next_cursor
+    if isinstance(db_items, ItemStream):
+        return _spool_list_stream(db, db_items, embed, fieldset, headers)
+    if fieldset is not None:
+        return JSONResponse(content=await fieldset.to_dicts(db, db_items), headers=headers)
+    return _spool_list_response(db_items, embed, headers)
+
+
+def _parse_fields(fields: str | None, embed: EmbedMode) -> SparseFieldset | None:
+    """Parse the fields parameter of the spool search, if given."""
+    if fields is None:
+        return None
+    if embed != EmbedMode.FULL:
+        raise ValueError("fields cannot be combined with embed.")
+    return parse_fields(fields)
+
+
+def _spool_list_response(db_items: list[models.Spool], embed: EmbedMode, headers: dict[str, str]) -> Response:
+    """Respond with a list of spools, with their filaments and vendors included as asked for."""
+    memo = FromDbMemo()
+    spools = [Spool.from_db(db_item, memo) for db_item in db_items]
+    if embed == EmbedMode.IDS:
+        return ModelResponse(content=NormalizedSpoolList.from_spools(spools, memo), headers=headers)
+    if embed == EmbedMode.NONE:
+        return ModelResponse(content=[normalize_spool(item) for item in spools], headers=headers)
+    return ModelResponse(content=spools, headers=headers)
+
+
+def _spool_list_stream(
+    db: AsyncSession,
+    items: ItemStream,
+    embed: EmbedMode,
+    fieldset: SparseFieldset | None,
+    headers: dict[str, str],
+) -> JSONStreamResponse:
+    """Respond with all spools of a search, sent batch by batch as they are read, the same as _spool_list_response."""
+    memo = FromDbMemo()
+    spools = ([Spool.from_db(db_item, memo) for db_item in batch] async for batch in items.batches())
+    if fieldset is not None:
+        arrays = (_render_json(await fieldset.to_dicts(db, batch)) async for batch in items.batches())
+    elif embed == EmbedMode.IDS:
+        return JSONStreamResponse(NormalizedSpoolList.stream(spools, memo), headers=headers)
+    elif embed == EmbedMode.NONE:
+        arrays = (render_models([normalize_spool(spool) for spool in batch]) async for batch in spools)
+    else:
+        arrays = (render_models(batch) async for batch in spools)
+    return JSONStreamResponse(stream_json_array(arrays), headers=headers)
+
+
+def _render_json(content: Sequence[dict]) -> bytes:
+    """Serialize plain data the way JSONResponse does."""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
 
 
 @router.websocket(
@@ -409,16 +592,19 @@ async def find(
 )
 async def notify_any(
     websocket: WebSocket,
+    mode: WebsocketModeQuery = WebsocketMode.FULL,
 ) -> None:
-    await websocket.accept()
-    websocket_manager.connect(("spool",), websocket)
     try:
-        while True:
-            await asyncio.sleep(0.5)
-            if await websocket.receive_text():
-                await websocket.send_json({"status": "healthy"})
-    except WebSocketDisconnect:
-        websocket_manager.disconnect(("spool",), websocket)
+        subscription_filter = _parse_subscription_filter(websocket.query_params)
+        members = None
+        if subscription_filter is not None:
+            async for db in get_db_session():
+                members = await subscription_filter.find_ids(db)
+    except ValueError as e:
+        await websocket.close(code=4000, reason=str(e))
+        return
+
+    await websocket_manager.serve(websocket, ("spool",), mode, subscription_filter, members)
 
 
 @router.get(
@@ -659,16 +845,30 @@ async def rename_field_value(
     name="Get spool",
     description=(
         "Get a specific spool. A websocket is served on the same path to listen for changes to the spool. "
-        "See the HTTP Response code 299 for the content of the websocket messages."
+        "See the HTTP Response code 299 for the content of the websocket messages. "
+        "The response carries an ETag, which changes whenever the spool does; send it back in If-None-Match "
+        "to get an empty 304 response if it hasn't changed since."
     ),
     response_model_exclude_none=True,
-    responses={404: {"model": Message}, 299: {"model": SpoolEvent, "description": "Websocket message"}},
+    response_model=Spool,
+    responses={
+        304: {"description": "The spool has not changed since the ETag in If-None-Match."},
+        404: {"model": Message},
+        299: {"model": SpoolEvent, "description": "Websocket message"},
+    },
 )
-async def get(
+async def get(  # noqa: ANN201
     db: Annotated[AsyncSession, Depends(get_db_session)],
     spool_id: int,
-) -> Spool:
+    response: Response,
+    if_none_match: Annotated[str | None, Header()] = None,
+):
+    if if_none_match is not None:
+        etag = await spool.get_etag(db, spool_id)
+        if response_cache.none_match(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
     db_item = await spool.get_by_id(db, spool_id)
+    response.headers["ETag"] = spool.etag(db_item)
     return Spool.from_db(db_item)
 
 
@@ -679,16 +879,9 @@ async def get(
 async def notify(
     websocket: WebSocket,
     spool_id: int,
+    mode: WebsocketModeQuery = WebsocketMode.FULL,
 ) -> None:
-    await websocket.accept()
-    websocket_manager.connect(("spool", str(spool_id)), websocket)
-    try:
-        while True:
-            await asyncio.sleep(0.5)
-            if await websocket.receive_text():
-                await websocket.send_json({"status": "healthy"})
-    except WebSocketDisconnect:
-        websocket_manager.disconnect(("spool", str(spool_id)), websocket)
+    await websocket_manager.serve(websocket, ("spool", str(spool_id)), mode)
 
 
 @router.post(
@@ -755,19 +948,24 @@ async def create(  # noqa: ANN201
         "Update any attribute of a spool. "
         "Only fields specified in the request will be affected. "
         "remaining_weight and used_weight can't be set at the same time. "
-        "If extra is set, all existing extra fields will be removed and replaced with the new ones."
+        "If extra is set, all existing extra fields will be removed and replaced with the new ones. "
+        "To not overwrite a change made by someone else, send the ETag the spool was read with in If-Match; "
+        "if the spool has changed since, nothing is updated and 412 is returned."
     ),
     response_model_exclude_none=True,
     response_model=Spool,
     responses={
         400: {"model": Message},
         404: {"model": Message},
+        412: {"model": Message},
     },
 )
 async def update(  # noqa: ANN201
     db: Annotated[AsyncSession, Depends(get_db_session)],
     spool_id: int,
     body: SpoolUpdateParameters,
+    response: Response,
+    if_match: Annotated[str | None, Header()] = None,
 ):
     patch_data = body.model_dump(exclude_unset=True)
 
@@ -789,6 +987,7 @@ async def update(  # noqa: ANN201
             db=db,
             spool_id=spool_id,
             data=patch_data,
+            if_match=if_match,
         )
     except ItemCreateError:
         logger.exception("Failed to update spool.")
@@ -797,6 +996,7 @@ async def update(  # noqa: ANN201
             content={"message": "Failed to update spool, see server logs for more information."},
         )
 
+    response.headers["ETag"] = spool.etag(db_item)
     return Spool.from_db(db_item)
 
 
@@ -814,6 +1014,40 @@ async def delete(
     return Message(message="Success!")
 
 
+@router.put(
+    "/use",
+    name="Use filament from several spools",
+    description=(
+        "Use some length or weight of filament from several spools at once, e.g. every slot of a multi-material "
+        "printer after a print. Each entry specifies either a length or a weight, not both. The entries are applied "
+        "in order, in a single transaction: if any spool does not exist, none of them are changed. A spool may be "
+        "listed more than once. Returns every affected spool once, in the order it first appears in the request."
+    ),
+    response_model_exclude_none=True,
+    response_model=list[Spool],
+    responses={
+        400: {"model": Message},
+        404: {"model": Message},
+    },
+)
+async def use_batch(  # noqa: ANN201
+    db: Annotated[AsyncSession, Depends(get_db_session)],
+    body: list[SpoolUseBatchItem],
+):
+    usages = []
+    for index, item in enumerate(body):
+        if (item.use_weight is None) == (item.use_length is None):
+            return JSONResponse(
+                status_code=400,
+                content={"message": f"Entry {index}: specify exactly one of use_weight or use_length."},
+            )
+        usages.append(spool.SpoolUsage(spool_id=item.spool_id, weight=item.use_weight, length=item.use_length))
+
+    db_items = await spool.use_batch(db, usages)
+    memo = FromDbMemo()
+    return [Spool.from_db(db_item, memo) for db_item in db_items]
+
+
 @router.put(
     "/{spool_id}/use",
     name="Use spool filament",
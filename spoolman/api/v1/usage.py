@@ -0,0 +1,78 @@
+"""Filament usage history endpoints."""
+
+import logging
+from datetime import datetime, timezone
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from spoolman.api.v1.models import Message, UsageTotal
+from spoolman.database import usage_ledger
+from spoolman.database.database import get_db_session
+from spoolman.database.usage_ledger import UsageGroupBy
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/usage",
+    tags=["usage"],
+)
+
+# ruff: noqa: D103
+
+
+def _utc_naive(dt: datetime) -> datetime:
+    """Convert a datetime to naive UTC, the way it is stored. A naive datetime is taken to be UTC."""
+    if dt.tzinfo is None:
+        return dt
+    return dt.astimezone(tz=timezone.utc).replace(tzinfo=None)
+
+
+@router.get(
+    "",
+    name="Get filament usage",
+    description=(
+        "Sum the filament used in a time range per spool, filament, material or location, most used "
+        "first. Every usage report and measurement is counted, of archived and deleted spools too. "
+        "Material and location are those the spool had when it was used."
+    ),
+    response_model=list[UsageTotal],
+    responses={400: {"model": Message}},
+)
+async def get_usage(
+    *,
+    db: Annotated[AsyncSession, Depends(get_db_session)],
+    group_by: Annotated[
+        UsageGroupBy,
+        Query(title="Group By", description="What to sum the usage per.", examples=["material"]),
+    ],
+    start: Annotated[
+        datetime | None,
+        Query(
+            title="Start",
+            description="Start of the time range, inclusive. Defaults to the beginning of the history. UTC if no "
+            "timezone is given.",
+            examples=["2026-09-01T00:00:00Z"],
+        ),
+    ] = None,
+    end: Annotated[
+        datetime | None,
+        Query(
+            title="End",
+            description="End of the time range, exclusive. Defaults to now. UTC if no timezone is given.",
+            examples=["2026-10-01T00:00:00Z"],
+        ),
+    ] = None,
+) -> list[UsageTotal] | JSONResponse:
+    start_utc = _utc_naive(start) if start is not None else None
+    end_utc = _utc_naive(end) if end is not None else datetime.utcnow()
+    if start_utc is not None and start_utc >= end_utc:
+        return JSONResponse(status_code=400, content=Message(message="start must be before end.").dict())
+
+    totals = await usage_ledger.consumption(db=db, group_by=group_by, start=start_utc, end=end_utc)
+    return [
+        UsageTotal(group_by=group_by, key=None if key is None else str(key), used_weight=used_weight)
+        for key, used_weight in totals
+    ]
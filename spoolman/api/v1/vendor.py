@@ -1,20 +1,30 @@
 """Vendor related endpoints."""
 
-import asyncio
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Query, Request, WebSocket, WebSocketDisconnect
-from fastapi.encoders import jsonable_encoder
+from fastapi import APIRouter, Depends, Header, Query, Request, Response, WebSocket
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, field_validator
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from spoolman.api.v1.models import Message, Vendor, VendorEvent, extra_fields_request_description
+from spoolman import response_cache
+from spoolman.api.v1.models import (
+    CountMode,
+    JSONStreamResponse,
+    Message,
+    ModelResponse,
+    Vendor,
+    VendorEvent,
+    WebsocketMode,
+    extra_fields_request_description,
+    render_models,
+    stream_json_array,
+)
 from spoolman.database import vendor
 from spoolman.database.database import get_db_session
-from spoolman.database.utils import parse_sort
+from spoolman.database.utils import ItemStream, parse_sort
 from spoolman.extra_fields import EntityType, get_extra_fields, validate_extra_field_dict
-from spoolman.ws import websocket_manager
+from spoolman.ws import WebsocketModeQuery, websocket_manager
 
 router = APIRouter(
     prefix="/vendor",
@@ -115,9 +125,40 @@ async def find(
     ] = None,
     limit: Annotated[
         int | None,
-        Query(title="Limit", description="Maximum number of items in the response."),
+        Query(
+            title="Limit",
+            description=(
+                "Maximum number of items in the response. Without it, all matching items are sent, in parts as "
+                "they are read."
+            ),
+        ),
     ] = None,
     offset: Annotated[int, Query(title="Offset", description="Offset in the full result set if a limit is set.")] = 0,
+    cursor: Annotated[
+        str | None,
+        Query(
+            title="Cursor",
+            description=(
+                "Continue after the last item of a previous page, instead of at an offset. Pass the "
+                "x-next-cursor header of that page, which is only set if there are more items. The sort must "
+                "be the same as for that page."
+            ),
+        ),
+    ] = None,
+    count: Annotated[
+        CountMode,
+        Query(
+            title="Count",
+            description=(
+                "How to count the matching items for the x-total-count header if a limit or cursor is set. "
+                "exact counts them, which takes a query of its own unless nothing changed since the same search "
+                "last counted them. estimate takes the count of the last time, however old. none leaves the "
+                "header out. Without a limit or cursor, the list is sent in batches as they are read, and the "
+                "header is the number of items that matched when it started, each of which is sent once, in "
+                "the order it had then. An item that is deleted or stops matching meanwhile is left out."
+            ),
+        ),
+    ] = CountMode.EXACT,
 ) -> JSONResponse:
     try:
         sort_by = parse_sort(sort)
@@ -133,7 +174,7 @@ async def find(
             extra_field_filters[field_key] = value
 
     try:
-        db_items, total_count = await vendor.find(
+        db_items, total_count, next_cursor = await vendor.find(
             db=db,
             name=name,
             external_id=external_id,
@@ -141,17 +182,25 @@ async def find(
             sort_by=sort_by,
             limit=limit,
             offset=offset,
+            cursor=cursor,
+            count=count,
+            stream=True,
         )
     except ValueError as e:
         return JSONResponse(status_code=400, content=Message(message=str(e)).dict())
 
-    # Set x-total-count header for pagination
-    return JSONResponse(
-        content=jsonable_encoder(
-            (Vendor.from_db(db_item) for db_item in db_items),
-            exclude_none=True,
-        ),
-        headers={"x-total-count": str(total_count)},
+    # Set x-total-count and x-next-cursor headers for pagination
+    headers: dict[str, str] = {}
+    if total_count is not None:
+        headers["x-total-count"] = str(total_count)
+    if next_cursor is not None:
+        headers["x-next-cursor"] = next_cursor
+    if isinstance(db_items, ItemStream):
+        arrays = (render_models([Vendor.from_db(db_item) for db_item in batch]) async for batch in db_items.batches())
+        return JSONStreamResponse(stream_json_array(arrays), headers=headers)
+    return ModelResponse(
+        content=[Vendor.from_db(db_item) for db_item in db_items],
+        headers=headers,
     )
 
 
@@ -161,16 +210,9 @@ async def find(
 )
 async def notify_any(
     websocket: WebSocket,
+    mode: WebsocketModeQuery = WebsocketMode.FULL,
 ) -> None:
-    await websocket.accept()
-    websocket_manager.connect(("vendor",), websocket)
-    try:
-        while True:
-            await asyncio.sleep(0.5)
-            if await websocket.receive_text():
-                await websocket.send_json({"status": "healthy"})
-    except WebSocketDisconnect:
-        websocket_manager.disconnect(("vendor",), websocket)
+    await websocket_manager.serve(websocket, ("vendor",), mode)
 
 
 @router.get(
@@ -178,16 +220,30 @@ async def notify_any(
     name="Get vendor",
     description=(
         "Get a specific vendor. A websocket is served on the same path to listen for changes to the vendor. "
-        "See the HTTP Response code 299 for the content of the websocket messages."
+        "See the HTTP Response code 299 for the content of the websocket messages. "
+        "The response carries an ETag, which changes whenever the vendor does; send it back in If-None-Match "
+        "to get an empty 304 response if it hasn't changed since."
     ),
     response_model_exclude_none=True,
-    responses={404: {"model": Message}, 299: {"model": VendorEvent, "description": "Websocket message"}},
+    response_model=Vendor,
+    responses={
+        304: {"description": "The vendor has not changed since the ETag in If-None-Match."},
+        404: {"model": Message},
+        299: {"model": VendorEvent, "description": "Websocket message"},
+    },
 )
-async def get(
+async def get(  # noqa: ANN201
     db: Annotated[AsyncSession, Depends(get_db_session)],
     vendor_id: int,
-) -> Vendor:
+    response: Response,
+    if_none_match: Annotated[str | None, Header()] = None,
+):
+    if if_none_match is not None:
+        etag = await vendor.get_etag(db, vendor_id)
+        if response_cache.none_match(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
     db_item = await vendor.get_by_id(db, vendor_id)
+    response.headers["ETag"] = vendor.etag(db_item)
     return Vendor.from_db(db_item)
 
 
@@ -198,16 +254,9 @@ async def get(
 async def notify(
     websocket: WebSocket,
     vendor_id: int,
+    mode: WebsocketModeQuery = WebsocketMode.FULL,
 ) -> None:
-    await websocket.accept()
-    websocket_manager.connect(("vendor", str(vendor_id)), websocket)
-    try:
-        while True:
-            await asyncio.sleep(0.5)
-            if await websocket.receive_text():
-                await websocket.send_json({"status": "healthy"})
-    except WebSocketDisconnect:
-        websocket_manager.disconnect(("vendor", str(vendor_id)), websocket)
+    await websocket_manager.serve(websocket, ("vendor", str(vendor_id)), mode)
 
 
 @router.post(
@@ -246,19 +295,24 @@ async def create(  # noqa: ANN201
     name="Update vendor",
     description=(
         "Update any attribute of a vendor. Only fields specified in the request will be affected. "
-        "If extra is set, all existing extra fields will be removed and replaced with the new ones."
+        "If extra is set, all existing extra fields will be removed and replaced with the new ones. "
+        "To not overwrite a change made by someone else, send the ETag the vendor was read with in If-Match; "
+        "if the vendor has changed since, nothing is updated and 412 is returned."
     ),
     response_model_exclude_none=True,
     response_model=Vendor,
     responses={
         400: {"model": Message},
         404: {"model": Message},
+        412: {"model": Message},
     },
 )
 async def update(  # noqa: ANN201
     db: Annotated[AsyncSession, Depends(get_db_session)],
     vendor_id: int,
     body: VendorUpdateParameters,
+    response: Response,
+    if_match: Annotated[str | None, Header()] = None,
 ):
     patch_data = body.model_dump(exclude_unset=True)
 
@@ -273,8 +327,10 @@ async def update(  # noqa: ANN201
         db=db,
         vendor_id=vendor_id,
         data=patch_data,
+        if_match=if_match,
     )
 
+    response.headers["ETag"] = vendor.etag(db_item)
     return Vendor.from_db(db_item)
 
 
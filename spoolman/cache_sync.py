@@ -0,0 +1,115 @@
+"""Keeping the caches of the processes that serve one database in step.
+
+The extra fields, the filament geometry, and the counts and responses cached under the data version
+are all process-local, and only learn of the writes of their own process. Run several processes on
+one database, like uvicorn's --workers, and a write in one of them leaves the others serving what
+they cached before it, for as long as they run.
+
+With SPOOLMAN_CACHE_SYNC_INTERVAL set, every session that writes also replaces the token in the
+cache_generation row of the setting table, in the same transaction, and every process reads that
+token before it handles a request, at most once per interval. When the token has changed, the
+process drops its caches, so a write reaches the caches of all processes within the interval. The
+row is not a registered setting, so the settings endpoints leave it out.
+
+Every write then also writes that one row, so that concurrent writes queue up behind each other on
+it. A single process has no need for any of this, and leaves the interval unset.
+"""
+
+import json
+import logging
+import time
+import uuid
+from typing import TYPE_CHECKING
+
+import sqlalchemy
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from spoolman import env
+from spoolman.database import models
+from spoolman.database.data_version import data_version, has_written
+from spoolman.database.database import get_db_session
+from spoolman.database.geometry_cache import filament_geometry_cache
+from spoolman.extra_field_registry import clear_extra_field_cache
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = "cache_generation"
+
+
+def clear_caches() -> None:
+    """Drop everything the caches of this process hold."""
+    # The count and response caches only serve what was read at the current data version.
+    data_version.bump()
+    filament_geometry_cache.clear()
+    clear_extra_field_cache()
+
+
+class CacheSync:
+    """Drops the caches of this process when the database is written to by another one."""
+
+    def __init__(self, interval: float | None) -> None:
+        """Initialize."""
+        self.interval = interval
+        # The token as of the last check, and the monotonic time of that check.
+        self.token: str | None = None
+        self.checked: float | None = None
+
+    def due(self) -> bool:
+        """Tell whether it is time to check the token, and take the check if so."""
+        if self.interval is None:
+            return False
+        now = time.monotonic()
+        if self.checked is not None and now - self.checked < self.interval:
+            return False
+        # Taken before the token is read, so that the requests that arrive meanwhile don't read it too.
+        self.checked = now
+        return True
+
+    async def check(self, db: "AsyncSession") -> None:
+        """Read the token, and drop the caches if it changed since the last check."""
+        stmt = sqlalchemy.select(models.Setting.value).where(models.Setting.key == GENERATION_KEY)
+        token = (await db.execute(stmt)).scalar_one_or_none()
+        if token != self.token:
+            self.token = token
+            clear_caches()
+            logger.debug("The database was written to, caches cleared.")
+
+
+cache_sync = CacheSync(env.get_cache_sync_interval())
+
+
+@event.listens_for(Session, "before_commit")
+def _before_commit(session: Session) -> None:
+    # Runs before the last flush of the commit, so the objects it is about to write count as well.
+    if cache_sync.interval is None:
+        return
+    if not (has_written(session) or session.new or session.dirty or session.deleted):
+        return
+    # Flushed first, so that a write that fails does so as it would without the token.
+    session.flush()
+    session.execute(
+        sqlalchemy.update(models.Setting)
+        .where(models.Setting.key == GENERATION_KEY)
+        .values(value=json.dumps(uuid.uuid4().hex)),
+    )
+
+
+class CacheSyncMiddleware:
+    """Check whether another process has written to the database before a request is handled."""
+
+    def __init__(self, app: "ASGIApp", sync: CacheSync = cache_sync) -> None:
+        """Wrap the given ASGI application."""
+        self.app = app
+        self.sync = sync
+
+    async def __call__(self, scope: "Scope", receive: "Receive", send: "Send") -> None:
+        """Check the token if it is time to, then handle the request."""
+        if scope["type"] == "http" and self.sync.due():
+            async for db in get_db_session():
+                await self.sync.check(db)
+        await self.app(scope, receive, send)
@@ -1,9 +1,11 @@
-"""CSS named colors and color-string resolution for the search feature.
+"""CSS named colors, color-string resolution for the search feature, and stored color sanitizing.
 
 Color names are the standard CSS Color Module Level 4 keywords, which are
 English-only. ``resolve_color`` turns a user-supplied color string (a hex code or
 one of these names) into a canonical ``RRGGBB`` hex string suitable for
 ``spoolman.math.hex_to_rgb``; it returns ``None`` when the string is not a color.
+``sanitize_color_hex`` and ``sanitize_multi_color_hexes`` normalize the color codes
+of a filament as read from the database, wherever a filament is sent from.
 """
 
 import re
@@ -179,3 +181,28 @@ def resolve_color(query: str) -> str | None:
         return hex_digits
 
     return CSS_COLORS.get(normalized.replace(" ", ""))
+
+
+def sanitize_color_hex(value: str | None) -> str | None:
+    """Normalize a color code read from the database.
+
+    Older releases could store a value with a leading ``#`` (see #780). Strip it and
+    drop anything that still isn't a valid 6 or 8 character code, so that one bad row
+    doesn't make the whole filament list unserializable.
+    """
+    if not value:
+        return None
+    clr = value.upper().removeprefix("#")
+    if len(clr) not in (6, 8) or any(c not in "0123456789ABCDEF" for c in clr):
+        return None
+    return clr
+
+
+def sanitize_multi_color_hexes(value: str | None) -> str | None:
+    """Normalize a comma-separated list of color codes read from the database."""
+    if not value:
+        return None
+    colors = [c for c in (sanitize_color_hex(part) for part in value.split(",")) if c is not None]
+    if len(colors) < 2:  # noqa: PLR2004
+        return None
+    return ",".join(colors)
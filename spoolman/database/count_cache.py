@@ -0,0 +1,87 @@
+"""In-memory cache of the total counts of searches.
+
+A paginated search counts all matching rows to fill the x-total-count header, which is a second
+query over the same joins and filters as the page itself, on every page. The count only changes when
+the data does, so it is cached per search, along with the data version it was counted at.
+
+A search is identified by its count statement as compiled, with its parameters, so two requests that
+spell the same filters differently share their count, while anything that changes the statement,
+like a new extra field, gets a count of its own.
+"""
+
+from collections import OrderedDict
+
+from sqlalchemy import Select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from spoolman.api.v1.models import CountMode
+from spoolman.database.data_version import data_version
+
+MAX_SIZE = 1024
+
+CountKey = tuple[str, str]
+
+
+class CountCache:
+    """A bounded, least-recently-used mapping from a search to its total count."""
+
+    def __init__(self, max_size: int) -> None:
+        """Initialize."""
+        self.max_size = max_size
+        self.entries: OrderedDict[CountKey, tuple[int, int]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: CountKey, version: int | None) -> int | None:
+        """Get the count of a search, as counted at the given data version, or at any if it is None."""
+        entry = self.entries.get(key)
+        if entry is None or (version is not None and entry[0] != version):
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: CountKey, version: int, count: int) -> None:
+        """Cache the count of a search, as counted at the given data version."""
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] > version:
+            # Counted by a request that started before the one that cached the newer count.
+            return
+        self.entries[key] = (version, count)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+count_cache = CountCache(MAX_SIZE)
+
+
+async def count(db: AsyncSession, stmt: Select, mode: CountMode) -> int | None:
+    """Count the rows a search matches.
+
+    Args:
+        db (AsyncSession): Database session
+        stmt (Select): The search, without pagination
+        mode (CountMode): How to count. An estimate is the last count of the same search, however old,
+            and an exact count if it was never counted.
+
+    Returns:
+        int | None: The count, or None if the mode asks for none.
+
+    """
+    if mode == CountMode.NONE:
+        return None
+
+    # Counted from what the first column is selected from, as a search of columns joins the tables of
+    # the others to it, e.g. the filament columns of a sparse spool search to the spool.
+    count_stmt = stmt.with_only_columns(func.count()).select_from(*stmt.columns_clause_froms[:1]).order_by(None)
+    compiled = count_stmt.compile(dialect=db.get_bind().dialect)
+    key = (str(compiled), repr(sorted(compiled.params.items())))
+    # Read before counting, so a write that commits meanwhile makes the count stale, not the cache.
+    version = data_version.value
+    total = count_cache.get(key, None if mode == CountMode.ESTIMATE else version)
+    if total is None:
+        total = (await db.execute(count_stmt)).scalar_one()
+        count_cache.put(key, version, total)
+    return total
@@ -0,0 +1,53 @@
+"""A counter of the writes to the database.
+
+Caches of query results, like the count cache, store the version a result was read at, and only
+serve it for as long as the version stays the same. The version is bumped when a session that wrote
+anything commits, whichever code path did the writing: the change notifications miss bulk updates,
+like renaming a value of an extra field across all items.
+
+It is bumped after the commit, not before, so that a result read from the database before the
+commit is never stored under the new version. The counter is process-local, like the caches, see
+spoolman.cache_sync for how several processes learn of each other's writes.
+"""
+
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session, UOWTransaction
+
+_DIRTY = "spoolman_wrote"
+
+
+class DataVersion:
+    """A counter that goes up with every committed write."""
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.value = 0
+
+    def bump(self) -> None:
+        """Mark the data as changed."""
+        self.value += 1
+
+
+data_version = DataVersion()
+
+
+def has_written(session: Session) -> bool:
+    """Tell whether a session has written anything that it has not committed yet."""
+    return session.info.get(_DIRTY, False)
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, flush_context: UOWTransaction) -> None:  # noqa: ARG001
+    session.info[_DIRTY] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _do_orm_execute(orm_execute_state: ORMExecuteState) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_DIRTY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    if session.info.pop(_DIRTY, False):
+        data_version.bump()
@@ -2,6 +2,7 @@
 
 import datetime
 import filecmp
+import json
 import logging
 import shutil
 import sqlite3
@@ -13,10 +14,12 @@ from pathlib import Path
 from typing import NamedTuple
 
 from scheduler.asyncio.scheduler import Scheduler
-from sqlalchemy import URL
+from sqlalchemy import URL, text, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
 from spoolman import env
+from spoolman.database import models
 from spoolman.prometheus.metrics import filament_metrics, spool_metrics
 
 logger = logging.getLogger(__name__)
@@ -85,7 +88,8 @@ class Database:
         """Construct the Database wrapper and set config parameters."""
         self.connection_url = connection_url
         # Monotonic timestamp of the last rotation, for the rate limit. Process-local, which is
-        # fine: Spoolman is single-instance, and a restart erring towards one extra backup is safe.
+        # fine: a restart, or another process, erring towards one extra backup is safe. The
+        # scheduled backups are only made by one process, see claim_run.
         self._last_rotation: float | None = None
 
     def is_file_based_sqlite(self) -> bool:
@@ -229,6 +233,13 @@ def setup_db(connection_url: URL) -> None:
     __db.connect()
 
 
+def get_engine() -> AsyncEngine:
+    """Get the engine of the database, for what needs a connection of its own rather than a session."""
+    if __db is None or __db.engine is None:
+        raise RuntimeError("DB is not setup.")
+    return __db.engine
+
+
 async def backup_global_db(num_backups: int = 5) -> BackupResult:
     """Backup the database and rotate existing backups.
 
@@ -241,14 +252,65 @@ async def backup_global_db(num_backups: int = 5) -> BackupResult:
     return __db.backup_and_rotate(env.get_backups_dir(), num_backups=num_backups)
 
 
-async def _backup_task() -> BackupResult:
+async def claim_run(db: AsyncSession, task: str, run: str) -> bool:
+    """Claim a run of a scheduled task, so that only one of the processes on the database does it.
+
+    Every process schedules the same tasks for the same times, and all but one of them should skip
+    each run, as concurrent backups would rotate the same files. The first to store the run in the
+    task's row of the setting table, and commit, has it. Runs are named so that a later one sorts
+    after an earlier one, such as the date of a daily task.
+
+    Returns:
+        bool: Whether this process has the run.
+
+    """
+    key = f"task_{task}"
+    value = json.dumps(run)
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+    stmt = update(models.Setting).where(models.Setting.key == key, models.Setting.value < value)
+    result = await db.execute(stmt.values(value=value, last_updated=now))
+    if result.rowcount == 0:
+        if await db.get(models.Setting, key) is not None:
+            return False
+        db.add(models.Setting(key=key, value=value, last_updated=now))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Another process stored the first run of the task at the same time.
+        await db.rollback()
+        return False
+    return True
+
+
+async def _claim_daily_run(task: str) -> bool:
+    """Claim today's run of a daily task, see claim_run."""
+    claimed = False
+    async for session in get_db_session():
+        claimed = await claim_run(session, task, datetime.date.today().isoformat())  # noqa: DTZ011
+    if not claimed:
+        logger.info("Skipping the %s task, another process has run it today.", task)
+    return claimed
+
+
+async def _backup_task() -> BackupResult | None:
     """Perform scheduled backup of the database."""
+    if not await _claim_daily_run("backup"):
+        return None
     logger.info("Performing scheduled database backup.")
     if __db is None:
         raise RuntimeError("DB is not setup.")
     return __db.backup_and_rotate(env.get_backups_dir(), num_backups=5)
 
 
+async def _analyze_task() -> None:
+    """Update the statistics that SQLite's query planner chooses indexes by."""
+    if not await _claim_daily_run("analyze"):
+        return
+    logger.info("Updating the database statistics.")
+    async for session in get_db_session():
+        await session.execute(text("ANALYZE"))
+
+
 async def _metrics() -> None:
     """Create some useful prometheus metrics."""
     logger.debug("Start metrics collection")
@@ -278,6 +340,11 @@ def schedule_tasks(scheduler: Scheduler) -> None:
         logger.info("Scheduling automatic metric collection.")
         # Run every minute, may be needs specify timer
         scheduler.minutely(datetime.time(second=0), _metrics)  # type: ignore[arg-type]
+    if "sqlite" in __db.connection_url.drivername:
+        # Without statistics, SQLite takes any index on a filtered column to be selective, and would
+        # rather look up nearly all spools one by one through the archived index than scan them.
+        logger.info("Scheduling updates of the database statistics.")
+        scheduler.daily(datetime.time(hour=0, minute=30, second=0), _analyze_task)  # type: ignore[arg-type]
     if not env.is_automatic_backup_enabled():
         return
     if "sqlite" in __db.connection_url.drivername:
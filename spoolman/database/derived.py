@@ -0,0 +1,64 @@
+"""The columns of a spool that are derived from its own values and its filament's.
+
+Sorting spools by remaining weight, remaining or used length, or price used to compute those per
+row in the ORDER BY, from the spool and its joined filament, so every sorted page read and sorted
+every matching spool. They are stored on the spool instead, with indexes, and kept up to date by
+the writes that change what they are computed from: the writes of a spool, and the updates of a
+filament's weight, density, diameter or price.
+
+They are computed by the database, in one UPDATE that reads the filament with subqueries, so that
+the writes that change a used weight in SQL (use, measure, the usage buffer) need not read the
+spool first. The values are the ones Spool.from_db computes.
+"""
+
+import math
+from typing import Any
+
+import sqlalchemy
+from sqlalchemy import ColumnElement, case, func
+from sqlalchemy.sql.functions import coalesce
+
+from spoolman.database import models
+
+# The filament columns the derived columns are computed from.
+FILAMENT_COLUMNS = frozenset({"weight", "density", "diameter", "price"})
+
+
+def _filament(column: ColumnElement[Any]) -> ColumnElement[Any]:
+    """Get a column of the spool's filament, for the UPDATE of the spool."""
+    return sqlalchemy.select(column).where(models.Filament.id == models.Spool.filament_id).scalar_subquery()
+
+
+def _length(weight: ColumnElement[float]) -> ColumnElement[float]:
+    """Get the length of a weight of the spool's filament, as length_from_weight does.
+
+    The literals are floats, as CockroachDB does not mix floats and integers in arithmetic. A zero
+    density or diameter gives NULL, where length_from_weight fails, rather than failing the write.
+    """
+    radius = _filament(models.Filament.diameter) / 2.0
+    section = func.nullif(_filament(models.Filament.density) * math.pi * radius * radius, 0.0)
+    return weight * 1000.0 / section
+
+
+def refresh(where: ColumnElement[bool]) -> sqlalchemy.Update:
+    """Build the UPDATE that recomputes the derived columns of the spools matching a condition.
+
+    Run it after the write that changed what they are computed from, not as part of it: MySQL
+    evaluates the assignments of an UPDATE from left to right, so in the same statement these would
+    see the new used weight there, and the old one on the other databases. Each derived column is
+    computed from the stored values alone, for the same reason.
+    """
+    remaining = coalesce(models.Spool.initial_weight, _filament(models.Filament.weight)) - models.Spool.used_weight
+    # CASE, not func.greatest: greatest() is not portable across all four supported databases.
+    remaining = case((remaining < 0, 0.0), else_=remaining)
+    return (
+        sqlalchemy.update(models.Spool)
+        .where(where)
+        .values(
+            remaining_weight=remaining,
+            remaining_length=_length(remaining),
+            used_length=_length(models.Spool.used_weight),
+            effective_price=coalesce(models.Spool.price, _filament(models.Filament.price)),
+        )
+        .execution_options(synchronize_session=False)
+    )
@@ -7,58 +7,37 @@ from dataclasses import dataclass
 from typing import TYPE_CHECKING
 
 import sqlalchemy
-from sqlalchemy import Alias, ColumnElement, Select
+from sqlalchemy import Alias, ColumnCollection, ColumnElement, Select, func
 from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import aliased
 from sqlalchemy.sql.expression import FunctionElement
 
-from spoolman.database import models
+from spoolman.api.v1.models import CountMode
+from spoolman.database import count_cache, models
 from spoolman.database.utils import (
     LIKE_ESCAPE,
+    SortKey,
     SortOrder,
     escape_like,
-    order_by_clauses,
     split_datetime_range_filter,
 )
 from spoolman.extra_field_registry import EntityType, ExtraField, ExtraFieldType, get_extra_fields
 
 if TYPE_CHECKING:
+    from collections.abc import Callable
+
     from sqlalchemy.ext.asyncio import AsyncSession
     from sqlalchemy.orm.attributes import InstrumentedAttribute
 
 
-class _JsonArrayFirstElement(FunctionElement):
-    """Cross-database helper: return the first element of a JSON array stored as text."""
-
-    name = "json_array_first_element"
-    inherit_cache = True
-
-
-@compiles(_JsonArrayFirstElement, "postgresql")
-@compiles(_JsonArrayFirstElement, "cockroachdb")
-def _compile_json_array_first_pg(element: _JsonArrayFirstElement, compiler: object, **kw: object) -> str:  # type: ignore[misc]
-    """PostgreSQL/CockroachDB: CAST(value AS JSON)->>0 returns the first element as TEXT."""
-    (col_expr,) = element.clauses
-    col_sql = compiler.process(col_expr, **kw)  # type: ignore[union-attr]
-    return f"(CAST({col_sql} AS JSON)->>0)"
-
-
-@compiles(_JsonArrayFirstElement)
-def _compile_json_array_first_default(element: _JsonArrayFirstElement, compiler: object, **kw: object) -> str:  # type: ignore[misc]
-    """SQLite/MariaDB: json_extract(value, '$[0]') returns the first element as a scalar."""
-    (col_expr,) = element.clauses
-    col_sql = compiler.process(col_expr, **kw)  # type: ignore[union-attr]
-    return f"JSON_EXTRACT({col_sql}, '$[0]')"
-
-
 class _JsonScalarText(FunctionElement):
     """Cross-database helper: decode a top-level JSON scalar and return it as unquoted TEXT.
 
     Used to compare against the *decoded* value rather than reconstructing the exact JSON
     serialization the client wrote. This decouples filtering from json.dumps/JSON.stringify
     encoding quirks (non-ASCII escaping, surrounding quotes, etc.). Only valid for JSON string
-    scalars (text/choice/datetime) - booleans and numbers are handled with numeric casts instead,
-    since scalar decoding is not consistent for them across dialects.
+    scalars (text/choice/datetime). The filters and sorts use the typed copies of the value instead
+    (see models.field_values), which this is only needed for where those fall short.
     """
 
     name = "json_scalar_text"
@@ -90,30 +69,6 @@ def _compile_json_scalar_text_default(element: _JsonScalarText, compiler: object
     return f"JSON_EXTRACT({col_sql}, '$')"
 
 
-class _JsonArraySecondElement(FunctionElement):
-    """Cross-database helper: return the second element of a JSON array stored as text."""
-
-    name = "json_array_second_element"
-    inherit_cache = True
-
-
-@compiles(_JsonArraySecondElement, "postgresql")
-@compiles(_JsonArraySecondElement, "cockroachdb")
-def _compile_json_array_second_pg(element: _JsonArraySecondElement, compiler: object, **kw: object) -> str:  # type: ignore[misc]
-    """PostgreSQL/CockroachDB: CAST(value AS JSON)->>1 returns the second element as TEXT."""
-    (col_expr,) = element.clauses
-    col_sql = compiler.process(col_expr, **kw)  # type: ignore[union-attr]
-    return f"(CAST({col_sql} AS JSON)->>1)"
-
-
-@compiles(_JsonArraySecondElement)
-def _compile_json_array_second_default(element: _JsonArraySecondElement, compiler: object, **kw: object) -> str:  # type: ignore[misc]
-    """SQLite/MariaDB: json_extract(value, '$[1]') returns the second element as a scalar."""
-    (col_expr,) = element.clauses
-    col_sql = compiler.process(col_expr, **kw)  # type: ignore[union-attr]
-    return f"JSON_EXTRACT({col_sql}, '$[1]')"
-
-
 @dataclass
 class ExtraFieldJoin:
     """One extra field pulled onto a query as a plain column, ready to group or order by.
@@ -129,6 +84,10 @@ class ExtraFieldJoin:
     #: The DB-decoded scalar, i.e. the string the user typed rather than its JSON encoding.
     value: ColumnElement[str]
 
+    def sort_value(self, field_type: ExtraFieldType) -> ColumnElement:
+        """Get the column to sort by the field, see extra_field_sort_column."""
+        return extra_field_sort_column(self.alias.c, field_type)
+
     def apply(self, stmt: Select, base_id_column: InstrumentedAttribute[int]) -> Select:
         """Outer-join the field's row onto `stmt`.
 
@@ -194,7 +153,39 @@ def _get_entity_id_column(field_table: type[models.Base]) -> InstrumentedAttribu
     raise ValueError(f"Unknown field table: {field_table}")
 
 
-def _parse_boolean_filter(value: str) -> bool:
+# The extra field types whose value is a range of two numbers.
+RANGE_FIELD_TYPES = (ExtraFieldType.integer_range, ExtraFieldType.float_range)
+
+
+def extra_field_text_equals(field_table: type[models.Base], value: str) -> ColumnElement[bool]:
+    """Match the extra fields whose value is a string equal to `value`, by their value_text.
+
+    value_text only holds the start of a long string, so a long value is checked in full as well.
+    """
+    if len(value) < models.VALUE_TEXT_LENGTH:
+        return field_table.value_text == value
+    return sqlalchemy.and_(
+        field_table.value_text == value[: models.VALUE_TEXT_LENGTH],
+        _JsonScalarText(field_table.value) == value,
+    )
+
+
+def _text_contains(field_table: type[models.Base], pattern: str) -> ColumnElement[bool]:
+    """Match the extra fields whose value is a string matching an ILIKE `pattern`, by their value_text.
+
+    value_text only holds the start of a long string, so the whole of a string that may have been
+    cut is matched as well. LENGTH counts bytes on MySQL, which only makes that a few more strings.
+    """
+    return sqlalchemy.or_(
+        field_table.value_text.ilike(pattern, escape=LIKE_ESCAPE),
+        sqlalchemy.and_(
+            func.length(field_table.value_text) >= models.VALUE_TEXT_LENGTH,
+            _JsonScalarText(field_table.value).ilike(pattern, escape=LIKE_ESCAPE),
+        ),
+    )
+
+
+def parse_boolean_filter(value: str) -> bool:
     """Parse a boolean filter using explicit true/false tokens only."""
     normalized = value.strip().lower()
     if normalized == "true":
@@ -204,60 +195,60 @@ def _parse_boolean_filter(value: str) -> bool:
     raise ValueError(f"Invalid boolean filter value: {value!r}")
 
 
-async def apply_extra_field_filters_and_sort(
+async def apply_extra_field_filters(
     *,
     db: AsyncSession,
     stmt: Select,
     base_obj: type[models.Base],
     entity_type: EntityType,
     extra_field_filters: dict[str, str] | None,
-    sort_by: dict[str, SortOrder] | None,
 ) -> Select:
-    """Apply extra-field filtering and sorting to a query."""
-    if not extra_field_filters and not (sort_by is not None and any(field.startswith("extra.") for field in sort_by)):
+    """Apply extra-field filtering to a query."""
+    if not extra_field_filters:
         return stmt
 
-    extra_fields = await get_extra_fields(db, entity_type)
-    extra_fields_dict: dict[str, ExtraField] = {field.key: field for field in extra_fields}
-
-    if extra_field_filters:
-        field_table = _get_field_table_for_entity(entity_type)
-        id_select = sqlalchemy.select(_get_entity_id_column(field_table))
-        for field_key, value in extra_field_filters.items():
-            field = extra_fields_dict.get(field_key)
-            if field is None:
-                continue
-            stmt = add_where_clause_extra_field(
-                stmt=stmt,
-                link_column=base_obj.id,
-                id_select=id_select,
-                field_table=field_table,
-                field_key=field_key,
-                field_type=field.field_type,
-                value=value,
-                multi_choice=field.multi_choice if field.field_type == ExtraFieldType.choice else None,
-            )
-
-    if sort_by is not None:
-        for field_name, order in sort_by.items():
-            if not field_name.startswith("extra."):
-                continue
-
-            field_key = field_name[6:]
-            extra_field = extra_fields_dict.get(field_key)
-            if extra_field is None:
-                continue
-
-            stmt = add_order_by_extra_field(
-                stmt=stmt,
-                base_obj=base_obj,
-                entity_type=entity_type,
-                field_key=field_key,
-                field_type=extra_field.field_type,
-                order=order,
-            )
+    field_table = _get_field_table_for_entity(entity_type)
+    return await _filter_by_extra_fields(
+        db=db,
+        stmt=stmt,
+        link_column=base_obj.id,
+        field_table=field_table,
+        filters=await _parse_field_filters(db, entity_type, field_table, extra_field_filters),
+    )
+
 
-    return stmt
+async def apply_extra_field_sort(
+    *,
+    db: AsyncSession,
+    stmt: Select,
+    base_obj: type[models.Base],
+    entity_type: EntityType,
+    sort_by: dict[str, SortOrder] | None,
+) -> tuple[Select, list[SortKey]]:
+    """Join the `extra.<key>` fields of a sort onto a query, and get their sort keys in the order given.
+
+    Each field is one outer join on its row, see ExtraFieldJoin, rather than a subquery that the
+    database runs again for every row it sorts. An entity has at most one row per key, so the
+    joins add no rows. Fields that are not defined are skipped, like they are when filtering.
+    """
+    if sort_by is None or not any(field.startswith("extra.") for field in sort_by):
+        return stmt, []
+
+    extra_fields_dict: dict[str, ExtraField] = {field.key: field for field in await get_extra_fields(db, entity_type)}
+    sort_keys = []
+    for field_name, order in sort_by.items():
+        if not field_name.startswith("extra."):
+            continue
+
+        field_key = field_name[6:]
+        extra_field = extra_fields_dict.get(field_key)
+        if extra_field is None:
+            continue
+
+        join = extra_field_join(entity_type, field_key)
+        stmt = join.apply(stmt, base_obj.id)
+        sort_keys.append((join.sort_value(extra_field.field_type), order))
+    return stmt, sort_keys
 
 
 async def apply_spool_related_extra_filters(
@@ -269,74 +260,66 @@ async def apply_spool_related_extra_filters(
 ) -> Select:
     """Filter a spool query by extra fields that live on the spool's filament or its vendor.
 
-    Spool extra fields are handled by apply_extra_field_filters_and_sort; this handles the two
+    Spool extra fields are handled by apply_extra_field_filters; this handles the two
     related entities, linking through Spool.filament_id (a spool matches when its filament — or that
     filament's vendor — matches the extra-field condition).
     """
     if filament_filters:
-        fields = {f.key: f for f in await get_extra_fields(db, EntityType.filament)}
-        for field_key, value in filament_filters.items():
-            field = fields.get(field_key)
-            if field is None:
-                continue
-            stmt = add_where_clause_extra_field(
-                stmt=stmt,
-                link_column=models.Spool.filament_id,
-                id_select=sqlalchemy.select(models.FilamentField.filament_id),
-                field_table=models.FilamentField,
-                field_key=field_key,
-                field_type=field.field_type,
-                value=value,
-                multi_choice=field.multi_choice if field.field_type == ExtraFieldType.choice else None,
-            )
+        stmt = await _filter_by_extra_fields(
+            db=db,
+            stmt=stmt,
+            link_column=models.Spool.filament_id,
+            field_table=models.FilamentField,
+            filters=await _parse_field_filters(db, EntityType.filament, models.FilamentField, filament_filters),
+        )
 
     if vendor_filters:
-        fields = {f.key: f for f in await get_extra_fields(db, EntityType.vendor)}
-        for field_key, value in vendor_filters.items():
-            field = fields.get(field_key)
-            if field is None:
-                continue
-            # Map matching vendors back to filament ids: a spool matches when its filament's vendor
-            # matches. Alias Filament so this subquery doesn't collide with the outer query's join.
-            fil = aliased(models.Filament)
-            id_select = sqlalchemy.select(fil.id).join(
-                models.VendorField,
-                models.VendorField.vendor_id == fil.vendor_id,
-            )
-            stmt = add_where_clause_extra_field(
-                stmt=stmt,
-                link_column=models.Spool.filament_id,
-                id_select=id_select,
-                field_table=models.VendorField,
-                field_key=field_key,
-                field_type=field.field_type,
-                value=value,
-                multi_choice=field.multi_choice if field.field_type == ExtraFieldType.choice else None,
-            )
+        # Map matching vendors back to filament ids: a spool matches when its filament's vendor
+        # matches. Alias Filament so this subquery doesn't collide with the outer query's join.
+        fil = aliased(models.Filament)
+        stmt = await _filter_by_extra_fields(
+            db=db,
+            stmt=stmt,
+            link_column=models.Spool.filament_id,
+            field_table=models.VendorField,
+            filters=await _parse_field_filters(db, EntityType.vendor, models.VendorField, vendor_filters),
+            link_ids=lambda vendor_ids: sqlalchemy.select(fil.id).where(fil.vendor_id.in_(vendor_ids)),
+        )
 
     return stmt
 
 
-def add_where_clause_extra_field(  # noqa: C901, PLR0912, PLR0915
-    stmt: Select,
-    *,
-    link_column: InstrumentedAttribute[int],
-    id_select: Select,
-    field_table: type[models.Base],
-    field_key: str,
-    field_type: ExtraFieldType,
-    value: str,
-    multi_choice: bool | None = None,
-) -> Select:
-    """Add a where clause to a select statement for an extra field.
+@dataclass
+class _FieldFilter:
+    """The conditions of one extra-field filter on the rows of its field table."""
 
-    `link_column` is the column on the outer query to constrain (e.g. Spool.id, or Spool.filament_id
-    when filtering spools by a filament/vendor extra field). `id_select` is a SELECT of ids in that
-    same space (with any join to `field_table` already applied); this function narrows a copy of it
-    by the field key/value conditions. This indirection is what lets one query filter by extra fields
-    that live on a related entity.
-    """
-    conditions = []
+    key: str
+    #: Matches the rows of the key whose value is one of the filter's values, None if it has none.
+    match: ColumnElement[bool] | None
+    #: Matches the rows of the key whose value is empty, if the filter has an empty value. Such a
+    #: filter matches the entities that have no row for the key as well.
+    empty: ColumnElement[bool] | None
+
+
+async def _parse_field_filters(
+    db: AsyncSession,
+    entity_type: EntityType,
+    field_table: type[models.Base],
+    filters: dict[str, str],
+) -> list[_FieldFilter]:
+    """Parse the extra-field filters of an entity type. Fields that are not defined are skipped."""
+    fields = {field.key: field for field in await get_extra_fields(db, entity_type)}
+    return [
+        _parse_field_filter(field_table, fields[field_key], value)
+        for field_key, value in filters.items()
+        if field_key in fields
+    ]
+
+
+def _parse_field_filter(field_table: type[models.Base], field: ExtraField, value: str) -> _FieldFilter:
+    """Parse the comma-separated values of a filter, any one of which an entity has to match."""
+    matches = []
+    empty = None
     for value_part in value.split(","):
         # Empty-string filters follow the existing string-query API semantics.
         if len(value_part) == 0:
@@ -349,141 +332,204 @@ def add_where_clause_extra_field(  # noqa: C901, PLR0912, PLR0915
                 # value" group by group_by but missing from the listing of that same group.
                 field_table.value == json.dumps(""),
             ]
-            if field_type == ExtraFieldType.boolean:
+            if field.field_type == ExtraFieldType.boolean:
                 empty_conditions.append(field_table.value == json.dumps(bool(0)))
+            empty = sqlalchemy.or_(*empty_conditions)
+            continue
+        matches.append(_value_condition(field_table, field, value_part))
+    return _FieldFilter(key=field.key, match=sqlalchemy.or_(*matches) if matches else None, empty=empty)
+
+
+async def _filter_by_extra_fields(
+    *,
+    db: AsyncSession,
+    stmt: Select,
+    link_column: InstrumentedAttribute[int],
+    field_table: type[models.Base],
+    filters: list[_FieldFilter],
+    link_ids: Callable[[Select], Select] | None = None,
+) -> Select:
+    """Filter a query by extra-field filters of one field table, all of which have to match.
+
+    `link_column` is the column on the outer query to constrain (e.g. Spool.id, or Spool.filament_id
+    when filtering spools by a filament/vendor extra field). `link_ids` maps a SELECT of the ids of
+    the field table's entities to a SELECT of ids in that column's space, when they differ. This
+    indirection is what lets one query filter by extra fields that live on a related entity.
+
+    The filters that need a row of their key are matched together, in one pass over the field
+    table, see _matching_all. A filter with an empty value also matches the entities without a row,
+    which no pass over the rows finds, so those filters get subqueries of their own.
+    """
+    entity_id = _get_entity_id_column(field_table)
+
+    def linked(ids: Select) -> Select:
+        return ids if link_ids is None else link_ids(ids)
 
-            field_has_empty_value = id_select.where(
-                sqlalchemy.and_(field_table.key == field_key, sqlalchemy.or_(*empty_conditions))
-            )
-            # The linked entity either stores an empty value, or has no row for this key at all.
-            conditions.append(link_column.in_(field_has_empty_value))
-            conditions.append(link_column.not_in(id_select.where(field_table.key == field_key)))
+    required = [field_filter for field_filter in filters if field_filter.empty is None]
+    if required:
+        stmt = stmt.where(link_column.in_(linked(await _matching_all(db, field_table, required))))
+
+    for field_filter in filters:
+        if field_filter.empty is None:
             continue
+        has_key = field_table.key == field_filter.key
+        # The linked entity either stores an empty value, or has no row for this key at all.
+        conditions = [
+            link_column.in_(linked(sqlalchemy.select(entity_id).where(has_key, field_filter.empty))),
+            link_column.not_in(linked(sqlalchemy.select(entity_id).where(has_key))),
+        ]
+        if field_filter.match is not None:
+            conditions.append(link_column.in_(linked(sqlalchemy.select(entity_id).where(has_key, field_filter.match))))
+        stmt = stmt.where(sqlalchemy.or_(*conditions))
+
+    return stmt
+
+
+async def _matching_all(db: AsyncSession, field_table: type[models.Base], filters: list[_FieldFilter]) -> Select:
+    """Select the entities that have a matching row for each of a number of filters.
+
+    Rather than one IN subquery per filter, the rows that match any of the filters are grouped by
+    entity, and the entities with as many of them as there are filters are kept: an entity has one
+    row per key, so that is one per filter. Only the rows of the entities that match the most
+    selective filter are grouped. That filter drives the search: its rows are found through the
+    index on its key and value, and the other rows of their entities through the index on the
+    entity.
+
+    The most selective filter is the one that matches the fewest rows. Each filter is counted once,
+    and that count reused after the data changes, see count_cache.count: it only ranks the filters.
+    """
+    entity_id = _get_entity_id_column(field_table)
+    matches = [sqlalchemy.and_(field_table.key == field_filter.key, field_filter.match) for field_filter in filters]
+    selects = [sqlalchemy.select(entity_id).where(match) for match in matches]
+    if len(selects) == 1:
+        return selects[0]
+
+    counts = [await count_cache.count(db, select, CountMode.ESTIMATE) or 0 for select in selects]
+    driver = selects[counts.index(min(counts))]
+    return (
+        sqlalchemy.select(entity_id)
+        .where(entity_id.in_(driver), sqlalchemy.or_(*matches))
+        .group_by(entity_id)
+        .having(func.count() == len(matches))
+    )
+
 
-        exact_match = value_part.startswith('"') and value_part.endswith('"')
-        parsed_value = value_part[1:-1] if exact_match else value_part
-
-        if field_type == ExtraFieldType.text:
-            # Compare against the DB-decoded scalar rather than a reconstructed JSON string, so
-            # matching is independent of how the value was encoded (quote handling, non-ASCII
-            # escaping). Substring search escapes LIKE wildcards to match user input literally.
-            decoded = _JsonScalarText(field_table.value)
-            field_condition = (
-                decoded == parsed_value
-                if exact_match
-                else decoded.ilike(f"%{escape_like(parsed_value)}%", escape=LIKE_ESCAPE)
-            )
-        elif field_type == ExtraFieldType.integer:
-            if ":" in parsed_value:
-                min_val_str, max_val_str = parsed_value.split(":", 1)
-                int_conditions = []
-                try:
-                    stored = sqlalchemy.cast(field_table.value, sqlalchemy.Integer)
-                    if min_val_str:
-                        int_conditions.append(stored >= int(min_val_str))
-                    if max_val_str:
-                        int_conditions.append(stored <= int(max_val_str))
-                except (ValueError, TypeError) as exc:
-                    raise ValueError(f"Invalid integer range filter value for '{field_key}': {parsed_value}") from exc
-                if not int_conditions:
-                    raise ValueError(f"Invalid integer range filter value for '{field_key}': {parsed_value}")
-                field_condition = sqlalchemy.and_(*int_conditions)
-            else:
-                try:
-                    field_condition = field_table.value == json.dumps(int(parsed_value))
-                except ValueError as exc:
-                    raise ValueError(f"Invalid integer filter value for '{field_key}': {parsed_value}") from exc
-        elif field_type == ExtraFieldType.float:
-            if ":" in parsed_value:
-                min_val_str, max_val_str = parsed_value.split(":", 1)
-                float_conditions = []
-                try:
-                    stored = sqlalchemy.cast(field_table.value, sqlalchemy.Float)
-                    if min_val_str:
-                        float_conditions.append(stored >= float(min_val_str))
-                    if max_val_str:
-                        float_conditions.append(stored <= float(max_val_str))
-                except (ValueError, TypeError) as exc:
-                    raise ValueError(f"Invalid float range filter value for '{field_key}': {parsed_value}") from exc
-                if not float_conditions:
-                    raise ValueError(f"Invalid float range filter value for '{field_key}': {parsed_value}")
-                field_condition = sqlalchemy.and_(*float_conditions)
-            else:
-                try:
-                    # Compare numerically rather than by JSON string so that int-typed storage
-                    # (e.g. "2") and non-canonical decimals (e.g. "2.50") match a "2.0" filter.
-                    field_condition = sqlalchemy.cast(field_table.value, sqlalchemy.Float) == float(parsed_value)
-                except ValueError as exc:
-                    raise ValueError(f"Invalid float filter value for '{field_key}': {parsed_value}") from exc
-        elif field_type == ExtraFieldType.boolean:
-            field_condition = field_table.value == json.dumps(_parse_boolean_filter(parsed_value))
-        elif field_type == ExtraFieldType.choice:
-            if multi_choice:
-                # Multi-choice is stored as a JSON array; match the JSON-encoded token as a
-                # substring. json.dumps gives the exact quoted, escaped form the array element
-                # is stored as, and LIKE wildcards in the token are escaped.
-                token = json.dumps(parsed_value, ensure_ascii=False)
-                field_condition = field_table.value.like(f"%{escape_like(token)}%", escape=LIKE_ESCAPE)
-            else:
-                # Compare against the DB-decoded scalar, independent of JSON encoding.
-                field_condition = _JsonScalarText(field_table.value) == parsed_value
-        elif field_type == ExtraFieldType.datetime:
-            # Compare decoded ISO-8601 strings. Both bounds and stored values are the frontend's
-            # canonical toISOString() output, so lexicographic comparison is chronological. That
-            # assumption is what makes this differ from the built-in datetime columns, which parse
-            # the bound and compare real datetimes: here an equivalent spelling of the same instant
-            # (a UTC offset, or a missing '.000') compares as a different string.
-            #
-            # The *grammar* is shared even though the comparison is not, so the split comes from
-            # the same helper the built-in columns use (see add_where_clause_datetime_opt).
-            decoded = _JsonScalarText(field_table.value)
-            ends = split_datetime_range_filter(parsed_value, field_key)
-            if ends is None:
-                field_condition = decoded == parsed_value
-            else:
-                start_str, end_str = ends
-                dt_conditions = []
-                if start_str:
-                    dt_conditions.append(decoded >= start_str)
-                if end_str:
-                    dt_conditions.append(decoded <= end_str)
-                field_condition = sqlalchemy.and_(*dt_conditions)
-        elif field_type in (ExtraFieldType.integer_range, ExtraFieldType.float_range):
-            if ":" not in parsed_value:
-                raise ValueError(
-                    f"Invalid range filter value for '{field_key}': {parsed_value}. Expected '<min>:<max>'."
-                )
+def _value_condition(  # noqa: C901, PLR0912, PLR0915
+    field_table: type[models.Base],
+    field: ExtraField,
+    value_part: str,
+) -> ColumnElement[bool]:
+    """Match the rows of the field table whose value matches one non-empty value of a filter."""
+    field_key = field.key
+    field_type = field.field_type
+    multi_choice = field.multi_choice if field_type == ExtraFieldType.choice else None
+    exact_match = value_part.startswith('"') and value_part.endswith('"')
+    parsed_value = value_part[1:-1] if exact_match else value_part
+
+    if field_type == ExtraFieldType.text:
+        # Compare against the decoded string rather than a reconstructed JSON string, so
+        # matching is independent of how the value was encoded (quote handling, non-ASCII
+        # escaping). Substring search escapes LIKE wildcards to match user input literally.
+        field_condition = (
+            extra_field_text_equals(field_table, parsed_value)
+            if exact_match
+            else _text_contains(field_table, f"%{escape_like(parsed_value)}%")
+        )
+    elif field_type == ExtraFieldType.integer:
+        if ":" in parsed_value:
             min_val_str, max_val_str = parsed_value.split(":", 1)
-            converter = int if field_type == ExtraFieldType.integer_range else float
-            range_conditions = []
+            int_conditions = []
             try:
-                cast_type = sqlalchemy.Integer if field_type == ExtraFieldType.integer_range else sqlalchemy.Float
                 if min_val_str:
-                    # stored_min >= filter_min: the range starts at or after the requested minimum.
-                    stored_min = sqlalchemy.cast(_JsonArrayFirstElement(field_table.value), cast_type)
-                    range_conditions.append(stored_min >= converter(min_val_str))
+                    int_conditions.append(field_table.value_num >= int(min_val_str))
                 if max_val_str:
-                    # stored_max <= filter_max: the range ends at or before the requested maximum.
-                    stored_max = sqlalchemy.cast(_JsonArraySecondElement(field_table.value), cast_type)
-                    range_conditions.append(stored_max <= converter(max_val_str))
+                    int_conditions.append(field_table.value_num <= int(max_val_str))
             except (ValueError, TypeError) as exc:
-                range_kind = "integer" if field_type == ExtraFieldType.integer_range else "float"
-                raise ValueError(f"Invalid {range_kind} range filter value for '{field_key}': {parsed_value}") from exc
-            if not range_conditions:
-                raise ValueError(
-                    f"Invalid range filter value for '{field_key}': {parsed_value}. Expected '<min>:<max>'."
-                )
-            field_condition = sqlalchemy.and_(*range_conditions)
+                raise ValueError(f"Invalid integer range filter value for '{field_key}': {parsed_value}") from exc
+            if not int_conditions:
+                raise ValueError(f"Invalid integer range filter value for '{field_key}': {parsed_value}")
+            field_condition = sqlalchemy.and_(*int_conditions)
         else:
-            raise ValueError(f"Unsupported extra field type for '{field_key}': {field_type}")
-
-        matching_entities = id_select.where(sqlalchemy.and_(field_table.key == field_key, field_condition))
-        conditions.append(link_column.in_(matching_entities))
-
-    if not conditions:
-        return stmt
-
-    return stmt.where(sqlalchemy.or_(*conditions))
+            try:
+                field_condition = field_table.value_num == int(parsed_value)
+            except ValueError as exc:
+                raise ValueError(f"Invalid integer filter value for '{field_key}': {parsed_value}") from exc
+    elif field_type == ExtraFieldType.float:
+        if ":" in parsed_value:
+            min_val_str, max_val_str = parsed_value.split(":", 1)
+            float_conditions = []
+            try:
+                if min_val_str:
+                    float_conditions.append(field_table.value_num >= float(min_val_str))
+                if max_val_str:
+                    float_conditions.append(field_table.value_num <= float(max_val_str))
+            except (ValueError, TypeError) as exc:
+                raise ValueError(f"Invalid float range filter value for '{field_key}': {parsed_value}") from exc
+            if not float_conditions:
+                raise ValueError(f"Invalid float range filter value for '{field_key}': {parsed_value}")
+            field_condition = sqlalchemy.and_(*float_conditions)
+        else:
+            try:
+                # Compare numerically rather than by JSON string so that int-typed storage
+                # (e.g. "2") and non-canonical decimals (e.g. "2.50") match a "2.0" filter.
+                field_condition = field_table.value_num == float(parsed_value)
+            except ValueError as exc:
+                raise ValueError(f"Invalid float filter value for '{field_key}': {parsed_value}") from exc
+    elif field_type == ExtraFieldType.boolean:
+        field_condition = field_table.value_bool == parse_boolean_filter(parsed_value)
+    elif field_type == ExtraFieldType.choice:
+        if multi_choice:
+            # Multi-choice is stored as a JSON array; match the JSON-encoded token as a
+            # substring. json.dumps gives the exact quoted, escaped form the array element
+            # is stored as, and LIKE wildcards in the token are escaped.
+            token = json.dumps(parsed_value, ensure_ascii=False)
+            field_condition = field_table.value.like(f"%{escape_like(token)}%", escape=LIKE_ESCAPE)
+        else:
+            # Compare against the decoded string, independent of JSON encoding.
+            field_condition = extra_field_text_equals(field_table, parsed_value)
+    elif field_type == ExtraFieldType.datetime:
+        # Compare decoded ISO-8601 strings. Both bounds and stored values are the frontend's
+        # canonical toISOString() output, so lexicographic comparison is chronological. That
+        # assumption is what makes this differ from the built-in datetime columns, which parse
+        # the bound and compare real datetimes: here an equivalent spelling of the same instant
+        # (a UTC offset, or a missing '.000') compares as a different string.
+        #
+        # The *grammar* is shared even though the comparison is not, so the split comes from
+        # the same helper the built-in columns use (see add_where_clause_datetime_opt).
+        ends = split_datetime_range_filter(parsed_value, field_key)
+        if ends is None:
+            field_condition = extra_field_text_equals(field_table, parsed_value)
+        else:
+            # The stored values are far shorter than value_text can hold, so it is never cut.
+            start_str, end_str = ends
+            dt_conditions = []
+            if start_str:
+                dt_conditions.append(field_table.value_text >= start_str)
+            if end_str:
+                dt_conditions.append(field_table.value_text <= end_str)
+            field_condition = sqlalchemy.and_(*dt_conditions)
+    elif field_type in RANGE_FIELD_TYPES:
+        if ":" not in parsed_value:
+            raise ValueError(f"Invalid range filter value for '{field_key}': {parsed_value}. Expected '<min>:<max>'.")
+        min_val_str, max_val_str = parsed_value.split(":", 1)
+        converter = int if field_type == ExtraFieldType.integer_range else float
+        range_conditions = []
+        try:
+            if min_val_str:
+                # stored_min >= filter_min: the range starts at or after the requested minimum.
+                range_conditions.append(field_table.value_num >= converter(min_val_str))
+            if max_val_str:
+                # stored_max <= filter_max: the range ends at or before the requested maximum.
+                range_conditions.append(field_table.value_num_hi <= converter(max_val_str))
+        except (ValueError, TypeError) as exc:
+            range_kind = "integer" if field_type == ExtraFieldType.integer_range else "float"
+            raise ValueError(f"Invalid {range_kind} range filter value for '{field_key}': {parsed_value}") from exc
+        if not range_conditions:
+            raise ValueError(f"Invalid range filter value for '{field_key}': {parsed_value}. Expected '<min>:<max>'.")
+        field_condition = sqlalchemy.and_(*range_conditions)
+    else:
+        raise ValueError(f"Unsupported extra field type for '{field_key}': {field_type}")
+    return field_condition
 
 
 async def find_extra_field_values(
@@ -507,41 +553,17 @@ async def find_extra_field_values(
     return sorted(values)
 
 
-def add_order_by_extra_field(
-    stmt: Select,
-    base_obj: type[models.Base],
-    entity_type: EntityType,
-    field_key: str,
-    field_type: ExtraFieldType,
-    order: SortOrder,
-) -> Select:
-    """Add an order-by clause to a select statement for an extra field."""
-    field_table = _get_field_table_for_entity(entity_type)
-    entity_id_column = _get_entity_id_column(field_table)
-
-    value_subq = (
-        sqlalchemy.select(field_table.value)
-        .where(
-            sqlalchemy.and_(
-                field_table.key == field_key,
-                entity_id_column == base_obj.id,
-            )
-        )
-        .scalar_subquery()
-        .correlate(base_obj)
-    )
-
-    if field_type == ExtraFieldType.integer:
-        sort_expr = sqlalchemy.cast(value_subq, sqlalchemy.Integer)
-    elif field_type == ExtraFieldType.float:
-        sort_expr = sqlalchemy.cast(value_subq, sqlalchemy.Float)
-    elif field_type in (ExtraFieldType.integer_range, ExtraFieldType.float_range):
-        cast_type = sqlalchemy.Integer if field_type == ExtraFieldType.integer_range else sqlalchemy.Float
-        # Use dialect-specific JSON first-element extraction, then cast to numeric.
-        sort_expr = sqlalchemy.cast(_JsonArrayFirstElement(value_subq), cast_type)
-    else:
-        sort_expr = value_subq
+def extra_field_sort_column(columns: ColumnCollection, field_type: ExtraFieldType) -> ColumnElement:
+    """Get the column of an extra-field row to sort by the field, from the columns of its table.
 
-    # A spool that has no value for the field yields NULL here, and "not filled in" belongs at
-    # the bottom of the list in both directions -- see order_by_clauses.
-    return stmt.order_by(*order_by_clauses([sort_expr], order))
+    Ranges sort by their start. Multi-choice lists have no typed copy, and sort by their JSON.
+    An item that has no value for the field yields NULL here, and "not filled in" belongs at the
+    bottom of the list in both directions, so sort by it with order_by_clauses.
+    """
+    if field_type in (ExtraFieldType.integer, ExtraFieldType.float, *RANGE_FIELD_TYPES):
+        return columns.value_num
+    if field_type == ExtraFieldType.boolean:
+        return columns.value_bool
+    if field_type in (ExtraFieldType.text, ExtraFieldType.choice, ExtraFieldType.datetime):
+        return columns.value_text
+    return columns.value
@@ -5,22 +5,27 @@ from collections.abc import Sequence
 from datetime import datetime
 
 import sqlalchemy
-from sqlalchemy import func, select
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import contains_eager, joinedload
 
-from spoolman.api.v1.models import EventType, Filament, FilamentEvent, MultiColorDirection
-from spoolman.database import models, vendor
-from spoolman.database.extra_field_query import apply_extra_field_filters_and_sort
+from spoolman.api.v1.models import CountMode, EventType, Filament, FilamentEvent, MultiColorDirection
+from spoolman.database import derived, models, usage_ledger, vendor
+from spoolman.database.extra_field_query import apply_extra_field_filters, apply_extra_field_sort
+from spoolman.database.geometry_cache import filament_geometry_cache
 from spoolman.database.utils import (
+    ItemStream,
     SortOrder,
     add_where_clause_int_in,
     add_where_clause_int_opt,
     add_where_clause_str,
     add_where_clause_str_opt,
-    order_by_clauses,
+    bump_version,
+    claim_version,
+    find_page,
     parse_nested_field,
+    version_etag,
 )
 from spoolman.exceptions import ItemDeleteError, ItemNotFoundError
 from spoolman.extra_field_registry import EntityType
@@ -95,6 +100,26 @@ async def get_by_id(db: AsyncSession, filament_id: int) -> models.Filament:
     return filament
 
 
+def etag(filament: models.Filament) -> str:
+    """Get the ETag of a filament, which changes along with the filament and with the vendor it embeds."""
+    vendor = filament.vendor
+    return version_etag(filament.registered, filament.version, vendor.version if vendor else None)
+
+
+async def get_etag(db: AsyncSession, filament_id: int) -> str:
+    """Get the ETag of a filament without loading it."""
+    row = (
+        await db.execute(
+            sqlalchemy.select(models.Filament.registered, models.Filament.version, models.Vendor.version)
+            .join(models.Filament.vendor, isouter=True)
+            .where(models.Filament.id == filament_id),
+        )
+    ).one_or_none()
+    if row is None:
+        raise ItemNotFoundError(f"No filament with ID {filament_id} found.")
+    return version_etag(*row)
+
+
 async def find(
     *,
     db: AsyncSession,
@@ -109,13 +134,18 @@ async def find(
     sort_by: dict[str, SortOrder] | None = None,
     limit: int | None = None,
     offset: int = 0,
-) -> tuple[list[models.Filament], int]:
+    cursor: str | None = None,
+    count: CountMode = CountMode.EXACT,
+    stream: bool = False,
+) -> tuple[list[models.Filament] | ItemStream, int | None, str | None]:
     """Find a list of filament objects by search criteria.
 
     Sort by a field by passing a dict with the field name as key and the sort order as value.
     The field name can contain nested fields, e.g. vendor.name.
 
-    Returns a tuple containing the list of items and the total count of matching items.
+    Returns a tuple containing the list of items, the total count of matching items and the cursor
+    of the next page, see find_page for both. With stream set, a search without a limit returns an
+    ItemStream of the items instead, see find_page.
     """
     stmt = (
         select(models.Filament)
@@ -131,40 +161,43 @@ async def find(
     stmt = add_where_clause_str_opt(stmt, models.Filament.article_number, article_number)
     stmt = add_where_clause_str_opt(stmt, models.Filament.external_id, external_id)
 
-    total_count = None
-
-    stmt = await apply_extra_field_filters_and_sort(
+    stmt = await apply_extra_field_filters(
         db=db,
         stmt=stmt,
         base_obj=models.Filament,
         entity_type=EntityType.filament,
         extra_field_filters=extra_field_filters,
-        sort_by=sort_by,
     )
 
+    # Extra fields take precedence over the other fields of a sort.
+    sorted_stmt, sort_keys = await apply_extra_field_sort(
+        db=db,
+        stmt=stmt,
+        base_obj=models.Filament,
+        entity_type=EntityType.filament,
+        sort_by=sort_by,
+    )
     if sort_by is not None:
         for fieldstr, order in sort_by.items():
             # Check if this is a custom field sort
             if fieldstr.startswith("extra."):
                 continue
 
-            field = parse_nested_field(models.Filament, fieldstr)
-            stmt = stmt.order_by(*order_by_clauses([field], order))
-
-    if limit is not None:
-        total_count_stmt = stmt.with_only_columns(func.count(), maintain_column_froms=True).order_by(None)
-        total_count = (await db.execute(total_count_stmt)).scalar()
-        stmt = stmt.offset(offset).limit(limit)
+            sort_keys.append((parse_nested_field(models.Filament, fieldstr), order))
 
-    rows = await db.execute(
-        stmt,
-        execution_options={"populate_existing": True},
+    return await find_page(
+        db=db,
+        stmt=sorted_stmt,
+        sort_by=sort_by,
+        sort_keys=sort_keys,
+        id_column=models.Filament.id,
+        limit=limit,
+        offset=offset,
+        cursor=cursor,
+        count=count,
+        count_stmt=stmt,
+        stream=stream,
     )
-    result = list(rows.unique().scalars().all())
-    if total_count is None:
-        total_count = len(result)
-
-    return result, total_count
 
 
 async def update(
@@ -172,9 +205,21 @@ async def update(
     db: AsyncSession,
     filament_id: int,
     data: dict,
+    if_match: str | None = None,
 ) -> models.Filament:
-    """Update the fields of a filament object."""
+    """Update the fields of a filament object.
+
+    With if_match set, nothing is updated unless it matches the ETag of the filament, at the time of the
+    write.
+
+    Raises:
+        PreconditionFailedError: The filament has changed since the ETag in if_match.
+
+    """
     filament = await get_by_id(db, filament_id)
+    if if_match is not None:
+        message = "The filament has changed since it was read."
+        await claim_version(db, filament, if_match=if_match, etag=etag(filament), message=message)
     for k, v in data.items():
         if k == "vendor_id":
             if v is None:
@@ -192,10 +237,17 @@ async def update(
             filament.multi_color_direction = v.value if v is not None else None
         else:
             setattr(filament, k, v)
+    if if_match is None:
+        bump_version(filament)
+    if not derived.FILAMENT_COLUMNS.isdisjoint(data):
+        await db.flush()
+        await db.execute(derived.refresh(models.Spool.filament_id == filament_id))
     await db.commit()
+    await db.refresh(filament, ["version"])
     # A spool's response embeds its filament and carries values derived from it
     # (remaining_length, and the initial_weight/price fall-backs), so this edit changed
-    # every one of this filament's spool payloads without touching a spool row.
+    # every one of this filament's spool payloads without touching a spool row's own values,
+    # only the derived sort columns refreshed above.
     # We deliberately do NOT re-broadcast those spools: a filament shared by hundreds of
     # spools would turn one PATCH into hundreds of ORM loads and websocket frames inside
     # the request. Subscribers are expected to treat a filament event as invalidating the
@@ -215,6 +267,9 @@ async def update(
 async def delete(db: AsyncSession, filament_id: int) -> None:
     """Delete a filament object."""
     filament = await get_by_id(db, filament_id)
+    # Only usage of spools that have since moved to another filament can be left at this point, as
+    # a filament that still has spools cannot be deleted.
+    await usage_ledger.detach_filament_usage(db, filament_id)
     await db.delete(filament)
     try:
         await db.commit()  # Flush immediately so any errors are propagated in this request.
@@ -226,6 +281,12 @@ async def delete(db: AsyncSession, filament_id: int) -> None:
 
 async def clear_extra_field(db: AsyncSession, key: str) -> None:
     """Delete all extra fields with a specific key."""
+    with_field = sqlalchemy.select(models.FilamentField.filament_id).where(models.FilamentField.key == key)
+    await db.execute(
+        sqlalchemy.update(models.Filament)
+        .where(models.Filament.id.in_(with_field))
+        .values(version=models.Filament.version + 1),
+    )
     await db.execute(
         sqlalchemy.delete(models.FilamentField).where(models.FilamentField.key == key),
     )
@@ -299,6 +360,8 @@ async def find_by_color(
 
 async def filament_changed(filament: models.Filament, typ: EventType) -> None:
     """Notify websocket clients that a filament has changed."""
+    # Its diameter or density may have changed, which length-based usage of its spools depends on.
+    filament_geometry_cache.invalidate_filament(filament.id)
     try:
         await websocket_manager.send(
             ("filament", str(filament.id)),
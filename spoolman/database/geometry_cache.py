@@ -0,0 +1,76 @@
+"""In-memory cache of the filament geometry behind each spool.
+
+Length-based usage reports need the diameter and density of the spool's filament to convert the
+length to a weight. They arrive every few seconds per printer for the same handful of spools, and
+the geometry behind a spool only changes when its filament is edited or it is moved to another
+filament, so it is cached here rather than joined in on every report.
+
+Entries are dropped by filament_changed and by spool updates and deletions. The cache is
+process-local, like the websocket manager that those notifications already assume.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+
+MAX_SIZE = 4096
+
+
+@dataclass(frozen=True)
+class FilamentGeometry:
+    """The properties of a spool's filament that are needed to convert a length to a weight."""
+
+    filament_id: int
+    diameter: float
+    density: float
+
+
+class FilamentGeometryCache:
+    """A bounded, least-recently-used mapping from spool ID to its filament geometry."""
+
+    def __init__(self, max_size: int) -> None:
+        """Initialize."""
+        self.max_size = max_size
+        self.entries: OrderedDict[int, FilamentGeometry] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Bumped by every invalidation. A value read from the database is only cached if no
+        # invalidation happened while it was being read, as it may predate the change otherwise.
+        self.generation = 0
+
+    def get(self, spool_id: int) -> FilamentGeometry | None:
+        """Get the cached geometry of a spool, counting the lookup as a hit or a miss."""
+        geometry = self.entries.get(spool_id)
+        if geometry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(spool_id)
+        self.hits += 1
+        return geometry
+
+    def put(self, spool_id: int, geometry: FilamentGeometry, generation: int) -> None:
+        """Cache the geometry of a spool, as read while the cache was at the given generation."""
+        if generation != self.generation:
+            return
+        self.entries[spool_id] = geometry
+        self.entries.move_to_end(spool_id)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def invalidate_spool(self, spool_id: int) -> None:
+        """Drop the cached geometry of a spool."""
+        self.generation += 1
+        self.entries.pop(spool_id, None)
+
+    def invalidate_filament(self, filament_id: int) -> None:
+        """Drop the cached geometry of every spool of a filament."""
+        self.generation += 1
+        for spool_id in [k for k, v in self.entries.items() if v.filament_id == filament_id]:
+            del self.entries[spool_id]
+
+    def clear(self) -> None:
+        """Drop the cached geometry of every spool."""
+        self.generation += 1
+        self.entries.clear()
+
+
+filament_geometry_cache = FilamentGeometryCache(MAX_SIZE)
@@ -1,9 +1,11 @@
 """SQLAlchemy data models."""
 
+import json
+import math
 from datetime import datetime
-from typing import Optional
+from typing import Any, Optional
 
-from sqlalchemy import ForeignKey, Integer, String, Text
+from sqlalchemy import ForeignKey, Index, Integer, String, Text, event
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -35,6 +37,11 @@ class Vendor(Base):
     comment: Mapped[str | None] = mapped_column(String(1024))
     filaments: Mapped[list["Filament"]] = relationship(back_populates="vendor")
     external_id: Mapped[str | None] = mapped_column(String(256))
+    version: Mapped[int] = mapped_column(
+        default=1,
+        server_default="1",
+        comment="Incremented on every change, including to the extra fields.",
+    )
     extra: Mapped[list["VendorField"]] = relationship(
         back_populates="vendor",
         cascade="save-update, merge, delete, delete-orphan",
@@ -48,10 +55,10 @@ class Filament(Base):
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     registered: Mapped[datetime] = mapped_column()
     name: Mapped[str | None] = mapped_column(String(64))
-    vendor_id: Mapped[int | None] = mapped_column(ForeignKey("vendor.id"))
+    vendor_id: Mapped[int | None] = mapped_column(ForeignKey("vendor.id"), index=True)
     vendor: Mapped[Optional["Vendor"]] = relationship(back_populates="filaments")
     spools: Mapped[list["Spool"]] = relationship(back_populates="filament")
-    material: Mapped[str | None] = mapped_column(String(64))
+    material: Mapped[str | None] = mapped_column(String(64), index=True)
     price: Mapped[float | None] = mapped_column()
     density: Mapped[float] = mapped_column()
     diameter: Mapped[float] = mapped_column()
@@ -65,6 +72,11 @@ class Filament(Base):
     multi_color_hexes: Mapped[str | None] = mapped_column(String(128))
     multi_color_direction: Mapped[str | None] = mapped_column(String(16))
     external_id: Mapped[str | None] = mapped_column(String(256))
+    version: Mapped[int] = mapped_column(
+        default=1,
+        server_default="1",
+        comment="Incremented on every change, including to the extra fields.",
+    )
     extra: Mapped[list["FilamentField"]] = relationship(
         back_populates="filament",
         cascade="save-update, merge, delete, delete-orphan",
@@ -74,21 +86,36 @@ class Filament(Base):
 
 class Spool(Base):
     __tablename__ = "spool"
+    # The default search leaves out the archived spools, and is mostly sorted by last use.
+    __table_args__ = (Index("ix_spool_archived_last_used", "archived", "last_used"),)
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     registered: Mapped[datetime] = mapped_column()
     first_used: Mapped[datetime | None] = mapped_column()
     last_used: Mapped[datetime | None] = mapped_column()
     price: Mapped[float | None] = mapped_column()
-    filament_id: Mapped[int] = mapped_column(ForeignKey("filament.id"))
+    filament_id: Mapped[int] = mapped_column(ForeignKey("filament.id"), index=True)
     filament: Mapped["Filament"] = relationship(back_populates="spools")
     initial_weight: Mapped[float | None] = mapped_column()
     spool_weight: Mapped[float | None] = mapped_column()
     used_weight: Mapped[float] = mapped_column()
-    location: Mapped[str | None] = mapped_column(String(64))
+    location: Mapped[str | None] = mapped_column(String(64), index=True)
     lot_nr: Mapped[str | None] = mapped_column(String(64))
     comment: Mapped[str | None] = mapped_column(String(1024))
     archived: Mapped[bool | None] = mapped_column()
+    version: Mapped[int] = mapped_column(
+        default=1,
+        server_default="1",
+        comment="Incremented on every change, including to the extra fields.",
+    )
+    # Derived from the spool and its filament, for sorting. See spoolman.database.derived.
+    remaining_weight: Mapped[float | None] = mapped_column(index=True, comment="Derived, for sorting.")
+    remaining_length: Mapped[float | None] = mapped_column(index=True, comment="Derived, for sorting.")
+    used_length: Mapped[float | None] = mapped_column(index=True, comment="Derived, for sorting.")
+    effective_price: Mapped[float | None] = mapped_column(
+        index=True,
+        comment="Derived, for sorting: the price of the spool, or else of its filament.",
+    )
     extra: Mapped[list["SpoolField"]] = relationship(
         back_populates="spool",
         cascade="save-update, merge, delete, delete-orphan",
@@ -104,28 +131,172 @@ class Setting(Base):
     last_updated: Mapped[datetime] = mapped_column()
 
 
+# How much of a text value is kept in the value_text of an extra field. It is indexed, and an index
+# entry has a size limit on MySQL and PostgreSQL.
+VALUE_TEXT_LENGTH = 255
+
+# The typed copies of an extra field's value, which are indexed along with the key.
+VALUE_COLUMNS = ("value_text", "value_num", "value_num_hi", "value_bool")
+
+
+def _value_indexes(table: str) -> list[Index]:
+    return [Index(f"ix_{table}_key_{column}", "key", column) for column in VALUE_COLUMNS]
+
+
+def field_values(value: str | None) -> dict[str, Any]:
+    """Get the typed copies of an extra field's value, decoded from its JSON.
+
+    The JSON value of an extra field is kept as text, which a filter or sort would have to decode
+    for every row, so that no index could serve it. Its typed copies are kept along with it
+    instead: value_text for a string (the first VALUE_TEXT_LENGTH characters of it), value_num for
+    a number, value_num and value_num_hi for the bounds of a range, either of which may be open,
+    and value_bool for a boolean. They follow from the JSON alone, whatever the type of the field.
+    Anything else, like the list of a multi-choice field, has none of them.
+    """
+    values: dict[str, Any] = dict.fromkeys(VALUE_COLUMNS)
+    try:
+        decoded = json.loads(value) if value is not None else None
+    except ValueError:
+        return values
+    if isinstance(decoded, bool):
+        values["value_bool"] = decoded
+    elif isinstance(decoded, str):
+        values["value_text"] = decoded[:VALUE_TEXT_LENGTH]
+    elif _is_number(decoded):
+        values["value_num"] = float(decoded)
+    elif isinstance(decoded, list) and len(decoded) == 2 and all(_is_bound(item) for item in decoded):  # noqa: PLR2004
+        values["value_num"], values["value_num_hi"] = (float(item) if item is not None else None for item in decoded)
+    return values
+
+
+def _is_number(value: object) -> bool:
+    """Tell whether a decoded JSON value is a number that fits in a float column."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    try:
+        return math.isfinite(float(value))
+    except OverflowError:
+        return False
+
+
+def _is_bound(value: object) -> bool:
+    """Tell whether a decoded JSON value is a bound of a range, which is a number or open."""
+    return value is None or _is_number(value)
+
+
+def set_field_values(target: "VendorField | FilamentField | SpoolField", value: str | None, *_: object) -> None:
+    """Keep the typed copies of an extra field's value up to date whenever the value is set."""
+    for column, typed in field_values(value).items():
+        setattr(target, column, typed)
+
+
 class VendorField(Base):
     __tablename__ = "vendor_field"
+    # For the extra field filters and sorts, which look up the vendors that have a key, or a value of it.
+    __table_args__ = (
+        Index("ix_vendor_field_key_vendor_id", "key", "vendor_id"),
+        *_value_indexes("vendor_field"),
+    )
 
     vendor_id: Mapped[int] = mapped_column(ForeignKey("vendor.id"), primary_key=True, index=True)
     vendor: Mapped["Vendor"] = relationship(back_populates="extra")
     key: Mapped[str] = mapped_column(String(64), primary_key=True, index=True)
     value: Mapped[str] = mapped_column(Text())
+    # Typed copies of the value, see set_field_values.
+    value_text: Mapped[str | None] = mapped_column(String(VALUE_TEXT_LENGTH))
+    value_num: Mapped[float | None] = mapped_column()
+    value_num_hi: Mapped[float | None] = mapped_column()
+    value_bool: Mapped[bool | None] = mapped_column()
 
 
 class FilamentField(Base):
     __tablename__ = "filament_field"
+    # For the extra field filters and sorts, which look up the filaments that have a key, or a value of it.
+    __table_args__ = (
+        Index("ix_filament_field_key_filament_id", "key", "filament_id"),
+        *_value_indexes("filament_field"),
+    )
 
     filament_id: Mapped[int] = mapped_column(ForeignKey("filament.id"), primary_key=True, index=True)
     filament: Mapped["Filament"] = relationship(back_populates="extra")
     key: Mapped[str] = mapped_column(String(64), primary_key=True, index=True)
     value: Mapped[str] = mapped_column(Text())
+    # Typed copies of the value, see set_field_values.
+    value_text: Mapped[str | None] = mapped_column(String(VALUE_TEXT_LENGTH))
+    value_num: Mapped[float | None] = mapped_column()
+    value_num_hi: Mapped[float | None] = mapped_column()
+    value_bool: Mapped[bool | None] = mapped_column()
 
 
 class SpoolField(Base):
     __tablename__ = "spool_field"
+    # For the extra field filters and sorts, which look up the spools that have a key, or a value of it.
+    __table_args__ = (
+        Index("ix_spool_field_key_spool_id", "key", "spool_id"),
+        *_value_indexes("spool_field"),
+    )
 
     spool_id: Mapped[int] = mapped_column(ForeignKey("spool.id"), primary_key=True, index=True)
     spool: Mapped["Spool"] = relationship(back_populates="extra")
     key: Mapped[str] = mapped_column(String(64), primary_key=True, index=True)
     value: Mapped[str] = mapped_column(Text())
+    # Typed copies of the value, see set_field_values.
+    value_text: Mapped[str | None] = mapped_column(String(VALUE_TEXT_LENGTH))
+    value_num: Mapped[float | None] = mapped_column()
+    value_num_hi: Mapped[float | None] = mapped_column()
+    value_bool: Mapped[bool | None] = mapped_column()
+
+
+for _field_table in (VendorField, FilamentField, SpoolField):
+    event.listen(_field_table.value, "set", set_field_values)
+
+
+class SpoolUsageRecord(Base):
+    __tablename__ = "spool_usage"
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    spool_id: Mapped[int | None] = mapped_column(
+        ForeignKey("spool.id", ondelete="SET NULL"),
+        index=True,
+        comment="Null once the spool is deleted.",
+    )
+    filament_id: Mapped[int | None] = mapped_column(
+        ForeignKey("filament.id", ondelete="SET NULL"),
+        index=True,
+        comment="The filament of the spool at the time of use. Null once the filament is deleted.",
+    )
+    material: Mapped[str | None] = mapped_column(String(64), comment="The filament material at the time of use.")
+    location: Mapped[str | None] = mapped_column(String(64), comment="The spool location at the time of use.")
+    weight: Mapped[float] = mapped_column(comment="The change in used weight, in grams.")
+    time: Mapped[datetime] = mapped_column(index=True)
+    source: Mapped[str] = mapped_column(String(16), comment="What reported the usage: use or measure.")
+
+
+class SpoolUsageHourly(Base):
+    __tablename__ = "spool_usage_hourly"
+
+    period_start: Mapped[datetime] = mapped_column(primary_key=True)
+    spool_id: Mapped[int] = mapped_column(primary_key=True, index=True, comment="0 once the spool is deleted.")
+    filament_id: Mapped[int] = mapped_column(primary_key=True, index=True, comment="0 once the filament is deleted.")
+    material: Mapped[str] = mapped_column(String(64), primary_key=True, comment="Empty if unset.")
+    location: Mapped[str] = mapped_column(String(64), primary_key=True, comment="Empty if unset.")
+    weight: Mapped[float] = mapped_column()
+
+
+class SpoolUsageDaily(Base):
+    __tablename__ = "spool_usage_daily"
+
+    period_start: Mapped[datetime] = mapped_column(primary_key=True)
+    spool_id: Mapped[int] = mapped_column(primary_key=True, index=True, comment="0 once the spool is deleted.")
+    filament_id: Mapped[int] = mapped_column(primary_key=True, index=True, comment="0 once the filament is deleted.")
+    material: Mapped[str] = mapped_column(String(64), primary_key=True, comment="Empty if unset.")
+    location: Mapped[str] = mapped_column(String(64), primary_key=True, comment="Empty if unset.")
+    weight: Mapped[float] = mapped_column()
+
+
+class EventPayload(Base):
+    __tablename__ = "event_payload"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    created: Mapped[datetime] = mapped_column(index=True)
+    payload: Mapped[str] = mapped_column(Text(), comment="A websocket event too large for a PostgreSQL notification.")
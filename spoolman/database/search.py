@@ -481,7 +481,7 @@ async def _color_matches(db: AsyncSession, color_hex: str, threshold: float, lim
     )
     if not matched_ids:
         return []
-    matched, _ = await filament_db.find(db=db, ids=matched_ids)
+    matched, _, _ = await filament_db.find(db=db, ids=matched_ids)
     query_lab = rgb_to_lab(hex_to_rgb(color_hex))
     matched.sort(key=lambda f: _filament_color_distance(f, query_lab))
     return [FilamentMatch(filament=f, match_field="color") for f in matched[:limit]]
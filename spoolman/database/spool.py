@@ -5,32 +5,43 @@ import logging
 from collections.abc import Sequence
 from dataclasses import dataclass
 from datetime import datetime, timezone
+from typing import Any
 
 import sqlalchemy
 from sqlalchemy import ColumnElement, case, func
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import contains_eager, joinedload
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.sql.functions import coalesce
 
-from spoolman.api.v1.models import EventType, Spool, SpoolEvent
-from spoolman.database import filament, models
+from spoolman.api.v1.models import CountMode, EventType, Spool, SpoolEvent
+from spoolman.database import derived, filament, models, usage_ledger
 from spoolman.database.extra_field_query import (
     ExtraFieldJoin,
-    apply_extra_field_filters_and_sort,
+    apply_extra_field_filters,
+    apply_extra_field_sort,
     apply_spool_related_extra_filters,
     extra_field_join,
-    extra_field_value_text,
+    extra_field_text_equals,
 )
+from spoolman.database.geometry_cache import FilamentGeometry, filament_geometry_cache
+from spoolman.database.usage_buffer import usage_buffer
+from spoolman.database.usage_ledger import UsageRecord
 from spoolman.database.utils import (
+    ItemStream,
     SortOrder,
     add_where_clause_datetime_opt,
     add_where_clause_int,
     add_where_clause_int_opt,
     add_where_clause_str,
     add_where_clause_str_opt,
+    bump_version,
+    claim_version,
+    find_page,
     order_by_clauses,
     parse_nested_field,
+    version_etag,
 )
 from spoolman.exceptions import ItemCreateError, ItemNotFoundError, SpoolMeasureError
 from spoolman.extra_field_registry import EntityType, ExtraField, ExtraFieldType, get_extra_fields
@@ -106,6 +117,8 @@ async def create(
         extra=[models.SpoolField(key=k, value=v) for k, v in (extra or {}).items() if v is not None],
     )
     db.add(spool)
+    await db.flush()
+    await db.execute(derived.refresh(models.Spool.id == spool.id))
     await db.commit()
     await spool_changed(spool, EventType.ADDED)
     return spool
@@ -123,7 +136,33 @@ async def get_by_id(db: AsyncSession, spool_id: int) -> models.Spool:
     return spool
 
 
-async def find(  # noqa: C901
+def etag(spool: models.Spool) -> str:
+    """Get the ETag of a spool, which changes along with the spool and with the filament and vendor it embeds."""
+    vendor = spool.filament.vendor
+    return version_etag(spool.registered, spool.version, spool.filament.version, vendor.version if vendor else None)
+
+
+async def get_etag(db: AsyncSession, spool_id: int) -> str:
+    """Get the ETag of a spool without loading it."""
+    row = (
+        await db.execute(
+            sqlalchemy.select(
+                models.Spool.registered,
+                models.Spool.version,
+                models.Filament.version,
+                models.Vendor.version,
+            )
+            .join(models.Spool.filament)
+            .join(models.Filament.vendor, isouter=True)
+            .where(models.Spool.id == spool_id),
+        )
+    ).one_or_none()
+    if row is None:
+        raise ItemNotFoundError(f"No spool with ID {spool_id} found.")
+    return version_etag(*row)
+
+
+async def find(
     *,
     db: AsyncSession,
     filament_name: str | None = None,
@@ -144,16 +183,25 @@ async def find(  # noqa: C901
     sort_by: dict[str, SortOrder] | None = None,
     limit: int | None = None,
     offset: int = 0,
-) -> tuple[list[models.Spool], int]:
+    cursor: str | None = None,
+    count: CountMode = CountMode.EXACT,
+    columns: Sequence[ColumnElement[Any]] | None = None,
+    stream: bool = False,
+) -> tuple[list[Any] | ItemStream, int | None, str | None]:
     """Find a list of spool objects by search criteria.
 
     Sort by a field by passing a dict with the field name as key and the sort order as value.
     The field name can contain nested fields, e.g. filament.name.
 
-    Returns a tuple containing the list of items and the total count of matching items.
+    Given columns, starting with the spool ID, only those are selected, and the items are their
+    rows rather than spool objects. See spool_fields.
+
+    Returns a tuple containing the list of items, the total count of matching items and the cursor
+    of the next page, see find_page for both. With stream set, a search without a limit returns an
+    ItemStream of the items instead, see find_page.
     """
     stmt = _apply_spool_filters(
-        sqlalchemy.select(models.Spool),
+        sqlalchemy.select(models.Spool) if columns is None else sqlalchemy.select(*columns),
         filament_name=filament_name,
         filament_id=filament_id,
         filament_material=filament_material,
@@ -166,17 +214,16 @@ async def find(  # noqa: C901
         first_used=first_used,
         last_used=last_used,
         registered=registered,
-    ).options(contains_eager(models.Spool.filament).contains_eager(models.Filament.vendor))
-
-    total_count = None
+    )
+    if columns is None:
+        stmt = stmt.options(contains_eager(models.Spool.filament).contains_eager(models.Filament.vendor))
 
-    stmt = await apply_extra_field_filters_and_sort(
+    stmt = await apply_extra_field_filters(
         db=db,
         stmt=stmt,
         base_obj=models.Spool,
         entity_type=EntityType.spool,
         extra_field_filters=extra_field_filters,
-        sort_by=sort_by,
     )
     stmt = await apply_spool_related_extra_filters(
         db=db,
@@ -185,6 +232,14 @@ async def find(  # noqa: C901
         vendor_filters=vendor_extra_field_filters,
     )
 
+    # Extra fields take precedence over the other fields of a sort.
+    sorted_stmt, sort_keys = await apply_extra_field_sort(
+        db=db,
+        stmt=stmt,
+        base_obj=models.Spool,
+        entity_type=EntityType.spool,
+        sort_by=sort_by,
+    )
     if sort_by is not None:
         for fieldstr, order in sort_by.items():
             # Check if this is a custom field sort
@@ -192,49 +247,40 @@ async def find(  # noqa: C901
                 continue
 
             sorts = []
-            if fieldstr == "remaining_weight":
-                sorts.append(
-                    coalesce(models.Spool.initial_weight, models.Filament.weight) - models.Spool.used_weight,
-                )
-            elif fieldstr == "remaining_length":
-                # Simplified weight -> length formula. Absolute value is not correct but the proportionality
-                # is still kept, which means the sort order is correct.
-                sorts.append(
-                    (coalesce(models.Spool.initial_weight, models.Filament.weight) - models.Spool.used_weight)
-                    / models.Filament.density
-                    / (models.Filament.diameter * models.Filament.diameter),
-                )
-            elif fieldstr == "used_length":
-                sorts.append(
-                    models.Spool.used_weight
-                    / models.Filament.density
-                    / (models.Filament.diameter * models.Filament.diameter),
-                )
+            if fieldstr in DERIVED_SORT_COLUMNS:
+                sorts.append(DERIVED_SORT_COLUMNS[fieldstr])
             elif fieldstr == "filament.combined_name":
                 sorts.append(models.Vendor.name)
                 sorts.append(models.Filament.name)
-            elif fieldstr == "price":
-                sorts.append(coalesce(models.Spool.price, models.Filament.price))
             else:
                 sorts.append(parse_nested_field(models.Spool, fieldstr))
 
-            stmt = stmt.order_by(*order_by_clauses(sorts, order))
+            sort_keys.extend((sort, order) for sort in sorts)
 
-    if limit is not None:
-        total_count_stmt = stmt.with_only_columns(func.count(), maintain_column_froms=True).order_by(None)
-        total_count = (await db.execute(total_count_stmt)).scalar()
-        stmt = stmt.offset(offset).limit(limit)
-
-    rows = await db.execute(
-        stmt,
-        execution_options={"populate_existing": True},
+    return await find_page(
+        db=db,
+        stmt=sorted_stmt,
+        sort_by=sort_by,
+        sort_keys=sort_keys,
+        id_column=models.Spool.id,
+        limit=limit,
+        offset=offset,
+        cursor=cursor,
+        count=count,
+        count_stmt=stmt,
+        stream=stream,
+        entity=columns is None,
     )
-    result = list(rows.unique().scalars().all())
-    if total_count is None:
-        total_count = len(result)
 
-    return result, total_count
 
+# The sort fields of values computed from the spool and its filament, and the columns they are
+# stored in, see spoolman.database.derived.
+DERIVED_SORT_COLUMNS = {
+    "remaining_weight": models.Spool.remaining_weight,
+    "remaining_length": models.Spool.remaining_length,
+    "used_length": models.Spool.used_length,
+    "price": models.Spool.effective_price,
+}
 
 GROUP_BY_COLUMNS = {
     "filament": models.Spool.filament_id,
@@ -309,7 +355,7 @@ def _blank_as_null(col: ColumnElement) -> ColumnElement:
     A spool with no value for a string field can spell that as NULL or as an empty string, and
     the two are distinct to the database — left alone they become two groups the client can only
     render as the same "unassigned" one. Filtering already treats both as unset (see
-    add_where_clause_str_opt and the empty branch of add_where_clause_extra_field), so grouping
+    add_where_clause_str_opt and the empty branch of _parse_field_filter), so grouping
     has to agree or a group's count will not match the spools that group's filter returns.
     """
     return func.nullif(col, "")
@@ -407,17 +453,11 @@ async def find_groups(
     """
     group_col, title_col, extra_join = await _resolve_group_by(db, group_by)
 
-    # Remaining weight is computed (see Spool.from_db); mirror that formula so the sum is correct.
-    # The fallback literal is 0.0 (float, not int): the weights are floats, and CockroachDB rejects
-    # a COALESCE that mixes a float expression with an int literal ("incompatible COALESCE expressions").
-    remaining_expr = coalesce(
-        coalesce(models.Spool.initial_weight, models.Filament.weight) - models.Spool.used_weight,
-        0.0,
-    )
-    # ...including its max(..., 0) clamp, so an over-used spool contributes 0 rather than a
-    # negative number and the group total still matches the sum of the per-spool values.
-    # CASE, not func.greatest: greatest() is not portable across all four supported databases.
-    remaining_expr = case((remaining_expr < 0, 0.0), else_=remaining_expr)
+    # The remaining weight is stored clamped at zero, as Spool.from_db computes it, so an over-used
+    # spool contributes 0 and the group total matches the sum of the per-spool values. The fallback
+    # literal is 0.0 (float, not int): CockroachDB rejects a COALESCE that mixes a float expression
+    # with an int literal ("incompatible COALESCE expressions").
+    remaining_expr = coalesce(models.Spool.remaining_weight, 0.0)
     spool_count = func.count().label("spool_count")
     in_use_count = func.sum(case((models.Spool.used_weight > 0, 1), else_=0)).label("in_use_count")
     total_remaining = func.sum(remaining_expr).label("total_remaining_weight")
@@ -449,13 +489,12 @@ async def find_groups(
     )
     if extra_join is not None:
         stmt = extra_join.apply(stmt, models.Spool.id)
-    stmt = await apply_extra_field_filters_and_sort(
+    stmt = await apply_extra_field_filters(
         db=db,
         stmt=stmt,
         base_obj=models.Spool,
         entity_type=EntityType.spool,
         extra_field_filters=extra_field_filters,
-        sort_by=None,
     )
     stmt = await apply_spool_related_extra_filters(
         db=db,
@@ -527,14 +566,28 @@ async def find_groups(
     ], total_count
 
 
-async def update(
+async def update(  # noqa: C901
     *,
     db: AsyncSession,
     spool_id: int,
     data: dict,
+    if_match: str | None = None,
 ) -> models.Spool:
-    """Update the fields of a spool object."""
+    """Update the fields of a spool object.
+
+    With if_match set, nothing is updated unless it matches the ETag of the spool, at the time of the
+    write.
+
+    Raises:
+        PreconditionFailedError: The spool has changed since the ETag in if_match.
+
+    """
+    # The patch may set the used weight, which pending usage must not be added on top of afterwards.
+    await usage_buffer.flush()
     spool = await get_by_id(db, spool_id)
+    if if_match is not None:
+        message = "The spool has changed since it was read."
+        await claim_version(db, spool, if_match=if_match, etag=etag(spool), message=message)
     for k, v in data.items():
         if k == "filament_id":
             spool.filament = await filament.get_by_id(db, v)
@@ -557,7 +610,14 @@ async def update(
             spool.extra.extend([models.SpoolField(key=k, value=v) for k, v in v.items() if v is not None])
         else:
             setattr(spool, k, v)
+    if if_match is None:
+        bump_version(spool)
+    await db.flush()
+    await db.execute(derived.refresh(models.Spool.id == spool_id))
     await db.commit()
+    await db.refresh(spool, ["version"])
+    if "filament_id" in data:
+        filament_geometry_cache.invalidate_spool(spool_id)
     await spool_changed(spool, EventType.UPDATED)
     return spool
 
@@ -565,15 +625,21 @@ async def update(
 async def delete(db: AsyncSession, spool_id: int) -> None:
     """Delete a spool object."""
     spool = await get_by_id(db, spool_id)
+    await usage_ledger.detach_spool_usage(db, spool_id)
     await db.delete(spool)
     # Commit before notifying so the deletion is durable and visible to subsequent
     # requests; post-commit notification must be the last, infallible step.
     await db.commit()
+    filament_geometry_cache.invalidate_spool(spool_id)
     await spool_changed(spool, EventType.DELETED)
 
 
 async def clear_extra_field(db: AsyncSession, key: str) -> None:
     """Delete all extra fields with a specific key."""
+    with_field = sqlalchemy.select(models.SpoolField.spool_id).where(models.SpoolField.key == key)
+    await db.execute(
+        sqlalchemy.update(models.Spool).where(models.Spool.id.in_(with_field)).values(version=models.Spool.version + 1),
+    )
     await db.execute(
         sqlalchemy.delete(models.SpoolField).where(models.SpoolField.key == key),
     )
@@ -589,7 +655,12 @@ async def use_weight_safe(db: AsyncSession, spool_id: int, weight: float) -> Non
         weight (float): Filament weight to consume, in grams
 
     """
-    await db.execute(
+    await db.execute(_use_weight_stmt(spool_id, weight))
+
+
+def _use_weight_stmt(spool_id: int, weight: float) -> sqlalchemy.Update:
+    """Build the UPDATE that adds a weight to the used weight of a spool, clamping it at zero."""
+    return (
         sqlalchemy.update(models.Spool)
         .where(models.Spool.id == spool_id)
         .values(
@@ -597,10 +668,90 @@ async def use_weight_safe(db: AsyncSession, spool_id: int, weight: float) -> Non
                 (models.Spool.used_weight + weight >= 0.0, models.Spool.used_weight + weight),
                 else_=0.0,  # Set used_weight to 0 if the result would be negative
             ),
-        ),
+            version=models.Spool.version + 1,
+        )
     )
 
 
+# Everything Spool.from_db reads, for loading a spool returned by UPDATE..RETURNING. A RETURNING
+# clause cannot be joined against, so the filament is selectin-loaded, and the options below it have
+# to be spelled out: the relationships' own lazy="selectin" is not applied under it.
+_USE_RETURNING_OPTIONS = (
+    selectinload(models.Spool.extra),
+    selectinload(models.Spool.filament).options(
+        selectinload(models.Filament.extra),
+        joinedload(models.Filament.vendor).selectinload(models.Vendor.extra),
+    ),
+)
+
+
+async def _use_weight_now(
+    db: AsyncSession,
+    spool_id: int,
+    weight: float,
+    source: str = usage_ledger.SOURCE_USE,
+) -> models.Spool:
+    """Consume filament from a spool by weight, setting first_used/last_used in the same UPDATE.
+
+    Where the dialect supports UPDATE..RETURNING (SQLite 3.35+, PostgreSQL, CockroachDB), the
+    updated spool row comes back from the UPDATE itself. Elsewhere (MySQL/MariaDB) it is read back
+    with one SELECT. Either way only the filament, vendor and extra fields are loaded after that.
+    """
+    now = datetime.utcnow().replace(microsecond=0)
+    change = weight
+    if weight < 0:
+        # Clamped at zero, so how much the used weight actually drops depends on what it was.
+        used_before = (
+            await db.execute(sqlalchemy.select(models.Spool.used_weight).where(models.Spool.id == spool_id))
+        ).scalar_one_or_none()
+        if used_before is None:
+            raise ItemNotFoundError(f"No spool with ID {spool_id} found.")
+        change = max(used_before + weight, 0) - used_before
+
+    stmt = _use_weight_stmt(spool_id, weight).values(
+        first_used=coalesce(models.Spool.first_used, now),
+        last_used=now,
+    )
+    if db.bind.dialect.update_returning:
+        result = await db.execute(
+            stmt.returning(models.Spool).options(*_USE_RETURNING_OPTIONS),
+            execution_options={"populate_existing": True},
+        )
+        spool = result.scalar_one_or_none()
+    else:
+        result = await db.execute(stmt)
+        spool = None
+        if result.rowcount > 0:
+            result = await db.execute(
+                sqlalchemy.select(models.Spool)
+                .where(models.Spool.id == spool_id)
+                .options(joinedload(models.Spool.filament).joinedload(models.Filament.vendor))
+                .execution_options(populate_existing=True),
+            )
+            spool = result.scalar_one()
+    if spool is None:
+        raise ItemNotFoundError(f"No spool with ID {spool_id} found.")
+    await db.execute(derived.refresh(models.Spool.id == spool_id))
+
+    await usage_ledger.record(
+        db,
+        [
+            UsageRecord(
+                spool_id=spool_id,
+                filament_id=spool.filament_id,
+                material=spool.filament.material,
+                location=spool.location,
+                weight=change,
+                time=now,
+                source=source,
+            ),
+        ],
+    )
+    await db.commit()
+    await spool_changed(spool, EventType.UPDATED)
+    return spool
+
+
 async def use_weight(db: AsyncSession, spool_id: int, weight: float) -> models.Spool:
     """Consume filament from a spool by weight.
 
@@ -616,15 +767,25 @@ async def use_weight(db: AsyncSession, spool_id: int, weight: float) -> models.S
         models.Spool: Updated spool object
 
     """
-    await use_weight_safe(db, spool_id, weight)
+    if usage_buffer.enabled and weight >= 0:
+        return await _use_weight_buffered(db, spool_id, weight)
+    await usage_buffer.flush()
+    return await _use_weight_now(db, spool_id, weight)
 
-    spool = await get_by_id(db, spool_id)
 
-    if spool.first_used is None:
-        spool.first_used = datetime.utcnow().replace(microsecond=0)
-    spool.last_used = datetime.utcnow().replace(microsecond=0)
+async def _use_weight_buffered(db: AsyncSession, spool_id: int, weight: float) -> models.Spool:
+    """Record usage in the usage buffer, and return the spool as it will be once that is written.
+
+    The spool is only read, never written: its used weight and timestamps are overlaid with the
+    pending usage as committed values, so the session has nothing to flush on commit.
+    """
+    async with usage_buffer.lock:
+        spool = await get_by_id(db, spool_id)
+        pending = usage_buffer.add(spool_id, weight, datetime.utcnow().replace(microsecond=0))
+        set_committed_value(spool, "used_weight", spool.used_weight + pending.weight)
+        set_committed_value(spool, "first_used", spool.first_used or pending.first_used)
+        set_committed_value(spool, "last_used", pending.last_used)
 
-    await db.commit()
     await spool_changed(spool, EventType.UPDATED)
     return spool
 
@@ -645,34 +806,139 @@ async def use_length(db: AsyncSession, spool_id: int, length: float) -> models.S
 
     """
     # Get filament diameter and density
-    result = await db.execute(
-        sqlalchemy.select(models.Filament.diameter, models.Filament.density)
-        .join(models.Spool, models.Spool.filament_id == models.Filament.id)
-        .where(models.Spool.id == spool_id),
-    )
-    try:
-        filament_info = result.one()
-    except NoResultFound as exc:
-        raise ItemNotFoundError("Filament not found for spool.") from exc
+    geometry = filament_geometry_cache.get(spool_id)
+    if geometry is None:
+        generation = filament_geometry_cache.generation
+        result = await db.execute(
+            sqlalchemy.select(models.Filament.id, models.Filament.diameter, models.Filament.density)
+            .join(models.Spool, models.Spool.filament_id == models.Filament.id)
+            .where(models.Spool.id == spool_id),
+        )
+        try:
+            filament_info = result.one()
+        except NoResultFound as exc:
+            raise ItemNotFoundError("Filament not found for spool.") from exc
+        geometry = FilamentGeometry(
+            filament_id=filament_info.id,
+            diameter=filament_info.diameter,
+            density=filament_info.density,
+        )
+        filament_geometry_cache.put(spool_id, geometry, generation)
 
     # Calculate and use weight
     weight = weight_from_length(
         length=length,
-        diameter=filament_info[0],
-        density=filament_info[1],
+        diameter=geometry.diameter,
+        density=geometry.density,
     )
-    await use_weight_safe(db, spool_id, weight)
+    if usage_buffer.enabled and weight >= 0:
+        return await _use_weight_buffered(db, spool_id, weight)
+    await usage_buffer.flush()
+    return await _use_weight_now(db, spool_id, weight)
 
-    # Get spool with new weight and update first_used and last_used
-    spool = await get_by_id(db, spool_id)
 
-    if spool.first_used is None:
-        spool.first_used = datetime.utcnow().replace(microsecond=0)
-    spool.last_used = datetime.utcnow().replace(microsecond=0)
+@dataclass
+class SpoolUsage:
+    """One entry of a batch usage report: filament consumed from one spool, by weight or by length."""
+
+    spool_id: int
+    weight: float | None = None
+    length: float | None = None
+
+
+async def use_batch(db: AsyncSession, usages: Sequence[SpoolUsage]) -> list[models.Spool]:
+    """Consume filament from several spools in one transaction.
+
+    Made for multi-material printers, which report every slot at once: calling use_weight/use_length
+    per slot costs each slot its own filament lookup, spool reload and commit. Here the filament
+    geometry of every spool is read in one query, each entry is applied with use_weight_safe in the
+    order given (so the result is identical to the same calls made one by one, clamping included),
+    the timestamps of all touched spools are set in one UPDATE, and everything is committed once.
+
+    Nothing is written unless every spool exists.
+
+    Args:
+        db (AsyncSession): Database session
+        usages (Sequence[SpoolUsage]): The usage entries, each with either a weight or a length set
+
+    Returns:
+        list[models.Spool]: The updated spools, once each, in the order they first appear in `usages`
+
+    """
+    spool_ids = list(dict.fromkeys(usage.spool_id for usage in usages))
+    if not spool_ids:
+        return []
+
+    await usage_buffer.flush()
+
+    # Diameter and density are only needed for the length entries, but reading them for every spool
+    # costs nothing extra and doubles as the existence check for the whole batch.
+    result = await db.execute(
+        sqlalchemy.select(
+            models.Spool.id,
+            models.Spool.filament_id,
+            models.Spool.location,
+            models.Spool.used_weight,
+            models.Filament.material,
+            models.Filament.diameter,
+            models.Filament.density,
+        )
+        .join(models.Filament, models.Spool.filament_id == models.Filament.id)
+        .where(models.Spool.id.in_(spool_ids)),
+    )
+    spool_rows = {row.id: row for row in result.all()}
+    missing = [spool_id for spool_id in spool_ids if spool_id not in spool_rows]
+    if missing:
+        raise ItemNotFoundError(f"No spool with ID {missing[0]} found.")
+
+    now = datetime.utcnow().replace(microsecond=0)
+    # Tracked alongside the UPDATEs, to know how much each entry changed once clamped at zero.
+    used = {spool_id: row.used_weight for spool_id, row in spool_rows.items()}
+    records = []
+    for usage in usages:
+        row = spool_rows[usage.spool_id]
+        weight = usage.weight
+        if weight is None:
+            if usage.length is None:
+                raise ValueError(f"No weight or length given for spool {usage.spool_id}.")
+            weight = weight_from_length(length=usage.length, diameter=row.diameter, density=row.density)
+        await use_weight_safe(db, usage.spool_id, weight)
+
+        used_after = max(used[usage.spool_id] + weight, 0)
+        records.append(
+            UsageRecord(
+                spool_id=usage.spool_id,
+                filament_id=row.filament_id,
+                material=row.material,
+                location=row.location,
+                weight=used_after - used[usage.spool_id],
+                time=now,
+                source=usage_ledger.SOURCE_USE,
+            ),
+        )
+        used[usage.spool_id] = used_after
+    await usage_ledger.record(db, records)
+
+    await db.execute(
+        sqlalchemy.update(models.Spool)
+        .where(models.Spool.id.in_(spool_ids))
+        .values(first_used=coalesce(models.Spool.first_used, now), last_used=now),
+    )
+    await db.execute(derived.refresh(models.Spool.id.in_(spool_ids)))
+
+    rows = await db.execute(
+        sqlalchemy.select(models.Spool)
+        .where(models.Spool.id.in_(spool_ids))
+        .options(joinedload(models.Spool.filament).joinedload(models.Filament.vendor)),
+        execution_options={"populate_existing": True},
+    )
+    spools = {item.id: item for item in rows.unique().scalars().all()}
 
     await db.commit()
-    await spool_changed(spool, EventType.UPDATED)
-    return spool
+    # One event per spool, however many entries it had in the batch.
+    for spool_id in spool_ids:
+        await spool_changed(spools[spool_id], EventType.UPDATED)
+    return [spools[spool_id] for spool_id in spool_ids]
 
 
 async def measure(db: AsyncSession, spool_id: int, weight: float) -> models.Spool:
@@ -690,6 +956,8 @@ async def measure(db: AsyncSession, spool_id: int, weight: float) -> models.Spoo
         models.Spool: Updated spool object
 
     """
+    # The measurement is compared against the used weight, so that has to include all usage so far.
+    await usage_buffer.flush()
     spool_result = await db.execute(
         sqlalchemy.select(models.Spool.initial_weight, models.Spool.used_weight, models.Spool.spool_weight).where(
             models.Spool.id == spool_id,
@@ -747,7 +1015,9 @@ async def measure(db: AsyncSession, spool_id: int, weight: float) -> models.Spoo
     if (initial_gross_weight - weight_to_use) < spool_weight:
         weight_to_use = current_use - spool_weight
 
-    return await use_weight(db, spool_id, weight_to_use)
+    # Written straight away even when usage is buffered, to keep it apart from the usage reports in
+    # the ledger. Pending usage has been flushed above, so nothing is reordered by skipping the buffer.
+    return await _use_weight_now(db, spool_id, weight_to_use, source=usage_ledger.SOURCE_MEASURE)
 
 
 async def find_locations(
@@ -789,11 +1059,16 @@ async def spool_changed(spool: models.Spool, typ: EventType) -> None:
 
 async def reset_initial_weight(db: AsyncSession, spool_id: int, weight: float) -> models.Spool:
     """Reset inital weight to new weight and used_weight to 0."""
+    await usage_buffer.flush()
     spool = await get_by_id(db, spool_id)
 
     spool.initial_weight = weight
     spool.used_weight = 0
+    bump_version(spool)
+    await db.flush()
+    await db.execute(derived.refresh(models.Spool.id == spool_id))
     await db.commit()
+    await db.refresh(spool, ["version"])
     await spool_changed(spool, EventType.UPDATED)
     return spool
 
@@ -806,7 +1081,9 @@ async def rename_location(
 ) -> None:
     """Rename all spools with the current location name to the new name."""
     await db.execute(
-        sqlalchemy.update(models.Spool).where(models.Spool.location == current_name).values(location=new_name),
+        sqlalchemy.update(models.Spool)
+        .where(models.Spool.location == current_name)
+        .values(location=new_name, version=models.Spool.version + 1),
     )
     await db.commit()
 
@@ -840,20 +1117,24 @@ async def rename_field_value(
     if field == "location":
         if len(new_value) > LOCATION_MAX_LENGTH:
             raise ValueError(f"A location can be at most {LOCATION_MAX_LENGTH} characters.")
-        stmt = sqlalchemy.update(models.Spool).where(models.Spool.location == value).values(location=new_value)
+        stmt = (
+            sqlalchemy.update(models.Spool)
+            .where(models.Spool.location == value)
+            .values(location=new_value, version=models.Spool.version + 1)
+        )
     elif field.startswith(EXTRA_FIELD_PREFIX):
         field_key = _extra_field_key(await get_extra_fields(db, EntityType.spool), field)
         # Match on the DB-decoded scalar, so which JSON encoding wrote the value doesn't matter;
         # store the new one the way the rest of the API does.
+        matches = sqlalchemy.and_(models.SpoolField.key == field_key, extra_field_text_equals(models.SpoolField, value))
+        await db.execute(
+            sqlalchemy.update(models.Spool)
+            .where(models.Spool.id.in_(sqlalchemy.select(models.SpoolField.spool_id).where(matches)))
+            .values(version=models.Spool.version + 1),
+        )
+        new_json = json.dumps(new_value, ensure_ascii=False)
         stmt = (
-            sqlalchemy.update(models.SpoolField)
-            .where(
-                sqlalchemy.and_(
-                    models.SpoolField.key == field_key,
-                    extra_field_value_text(models.SpoolField.value) == value,
-                ),
-            )
-            .values(value=json.dumps(new_value, ensure_ascii=False))
+            sqlalchemy.update(models.SpoolField).where(matches).values(value=new_json, **models.field_values(new_json))
         )
     else:
         raise ValueError(
@@ -0,0 +1,291 @@
+"""Sparse fieldsets of the spool search: reading only the fields of the spools a client asks for.
+
+An integration like a label printer or a printer macro only needs a few fields of each spool, e.g.
+id, remaining_weight and location. It names them in the fields parameter, and each of them maps to
+the columns it is computed from. The search then selects just those columns, as plain rows,
+instead of loading spool objects along with their filaments, vendors and extra fields, and the
+fields are computed from the rows with the same functions that Spool.from_db and Filament.from_db
+use. Extra fields are read with one query per entity, and only if asked for.
+
+The fields that are a column as is mirror Spool.from_db, Filament.from_db and Vendor.from_db, and
+have to be kept in step with them; the integration test test_find_fields checks that they are.
+"""
+
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+import sqlalchemy
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import attributes
+
+from spoolman.api.v1.models import datetime_to_str
+from spoolman.colors import sanitize_color_hex, sanitize_multi_color_hexes
+from spoolman.database import models
+from spoolman.math import length_from_weight, remaining_length, remaining_weight
+
+Column = attributes.InstrumentedAttribute[Any]
+
+# How many IDs the extra fields are read for per query, to stay below the bound parameter limits.
+EXTRA_FIELD_CHUNK_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class SparseField:
+    """A field of a spool as sent, and how to compute it from the columns it needs."""
+
+    columns: tuple[Column, ...]
+    # Gets the values of the columns. Without it, the field is the value of its single column.
+    compute: Callable[..., Any] | None = None
+
+
+def _column(column: Column) -> SparseField:
+    return SparseField((column,))
+
+
+def _datetime(column: Column) -> SparseField:
+    return SparseField((column,), lambda value: datetime_to_str(value) if value is not None else None)
+
+
+_VENDOR_FIELDS = {
+    "id": _column(models.Vendor.id),
+    "registered": _datetime(models.Vendor.registered),
+    "name": _column(models.Vendor.name),
+    "comment": _column(models.Vendor.comment),
+    "empty_spool_weight": _column(models.Vendor.empty_spool_weight),
+    "external_id": _column(models.Vendor.external_id),
+}
+
+_FILAMENT_FIELDS = {
+    "id": _column(models.Filament.id),
+    "registered": _datetime(models.Filament.registered),
+    "name": _column(models.Filament.name),
+    "material": _column(models.Filament.material),
+    "price": _column(models.Filament.price),
+    "density": _column(models.Filament.density),
+    "diameter": _column(models.Filament.diameter),
+    "weight": _column(models.Filament.weight),
+    "spool_weight": _column(models.Filament.spool_weight),
+    "article_number": _column(models.Filament.article_number),
+    "comment": _column(models.Filament.comment),
+    "settings_extruder_temp": _column(models.Filament.settings_extruder_temp),
+    "settings_bed_temp": _column(models.Filament.settings_bed_temp),
+    "color_hex": SparseField((models.Filament.color_hex,), sanitize_color_hex),
+    "multi_color_hexes": SparseField((models.Filament.multi_color_hexes,), sanitize_multi_color_hexes),
+    "multi_color_direction": _column(models.Filament.multi_color_direction),
+    "external_id": _column(models.Filament.external_id),
+}
+
+_SPOOL_FIELDS = {
+    "id": _column(models.Spool.id),
+    "registered": _datetime(models.Spool.registered),
+    "first_used": _datetime(models.Spool.first_used),
+    "last_used": _datetime(models.Spool.last_used),
+    "price": _column(models.Spool.price),
+    "initial_weight": _column(models.Spool.initial_weight),
+    "spool_weight": _column(models.Spool.spool_weight),
+    "used_weight": _column(models.Spool.used_weight),
+    "used_length": SparseField(
+        (models.Spool.used_weight, models.Filament.density, models.Filament.diameter),
+        lambda used_weight, density, diameter: length_from_weight(
+            weight=used_weight,
+            density=density,
+            diameter=diameter,
+        ),
+    ),
+    "remaining_weight": SparseField(
+        (models.Spool.initial_weight, models.Filament.weight, models.Spool.used_weight),
+        lambda initial_weight, filament_weight, used_weight: remaining_weight(
+            initial_weight=initial_weight,
+            filament_weight=filament_weight,
+            used_weight=used_weight,
+        ),
+    ),
+    "remaining_length": SparseField(
+        (
+            models.Spool.initial_weight,
+            models.Filament.weight,
+            models.Spool.used_weight,
+            models.Filament.density,
+            models.Filament.diameter,
+        ),
+        lambda initial_weight, filament_weight, used_weight, density, diameter: remaining_length(
+            initial_weight=initial_weight,
+            filament_weight=filament_weight,
+            used_weight=used_weight,
+            density=density,
+            diameter=diameter,
+        ),
+    ),
+    "location": _column(models.Spool.location),
+    "lot_nr": _column(models.Spool.lot_nr),
+    "comment": _column(models.Spool.comment),
+    "archived": SparseField((models.Spool.archived,), lambda archived: archived if archived is not None else False),
+}
+
+# Every field that can be asked for, by its path in the spool as sent.
+FIELDS: dict[str, SparseField] = {
+    **_SPOOL_FIELDS,
+    **{f"filament.{name}": sparse_field for name, sparse_field in _FILAMENT_FIELDS.items()},
+    **{f"filament.vendor.{name}": sparse_field for name, sparse_field in _VENDOR_FIELDS.items()},
+}
+
+
+@dataclass(frozen=True)
+class ExtraFieldGroup:
+    """The extra fields of one of the entities of a spool, and where to read them from."""
+
+    owner_id: Column
+    field_owner_id: Column
+    field_model: type[models.SpoolField | models.FilamentField | models.VendorField]
+
+
+# The extra fields of the spool, its filament and its vendor, by their path in the spool as sent.
+EXTRA_FIELD_GROUPS = {
+    "extra": ExtraFieldGroup(models.Spool.id, models.SpoolField.spool_id, models.SpoolField),
+    "filament.extra": ExtraFieldGroup(models.Filament.id, models.FilamentField.filament_id, models.FilamentField),
+    "filament.vendor.extra": ExtraFieldGroup(models.Vendor.id, models.VendorField.vendor_id, models.VendorField),
+}
+
+# The nested objects of a spool, which stand for all of their fields.
+_OBJECTS = ("filament.vendor", "filament")
+
+
+@dataclass
+class SparseFieldset:
+    """The fields of the spools a client asked for, and the columns to select for them."""
+
+    # The positions among the columns that each field is computed from, by path.
+    fields: dict[str, list[int]] = field(default_factory=dict)
+    # The extra fields asked for by group, or None for all of them.
+    extra_fields: dict[str, set[str] | None] = field(default_factory=dict)
+    # Starts with the spool ID, which the search needs to page.
+    columns: list[Column] = field(default_factory=lambda: [models.Spool.id])
+
+    def _position(self, column: Column) -> int:
+        """Get the position of a column among the selected ones, adding it if it isn't yet."""
+        for position, selected in enumerate(self.columns):
+            if selected is column:
+                return position
+        self.columns.append(column)
+        return len(self.columns) - 1
+
+    def _add_field(self, path: str) -> None:
+        if path not in self.fields:
+            self.fields[path] = [self._position(column) for column in FIELDS[path].columns]
+
+    def _add_extra_fields(self, group: str, key: str | None) -> None:
+        self._position(EXTRA_FIELD_GROUPS[group].owner_id)
+        keys = self.extra_fields.get(group, set())
+        if keys is None or key is None:
+            self.extra_fields[group] = None
+        else:
+            self.extra_fields[group] = keys | {key}
+
+    def add(self, path: str) -> None:
+        """Add a field by its path in the spool as sent.
+
+        Raises:
+            ValueError: If there is no such field.
+
+        """
+        if path in FIELDS:
+            self._add_field(path)
+            return
+        if path in _OBJECTS:
+            for name in FIELDS:
+                if name.startswith(f"{path}."):
+                    self._add_field(name)
+            for group in EXTRA_FIELD_GROUPS:
+                if group.startswith(f"{path}."):
+                    self._add_extra_fields(group, None)
+            return
+        for group in EXTRA_FIELD_GROUPS:
+            if path == group:
+                self._add_extra_fields(group, None)
+                return
+            key = path.removeprefix(f"{group}.")
+            if key not in (path, ""):
+                self._add_extra_fields(group, key)
+                return
+        raise ValueError(f"Unknown field: {path}")
+
+    async def to_dicts(self, db: AsyncSession, rows: Sequence[sqlalchemy.Row[Any]]) -> list[dict[str, Any]]:
+        """Compute the fields of the spools from the rows of the selected columns.
+
+        Like the spools as sent, a field without a value is left out.
+        """
+        computations = [(path.split("."), positions, FIELDS[path].compute) for path, positions in self.fields.items()]
+
+        extra_values: list[tuple[list[str], int, dict[Any, dict[str, str]], set[str] | None]] = []
+        for group, keys in self.extra_fields.items():
+            position = self._position(EXTRA_FIELD_GROUPS[group].owner_id)
+            owner_ids = {row[position] for row in rows if row[position] is not None}
+            values = await _read_extra_fields(db, EXTRA_FIELD_GROUPS[group], owner_ids, keys)
+            extra_values.append((group.split("."), position, values, keys))
+
+        result = []
+        for row in rows:
+            item: dict[str, Any] = {}
+            for path, positions, compute in computations:
+                values = [row[position] for position in positions]
+                value = compute(*values) if compute is not None else values[0]
+                if value is not None:
+                    _set(item, path, value)
+            for path, position, values, keys in extra_values:
+                owner_id = row[position]
+                if owner_id is None:
+                    continue
+                extra = values.get(owner_id, {})
+                # All of the extra fields are there even if there are none, like in the spools as sent.
+                if keys is None or extra:
+                    _set(item, path, extra)
+            result.append(item)
+        return result
+
+
+def _set(item: dict[str, Any], path: list[str], value: Any) -> None:  # noqa: ANN401
+    """Set a value at a path of nested dicts, adding the dicts along the way."""
+    for name in path[:-1]:
+        item = item.setdefault(name, {})
+    item[path[-1]] = value
+
+
+async def _read_extra_fields(
+    db: AsyncSession,
+    group: ExtraFieldGroup,
+    owner_ids: set[Any],
+    keys: set[str] | None,
+) -> dict[Any, dict[str, str]]:
+    """Read the extra fields of the given entities, by entity ID and key."""
+    values: dict[Any, dict[str, str]] = {}
+    ids = sorted(owner_ids)
+    for start in range(0, len(ids), EXTRA_FIELD_CHUNK_SIZE):
+        stmt = sqlalchemy.select(group.field_owner_id, group.field_model.key, group.field_model.value).where(
+            group.field_owner_id.in_(ids[start : start + EXTRA_FIELD_CHUNK_SIZE]),
+        )
+        if keys is not None:
+            stmt = stmt.where(group.field_model.key.in_(sorted(keys)))
+        for owner_id, key, value in await db.execute(stmt):
+            values.setdefault(owner_id, {})[key] = value
+    return values
+
+
+def parse_fields(fields: str) -> SparseFieldset:
+    """Parse a comma-separated list of the fields of a spool.
+
+    A field is named by its path in the spool as sent, e.g. remaining_weight or filament.vendor.name,
+    and an extra field by its key, e.g. extra.shelf. A nested object, like filament, stands for all
+    of its fields, and extra for all of the extra fields.
+
+    Raises:
+        ValueError: If a field is unknown, or none is given.
+
+    """
+    fieldset = SparseFieldset()
+    for path in fields.split(","):
+        if path.strip():
+            fieldset.add(path.strip())
+    if not fieldset.fields and not fieldset.extra_fields:
+        raise ValueError("No fields given.")
+    return fieldset
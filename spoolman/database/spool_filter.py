@@ -0,0 +1,267 @@
+"""In-memory evaluation of the spool search filters.
+
+Filtered websocket subscriptions have to know, for every spool event, which of the active filters
+the spool matches. Asking the database would cost a query per filter per usage report, so the
+filters of the spool search are evaluated here, against the spool as it is sent, instead. This
+mirrors _apply_spool_filters and _parse_field_filter, and has to be kept in step with them.
+The database is only asked once per subscription, for the spools that match when it starts.
+"""
+
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from spoolman.api.v1.models import CountMode, Spool
+from spoolman.database import models, spool
+from spoolman.database.extra_field_query import parse_boolean_filter
+from spoolman.database.utils import parse_datetime_filter_bound, split_datetime_range_filter
+from spoolman.extra_field_registry import EntityType, ExtraField, ExtraFieldType, get_extra_fields
+
+
+def _matches_str(value: str | None, value_filter: str, *, optional: bool) -> bool:
+    """Match a string the way add_where_clause_str(_opt) does."""
+    for value_part in value_filter.split(","):
+        if len(value_part) == 0:
+            if value == "" or (optional and value is None):
+                return True
+        elif value is None:
+            continue
+        elif value_part[0] == '"' and value_part[-1] == '"':
+            if value == value_part[1:-1]:
+                return True
+        elif value_part.lower() in value.lower():
+            return True
+    return False
+
+
+def _utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(tz=timezone.utc).replace(tzinfo=None)
+
+
+def _matches_datetime(value: datetime | None, value_filter: str, field_name: str) -> bool:
+    """Match a datetime the way add_where_clause_datetime_opt does."""
+    for raw_part in value_filter.split(","):
+        if len(raw_part) == 0:
+            if value is None:
+                return True
+            continue
+        if value is None:
+            continue
+
+        value_part = raw_part[1:-1] if len(raw_part) > 1 and raw_part[0] == '"' == raw_part[-1] else raw_part
+        stored = _utc_naive(value)
+        ends = split_datetime_range_filter(value_part, field_name)
+        if ends is None:
+            if stored == parse_datetime_filter_bound(value_part, field_name):
+                return True
+            continue
+
+        start_str, end_str = ends
+        if (not start_str or stored >= parse_datetime_filter_bound(start_str, field_name)) and (
+            not end_str or stored <= parse_datetime_filter_bound(end_str, field_name)
+        ):
+            return True
+    return False
+
+
+def _parse_bounds(value: str, converter: type, kind: str, field_key: str) -> tuple[Any, Any]:
+    """Parse a `<min>:<max>` filter value, either end of which may be empty."""
+    min_str, _, max_str = value.partition(":")
+    try:
+        bounds = (converter(min_str) if min_str else None, converter(max_str) if max_str else None)
+    except ValueError as exc:
+        raise ValueError(f"Invalid {kind} range filter value for '{field_key}': {value}") from exc
+    if bounds == (None, None):
+        raise ValueError(f"Invalid {kind} range filter value for '{field_key}': {value}")
+    return bounds
+
+
+def _within(number: object, bounds: tuple[Any, Any]) -> bool:
+    if not isinstance(number, int | float) or isinstance(number, bool):
+        return False
+    return (bounds[0] is None or number >= bounds[0]) and (bounds[1] is None or number <= bounds[1])
+
+
+def _matches_extra_field_part(raw: str | None, extra_field: ExtraField, value_part: str) -> bool:  # noqa: C901, PLR0911, PLR0912
+    """Match one comma-separated part of an extra field filter against the stored JSON value."""
+    field_type = extra_field.field_type
+    if len(value_part) == 0:
+        return raw in (None, "null", json.dumps("")) or (
+            field_type == ExtraFieldType.boolean and raw == json.dumps(obj=False)
+        )
+    if raw is None:
+        return False
+
+    exact_match = value_part.startswith('"') and value_part.endswith('"')
+    parsed_value = value_part[1:-1] if exact_match else value_part
+    try:
+        stored = json.loads(raw)
+    except ValueError:
+        return False
+
+    if field_type == ExtraFieldType.text:
+        if not isinstance(stored, str):
+            return False
+        return stored == parsed_value if exact_match else parsed_value.lower() in stored.lower()
+    if field_type in (ExtraFieldType.integer, ExtraFieldType.float):
+        converter = int if field_type == ExtraFieldType.integer else float
+        if ":" in parsed_value:
+            return _within(stored, _parse_bounds(parsed_value, converter, field_type.value, extra_field.key))
+        try:
+            target = converter(parsed_value)
+        except ValueError as exc:
+            raise ValueError(
+                f"Invalid {field_type.value} filter value for '{extra_field.key}': {parsed_value}",
+            ) from exc
+        return _within(stored, (target, target))
+    if field_type == ExtraFieldType.boolean:
+        return stored is parse_boolean_filter(parsed_value)
+    if field_type == ExtraFieldType.choice:
+        if extra_field.multi_choice:
+            return isinstance(stored, list) and parsed_value in stored
+        return stored == parsed_value
+    if field_type == ExtraFieldType.datetime:
+        # Compared as ISO 8601 strings, like the SQL does, see _value_condition.
+        if not isinstance(stored, str):
+            return False
+        ends = split_datetime_range_filter(parsed_value, extra_field.key)
+        if ends is None:
+            return stored == parsed_value
+        start_str, end_str = ends
+        return (not start_str or stored >= start_str) and (not end_str or stored <= end_str)
+    if field_type in (ExtraFieldType.integer_range, ExtraFieldType.float_range):
+        if ":" not in parsed_value:
+            raise ValueError(
+                f"Invalid range filter value for '{extra_field.key}': {parsed_value}. Expected '<min>:<max>'.",
+            )
+        converter = int if field_type == ExtraFieldType.integer_range else float
+        kind = "integer" if field_type == ExtraFieldType.integer_range else "float"
+        min_value, max_value = _parse_bounds(parsed_value, converter, kind, extra_field.key)
+        if not isinstance(stored, list) or len(stored) != 2:  # noqa: PLR2004
+            return False
+        return _within(stored[0], (min_value, None)) and _within(stored[1], (None, max_value))
+    raise ValueError(f"Unsupported extra field type for '{extra_field.key}': {field_type}")
+
+
+def _matches_extra_fields(
+    values: dict[str, str],
+    filters: tuple[tuple[str, str], ...],
+    fields: dict[str, ExtraField],
+) -> bool:
+    for field_key, value in filters:
+        extra_field = fields.get(field_key)
+        if extra_field is None:
+            # Unknown fields are ignored by the search as well.
+            continue
+        if not any(_matches_extra_field_part(values.get(field_key), extra_field, part) for part in value.split(",")):
+            return False
+    return True
+
+
+@dataclass(unsafe_hash=True)
+class SpoolFilter:
+    """The filters of a spool search, as passed to spool.find.
+
+    Two subscriptions with equal filters share one evaluation per event, so only the filters
+    themselves take part in comparisons, not the extra field definitions loaded for them.
+    """
+
+    filament_name: str | None = None
+    filament_id: tuple[int, ...] | None = None
+    filament_material: str | None = None
+    filament_multi_color_direction: str | None = None
+    vendor_name: str | None = None
+    vendor_id: tuple[int, ...] | None = None
+    location: str | None = None
+    lot_nr: str | None = None
+    allow_archived: bool = False
+    first_used: str | None = None
+    last_used: str | None = None
+    registered: str | None = None
+    extra_field_filters: tuple[tuple[str, str], ...] = ()
+    filament_extra_field_filters: tuple[tuple[str, str], ...] = ()
+    vendor_extra_field_filters: tuple[tuple[str, str], ...] = ()
+    extra_fields: dict[EntityType, dict[str, ExtraField]] = field(default_factory=dict, compare=False)
+
+    async def find_ids(self, db: AsyncSession) -> set[str]:
+        """Get the IDs of the spools that match now, and load the extra field definitions to match against.
+
+        Raises:
+            ValueError: If the filter is invalid, the same as the spool search would.
+
+        """
+        rows, _, _ = await spool.find(
+            db=db,
+            filament_name=self.filament_name,
+            filament_id=self.filament_id,
+            filament_material=self.filament_material,
+            filament_multi_color_direction=self.filament_multi_color_direction,
+            vendor_name=self.vendor_name,
+            vendor_id=self.vendor_id,
+            location=self.location,
+            lot_nr=self.lot_nr,
+            allow_archived=self.allow_archived,
+            first_used=self.first_used,
+            last_used=self.last_used,
+            registered=self.registered,
+            extra_field_filters=dict(self.extra_field_filters) or None,
+            filament_extra_field_filters=dict(self.filament_extra_field_filters) or None,
+            vendor_extra_field_filters=dict(self.vendor_extra_field_filters) or None,
+            count=CountMode.NONE,
+            columns=(models.Spool.id,),
+        )
+        for entity_type in EntityType:
+            self.extra_fields[entity_type] = {
+                extra_field.key: extra_field for extra_field in await get_extra_fields(db, entity_type)
+            }
+        return {str(row[0]) for row in rows}
+
+    def matches(self, item: Spool) -> bool:
+        """Check whether a spool matches the filter."""
+        filament = item.filament
+        vendor = filament.vendor
+        if self.filament_id is not None and filament.id not in self.filament_id:
+            return False
+        if self.vendor_id is not None and (vendor.id if vendor is not None else -1) not in self.vendor_id:
+            return False
+        if not self.allow_archived and item.archived:
+            return False
+
+        direction = filament.multi_color_direction.value if filament.multi_color_direction is not None else None
+        for value, value_filter, optional in (
+            (vendor.name if vendor is not None else None, self.vendor_name, False),
+            (filament.name, self.filament_name, True),
+            (filament.material, self.filament_material, True),
+            (direction, self.filament_multi_color_direction, True),
+            (item.location, self.location, True),
+            (item.lot_nr, self.lot_nr, True),
+        ):
+            if value_filter is not None and not _matches_str(value, value_filter, optional=optional):
+                return False
+
+        for value, value_filter, field_name in (
+            (item.first_used, self.first_used, "first_used"),
+            (item.last_used, self.last_used, "last_used"),
+            (item.registered, self.registered, "registered"),
+        ):
+            if value_filter is not None and not _matches_datetime(value, value_filter, field_name):
+                return False
+
+        return (
+            _matches_extra_fields(item.extra, self.extra_field_filters, self.extra_fields.get(EntityType.spool, {}))
+            and _matches_extra_fields(
+                filament.extra,
+                self.filament_extra_field_filters,
+                self.extra_fields.get(EntityType.filament, {}),
+            )
+            and _matches_extra_fields(
+                vendor.extra if vendor is not None else {},
+                self.vendor_extra_field_filters,
+                self.extra_fields.get(EntityType.vendor, {}),
+            )
+        )
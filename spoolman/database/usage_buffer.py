@@ -0,0 +1,182 @@
+"""Write-behind buffering of filament usage reports.
+
+Printer integrations report usage every few seconds per printer, and each report used to be its
+own write transaction. With SPOOLMAN_USAGE_FLUSH_INTERVAL set, the reports are instead summed per
+spool in memory and written in one batched UPDATE per interval, or earlier once
+SPOOLMAN_USAGE_FLUSH_MAX_PENDING reports are waiting. On SQLite, where every write takes the
+database-wide lock, that is the difference between hundreds of short write transactions and one.
+
+The buffer is process-local. Pending usage is flushed on shutdown, and before any other write that
+reads or overwrites a spool's used weight, so those never act on a stale value. Each flush adds one
+entry per spool to the usage ledger, timestamped with the last report it sums.
+"""
+
+import asyncio
+import contextlib
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+
+import sqlalchemy
+from sqlalchemy.sql.functions import coalesce
+
+from spoolman import env
+from spoolman.database import derived, models, usage_ledger
+from spoolman.database.database import get_db_session
+from spoolman.database.usage_ledger import UsageRecord
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingUsage:
+    """Usage of one spool that has been reported but not yet written."""
+
+    weight: float
+    first_used: datetime
+    last_used: datetime
+
+
+class UsageBuffer:
+    """Accumulates usage per spool and writes it in batches."""
+
+    def __init__(self, interval_ms: int, max_pending: int) -> None:
+        """Initialize. An interval of 0 disables buffering."""
+        self.interval_ms = interval_ms
+        self.max_pending = max_pending
+        self.pending: dict[int, PendingUsage] = {}
+        self.pending_reports = 0
+        # Held while the pending usage is written, and by readers that combine the database state
+        # with the pending usage, so that a report is never counted twice or not at all.
+        self.lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def enabled(self) -> bool:
+        """Whether usage is buffered, rather than written immediately."""
+        return self.interval_ms > 0
+
+    def add(self, spool_id: int, weight: float, now: datetime) -> PendingUsage:
+        """Record usage of a spool, returning everything that is now pending for it.
+
+        Only non-negative weights may be buffered. Summing is only equivalent to applying the
+        reports one by one while nothing gets clamped at zero, which a negative weight can cause.
+        """
+        if weight < 0:
+            raise ValueError("Only non-negative usage can be buffered.")
+        pending = self.pending.get(spool_id)
+        if pending is None:
+            pending = PendingUsage(weight=weight, first_used=now, last_used=now)
+            self.pending[spool_id] = pending
+        else:
+            pending.weight += weight
+            pending.last_used = now
+        self.pending_reports += 1
+        if self.pending_reports >= self.max_pending:
+            self._wake.set()
+        return pending
+
+    async def flush(self) -> None:
+        """Write all pending usage to the database in one transaction."""
+        async with self.lock:
+            if not self.pending:
+                return
+            pending, reports = self.pending, self.pending_reports
+            self.pending = {}
+            self.pending_reports = 0
+
+            spool = models.Spool.__table__
+            stmt = (
+                sqlalchemy.update(spool)
+                .where(spool.c.id == sqlalchemy.bindparam("b_spool_id"))
+                .values(
+                    used_weight=spool.c.used_weight + sqlalchemy.bindparam("b_weight", type_=sqlalchemy.Float),
+                    first_used=coalesce(
+                        spool.c.first_used,
+                        sqlalchemy.bindparam("b_first_used", type_=sqlalchemy.DateTime),
+                    ),
+                    last_used=sqlalchemy.bindparam("b_last_used", type_=sqlalchemy.DateTime),
+                    version=spool.c.version + 1,
+                )
+            )
+            params = [
+                {
+                    "b_spool_id": spool_id,
+                    "b_weight": usage.weight,
+                    "b_first_used": usage.first_used,
+                    "b_last_used": usage.last_used,
+                }
+                for spool_id, usage in pending.items()
+            ]
+            try:
+                async for db in get_db_session():
+                    await db.execute(stmt, params)
+                    await db.execute(derived.refresh(spool.c.id.in_(pending)))
+                    # The spools the usage was added to, which excludes any deleted in the meantime.
+                    filament = models.Filament.__table__
+                    spools = {
+                        row.id: row
+                        for row in await db.execute(
+                            sqlalchemy.select(spool.c.id, spool.c.filament_id, spool.c.location, filament.c.material)
+                            .join(filament, spool.c.filament_id == filament.c.id)
+                            .where(spool.c.id.in_(pending)),
+                        )
+                    }
+                    await usage_ledger.record(
+                        db,
+                        [
+                            UsageRecord(
+                                spool_id=spool_id,
+                                filament_id=spools[spool_id].filament_id,
+                                material=spools[spool_id].material,
+                                location=spools[spool_id].location,
+                                weight=usage.weight,
+                                time=usage.last_used,
+                                source=usage_ledger.SOURCE_USE,
+                            )
+                            for spool_id, usage in pending.items()
+                            if spool_id in spools
+                        ],
+                    )
+            except Exception:
+                # Keep the usage for the next attempt rather than losing it.
+                for spool_id, usage in pending.items():
+                    newer = self.pending.get(spool_id)
+                    if newer is not None:
+                        usage.weight += newer.weight
+                        usage.last_used = newer.last_used
+                    self.pending[spool_id] = usage
+                self.pending_reports += reports
+                raise
+            logger.debug("Flushed pending usage of %d spools.", len(params))
+
+    async def _run(self) -> None:
+        """Flush periodically, or as soon as too many reports are pending."""
+        while True:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval_ms / 1000)
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to write pending filament usage, will retry.")
+
+    def start(self) -> None:
+        """Start the background flushing, if buffering is enabled."""
+        if not self.enabled or self._task is not None:
+            return
+        logger.info("Buffering filament usage, writing it every %d ms.", self.interval_ms)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background flushing and write whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.flush()
+
+
+usage_buffer = UsageBuffer(env.get_usage_flush_interval(), env.get_usage_flush_max_pending())
@@ -0,0 +1,263 @@
+"""Helper functions for the filament usage ledger.
+
+Every change in a spool's used weight that comes from a usage report or a measurement is appended to
+the spool_usage table, and added to per-hour and per-day totals in spool_usage_hourly and
+spool_usage_daily in the same transaction. A consumption query over a time range then reads whole
+days from the daily totals and whole hours from the hourly totals, and only the partial hours at
+either end of the range from the ledger itself.
+
+Each entry stores the material and location the spool had when it was used, so editing or deleting
+the spool or filament later does not change past totals. When a spool or filament is deleted, its
+ledger entries keep their weight but lose the ID, and its rollup totals are merged into those of ID
+0, which no spool or filament ever has. The ID cannot stay, as SQLite hands the ID of the most
+recently deleted row to the next one added. The rollups key on material and location too, with
+empty strings for unset, since a primary key cannot hold nulls.
+"""
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Literal
+
+import sqlalchemy
+from sqlalchemy import func
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from spoolman.database import models
+
+SOURCE_USE = "use"
+SOURCE_MEASURE = "measure"
+
+UsageGroupBy = Literal["spool", "filament", "material", "location"]
+
+DELETED_ID = 0
+UNSET = ""
+
+_ROLLUPS = {
+    "hour": models.SpoolUsageHourly,
+    "day": models.SpoolUsageDaily,
+}
+
+
+@dataclass
+class UsageRecord:
+    """A change in the used weight of one spool."""
+
+    spool_id: int
+    filament_id: int
+    material: str | None
+    location: str | None
+    weight: float
+    time: datetime
+    source: str
+
+
+def _truncate(time: datetime, period: str) -> datetime:
+    """Round a time down to the start of its hour or day."""
+    if period == "day":
+        return time.replace(hour=0, minute=0, second=0, microsecond=0)
+    return time.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil(time: datetime, period: str) -> datetime:
+    """Round a time up to the start of the next hour or day, unless it already is one."""
+    start = _truncate(time, period)
+    if start == time:
+        return time
+    return start + (timedelta(days=1) if period == "day" else timedelta(hours=1))
+
+
+def _upsert_rollup(db: AsyncSession, rollup: type[models.Base], rows: list[dict]) -> sqlalchemy.Insert:
+    """Build an INSERT that adds the weight of each row to the existing total of its period, if any."""
+    table = rollup.__table__
+    dialect = db.bind.dialect.name
+    if dialect in ("mysql", "mariadb"):
+        stmt = mysql.insert(table).values(rows)
+        return stmt.on_duplicate_key_update(weight=table.c.weight + stmt.inserted.weight)
+    # PostgreSQL's INSERT .. ON CONFLICT is also what CockroachDB speaks.
+    stmt = (sqlite.insert if dialect == "sqlite" else postgresql.insert)(table).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[
+            table.c.period_start,
+            table.c.spool_id,
+            table.c.filament_id,
+            table.c.material,
+            table.c.location,
+        ],
+        set_={"weight": table.c.weight + stmt.excluded.weight},
+    )
+
+
+async def record(db: AsyncSession, records: Sequence[UsageRecord]) -> None:
+    """Append usage to the ledger and add it to the rollups. Does not commit.
+
+    Args:
+        db (AsyncSession): Database session
+        records (Sequence[UsageRecord]): The usage to record. Entries that changed nothing are skipped.
+
+    """
+    records = [entry for entry in records if entry.weight != 0]
+    if not records:
+        return
+
+    await db.execute(
+        sqlalchemy.insert(models.SpoolUsageRecord),
+        [
+            {
+                "spool_id": entry.spool_id,
+                "filament_id": entry.filament_id,
+                "material": entry.material,
+                "location": entry.location,
+                "weight": entry.weight,
+                "time": entry.time,
+                "source": entry.source,
+            }
+            for entry in records
+        ],
+    )
+
+    for period, rollup in _ROLLUPS.items():
+        # Summed per key first, as one statement may not update the same row twice.
+        totals: dict[tuple[datetime, int, int, str, str], float] = {}
+        for entry in records:
+            key = (
+                _truncate(entry.time, period),
+                entry.spool_id,
+                entry.filament_id,
+                entry.material or UNSET,
+                entry.location or UNSET,
+            )
+            totals[key] = totals.get(key, 0) + entry.weight
+        rows = [
+            {
+                "period_start": period_start,
+                "spool_id": spool_id,
+                "filament_id": filament_id,
+                "material": material,
+                "location": location,
+                "weight": weight,
+            }
+            for (period_start, spool_id, filament_id, material, location), weight in totals.items()
+        ]
+        await db.execute(_upsert_rollup(db, rollup, rows))
+
+
+async def _detach(db: AsyncSession, column: str, entity_id: int) -> None:
+    """Keep the usage recorded against a spool or filament that is about to be deleted, without its ID."""
+    # Set explicitly rather than left to ON DELETE SET NULL, which SQLite does not enforce.
+    await db.execute(
+        sqlalchemy.update(models.SpoolUsageRecord)
+        .where(getattr(models.SpoolUsageRecord, column) == entity_id)
+        .values({column: None}),
+    )
+    for rollup in _ROLLUPS.values():
+        table = rollup.__table__
+        rows = (await db.execute(sqlalchemy.select(table).where(table.c[column] == entity_id))).mappings().all()
+        if not rows:
+            continue
+        await db.execute(sqlalchemy.delete(table).where(table.c[column] == entity_id))
+        await db.execute(_upsert_rollup(db, rollup, [{**row, column: DELETED_ID} for row in rows]))
+
+
+async def detach_spool_usage(db: AsyncSession, spool_id: int) -> None:
+    """Keep the recorded usage of a spool that is about to be deleted, without its ID. Does not commit."""
+    await _detach(db, "spool_id", spool_id)
+
+
+async def detach_filament_usage(db: AsyncSession, filament_id: int) -> None:
+    """Keep the usage recorded against a filament that is about to be deleted, without its ID. Does not commit."""
+    await _detach(db, "filament_id", filament_id)
+
+
+def split_range(start: datetime | None, end: datetime) -> list[tuple[str, datetime | None, datetime]]:
+    """Split a time range into the parts to read from each table.
+
+    Returns (source, from, to) tuples, with source being "day", "hour" or "ledger", and each part
+    covering [from, to). A from of None means since the beginning.
+    """
+    hour_lo = None if start is None else _ceil(start, "hour")
+    hour_hi = _truncate(end, "hour")
+    if start is not None and hour_lo >= hour_hi:
+        return [("ledger", start, end)]
+
+    parts: list[tuple[str, datetime | None, datetime]] = []
+    if start is not None and start < hour_lo:
+        parts.append(("ledger", start, hour_lo))
+
+    day_lo = None if hour_lo is None else _ceil(hour_lo, "day")
+    day_hi = _truncate(hour_hi, "day")
+    if day_lo is not None and day_lo >= day_hi:
+        parts.append(("hour", hour_lo, hour_hi))
+    else:
+        if day_lo is not None and hour_lo < day_lo:
+            parts.append(("hour", hour_lo, day_lo))
+        parts.append(("day", day_lo, day_hi))
+        if day_hi < hour_hi:
+            parts.append(("hour", day_hi, hour_hi))
+
+    if hour_hi < end:
+        parts.append(("ledger", hour_hi, end))
+    return parts
+
+
+async def consumption(
+    *,
+    db: AsyncSession,
+    group_by: UsageGroupBy,
+    start: datetime | None,
+    end: datetime,
+) -> list[tuple[int | str | None, float]]:
+    """Sum the recorded usage in a time range per spool, filament, material or location.
+
+    Material and location are those at the time of use. Usage of a deleted spool or filament is
+    summed under a key of None when grouping by it, as is usage with no material or location set.
+
+    Args:
+        db (AsyncSession): Database session
+        group_by (UsageGroupBy): What to sum the usage per
+        start (datetime | None): Start of the range, inclusive. None to sum from the beginning.
+        end (datetime): End of the range, exclusive
+
+    Returns:
+        list[tuple[int | str | None, float]]: (key, grams used) per group, most used first
+
+    """
+    parts = []
+    for source, lo, hi in split_range(start, end):
+        if source == "ledger":
+            table = models.SpoolUsageRecord
+            time_col = models.SpoolUsageRecord.time
+        else:
+            table = _ROLLUPS[source]
+            time_col = table.period_start
+        if source == "ledger":
+            columns = [table.spool_id, table.filament_id, table.material, table.location]
+        else:
+            columns = [
+                func.nullif(table.spool_id, DELETED_ID).label("spool_id"),
+                func.nullif(table.filament_id, DELETED_ID).label("filament_id"),
+                func.nullif(table.material, UNSET).label("material"),
+                func.nullif(table.location, UNSET).label("location"),
+            ]
+        part = sqlalchemy.select(*columns, table.weight).where(time_col < hi)
+        if lo is not None:
+            part = part.where(time_col >= lo)
+        parts.append(part)
+    usage = sqlalchemy.union_all(*parts).subquery()
+
+    if group_by == "spool":
+        key = usage.c.spool_id
+    elif group_by == "filament":
+        key = usage.c.filament_id
+    elif group_by == "material":
+        key = usage.c.material
+    elif group_by == "location":
+        key = usage.c.location
+    else:
+        raise ValueError(f"Cannot group usage by {group_by}.")
+
+    total = func.sum(usage.c.weight)
+    stmt = sqlalchemy.select(key, total).select_from(usage).group_by(key).order_by(total.desc())
+    rows = await db.execute(stmt)
+    return [(row[0], float(row[1])) for row in rows.all()]
@@ -1,15 +1,26 @@
 """Utility functions for the database module."""
 
-from collections.abc import Sequence
+import base64
+import binascii
+import json
+from collections.abc import AsyncIterator, Sequence
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from decimal import Decimal
 from enum import Enum
 from typing import Any, TypeVar
 
 import sqlalchemy
-from sqlalchemy import Select
+from sqlalchemy import ColumnElement, Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import attributes
+from sqlalchemy.sql.expression import FunctionElement
 
-from spoolman.database import models
+from spoolman import response_cache
+from spoolman.api.v1.models import CountMode
+from spoolman.database import count_cache, models
+from spoolman.exceptions import PreconditionFailedError
 
 # Escape character for LIKE patterns. Deliberately not backslash: a backslash ESCAPE clause is
 # ambiguous under MySQL/MariaDB string parsing. '/' renders safely on all four dialects.
@@ -37,6 +48,52 @@ class SortOrder(Enum):
     DESC = 2
 
 
+class _NullsLast(FunctionElement):
+    """Cross-database helper: one ORDER BY term that sorts an expression with its NULLs last."""
+
+    name = "nulls_last"
+    inherit_cache = True
+    descending = False
+
+
+class _NullsLastAsc(_NullsLast):
+    inherit_cache = True
+
+
+class _NullsLastDesc(_NullsLast):
+    inherit_cache = True
+    descending = True
+
+
+def _nulls_last_sql(element: _NullsLast, compiler: object, **kw: object) -> tuple[str, str]:
+    (col_expr,) = element.clauses
+    return compiler.process(col_expr, **kw), "DESC" if element.descending else "ASC"  # type: ignore[union-attr]
+
+
+@compiles(_NullsLast, "sqlite")
+@compiles(_NullsLast, "postgresql")
+def _compile_nulls_last(element: _NullsLast, compiler: object, **kw: object) -> str:  # type: ignore[misc]
+    """SQLite/PostgreSQL: NULLS LAST, which SQLite can still read from an index on the expression."""
+    col_sql, direction = _nulls_last_sql(element, compiler, **kw)
+    return f"{col_sql} {direction} NULLS LAST"
+
+
+@compiles(_NullsLast, "mysql")
+def _compile_nulls_last_mysql(element: _NullsLast, compiler: object, **kw: object) -> str:  # type: ignore[misc]
+    """MySQL/MariaDB: NULL is the lowest value, so it is already last when descending."""
+    col_sql, direction = _nulls_last_sql(element, compiler, **kw)
+    if element.descending:
+        return f"{col_sql} {direction}"
+    return f"{col_sql} IS NULL ASC, {col_sql} ASC"
+
+
+@compiles(_NullsLast)
+def _compile_nulls_last_default(element: _NullsLast, compiler: object, **kw: object) -> str:  # type: ignore[misc]
+    """CockroachDB and anything else: order on an "is it null" flag first."""
+    col_sql, direction = _nulls_last_sql(element, compiler, **kw)
+    return f"{col_sql} IS NULL ASC, {col_sql} {direction}"
+
+
 def order_by_clauses(
     exprs: Sequence[Any],
     order: SortOrder,
@@ -49,10 +106,12 @@ def order_by_clauses(
     PostgreSQL therefore floated every never-used spool to the top of the list (#984, #985).
 
     A NULL means "no value recorded", which belongs at the bottom whichever way the list is
-    pointing, so we order on an explicit "is it null" flag first. It is written as a boolean
-    expression rather than SQLAlchemy's ``nullslast()`` on purpose: that renders a literal
-    NULLS LAST, which MySQL and MariaDB do not support, whereas ``expr IS NULL`` sorts
-    false-before-true on all four supported databases.
+    pointing. SQLAlchemy's ``nullslast()`` cannot be used for it: that renders a literal
+    NULLS LAST, which MySQL and MariaDB do not support. Each term is therefore rendered per
+    database, see _NullsLast: NULLS LAST where it is supported, nothing extra where the NULLs
+    are last already, and elsewhere an ``expr IS NULL`` flag first, which sorts
+    false-before-true on all four supported databases. The flag is avoided where possible, as a
+    database cannot read an order that starts with it from an index on the expression.
 
     Args:
         exprs: The expressions to sort by, in priority order. A field usually contributes
@@ -63,11 +122,8 @@ def order_by_clauses(
         list[Any]: Clauses to hand to ``Select.order_by()``.
 
     """
-    clauses: list[Any] = []
-    for expr in exprs:
-        clauses.append(expr.is_(None).asc())
-        clauses.append(expr.asc() if order == SortOrder.ASC else expr.desc())
-    return clauses
+    term = _NullsLastAsc if order == SortOrder.ASC else _NullsLastDesc
+    return [term(expr) for expr in exprs]
 
 
 def parse_sort(sort: str | None) -> dict[str, SortOrder]:
@@ -111,6 +167,291 @@ def parse_sort(sort: str | None) -> dict[str, SortOrder]:
     return sort_by
 
 
+# One key of a sort: the expression to sort by and the direction. A sort field usually gives one;
+# a couple (e.g. `filament.combined_name`) expand to several.
+SortKey = tuple[ColumnElement[Any], SortOrder]
+
+
+def _encode_cursor_value(value: object) -> object:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _decode_cursor_value(value: object) -> object:
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def _cursor_sort(sort_by: dict[str, SortOrder] | None) -> list[list[str]]:
+    return [[field, order.name.lower()] for field, order in (sort_by or {}).items()]
+
+
+def encode_cursor(sort_by: dict[str, SortOrder] | None, values: Sequence[Any], last_id: int) -> str:
+    """Encode the position after a row into an opaque cursor.
+
+    The cursor holds the values of the row's sort keys, with None for a NULL, which order_by_clauses
+    sorts last in both directions, and the row's ID, which breaks ties. The sort it was made for is
+    kept as well, so that it cannot be used with another one.
+    """
+    data = {"s": _cursor_sort(sort_by), "k": [_encode_cursor_value(value) for value in values], "id": last_id}
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: dict[str, SortOrder] | None, key_count: int) -> tuple[list[Any], int]:
+    """Decode a cursor made by encode_cursor into the sort key values and the ID of the row it points after.
+
+    Raises:
+        ValueError: If the cursor is invalid, or was made for another sort.
+
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        sort, values, last_id = data["s"], data["k"], data["id"]
+        values = [_decode_cursor_value(value) for value in values]
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor.") from None
+    if sort != _cursor_sort(sort_by):
+        raise ValueError("The cursor was made for another sort order.")
+    if not isinstance(last_id, int) or len(values) != key_count:
+        raise ValueError("Invalid cursor.")
+    return values, last_id
+
+
+def after_cursor(
+    sort_keys: Sequence[SortKey],
+    id_column: attributes.InstrumentedAttribute[int],
+    values: Sequence[Any],
+    last_id: int,
+) -> ColumnElement[bool]:
+    """Build the condition for the rows that come after a cursor, in the order order_by_clauses sorts them.
+
+    Row value comparisons can't be used, as each key may have its own direction and NULLs go last,
+    so this is spelled out as "greater in the first key, or equal in it and greater in the next",
+    down to the ID. Nothing comes after a NULL in its own key, only other NULLs.
+    """
+    conditions = []
+    equal: list[ColumnElement[bool]] = []
+    for (expr, order), value in zip(sort_keys, values, strict=True):
+        if value is None:
+            equal.append(expr.is_(None))
+            continue
+        beyond = expr > value if order == SortOrder.ASC else expr < value
+        conditions.append(sqlalchemy.and_(*equal, sqlalchemy.or_(beyond, expr.is_(None))))
+        equal.append(expr == value)
+    conditions.append(sqlalchemy.and_(*equal, id_column > last_id))
+    return sqlalchemy.or_(*conditions)
+
+
+# How many items of a streamed search are read at a time, see ItemStream.
+STREAM_BATCH_SIZE = 500
+
+
+@dataclass
+class ItemStream:
+    """The items of a search without a limit, read in batches as they are iterated.
+
+    An inventory listed in full would otherwise be read, converted and serialized all at once, so
+    that the memory it takes grows with its size, and nothing is sent before the last row is read.
+    The IDs of the items, in order, are read up front in one statement, and each batch is then read
+    by the next of them. A server-side cursor would need the connection to itself on MySQL, while
+    the extra fields of each batch are read with queries of their own.
+
+    While the items are sent, they can change. Every item that matched when the IDs were read is
+    sent once, in the order it had then, however its sort keys change in the meantime, with the
+    values it has when its batch is read. An item that is deleted, or stops matching, before its
+    batch is read is left out, so the list can then be shorter than the count of the IDs.
+    """
+
+    db: AsyncSession
+    # The search, which each batch is read from by ID.
+    stmt: Select
+    ids: list[int]
+    id_column: attributes.InstrumentedAttribute[int]
+    entity: bool
+    batch_size: int = STREAM_BATCH_SIZE
+
+    async def batches(self) -> AsyncIterator[list[Any]]:
+        """Read the items, a batch at a time."""
+        for start in range(0, len(self.ids), self.batch_size):
+            ids = self.ids[start : start + self.batch_size]
+            result = await self.db.execute(
+                self.stmt.where(self.id_column.in_(ids)).order_by(None),
+                execution_options={"populate_existing": True},
+            )
+            rows = {row[0].id if self.entity else row[0]: row for row in result.all()}
+            batch = [rows[item_id] for item_id in ids if item_id in rows]
+            if batch:
+                yield [row[0] for row in batch] if self.entity else batch
+
+
+async def find_page(
+    *,
+    db: AsyncSession,
+    stmt: Select,
+    sort_by: dict[str, SortOrder] | None,
+    sort_keys: Sequence[SortKey],
+    id_column: attributes.InstrumentedAttribute[int],
+    limit: int | None,
+    offset: int,
+    cursor: str | None,
+    count: CountMode = CountMode.EXACT,
+    count_stmt: Select | None = None,
+    entity: bool = True,
+    stream: bool = False,
+) -> tuple[list[Any] | ItemStream, int | None, str | None]:
+    """Sort a search, and get one page of it.
+
+    Rows are sorted by the sort keys, and then by ID, so that the order is the same every time. A page
+    starts either at an offset or after a cursor, and the cursor to get the next page after it is
+    returned along with it, if there is one. Counting all matching items takes a query of its own,
+    unless the search is neither paginated nor streamed, see count_cache.count for the modes. The
+    count_stmt, if given, is counted instead of the search: the search without the joins that only
+    sort it.
+
+    The statement selects either an entity, whose objects are the items, or with entity set to
+    False, columns starting with the ID, whose rows are the items.
+
+    With stream set, the items of a search without a limit are not read here, but returned as an
+    ItemStream to be read batch by batch while they are sent. Only their IDs are read here, which
+    also counts them.
+
+    Returns a tuple containing the items, the total count of matching items, None if not counted,
+    and the next cursor.
+
+    Raises:
+        ValueError: If the cursor is invalid, or is given together with an offset.
+
+    """
+    if cursor is not None and offset:
+        raise ValueError("A cursor cannot be combined with an offset.")
+    total_count = None
+    counted = stmt if count_stmt is None else count_stmt
+    if limit is not None or cursor is not None:
+        total_count = await count_cache.count(db, counted, count)
+
+    for expr, order in sort_keys:
+        stmt = stmt.order_by(*order_by_clauses([expr], order))
+    stmt = stmt.order_by(id_column.asc())
+
+    if cursor is not None:
+        values, last_id = decode_cursor(cursor, sort_by, len(sort_keys))
+        stmt = stmt.where(after_cursor(sort_keys, id_column, values, last_id))
+
+    if limit is None and stream:
+        # Selected from what the first column is, as count_cache.count counts it.
+        id_stmt = stmt.with_only_columns(id_column).select_from(*stmt.columns_clause_froms[:1])
+        ids = list((await db.execute(id_stmt.offset(offset))).scalars())
+        items = ItemStream(db=db, stmt=stmt, ids=ids, id_column=id_column, entity=entity)
+        if cursor is None and count != CountMode.NONE:
+            total_count = len(ids)
+        return items, total_count, None
+
+    if limit is None:
+        rows = await db.execute(stmt.offset(offset), execution_options={"populate_existing": True})
+        result = list(rows.unique().scalars().all()) if entity else list(rows.all())
+        if cursor is None and count != CountMode.NONE:
+            total_count = len(result)
+        return result, total_count, None
+
+    items, next_cursor = await _read_page(
+        db=db,
+        stmt=stmt,
+        sort_by=sort_by,
+        sort_keys=sort_keys,
+        limit=limit,
+        offset=offset,
+        entity=entity,
+    )
+    return items, total_count, next_cursor
+
+
+async def _read_page(
+    *,
+    db: AsyncSession,
+    stmt: Select,
+    sort_by: dict[str, SortOrder] | None,
+    sort_keys: Sequence[SortKey],
+    limit: int,
+    offset: int,
+    entity: bool,
+) -> tuple[list[Any], str | None]:
+    """Read a page of a sorted search, and make the cursor of the next page if there is one."""
+    # One more row than asked for tells whether there is a next page, and the sort key values of the
+    # last row are read along with it to make the cursor.
+    width = 1 if entity else len(stmt.selected_columns)
+    stmt = stmt.add_columns(*(expr for expr, _ in sort_keys)).offset(offset).limit(limit + 1)
+    result = await db.execute(stmt, execution_options={"populate_existing": True})
+    rows = list(result.unique().all() if entity else result.all())
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if rows:
+            last_row = rows[-1]
+            last_id = last_row[0].id if entity else last_row[0]
+            next_cursor = encode_cursor(sort_by, list(last_row[width:]), last_id)
+    if entity:
+        return [row[0] for row in rows], next_cursor
+    return [row[:width] for row in rows], next_cursor
+
+
+def version_etag(registered: datetime, *versions: int | None) -> str:
+    """Build the ETag of an item from its registration time and version, followed by those of the items it embeds.
+
+    The registration time tells apart items that had the same ID, as SQLite hands out the ID of the
+    most recently deleted row again. An item that embeds none has version 0 in its place.
+    """
+    return f'"{registered.strftime("%Y%m%dT%H%M%S")}.{".".join(str(version or 0) for version in versions)}"'
+
+
+def bump_version(item: models.Spool | models.Filament | models.Vendor) -> None:
+    """Increment the version of an item when it is flushed.
+
+    Incremented by the database rather than from the loaded value, so that a concurrent increment by
+    an UPDATE statement, like the one of a usage report, is not lost. The version is expired by the
+    flush, so refresh it before reading it.
+    """
+    item.version = type(item).version + 1
+
+
+async def claim_version(
+    db: AsyncSession,
+    item: models.Spool | models.Filament | models.Vendor,
+    *,
+    if_match: str,
+    etag: str,
+    message: str,
+) -> None:
+    """Check an If-Match header against the ETag of a loaded item, and increment its version right away.
+
+    Used instead of bump_version when the client sent If-Match. The UPDATE only matches the version
+    the item was loaded with, re-read at the time of the write, and holds the row lock (the database
+    lock on SQLite) until the commit, so of two updates that checked the same ETag only the first gets
+    through. The versions of the items it embeds are only checked as loaded, as a change to them does
+    not touch what the update writes. Call it before changing the item, so nothing is flushed ahead
+    of it. The version is not refreshed.
+
+    Raises:
+        PreconditionFailedError: The item has changed since the ETag in If-Match.
+
+    """
+    if not response_cache.match(if_match, etag):
+        raise PreconditionFailedError(message)
+    model = type(item)
+    result = await db.execute(
+        sqlalchemy.update(model)
+        .where(model.id == item.id, model.version == item.version)
+        .values(version=model.version + 1)
+        .execution_options(synchronize_session=False),
+    )
+    if result.rowcount == 0:
+        raise PreconditionFailedError(message)
+
+
 def parse_nested_field(base_obj: type[models.Base], field: str) -> attributes.InstrumentedAttribute[Any]:
     """Parse a nested field string into a sqlalchemy field object."""
     fields = field.split(".")
@@ -185,7 +526,7 @@ def add_where_clause_str(
 
 
 # Separates the two ends of a datetime range. Not ':', which ISO 8601 timestamps are full of —
-# the same reason the extra-field datetime filters use this character (see add_where_clause_extra_field).
+# the same reason the extra-field datetime filters use this character (see _value_condition).
 DATETIME_RANGE_SEPARATOR = "|"
 
 
@@ -196,7 +537,7 @@ def split_datetime_range_filter(value: str, field_name: str) -> tuple[str, str]
     rejected. Shared by the built-in datetime columns and the datetime extra fields so that the
     one documented grammar is parsed in exactly one place. Only the parsing is common: what each
     caller then does with the ends differs, because a typed column is compared as a datetime while
-    an extra field is compared as its decoded JSON text (see add_where_clause_extra_field).
+    an extra field is compared as its decoded JSON text (see _value_condition).
     """
     if DATETIME_RANGE_SEPARATOR not in value:
         return None
@@ -4,18 +4,22 @@ import logging
 from datetime import datetime
 
 import sqlalchemy
-from sqlalchemy import func, select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from spoolman.api.v1.models import EventType, Vendor, VendorEvent
+from spoolman.api.v1.models import CountMode, EventType, Vendor, VendorEvent
 from spoolman.database import models
-from spoolman.database.extra_field_query import apply_extra_field_filters_and_sort
+from spoolman.database.extra_field_query import apply_extra_field_filters, apply_extra_field_sort
 from spoolman.database.utils import (
+    ItemStream,
     SortOrder,
     add_where_clause_str,
     add_where_clause_str_opt,
-    order_by_clauses,
+    bump_version,
+    claim_version,
+    find_page,
     parse_nested_field,
+    version_etag,
 )
 from spoolman.exceptions import ItemNotFoundError
 from spoolman.extra_field_registry import EntityType
@@ -56,6 +60,23 @@ async def get_by_id(db: AsyncSession, vendor_id: int) -> models.Vendor:
     return vendor
 
 
+def etag(vendor: models.Vendor) -> str:
+    """Get the ETag of a vendor, which changes along with the vendor."""
+    return version_etag(vendor.registered, vendor.version)
+
+
+async def get_etag(db: AsyncSession, vendor_id: int) -> str:
+    """Get the ETag of a vendor without loading it."""
+    row = (
+        await db.execute(
+            sqlalchemy.select(models.Vendor.registered, models.Vendor.version).where(models.Vendor.id == vendor_id),
+        )
+    ).one_or_none()
+    if row is None:
+        raise ItemNotFoundError(f"No vendor with ID {vendor_id} found.")
+    return version_etag(*row)
+
+
 async def find(
     *,
     db: AsyncSession,
@@ -65,50 +86,58 @@ async def find(
     sort_by: dict[str, SortOrder] | None = None,
     limit: int | None = None,
     offset: int = 0,
-) -> tuple[list[models.Vendor], int]:
+    cursor: str | None = None,
+    count: CountMode = CountMode.EXACT,
+    stream: bool = False,
+) -> tuple[list[models.Vendor] | ItemStream, int | None, str | None]:
     """Find a list of vendor objects by search criteria.
 
-    Returns a tuple containing the list of items and the total count of matching items.
+    Returns a tuple containing the list of items, the total count of matching items and the cursor
+    of the next page, see find_page for both. With stream set, a search without a limit returns an
+    ItemStream of the items instead, see find_page.
     """
     stmt = select(models.Vendor)
 
     stmt = add_where_clause_str(stmt, models.Vendor.name, name)
     stmt = add_where_clause_str_opt(stmt, models.Vendor.external_id, external_id)
 
-    total_count = None
-
-    stmt = await apply_extra_field_filters_and_sort(
+    stmt = await apply_extra_field_filters(
         db=db,
         stmt=stmt,
         base_obj=models.Vendor,
         entity_type=EntityType.vendor,
         extra_field_filters=extra_field_filters,
-        sort_by=sort_by,
     )
 
+    # Extra fields take precedence over the other fields of a sort.
+    sorted_stmt, sort_keys = await apply_extra_field_sort(
+        db=db,
+        stmt=stmt,
+        base_obj=models.Vendor,
+        entity_type=EntityType.vendor,
+        sort_by=sort_by,
+    )
     if sort_by is not None:
         for fieldstr, order in sort_by.items():
             # Check if this is a custom field sort
             if fieldstr.startswith("extra."):
                 continue
 
-            field = parse_nested_field(models.Vendor, fieldstr)
-            stmt = stmt.order_by(*order_by_clauses([field], order))
-
-    if limit is not None:
-        total_count_stmt = stmt.with_only_columns(func.count(), maintain_column_froms=True).order_by(None)
-        total_count = (await db.execute(total_count_stmt)).scalar()
-        stmt = stmt.offset(offset).limit(limit)
+            sort_keys.append((parse_nested_field(models.Vendor, fieldstr), order))
 
-    rows = await db.execute(
-        stmt,
-        execution_options={"populate_existing": True},
+    return await find_page(
+        db=db,
+        stmt=sorted_stmt,
+        sort_by=sort_by,
+        sort_keys=sort_keys,
+        id_column=models.Vendor.id,
+        limit=limit,
+        offset=offset,
+        cursor=cursor,
+        count=count,
+        count_stmt=stmt,
+        stream=stream,
     )
-    result = list(rows.unique().scalars().all())
-    if total_count is None:
-        total_count = len(result)
-
-    return result, total_count
 
 
 async def update(
@@ -116,9 +145,21 @@ async def update(
     db: AsyncSession,
     vendor_id: int,
     data: dict,
+    if_match: str | None = None,
 ) -> models.Vendor:
-    """Update the fields of a vendor object."""
+    """Update the fields of a vendor object.
+
+    With if_match set, nothing is updated unless it matches the ETag of the vendor, at the time of the
+    write.
+
+    Raises:
+        PreconditionFailedError: The vendor has changed since the ETag in if_match.
+
+    """
     vendor = await get_by_id(db, vendor_id)
+    if if_match is not None:
+        message = "The vendor has changed since it was read."
+        await claim_version(db, vendor, if_match=if_match, etag=etag(vendor), message=message)
     for k, v in data.items():
         if k == "extra":
             # Merged per key, the same as a spool's and a filament's: only the keys present
@@ -129,7 +170,10 @@ async def update(
             vendor.extra.extend([models.VendorField(key=k, value=v) for k, v in v.items() if v is not None])
         else:
             setattr(vendor, k, v)
+    if if_match is None:
+        bump_version(vendor)
     await db.commit()
+    await db.refresh(vendor, ["version"])
     await vendor_changed(vendor, EventType.UPDATED)
     return vendor
 
@@ -146,6 +190,12 @@ async def delete(db: AsyncSession, vendor_id: int) -> None:
 
 async def clear_extra_field(db: AsyncSession, key: str) -> None:
     """Delete all extra fields with a specific key."""
+    with_field = sqlalchemy.select(models.VendorField.vendor_id).where(models.VendorField.key == key)
+    await db.execute(
+        sqlalchemy.update(models.Vendor)
+        .where(models.Vendor.id.in_(with_field))
+        .values(version=models.Vendor.version + 1),
+    )
     await db.execute(
         sqlalchemy.delete(models.VendorField).where(models.VendorField.key == key),
     )
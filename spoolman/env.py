@@ -40,6 +40,21 @@ class DatabaseType(Enum):
         raise ValueError(f"Unknown database type '{self}'.")
 
 
+class WebsocketQueuePolicy(Enum):
+    """What to do with a websocket client whose outbound queue is full."""
+
+    DISCONNECT = "disconnect"
+    DROP_OLDEST = "drop_oldest"
+
+
+class EventBusType(Enum):
+    """How websocket events reach the other processes that serve the same database."""
+
+    LOCAL = "local"
+    POSTGRES = "postgres"
+    UNIX = "unix"
+
+
 def get_database_type() -> DatabaseType | None:
     """Get the database type from environment variables.
 
@@ -560,3 +575,195 @@ def is_legacy_client_enabled() -> bool:
     raise ValueError(
         f"Failed to parse SPOOLMAN_LEGACY_CLIENT variable: Unknown value '{legacy_client}'.",
     )
+
+
+def get_usage_flush_interval() -> int:
+    """Get how long filament usage may be held in memory before it is written, in milliseconds.
+
+    Set SPOOLMAN_USAGE_FLUSH_INTERVAL to a positive number of milliseconds to have usage reports
+    accumulated per spool and written in one batched UPDATE per interval, instead of one write
+    transaction per report. Returns 0, meaning every report is written immediately, if it is unset.
+
+    Returns:
+        int: The flush interval in milliseconds, or 0 if usage is written through.
+
+    """
+    interval = os.getenv("SPOOLMAN_USAGE_FLUSH_INTERVAL", "0")
+    try:
+        value = int(interval)
+    except ValueError as exc:
+        raise ValueError(f"Failed to parse SPOOLMAN_USAGE_FLUSH_INTERVAL variable: {exc!s}") from exc
+    if value < 0:
+        raise ValueError("Failed to parse SPOOLMAN_USAGE_FLUSH_INTERVAL variable: It must not be negative.")
+    return value
+
+
+def get_usage_flush_max_pending() -> int:
+    """Get how many usage reports may be held in memory before they are written early.
+
+    Only relevant if SPOOLMAN_USAGE_FLUSH_INTERVAL is set. Returns 1000 if no environment
+    variable was set.
+
+    Returns:
+        int: The number of pending reports that triggers a flush ahead of the interval.
+
+    """
+    max_pending = os.getenv("SPOOLMAN_USAGE_FLUSH_MAX_PENDING", "1000")
+    try:
+        value = int(max_pending)
+    except ValueError as exc:
+        raise ValueError(f"Failed to parse SPOOLMAN_USAGE_FLUSH_MAX_PENDING variable: {exc!s}") from exc
+    if value < 1:
+        raise ValueError("Failed to parse SPOOLMAN_USAGE_FLUSH_MAX_PENDING variable: It must be at least 1.")
+    return value
+
+
+def get_ws_queue_size() -> int:
+    """Get how many websocket messages may wait to be sent to a single client.
+
+    Returns 1000 if no environment variable was set.
+
+    Returns:
+        int: The maximum number of queued messages per websocket connection.
+
+    """
+    queue_size = os.getenv("SPOOLMAN_WS_QUEUE_SIZE", "1000")
+    try:
+        value = int(queue_size)
+    except ValueError as exc:
+        raise ValueError(f"Failed to parse SPOOLMAN_WS_QUEUE_SIZE variable: {exc!s}") from exc
+    if value < 1:
+        raise ValueError("Failed to parse SPOOLMAN_WS_QUEUE_SIZE variable: It must be at least 1.")
+    return value
+
+
+def get_ws_full_queue_policy() -> WebsocketQueuePolicy:
+    """Get what to do with a websocket client that does not keep up with the messages sent to it.
+
+    Returns DISCONNECT if no environment variable was set.
+
+    Returns:
+        WebsocketQueuePolicy: The policy for full websocket queues.
+
+    """
+    policy = os.getenv("SPOOLMAN_WS_FULL_QUEUE_POLICY", "disconnect").lower()
+    try:
+        return WebsocketQueuePolicy(policy)
+    except ValueError as exc:
+        raise ValueError(
+            f"Failed to parse SPOOLMAN_WS_FULL_QUEUE_POLICY variable: Unknown policy '{policy}'.",
+        ) from exc
+
+
+def get_ws_coalesce_window() -> int:
+    """Get the window within which UPDATED websocket events of one entity are collapsed, in milliseconds.
+
+    Returns 0, meaning every event is sent, if no environment variable was set.
+
+    Returns:
+        int: The coalescing window in milliseconds.
+
+    """
+    window = os.getenv("SPOOLMAN_WS_COALESCE_WINDOW", "0")
+    try:
+        value = int(window)
+    except ValueError as exc:
+        raise ValueError(f"Failed to parse SPOOLMAN_WS_COALESCE_WINDOW variable: {exc!s}") from exc
+    if value < 0:
+        raise ValueError("Failed to parse SPOOLMAN_WS_COALESCE_WINDOW variable: It must not be negative.")
+    return value
+
+
+def get_ws_idle_timeout() -> float:
+    """Get how long a websocket client may go without sending anything before it is disconnected, in seconds.
+
+    Returns 0, meaning never, if no environment variable was set.
+
+    Returns:
+        float: The idle timeout in seconds.
+
+    """
+    timeout = os.getenv("SPOOLMAN_WS_IDLE_TIMEOUT", "0")
+    try:
+        value = float(timeout)
+    except ValueError as exc:
+        raise ValueError(f"Failed to parse SPOOLMAN_WS_IDLE_TIMEOUT variable: {exc!s}") from exc
+    if value < 0:
+        raise ValueError("Failed to parse SPOOLMAN_WS_IDLE_TIMEOUT variable: It must not be negative.")
+    return value
+
+
+def get_cache_sync_interval() -> float | None:
+    """Get how often to check whether another process has written to the database, in seconds.
+
+    Returns None, meaning never, if no environment variable was set.
+
+    Returns:
+        Optional[float]: The interval in seconds.
+
+    """
+    interval = os.getenv("SPOOLMAN_CACHE_SYNC_INTERVAL")
+    if interval is None:
+        return None
+    try:
+        value = float(interval)
+    except ValueError as exc:
+        raise ValueError(f"Failed to parse SPOOLMAN_CACHE_SYNC_INTERVAL variable: {exc!s}") from exc
+    if value < 0:
+        raise ValueError("Failed to parse SPOOLMAN_CACHE_SYNC_INTERVAL variable: It must not be negative.")
+    return value
+
+
+def get_event_bus() -> EventBusType:
+    """Get how websocket events reach the other processes that serve the same database.
+
+    Returns LOCAL, meaning they don't, if no environment variable was set.
+
+    Returns:
+        EventBusType: The event bus to use.
+
+    """
+    bus = os.getenv("SPOOLMAN_EVENT_BUS", "local").lower()
+    try:
+        value = EventBusType(bus)
+    except ValueError as exc:
+        raise ValueError(f"Failed to parse SPOOLMAN_EVENT_BUS variable: Unknown event bus '{bus}'.") from exc
+    if value is EventBusType.POSTGRES and get_database_type() is not DatabaseType.POSTGRES:
+        raise ValueError("Failed to parse SPOOLMAN_EVENT_BUS variable: The postgres bus needs a PostgreSQL database.")
+    if value is EventBusType.UNIX and os.name == "nt":
+        raise ValueError("Failed to parse SPOOLMAN_EVENT_BUS variable: The unix bus is not available on Windows.")
+    return value
+
+
+def get_event_bus_socket() -> Path:
+    """Get the path of the Unix socket that the unix event bus relays events through.
+
+    Returns events.sock in the data directory if no environment variable was set.
+
+    Returns:
+        Path: The path of the socket.
+
+    """
+    path = os.getenv("SPOOLMAN_EVENT_BUS_SOCKET")
+    if path is None:
+        return get_data_dir().joinpath("events.sock")
+    return Path(path)
+
+
+def get_response_cache_size() -> int:
+    """Get how much memory the cached responses of the list endpoints may take, in bytes.
+
+    Set in megabytes. Returns 16 MB if no environment variable was set, and 0 if caching is disabled.
+
+    Returns:
+        int: The size of the response cache in bytes.
+
+    """
+    size = os.getenv("SPOOLMAN_RESPONSE_CACHE_SIZE", "16")
+    try:
+        value = int(size)
+    except ValueError as exc:
+        raise ValueError(f"Failed to parse SPOOLMAN_RESPONSE_CACHE_SIZE variable: {exc!s}") from exc
+    if value < 0:
+        raise ValueError("Failed to parse SPOOLMAN_RESPONSE_CACHE_SIZE variable: It must not be negative.")
+    return value * 1024 * 1024
@@ -0,0 +1,355 @@
+"""Carrying websocket events to every process that serves the database.
+
+The websocket manager of a process only has the clients connected to that process. Run several
+processes on one database, like uvicorn's --workers or several containers behind a load balancer,
+and a change made through one of them has to reach the clients of all of them. The manager hands
+every event to an event bus, which delivers it in this process straight away, and then hands it to
+the other processes, depending on SPOOLMAN_EVENT_BUS:
+
+- local: to none. The default, for a single process.
+- postgres: through LISTEN/NOTIFY on the PostgreSQL database the processes share.
+- unix: through a Unix socket, relayed by one of the processes. For processes on one host, such as
+  those sharing a SQLite database.
+
+Events are exchanged at most once. One raised while a process is cut off from the others, such as
+while the relaying process restarts, only reaches the clients of that process.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Annotated, Any
+
+import sqlalchemy
+from pydantic import Field, TypeAdapter
+
+from spoolman import env
+from spoolman.api.v1.models import Event, FilamentEvent, SettingEvent, SpoolEvent, VendorEvent
+from spoolman.database import models
+from spoolman.env import EventBusType
+
+if os.name != "nt":
+    import fcntl
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# How long to wait before connecting to the other processes again, in seconds.
+RETRY_INTERVAL = 1.0
+
+# PostgreSQL refuses notifications with payloads of 8000 bytes or more.
+MAX_NOTIFY_SIZE = 8000
+
+# Notified in place of an event too large to notify, followed by the ID of its stored payload.
+STORED_PREFIX = "stored:"
+
+# How long the payload of an event too large to notify is kept for the other processes to read.
+STORED_PAYLOAD_LIFETIME = timedelta(minutes=1)
+
+# The longest line a process may send through the Unix socket, in bytes.
+MAX_LINE_SIZE = 16 * 1024 * 1024
+
+Handler = Callable[[tuple[str, ...], Event], Awaitable[None]]
+
+_events = TypeAdapter(
+    Annotated[SpoolEvent | FilamentEvent | VendorEvent | SettingEvent, Field(discriminator="resource")],
+)
+
+
+def encode(pool: tuple[str, ...], evt: Event) -> str:
+    """Serialize an event and its pool, as they are sent to the other processes."""
+    return json.dumps({"pool": pool, "event": evt.model_dump(mode="json")})
+
+
+def decode(message: str | bytes) -> tuple[tuple[str, ...], Event]:
+    """Deserialize an event and its pool, as they are received from another process."""
+    data = json.loads(message)
+    return tuple(data["pool"]), _events.validate_python(data["event"])
+
+
+class EventBus:
+    """Delivers the events raised in this process to the websocket clients of this process only."""
+
+    def __init__(self, handler: Handler) -> None:
+        """Initialize with what delivers an event to the clients of this process."""
+        self.handler = handler
+
+    def start(self) -> None:
+        """Start exchanging events with the other processes."""
+
+    async def stop(self) -> None:
+        """Stop exchanging events with the other processes."""
+
+    async def publish(self, pool: tuple[str, ...], evt: Event) -> None:
+        """Deliver an event to the clients of this process, then hand it to the other processes."""
+        await self.handler(pool, evt)
+        await self._forward(pool, evt)
+
+    async def _forward(self, pool: tuple[str, ...], evt: Event) -> None:
+        """Hand an event to the other processes, without raising if they cannot be reached."""
+
+    async def _receive(self, message: str | bytes) -> None:
+        """Deliver an event handed over by another process to the clients of this process."""
+        try:
+            pool, evt = decode(message)
+            await self.handler(pool, evt)
+        except Exception:
+            logger.exception("Failed to deliver an event from another process.")
+
+
+class PostgresEventBus(EventBus):
+    """Exchanges events with the other processes through LISTEN/NOTIFY on the PostgreSQL database.
+
+    Listens and notifies on a connection of its own, taken from the pool of the engine for as long as
+    the bus runs, and closed rather than put back, so that no other connection ever listens.
+
+    An event too large for a notification, like a spool with many extra fields, is stored in the
+    event_payload table instead, and only its ID is notified, for the other processes to read it
+    from there. Stored payloads are deleted a while later, by the process that stores the next one.
+    """
+
+    CHANNEL = "spoolman_events"
+
+    def __init__(self, handler: Handler, engine: "AsyncEngine") -> None:
+        """Initialize with the engine of the database."""
+        super().__init__(handler)
+        self.engine = engine
+        # The asyncpg connection, while there is one.
+        self._connection: Any = None
+        # asyncpg connections run one statement at a time.
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        # The notifications of the other processes, delivered one at a time so that they stay in order.
+        self._notifications: asyncio.Queue[str] = asyncio.Queue()
+        self._delivery: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Start listening."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+            self._delivery = asyncio.create_task(self._deliver_notifications())
+
+    async def stop(self) -> None:
+        """Stop listening."""
+        for task in (self._task, self._delivery):
+            if task is not None:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+        self._task = None
+        self._delivery = None
+
+    async def _listen(self) -> None:
+        """Listen for the events of the other processes, connecting again whenever the connection is lost."""
+        while True:
+            try:
+                await self._listen_once()
+                logger.warning("Lost the connection that websocket events are exchanged on.")
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa: BLE001 - whatever went wrong with the connection, connect again.
+                logger.warning("Lost the connection that websocket events are exchanged on.", exc_info=True)
+            await asyncio.sleep(RETRY_INTERVAL)
+
+    async def _listen_once(self) -> None:
+        """Listen on a connection of its own, until it is lost."""
+        lost = asyncio.Event()
+        async with self.engine.connect() as conn:
+            try:
+                connection = (await conn.get_raw_connection()).driver_connection
+                connection.add_termination_listener(lambda _: lost.set())
+                await connection.add_listener(self.CHANNEL, self._notified)
+                self._connection = connection
+                logger.info("Exchanging websocket events with other processes through PostgreSQL.")
+                await lost.wait()
+            finally:
+                self._connection = None
+                await conn.invalidate()
+
+    def _notified(self, connection: Any, pid: int, _channel: str, payload: str) -> None:  # noqa: ANN401
+        # Notifications also reach the connection that sent them, and this process delivered those already.
+        if pid == connection.get_server_pid():
+            return
+        self._notifications.put_nowait(payload)
+
+    async def _deliver_notifications(self) -> None:
+        """Deliver the notifications of the other processes, reading the stored ones from the database."""
+        while True:
+            message = await self._notifications.get()
+            if message.startswith(STORED_PREFIX):
+                try:
+                    stored = await self._load(int(message.removeprefix(STORED_PREFIX)))
+                except Exception:
+                    logger.exception("Failed to read an event from another process.")
+                    continue
+                if stored is None:
+                    logger.warning("An event from another process was deleted before it could be read.")
+                    continue
+                message = stored
+            await self._receive(message)
+
+    async def _store(self, message: str) -> int:
+        """Store a message too large to notify, and get its ID, deleting the ones stored long enough ago."""
+        now = datetime.utcnow()
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                sqlalchemy.delete(models.EventPayload).where(
+                    models.EventPayload.created < now - STORED_PAYLOAD_LIFETIME,
+                ),
+            )
+            result = await conn.execute(
+                sqlalchemy.insert(models.EventPayload)
+                .values(created=now, payload=message)
+                .returning(models.EventPayload.id),
+            )
+            return result.scalar_one()
+
+    async def _load(self, payload_id: int) -> str | None:
+        """Read a stored message, if it has not been deleted yet."""
+        async with self.engine.connect() as conn:
+            stmt = sqlalchemy.select(models.EventPayload.payload).where(models.EventPayload.id == payload_id)
+            return (await conn.execute(stmt)).scalar_one_or_none()
+
+    async def _forward(self, pool: tuple[str, ...], evt: Event) -> None:
+        connection = self._connection
+        if connection is None:
+            logger.debug("Not connected to the other processes, the event only reaches this one.")
+            return
+        message = encode(pool, evt)
+        try:
+            if len(message.encode()) >= MAX_NOTIFY_SIZE:
+                message = f"{STORED_PREFIX}{await self._store(message)}"
+            async with self._lock:
+                await connection.execute("SELECT pg_notify($1, $2)", self.CHANNEL, message)
+        except Exception:  # noqa: BLE001 - the listener connects again, the event only reaches this process.
+            logger.warning("Failed to send an event to the other processes.", exc_info=True)
+
+
+class UnixSocketEventBus(EventBus):
+    """Exchanges events with the other processes on this host through a Unix socket.
+
+    One of the processes relays: it listens on the socket, and sends each line that a process writes
+    to it on to all the others. Every process, the relaying one too, connects to it. Which process
+    relays is settled with a lock on a file next to the socket, held for as long as the process
+    relays, so when it stops, the first of the others to notice takes over.
+    """
+
+    def __init__(self, handler: Handler, path: Path) -> None:
+        """Initialize with the path of the socket."""
+        super().__init__(handler)
+        self.path = path
+        self._writer: asyncio.StreamWriter | None = None
+        self._task: asyncio.Task | None = None
+        # While this process relays: the server, the file descriptor of the lock, and the connected processes.
+        self._server: asyncio.Server | None = None
+        self._lock_fd: int | None = None
+        self._peers: set[asyncio.StreamWriter] = set()
+
+    def start(self) -> None:
+        """Start exchanging events."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop exchanging events, and stop relaying if this process does."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._server is not None:
+            self._server.close()
+            for peer in list(self._peers):
+                peer.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    async def _run(self) -> None:
+        """Receive the events of the other processes, connecting again whenever the connection is lost."""
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=MAX_LINE_SIZE)
+            except OSError:
+                # Nobody relays, or the socket was left behind by a process that did.
+                if not await self._relay():
+                    await asyncio.sleep(RETRY_INTERVAL)
+                continue
+            self._writer = writer
+            logger.info("Exchanging websocket events with other processes through %s.", self.path)
+            try:
+                while line := await reader.readline():
+                    await self._receive(line)
+            except (OSError, ValueError):
+                logger.warning("Lost the connection that websocket events are exchanged on.", exc_info=True)
+            finally:
+                self._writer = None
+                writer.close()
+            await asyncio.sleep(RETRY_INTERVAL)
+
+    async def _relay(self) -> bool:
+        """Start relaying, unless another process does. Return whether this process relays now."""
+        if self._server is not None:
+            return False
+        fd = os.open(self.path.with_name(self.path.name + ".lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        self.path.unlink(missing_ok=True)
+        self._server = await asyncio.start_unix_server(self._relay_peer, self.path, limit=MAX_LINE_SIZE)
+        logger.info("Relaying websocket events between processes through %s.", self.path)
+        return True
+
+    async def _relay_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Send each line that a connected process writes on to all the others."""
+        self._peers.add(writer)
+        try:
+            while line := await reader.readline():
+                for peer in list(self._peers):
+                    if peer is writer:
+                        continue
+                    if peer.transport.get_write_buffer_size() > MAX_LINE_SIZE:
+                        # The process has stopped reading. It connects again once it reads, having missed these.
+                        logger.warning("Disconnecting a process that has fallen behind on websocket events.")
+                        self._peers.discard(peer)
+                        peer.close()
+                        continue
+                    peer.write(line)
+        except (OSError, ValueError):
+            logger.debug("Lost the connection to a process that websocket events are relayed to.", exc_info=True)
+        finally:
+            self._peers.discard(writer)
+            writer.close()
+
+    async def _forward(self, pool: tuple[str, ...], evt: Event) -> None:
+        writer = self._writer
+        if writer is None:
+            logger.debug("Not connected to the other processes, the event only reaches this one.")
+            return
+        try:
+            writer.write(encode(pool, evt).encode() + b"\n")
+            await writer.drain()
+        except OSError:
+            logger.warning("Failed to send an event to the other processes.", exc_info=True)
+
+
+def create_event_bus(handler: Handler, engine: "AsyncEngine") -> EventBus:
+    """Create the event bus that SPOOLMAN_EVENT_BUS asks for."""
+    bus_type = env.get_event_bus()
+    if bus_type is EventBusType.POSTGRES:
+        return PostgresEventBus(handler, engine)
+    if bus_type is EventBusType.UNIX:
+        return UnixSocketEventBus(handler, env.get_event_bus_socket())
+    return EventBus(handler)
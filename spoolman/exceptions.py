@@ -15,3 +15,7 @@ class ItemCreateError(Exception):
 
 class SpoolMeasureError(Exception):
     pass
+
+
+class PreconditionFailedError(Exception):
+    pass
@@ -6,6 +6,9 @@ import json
 from collections.abc import Iterable
 from typing import TYPE_CHECKING, Any
 
+import sqlalchemy
+from sqlalchemy.orm import MANYTOONE
+
 from spoolman.database import models
 
 if TYPE_CHECKING:
@@ -37,8 +40,17 @@ def escape_csv_value(value: Any) -> Any:  # noqa: ANN401
     return value
 
 
-async def flatten_sqlalchemy_object(obj: models.Base, parent_key: str = "", sep: str = ".") -> dict[str, Any]:
-    """Recursively flattens a SQLAlchemy object into a dictionary with dot-separated keys."""
+async def flatten_sqlalchemy_object(
+    obj: models.Base,
+    parent_key: str = "",
+    sep: str = ".",
+    *,
+    embed: bool = True,
+) -> dict[str, Any]:
+    """Recursively flattens a SQLAlchemy object into a dictionary with dot-separated keys.
+
+    Without embed, the objects it refers to are left out, leaving only their IDs, like filament_id.
+    """
     fields = {}
     for attr in dir(obj):
         # Check if the attribute is a column or a relationship
@@ -53,6 +65,8 @@ async def flatten_sqlalchemy_object(obj: models.Base, parent_key: str = "", sep:
 
             # Handle nested SQLAlchemy objects
             if isinstance(value, models.Base):
+                if not embed:
+                    continue
                 nested_fields = await flatten_sqlalchemy_object(value, f"{parent_key}{attr}{sep}", sep=sep)
                 fields.update(nested_fields)
             else:
@@ -61,10 +75,17 @@ async def flatten_sqlalchemy_object(obj: models.Base, parent_key: str = "", sep:
     return fields
 
 
-async def dump_as_csv(sqlalchemy_objects: Iterable[models.Base], writer: "SupportsWrite[str]") -> None:
+async def dump_as_csv(
+    sqlalchemy_objects: Iterable[models.Base],
+    writer: "SupportsWrite[str]",
+    *,
+    embed: bool = True,
+) -> None:
     """Export a list of objects as CSV to a writer. Nested objects are flattened with dot-separated keys."""
     # Flatten each object and get all column names
-    all_flattened = await asyncio.gather(*[flatten_sqlalchemy_object(obj) for obj in sqlalchemy_objects])
+    all_flattened = await asyncio.gather(
+        *[flatten_sqlalchemy_object(obj, embed=embed) for obj in sqlalchemy_objects],
+    )
 
     # Collect all unique headers across flattened objects
     headers = set()
@@ -81,10 +102,63 @@ async def dump_as_csv(sqlalchemy_objects: Iterable[models.Base], writer: "Suppor
         csv_writer.writerow({key: escape_csv_value(value) for key, value in flattened_obj.items()})
 
 
-async def dump_as_json(sqlalchemy_objects: Iterable[models.Base], writer: "SupportsWrite[str]") -> None:
+async def dump_as_json(
+    sqlalchemy_objects: Iterable[models.Base],
+    writer: "SupportsWrite[str]",
+    *,
+    embed: bool = True,
+) -> None:
     """Export a list of objects as JSON to a writer. Nested objects are flattened with dot-separated keys."""
     # Flatten each object and get all column names
-    all_flattened = await asyncio.gather(*[flatten_sqlalchemy_object(obj) for obj in sqlalchemy_objects])
+    all_flattened = await asyncio.gather(
+        *[flatten_sqlalchemy_object(obj, embed=embed) for obj in sqlalchemy_objects],
+    )
 
     # Write to JSON
     json.dump(all_flattened, writer, default=str)
+
+
+async def _collect_referred(
+    model: type[models.Base],
+    objects: list[models.Base],
+    referred: dict[str, dict[int, models.Base]],
+) -> None:
+    """Collect the objects that the given ones refer to, directly or not, by relationship and ID."""
+    for relationship in sqlalchemy.inspect(model).relationships:
+        if relationship.direction is not MANYTOONE:
+            continue
+        by_id = referred.setdefault(relationship.key, {})
+        found = []
+        for obj in objects:
+            value = await getattr(obj.awaitable_attrs, relationship.key)
+            if value is not None and value.id not in by_id:
+                by_id[value.id] = value
+                found.append(value)
+        await _collect_referred(relationship.mapper.class_, found, referred)
+
+
+async def dump_as_json_side_loaded(
+    model: type[models.Base],
+    sqlalchemy_objects: Iterable[models.Base],
+    writer: "SupportsWrite[str]",
+) -> None:
+    """Export a list of objects as JSON to a writer, with each object they refer to listed once.
+
+    The objects are flattened without the ones they refer to, leaving only their IDs. The result has
+    the list under the plural of their table name, and the objects referred to under the plural of
+    the relationship, by ID: e.g. spools, with the filaments and vendors of those spools.
+    """
+    objects = list(sqlalchemy_objects)
+    referred: dict[str, dict[int, models.Base]] = {}
+    await _collect_referred(model, objects, referred)
+
+    result: dict[str, Any] = {
+        f"{model.__tablename__}s": await asyncio.gather(
+            *[flatten_sqlalchemy_object(obj, embed=False) for obj in objects],
+        ),
+    }
+    for key, by_id in referred.items():
+        flattened = await asyncio.gather(*[flatten_sqlalchemy_object(obj, embed=False) for obj in by_id.values()])
+        result[f"{key}s"] = dict(zip(by_id, flattened, strict=True))
+
+    json.dump(result, writer, default=str)
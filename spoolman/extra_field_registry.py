@@ -256,6 +256,11 @@ def invalidate_extra_field_cache(key: str) -> None:
         logger.info("Extra field cache for entity type %s invalidated.", entity_type.name)
 
 
+def clear_extra_field_cache() -> None:
+    """Drop the cached extra fields of every entity type."""
+    extra_field_cache.clear()
+
+
 async def get_extra_fields(db: AsyncSession, entity_type: EntityType) -> list[ExtraField]:
     """Get all extra fields for a specific entity type."""
     if entity_type in extra_field_cache:
@@ -17,7 +17,10 @@ from spoolman import env, externaldb, security
 from spoolman.api.v1.router import app as v1_app
 from spoolman.client import SinglePageApplication, render_config_js
 from spoolman.database import database
+from spoolman.database.usage_buffer import usage_buffer
+from spoolman.event_bus import create_event_bus
 from spoolman.prometheus.metrics import registry
+from spoolman.ws import websocket_manager
 
 # Define a console logger
 console_handler = logging.StreamHandler()
@@ -177,7 +180,7 @@ def add_cors_middleware() -> None:
         allow_credentials=allow_credentials,
         allow_methods=["*"],
         allow_headers=["*"],
-        expose_headers=["X-Total-Count"],
+        expose_headers=["X-Total-Count", "X-Next-Cursor", "ETag"],
     )
 
 
@@ -238,6 +241,11 @@ async def startup() -> None:
     database.schedule_tasks(schedule)
     externaldb.schedule_tasks(schedule)
 
+    usage_buffer.start()
+
+    websocket_manager.bus = create_event_bus(websocket_manager.deliver, database.get_engine())
+    websocket_manager.bus.start()
+
     logger.info("Startup complete.")
 
     if env.is_docker() and not env.is_data_dir_mounted():
@@ -257,5 +265,13 @@ async def startup() -> None:
         logger.warning("!!!! WARNING !!!!")
 
 
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    """Run the service's shutdown sequence."""
+    # Buffered filament usage only lives in memory until it is written.
+    await usage_buffer.stop()
+    await websocket_manager.bus.stop()
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -39,6 +39,54 @@ def length_from_weight(*, weight: float, diameter: float, density: float) -> flo
     return volume_mm3 / (math.pi * (diameter / 2) ** 2)
 
 
+def remaining_weight(
+    *, initial_weight: float | None, filament_weight: float | None, used_weight: float
+) -> float | None:
+    """Calculate how much filament is left on a spool.
+
+    Args:
+        initial_weight (Optional[float]): Net weight of the spool when it was new in g, if set
+        filament_weight (Optional[float]): Net weight of a spool of its filament in g, if set
+        used_weight (float): Weight used from the spool in g
+
+    Returns:
+        Optional[float]: Weight in g, or None if neither the spool nor its filament has a weight
+
+    """
+    if initial_weight is not None:
+        return max(initial_weight - used_weight, 0)
+    if filament_weight is not None:
+        return max(filament_weight - used_weight, 0)
+    return None
+
+
+def remaining_length(
+    *,
+    initial_weight: float | None,
+    filament_weight: float | None,
+    used_weight: float,
+    diameter: float,
+    density: float,
+) -> float | None:
+    """Calculate how much filament is left on a spool, in length.
+
+    Args:
+        initial_weight (Optional[float]): Net weight of the spool when it was new in g, if set
+        filament_weight (Optional[float]): Net weight of a spool of its filament in g, if set
+        used_weight (float): Weight used from the spool in g
+        diameter (float): Filament diameter in mm
+        density (float): Density of filament material in g/cm3
+
+    Returns:
+        Optional[float]: Length in mm, or None if neither the spool nor its filament has a weight
+
+    """
+    weight = remaining_weight(initial_weight=initial_weight, filament_weight=filament_weight, used_weight=used_weight)
+    if weight is None:
+        return None
+    return length_from_weight(weight=weight, diameter=diameter, density=density)
+
+
 def rgb_to_lab(rgb: list[int]) -> list[float]:
     """Convert a RGB color to CIELAB.
 
@@ -1,14 +1,21 @@
 """Prometheus metrics collectors."""
 
 import logging
-from collections.abc import Callable
+from collections.abc import Callable, Iterator, Sized
+from typing import Protocol
 
 import sqlalchemy
 from prometheus_client import REGISTRY, Gauge, make_asgi_app
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import contains_eager
 
 from spoolman.database import models
+from spoolman.database.count_cache import count_cache
+from spoolman.database.geometry_cache import filament_geometry_cache
+from spoolman.response_cache import response_cache
+from spoolman.ws import websocket_manager
 
 registry = REGISTRY
 
@@ -33,6 +40,105 @@ FILAMENT_WEIGHT = Gauge(f"{PREFIX}_filament_weight", "Net weight of filament", [
 logger = logging.getLogger(__name__)
 
 
+class CacheStats(Protocol):
+    """What a cache keeps about itself for its metrics."""
+
+    hits: int
+    misses: int
+    entries: Sized
+
+
+class CacheCollector(Collector):
+    """Report the hit and miss counters and the size of a cache on every scrape."""
+
+    def __init__(
+        self,
+        prefix: str,
+        cache: CacheStats,
+        description: str,
+        size_in_bytes: Callable[[], int] | None = None,
+    ) -> None:
+        """Initialize.
+
+        Args:
+            prefix: The start of the metric names, after the spoolman prefix.
+            cache: The cache to report on.
+            description: What the cache holds, in the plural, such as "total counts of paginated searches".
+            size_in_bytes: Get the size of the cache in bytes, for a cache that is bounded in bytes rather than
+                in entries.
+
+        """
+        self.prefix = prefix
+        self.cache = cache
+        self.description = description
+        self.size_in_bytes = size_in_bytes
+
+    def collect(self) -> Iterator[CounterMetricFamily | GaugeMetricFamily]:
+        """Collect the current cache counters."""
+        yield CounterMetricFamily(
+            f"{PREFIX}_{self.prefix}_hits",
+            f"Lookups of {self.description} that were answered from the cache",
+            value=self.cache.hits,
+        )
+        yield CounterMetricFamily(
+            f"{PREFIX}_{self.prefix}_misses",
+            f"Lookups of {self.description} that were not in the cache",
+            value=self.cache.misses,
+        )
+        if self.size_in_bytes is not None:
+            yield GaugeMetricFamily(
+                f"{PREFIX}_{self.prefix}_bytes",
+                f"Size of the {self.description} in the cache, in bytes",
+                value=self.size_in_bytes(),
+            )
+        else:
+            yield GaugeMetricFamily(
+                f"{PREFIX}_{self.prefix}_size",
+                f"Number of {self.description} in the cache",
+                value=len(self.cache.entries),
+            )
+
+
+registry.register(
+    CacheCollector("filament_geometry_cache", filament_geometry_cache, "filament geometries of spools"),
+)
+registry.register(CacheCollector("count_cache", count_cache, "total counts of paginated searches"))
+registry.register(
+    CacheCollector(
+        "response_cache",
+        response_cache,
+        "responses of list requests",
+        size_in_bytes=lambda: response_cache.size,
+    ),
+)
+
+
+class WebsocketConnectionsCollector(Collector):
+    """Report the number of websocket subscribers on every scrape.
+
+    Subscriptions to a single item are summed per resource, so that the number of series does not
+    grow with the number of items.
+    """
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        """Collect the current connection counts."""
+        family = GaugeMetricFamily(
+            f"{PREFIX}_websocket_connections",
+            "Connected websocket clients, per resource they listen to, and whether to all of them or to one item",
+            labels=["resource", "scope"],
+        )
+        totals: dict[tuple[str, str], int] = {}
+        for pool, count in websocket_manager.connection_counts().items():
+            key = (pool[0] if pool else "any", "item" if len(pool) > 1 else "all")
+            totals[key] = totals.get(key, 0) + count
+        for labels, count in sorted(totals.items()):
+            family.add_metric(list(labels), count)
+        yield family
+
+
+registry.register(WebsocketConnectionsCollector())
+
+
 def make_metrics_app() -> Callable:
     """Start ASGI prometheus app with global registry."""
     logger.info("Start metrics app")
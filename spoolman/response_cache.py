@@ -0,0 +1,243 @@
+"""Caching of the list endpoints' responses, and revalidation of them with ETags.
+
+Dashboards poll the same lists over and over, and nearly every time nothing has changed since the
+last poll. The responses of the list endpoints are therefore kept in memory, keyed by path and query
+string, along with the data version they were read at (see data_version), and only served for as
+long as that version is current.
+
+Every response of these endpoints carries a strong ETag, a hash of its body, so a client that sends
+it back in If-None-Match gets a 304 without a body if nothing changed. Since the ETag is derived from
+the content rather than the data version, that also holds after a write to unrelated data, or a
+restart. The single-item endpoints aren't cached, their ETags come from the version of the item
+instead, but they use the same checks of If-None-Match and If-Match as found here.
+
+The cache is bounded by the size of the responses it holds, set with SPOOLMAN_RESPONSE_CACHE_SIZE,
+and evicts the least recently used first. It is process-local, like the data version. A list without
+a limit is streamed, and held back here until it is complete, or too large to be cached, after which
+the rest of it is sent on as it comes.
+"""
+
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.datastructures import Headers
+
+from spoolman import env
+from spoolman.database.data_version import data_version
+
+if TYPE_CHECKING:
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# The endpoints of the v1 API whose responses are cached, relative to its root.
+CACHED_PATHS = frozenset(
+    {
+        "/spool",
+        "/spool/group",
+        "/filament",
+        "/vendor",
+        "/material",
+        "/article-number",
+        "/lot-number",
+        "/location",
+    },
+)
+
+# A response larger than this part of the cache is not cached, but sent on as it comes.
+_MAX_ENTRY_SHARE = 4
+
+_CACHE_CONTROL = (b"cache-control", b"no-cache")
+
+
+@dataclass
+class CachedResponse:
+    """A response as sent, and the data version it was read at."""
+
+    version: int
+    headers: list[tuple[bytes, bytes]]
+    body: bytes
+    etag: bytes
+
+    @property
+    def size(self) -> int:
+        """Get roughly how much memory the response takes."""
+        return len(self.body) + sum(len(name) + len(value) for name, value in self.headers)
+
+
+class ResponseCache:
+    """A least-recently-used mapping from a request to its response, bounded by the size of the responses."""
+
+    def __init__(self, max_bytes: int) -> None:
+        """Initialize."""
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, version: int) -> CachedResponse | None:
+        """Get the response to a request, if it was read at the given data version."""
+        entry = self.entries.get(key)
+        if entry is None or entry.version != version:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        """Cache the response to a request."""
+        if entry.size * _MAX_ENTRY_SHARE > self.max_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            if old.version > entry.version:
+                # Read by a request that started before the one that cached the newer response.
+                self.entries[key] = old
+                return
+            self.size -= old.size
+        self.entries[key] = entry
+        self.size += entry.size
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= evicted.size
+
+
+response_cache = ResponseCache(env.get_response_cache_size())
+
+
+def _route_path(scope: "Scope") -> str:
+    """Get the path of a request relative to the root of the app it is mounted as."""
+    path: str = scope["path"]
+    root_path: str = scope.get("root_path", "")
+    return path[len(root_path) :] if root_path and path.startswith(root_path) else path
+
+
+def _etag(body: bytes) -> bytes:
+    return b'"' + hashlib.sha256(body).hexdigest()[:32].encode() + b'"'
+
+
+def none_match(if_none_match: str | None, etag: str) -> bool:
+    """Check whether an If-None-Match header matches an ETag, with the weak comparison it calls for.
+
+    If it does, the client already has the current representation and can be answered with a 304.
+    """
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
+
+
+def match(if_match: str | None, etag: str) -> bool:
+    """Check whether an If-Match header allows a change to an item with the given ETag.
+
+    Uses the strong comparison it calls for, so a weak ETag never matches. Without the header, any
+    change is allowed.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return True
+    return any(candidate.strip() == etag for candidate in if_match.split(","))
+
+
+async def _send_cached(send: "Send", entry: CachedResponse, if_none_match: str | None) -> None:
+    if none_match(if_none_match, entry.etag.decode()):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(b"etag", entry.etag), _CACHE_CONTROL],
+            },
+        )
+        await send({"type": "http.response.body", "body": b""})
+        return
+    # A copy, as the middlewares further out edit the headers in place, e.g. GZip its Content-Length.
+    await send({"type": "http.response.start", "status": 200, "headers": list(entry.headers)})
+    await send({"type": "http.response.body", "body": entry.body})
+
+
+class ResponseCacheMiddleware:
+    """Serve the list endpoints from the response cache, and answer If-None-Match."""
+
+    def __init__(self, app: "ASGIApp", cache: ResponseCache = response_cache) -> None:
+        """Wrap the given ASGI application."""
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope: "Scope", receive: "Receive", send: "Send") -> None:
+        """Serve the request from the cache if possible, otherwise pass it through and cache the response."""
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or self.cache.max_bytes == 0
+            or _route_path(scope) not in CACHED_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        # The query parameters are sorted by name, so that their order does not matter. Repeated
+        # names keep their order, as the last one wins.
+        query = parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)
+        key = _route_path(scope) + "?" + urlencode(sorted(query, key=lambda item: item[0]))
+        if_none_match = Headers(scope=scope).get("if-none-match")
+
+        # Read before the request is handled, so that a write that commits meanwhile makes the
+        # response stale, not the cache.
+        version = data_version.value
+        entry = self.cache.get(key, version)
+        if entry is not None:
+            await _send_cached(send, entry, if_none_match)
+            return
+
+        start: Message | None = None
+        chunks: list[bytes] = []
+        size = 0
+        passing_through = False
+
+        async def capture(message: "Message") -> None:
+            nonlocal start, size, passing_through
+            if passing_through:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                start = message
+                if message["status"] != 200:  # noqa: PLR2004
+                    passing_through = True
+                    await send(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                size += len(chunks[-1])
+                if not message.get("more_body", False):
+                    await self._complete(key, version, start, b"".join(chunks), if_none_match, send)
+                elif size * _MAX_ENTRY_SHARE > self.cache.max_bytes:
+                    # Too large to cache, so it is sent on without an ETag.
+                    passing_through = True
+                    await send(start)
+                    await send({"type": "http.response.body", "body": b"".join(chunks), "more_body": True})
+            else:
+                await send(message)
+
+        await self.app(scope, receive, capture)
+
+    async def _complete(
+        self,
+        key: str,
+        version: int,
+        start: "Message",
+        body: bytes,
+        if_none_match: str | None,
+        send: "Send",
+    ) -> None:
+        etag = _etag(body)
+        headers = [
+            (name, value) for name, value in start.get("headers", []) if name.lower() not in (b"etag", b"cache-control")
+        ]
+        entry = CachedResponse(
+            version=version,
+            headers=[*headers, (b"etag", etag), _CACHE_CONTROL],
+            body=body,
+            etag=etag,
+        )
+        self.cache.put(key, entry)
+        await _send_cached(send, entry, if_none_match)
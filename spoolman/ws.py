@@ -1,14 +1,162 @@
 """Websocket functionality."""
 
+import asyncio
+import contextlib
+import itertools
 import logging
+import uuid
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Annotated, Any, Protocol
 
-from fastapi import WebSocket
+from fastapi import Query, WebSocket
+from starlette import status
 from starlette.websockets import WebSocketState
 
-from spoolman.api.v1.models import Event
+from spoolman import env
+from spoolman.api.v1.models import DeltaEvent, Event, EventType, WebsocketMode
+from spoolman.env import WebsocketQueuePolicy
+from spoolman.event_bus import EventBus
 
 logger = logging.getLogger(__name__)
 
+# The reply to anything a client sends, formatted the way WebSocket.send_json would.
+HEALTHY_MESSAGE = '{"status":"healthy"}'
+
+# The most items whose last sent state is kept to compute delta payloads against.
+MAX_SNAPSHOTS = 4096
+
+WebsocketModeQuery = Annotated[
+    WebsocketMode,
+    Query(
+        description=(
+            "What each message contains: the full item (full), or only what changed since the previous message for "
+            "the same item (delta), see DeltaEvent."
+        ),
+    ),
+]
+
+
+def _client_host(websocket: WebSocket) -> str:
+    return websocket.client.host if websocket.client else "?"
+
+
+class SubscriptionFilter(Hashable, Protocol):
+    """A condition on the items of a pool, that a subscription to the pool can be narrowed down with."""
+
+    def matches(self, item: Any) -> bool:  # noqa: ANN401
+        """Check whether an item, as sent in an event payload, meets the condition."""
+        ...
+
+
+class Connection:
+    """A websocket client, with its own queue of outbound messages and a task that sends them.
+
+    Messages are queued rather than sent by the code that raised the event, so that a client on a
+    slow network only ever holds up its own messages, never other clients or the request.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        pool: tuple[str, ...],
+        queue_size: int,
+        policy: WebsocketQueuePolicy,
+        mode: WebsocketMode = WebsocketMode.FULL,
+        subscription_filter: SubscriptionFilter | None = None,
+    ) -> None:
+        """Initialize, and start sending."""
+        self.websocket = websocket
+        self.pool = pool
+        self.policy = policy
+        self.mode = mode
+        self.subscription_filter = subscription_filter
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+        self._sender = asyncio.create_task(self._send_queued())
+        self._closer: asyncio.Task | None = None
+
+    @property
+    def is_connected(self) -> bool:
+        """Whether messages can still be sent to the client."""
+        return (
+            not self.closed
+            and self.websocket.client_state == WebSocketState.CONNECTED
+            and self.websocket.application_state == WebSocketState.CONNECTED
+        )
+
+    def offer(self, message: str) -> None:
+        """Queue a message, applying the full-queue policy if the client has fallen behind."""
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            if self.policy is WebsocketQueuePolicy.DROP_OLDEST:
+                self.queue.get_nowait()
+                self.queue.put_nowait(message)
+                logger.debug("Dropped a message to client %s, which is falling behind.", _client_host(self.websocket))
+            else:
+                logger.warning(
+                    "Disconnecting client %s, which has fallen %d messages behind.",
+                    _client_host(self.websocket),
+                    self.queue.qsize(),
+                )
+                self.close(code=status.WS_1013_TRY_AGAIN_LATER)
+
+    async def _send_queued(self) -> None:
+        """Send queued messages, one at a time, until the connection is closed."""
+        try:
+            while True:
+                message = await self.queue.get()
+                await self.websocket.send_text(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # noqa: BLE001 - whatever the ASGI server raised, the client is gone.
+            # The subscription tree drops this connection on its next send.
+            logger.debug("Failed to send to client %s.", _client_host(self.websocket), exc_info=True)
+            self.closed = True
+
+    def close(self, code: int | None = None) -> None:
+        """Stop sending, and close the websocket with the given code if there is one."""
+        self.closed = True
+        self._sender.cancel()
+        if code is not None and self._closer is None and self.websocket.application_state == WebSocketState.CONNECTED:
+            self._closer = asyncio.create_task(self._close_websocket(code))
+
+    async def wait_closed(self) -> None:
+        """Wait for the websocket to be closed, if close was called with a code."""
+        if self._closer is not None:
+            await self._closer
+
+    async def _close_websocket(self, code: int) -> None:
+        with contextlib.suppress(Exception):
+            await self.websocket.close(code=code)
+
+
+def _offer_all(
+    subscribers: set[Connection],
+    message: str,
+    delta_message: str | None,
+    pool: tuple[str, ...],
+) -> None:
+    """Queue a message for each connection in a set, dropping those that have gone away."""
+    for connection in list(subscribers):
+        if connection.is_connected:
+            if delta_message is not None and connection.mode is WebsocketMode.DELTA:
+                connection.offer(delta_message)
+            else:
+                connection.offer(message)
+        else:
+            # A bad disconnection may have occurred
+            subscribers.discard(connection)
+            connection.close()
+            logger.info(
+                "Forcing disconnection of client %s on pool %s",
+                _client_host(connection.websocket),
+                ",".join(pool),
+            )
+
 
 class SubscriptionTree:
     """Subscription tree.
@@ -25,82 +173,335 @@ class SubscriptionTree:
     def __init__(self) -> None:
         """Initialize."""
         self.children: dict[str, SubscriptionTree] = {}
-        self.subscribers: set[WebSocket] = set()
+        self.subscribers: set[Connection] = set()
 
-    def add(self, path: tuple[str, ...], websocket: WebSocket) -> None:
-        """Add a websocket to the subscription tree."""
+    def add(self, path: tuple[str, ...], connection: Connection) -> None:
+        """Add a connection to the subscription tree."""
         if len(path) == 0:
-            self.subscribers.add(websocket)
+            self.subscribers.add(connection)
         else:
             if path[0] not in self.children:
                 self.children[path[0]] = SubscriptionTree()
-            self.children[path[0]].add(path[1:], websocket)
+            self.children[path[0]].add(path[1:], connection)
 
-    def remove(self, path: tuple[str, ...], websocket: WebSocket) -> None:
-        """Remove a websocket from the subscription tree."""
+    def remove(self, path: tuple[str, ...], connection: Connection) -> None:
+        """Remove a connection from the subscription tree, if it is in it."""
         if len(path) == 0:
-            self.subscribers.remove(websocket)
+            self.subscribers.discard(connection)
         elif path[0] in self.children:
-            self.children[path[0]].remove(path[1:], websocket)
+            self.children[path[0]].remove(path[1:], connection)
 
-    async def send(self, path: tuple[str, ...], evt: Event) -> None:
-        """Send a message to all websockets in this branch of the tree."""
+    def send(
+        self,
+        path: tuple[str, ...],
+        message: str,
+        delta_message: str | None = None,
+        pool: tuple[str, ...] = (),
+    ) -> None:
+        """Queue a message for all connections in this branch of the tree.
+
+        Connections in delta mode get the delta message instead, if there is one.
+        Never waits for a client: each connection sends its queued messages in its own task.
+        """
         # Broadcast to all subscribers on this level
-        for websocket in self.subscribers:
-            if (
-                websocket.client_state == WebSocketState.DISCONNECTED  # noqa: PLR1714
-                or websocket.application_state == WebSocketState.DISCONNECTED
-            ):
-                # A bad disconnection may have occurred
-                self.remove(path, websocket)
-                logger.info(
-                    "Forcing disconnection of client %s on pool %s",
-                    websocket.client.host if websocket.client else "?",
-                    ",".join(path),
-                )
-            elif (
-                websocket.client_state == WebSocketState.CONNECTED
-                and websocket.application_state == WebSocketState.CONNECTED
-            ):
-                # exclude_none mirrors the REST endpoints' response_model_exclude_none=True so that
-                # websocket payloads and REST responses have an identical shape. Without this, unset
-                # fields arrive as explicit `null` over the websocket but are omitted over REST, which
-                # trips up clients that distinguish the two (e.g. the spool list's price fallback).
-                await websocket.send_text(evt.json(exclude_none=True))
+        _offer_all(self.subscribers, message, delta_message, pool)
 
         # Send the message further down the tree
         if len(path) > 0 and path[0] in self.children:
-            await self.children[path[0]].send(path[1:], evt)
+            self.children[path[0]].send(path[1:], message, delta_message, (*pool, path[0]))
 
 
-class WebsocketManager:
-    """Websocket manager."""
+class FilteredSubscriptions:
+    """The subscriptions to a pool with one filter, and the items of the pool that currently match it.
 
-    def __init__(self) -> None:
+    Events are sent as the subscribers see them: an item that comes to match is ADDED, one that
+    stops matching is DELETED, and one that neither matched nor matches is not sent at all.
+    """
+
+    def __init__(self, subscription_filter: SubscriptionFilter, members: set[str]) -> None:
+        """Initialize with the IDs of the items that match when the first subscriber connects."""
+        self.filter = subscription_filter
+        self.members = members
+        self.subscribers: set[Connection] = set()
+
+    def update(self, item_id: str, evt: Event) -> EventType | None:
+        """Track whether an item matches, and get the type of the event to send for it, if any."""
+        was_member = item_id in self.members
+        is_member = evt.type != EventType.DELETED and self.filter.matches(evt.payload)
+        if is_member:
+            self.members.add(item_id)
+            return EventType.UPDATED if was_member and evt.type == EventType.UPDATED else EventType.ADDED
+        self.members.discard(item_id)
+        return EventType.DELETED if was_member else None
+
+
+class CoalescingWindow:
+    """The UPDATED events of one pool that are held back to be sent as one."""
+
+    def __init__(self, timer: asyncio.TimerHandle) -> None:
         """Initialize."""
+        self.timer = timer
+        self.pending: Event | None = None
+
+
+class WebsocketManager:
+    """Websocket manager.
+
+    With a coalescing window set, UPDATED events are throttled per pool, i.e. per entity: the first
+    is sent right away, and any further ones within the window are collapsed into the latest, sent
+    when the window ends. A spool that is being printed from then costs its subscribers one frame
+    per window instead of one per usage report. ADDED and DELETED events are never held back, and
+    an UPDATED event that is being held back is sent before them, so clients see them in order.
+
+    For subscriptions in delta mode, the manager keeps the last sent state of each item, and sends a
+    JSON merge patch against it with every event. That state is only kept while there are such
+    subscriptions, and only for the most recently changed items; an item without it is sent in full.
+
+    Events are sent through the event bus, which delivers them here and in the other processes that
+    serve the database, if any. Each process coalesces and computes the deltas for its own clients.
+    """
+
+    def __init__(
+        self,
+        queue_size: int,
+        policy: WebsocketQueuePolicy,
+        coalesce_window_ms: int = 0,
+        idle_timeout: float = 0,
+    ) -> None:
+        """Initialize. A coalescing window of 0 sends every event, and an idle timeout of 0 never times out."""
+        self.queue_size = queue_size
+        self.policy = policy
+        self.coalesce_window_ms = coalesce_window_ms
+        self.idle_timeout = idle_timeout
         self.tree = SubscriptionTree()
+        self.connections: dict[WebSocket, Connection] = {}
+        self.windows: dict[tuple[str, ...], CoalescingWindow] = {}
+        self.filtered: dict[tuple[str, ...], dict[SubscriptionFilter, FilteredSubscriptions]] = {}
+        self.delta_connections = 0
+        self.snapshots: OrderedDict[tuple[str, ...], tuple[int, dict[str, Any]]] = OrderedDict()
+        self._versions = itertools.count(1)
+        self.epoch = uuid.uuid4().hex
+        self.bus = EventBus(self.deliver)
 
-    def connect(self, pool: tuple[str, ...], websocket: WebSocket) -> None:
-        """Connect a websocket."""
-        self.tree.add(pool, websocket)
+    def connect(
+        self,
+        pool: tuple[str, ...],
+        websocket: WebSocket,
+        mode: WebsocketMode = WebsocketMode.FULL,
+        subscription_filter: SubscriptionFilter | None = None,
+        members: set[str] | None = None,
+    ) -> None:
+        """Connect a websocket.
+
+        With a filter, only events for the items of the pool that match it are sent, and members
+        are the IDs of the items that match now. Subscriptions with equal filters share the work.
+        """
+        connection = Connection(websocket, pool, self.queue_size, self.policy, mode, subscription_filter)
+        self.connections[websocket] = connection
+        if mode is WebsocketMode.DELTA:
+            self.delta_connections += 1
+        if subscription_filter is None:
+            self.tree.add(pool, connection)
+        else:
+            groups = self.filtered.setdefault(pool, {})
+            if subscription_filter not in groups:
+                groups[subscription_filter] = FilteredSubscriptions(subscription_filter, members or set())
+            groups[subscription_filter].subscribers.add(connection)
         logger.info(
             "Client %s is now listening on pool %s",
-            websocket.client.host if websocket.client else "?",
+            _client_host(websocket),
             ",".join(pool),
         )
 
     def disconnect(self, pool: tuple[str, ...], websocket: WebSocket) -> None:
         """Disconnect a websocket."""
-        self.tree.remove(pool, websocket)
+        connection = self.connections.pop(websocket, None)
+        if connection is None:
+            return
+        if connection.subscription_filter is None:
+            self.tree.remove(pool, connection)
+        else:
+            groups = self.filtered[pool]
+            group = groups[connection.subscription_filter]
+            group.subscribers.discard(connection)
+            if not group.subscribers:
+                del groups[connection.subscription_filter]
+                if not groups:
+                    del self.filtered[pool]
+        connection.close()
+        if connection.mode is WebsocketMode.DELTA:
+            self.delta_connections -= 1
+            if self.delta_connections == 0:
+                self.snapshots.clear()
         logger.info(
             "Client %s has stopped listening on pool %s",
-            websocket.client.host if websocket.client else "?",
+            _client_host(websocket),
             ",".join(pool),
         )
 
+    async def serve(
+        self,
+        websocket: WebSocket,
+        pool: tuple[str, ...],
+        mode: WebsocketMode = WebsocketMode.FULL,
+        subscription_filter: SubscriptionFilter | None = None,
+        members: set[str] | None = None,
+    ) -> None:
+        """Accept a websocket, and send it the events of a pool until it disconnects.
+
+        Waits on the client rather than polling it, so an idle subscription costs nothing until the
+        client sends something. Any text it sends is answered with a health status, which clients
+        use as a keepalive. Keepalive at the protocol level, with ping and pong frames, is done by
+        uvicorn, which closes connections whose peer stops answering; that then ends up here as a
+        disconnect like any other.
+        """
+        await websocket.accept()
+        self.connect(pool, websocket, mode, subscription_filter, members)
+        connection = self.connections[websocket]
+        try:
+            while True:
+                message = await asyncio.wait_for(websocket.receive(), timeout=self.idle_timeout or None)
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("text"):
+                    connection.offer(HEALTHY_MESSAGE)
+        except asyncio.TimeoutError:
+            logger.info("Closing client %s, which has not sent anything in a while.", _client_host(websocket))
+            connection.close(code=status.WS_1001_GOING_AWAY)
+            await connection.wait_closed()
+        finally:
+            self.disconnect(pool, websocket)
+
+    def connection_counts(self) -> dict[tuple[str, ...], int]:
+        """Get the number of connected websockets per pool."""
+        counts: dict[tuple[str, ...], int] = {}
+        for connection in self.connections.values():
+            counts[connection.pool] = counts.get(connection.pool, 0) + 1
+        return counts
+
     async def send(self, pool: tuple[str, ...], evt: Event) -> None:
-        """Send a message to all websockets in a pool."""
-        await self.tree.send(pool, evt)
+        """Send a message to all websockets in a pool, in this process and all others on the event bus."""
+        await self.bus.publish(pool, evt)
+
+    async def deliver(self, pool: tuple[str, ...], evt: Event) -> None:
+        """Send a message to the websockets in a pool that are connected to this process."""
+        if self.coalesce_window_ms <= 0:
+            self._publish(pool, evt)
+            return
+
+        window = self.windows.get(pool)
+        if evt.type == EventType.UPDATED:
+            if window is None:
+                self._publish(pool, evt)
+                self._open_window(pool)
+            else:
+                window.pending = evt
+            return
+
+        if window is not None:
+            window.timer.cancel()
+            del self.windows[pool]
+            if window.pending is not None:
+                self._publish(pool, window.pending)
+        self._publish(pool, evt)
+
+    def _open_window(self, pool: tuple[str, ...]) -> None:
+        timer = asyncio.get_running_loop().call_later(self.coalesce_window_ms / 1000, self._close_window, pool)
+        self.windows[pool] = CoalescingWindow(timer)
+
+    def _close_window(self, pool: tuple[str, ...]) -> None:
+        """Send the latest held-back event, and keep throttling if there was one."""
+        window = self.windows.pop(pool)
+        if window.pending is not None:
+            self._publish(pool, window.pending)
+            self._open_window(pool)
+
+    def _publish(self, pool: tuple[str, ...], evt: Event) -> None:
+        # Serialized once here, however many clients receive it.
+        # exclude_none mirrors the REST endpoints' response_model_exclude_none=True so that
+        # websocket payloads and REST responses have an identical shape. Without this, unset
+        # fields arrive as explicit `null` over the websocket but are omitted over REST, which
+        # trips up clients that distinguish the two (e.g. the spool list's price fallback).
+        message = evt.model_dump_json(exclude_none=True)
+        delta = self._delta(pool, evt) if self.delta_connections > 0 else None
+        delta_message = delta.model_dump_json() if delta is not None else None
+        self.tree.send(pool, message, delta_message)
+
+        groups = self.filtered.get(pool[:-1])
+        if not groups:
+            return
+        # Each distinct filter is evaluated once, and each event type it results in serialized once.
+        messages: dict[EventType, tuple[str, str | None]] = {evt.type: (message, delta_message)}
+        for group in list(groups.values()):
+            typ = group.update(pool[-1], evt)
+            if typ is None:
+                continue
+            if typ not in messages:
+                messages[typ] = self._retype(evt, delta, typ)
+            _offer_all(group.subscribers, *messages[typ], pool)
+
+    def _retype(self, evt: Event, delta: DeltaEvent | None, typ: EventType) -> tuple[str, str | None]:
+        """Serialize an event as another type, for a filtered subscription that the item entered or left."""
+        message = evt.model_copy(update={"type": typ}).model_dump_json(exclude_none=True)
+        if delta is None:
+            return message, None
+        if typ == EventType.ADDED:
+            # New to the subscriber, so there is nothing to patch.
+            payload = evt.payload.model_dump(mode="json", exclude_none=True)
+            delta = delta.model_copy(update={"type": typ, "base_version": None, "patch": payload})
+        else:
+            delta = delta.model_copy(update={"type": typ, "patch": None})
+        return message, delta.model_dump_json()
+
+    def _delta(self, pool: tuple[str, ...], evt: Event) -> DeltaEvent:
+        """Turn an event into a patch against the last sent state of its item, and remember the new state."""
+        payload = evt.payload.model_dump(mode="json", exclude_none=True)
+        version = next(self._versions)
+        previous = self.snapshots.pop(pool, None)
+        if evt.type != EventType.DELETED:
+            self.snapshots[pool] = (version, payload)
+            if len(self.snapshots) > MAX_SNAPSHOTS:
+                self.snapshots.popitem(last=False)
+
+        base_version = previous[0] if previous is not None else None
+        if evt.type == EventType.DELETED:
+            patch = None
+        elif evt.type == EventType.UPDATED and previous is not None:
+            patch = merge_patch(previous[1], payload)
+        else:
+            # Also for an added item that reuses the ID of a deleted one.
+            base_version, patch = None, payload
+        return DeltaEvent(
+            type=evt.type,
+            resource=evt.resource,
+            date=evt.date,
+            id=pool[-1],
+            epoch=self.epoch,
+            version=version,
+            base_version=base_version,
+            patch=patch,
+        )
+
+
+def merge_patch(old: dict[str, Any], new: dict[str, Any]) -> dict[str, Any]:
+    """Create the JSON merge patch (RFC 7396) that turns one object into another."""
+    patch: dict[str, Any] = {}
+    for key, value in new.items():
+        old_value = old.get(key)
+        if value == old_value:
+            continue
+        if isinstance(value, dict) and isinstance(old_value, dict):
+            patch[key] = merge_patch(old_value, value)
+        else:
+            patch[key] = value
+    for key in old.keys() - new.keys():
+        patch[key] = None
+    return patch
 
 
-websocket_manager = WebsocketManager()
+websocket_manager = WebsocketManager(
+    env.get_ws_queue_size(),
+    env.get_ws_full_queue_policy(),
+    env.get_ws_coalesce_window(),
+    env.get_ws_idle_timeout(),
+)
@@ -0,0 +1,109 @@
+"""Tests for keeping the caches of several processes on one database in step."""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from spoolman.cache_sync import GENERATION_KEY, CacheSync, cache_sync
+from spoolman.database import models
+from spoolman.database.data_version import data_version
+from spoolman.database.database import claim_run
+from spoolman.database.geometry_cache import FilamentGeometry, filament_geometry_cache
+from spoolman.extra_field_registry import EntityType, extra_field_cache
+
+REGISTERED = datetime(2026, 1, 1)  # noqa: DTZ001
+
+
+async def _database() -> async_sessionmaker[AsyncSession]:
+    """Create a database with the row of the token in it, as the migrations leave it."""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_maker() as db:
+        db.add(models.Setting(key=GENERATION_KEY, value='""', last_updated=REGISTERED))
+        await db.commit()
+    return session_maker
+
+
+async def _write(session_maker: async_sessionmaker[AsyncSession]) -> None:
+    async with session_maker() as db:
+        db.add(models.Vendor(name="Vendor", registered=REGISTERED))
+        await db.commit()
+
+
+async def _token(session_maker: async_sessionmaker[AsyncSession]) -> str:
+    async with session_maker() as db:
+        setting = await db.get(models.Setting, GENERATION_KEY)
+        assert setting is not None
+        return setting.value
+
+
+def _fill_caches() -> None:
+    geometry = FilamentGeometry(filament_id=1, diameter=1.75, density=1.24)
+    filament_geometry_cache.put(1, geometry, filament_geometry_cache.generation)
+    extra_field_cache[EntityType.spool] = []
+
+
+@pytest.mark.asyncio
+async def test_a_write_in_another_process_clears_the_caches(monkeypatch: pytest.MonkeyPatch):
+    session_maker = await _database()
+    monkeypatch.setattr(cache_sync, "interval", 0.0)
+    other = CacheSync(0.0)
+    async with session_maker() as db:
+        await other.check(db)
+
+    _fill_caches()
+    version = data_version.value
+    async with session_maker() as db:
+        await other.check(db)
+    assert extra_field_cache
+    assert data_version.value == version
+
+    await _write(session_maker)
+    async with session_maker() as db:
+        await other.check(db)
+    assert not extra_field_cache
+    assert not filament_geometry_cache.entries
+    assert data_version.value > version
+
+
+@pytest.mark.asyncio
+async def test_writes_leave_the_token_alone_when_not_syncing(monkeypatch: pytest.MonkeyPatch):
+    session_maker = await _database()
+    monkeypatch.setattr(cache_sync, "interval", None)
+    token = await _token(session_maker)
+    await _write(session_maker)
+    assert await _token(session_maker) == token
+
+
+@pytest.mark.asyncio
+async def test_sessions_that_only_read_leave_the_token_alone(monkeypatch: pytest.MonkeyPatch):
+    session_maker = await _database()
+    monkeypatch.setattr(cache_sync, "interval", 0.0)
+    token = await _token(session_maker)
+    async with session_maker() as db:
+        await db.get(models.Setting, GENERATION_KEY)
+        await db.commit()
+    assert await _token(session_maker) == token
+
+
+def test_checks_are_taken_once_per_interval():
+    sync = CacheSync(60.0)
+    assert sync.due()
+    assert not sync.due()
+    assert not CacheSync(None).due()
+
+
+@pytest.mark.asyncio
+async def test_a_run_is_claimed_once():
+    session_maker = await _database()
+    async with session_maker() as db:
+        assert await claim_run(db, "backup", "2026-10-17")
+    async with session_maker() as db:
+        assert not await claim_run(db, "backup", "2026-10-17")
+    async with session_maker() as db:
+        assert await claim_run(db, "analyze", "2026-10-17")
+    async with session_maker() as db:
+        assert await claim_run(db, "backup", "2026-10-18")
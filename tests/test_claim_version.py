@@ -0,0 +1,74 @@
+"""Tests for conditional updates: an If-Match that matched when the item was read must still hold when it is written."""
+
+import tempfile
+from datetime import datetime
+
+import pytest
+import sqlalchemy
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from spoolman.database import models
+from spoolman.database.utils import claim_version, version_etag
+from spoolman.exceptions import PreconditionFailedError
+
+REGISTERED = datetime(2026, 1, 1)  # noqa: DTZ001
+
+
+def etag(vendor: models.Vendor) -> str:
+    return version_etag(vendor.registered, vendor.version)
+
+
+@pytest.mark.asyncio
+async def test_the_version_changing_between_the_check_and_the_write_fails_the_update():
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/spoolman.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+        async with session_maker() as db:
+            db.add(models.Vendor(id=1, registered=REGISTERED, name="Polymaker", version=1))
+            await db.commit()
+
+        async with session_maker() as first, session_maker() as second:
+            first_vendor = await first.get(models.Vendor, 1)
+            second_vendor = await second.get(models.Vendor, 1)
+            if_match = etag(first_vendor)
+            assert etag(second_vendor) == if_match
+
+            await claim_version(first, first_vendor, if_match=if_match, etag=etag(first_vendor), message="Changed")
+            first_vendor.name = "First"
+            await first.commit()
+
+            # The second update read the vendor before the first one was written, so its check passes.
+            with pytest.raises(PreconditionFailedError):
+                await claim_version(
+                    second,
+                    second_vendor,
+                    if_match=if_match,
+                    etag=etag(second_vendor),
+                    message="Changed",
+                )
+            await second.rollback()
+
+        async with session_maker() as db:
+            row = (await db.execute(sqlalchemy.select(models.Vendor.name, models.Vendor.version))).one()
+            assert tuple(row) == ("First", 2)
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_a_stale_etag_fails_before_anything_is_written():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_maker() as db:
+        vendor = models.Vendor(id=1, registered=REGISTERED, name="Polymaker", version=3)
+        db.add(vendor)
+        await db.commit()
+
+        stale = version_etag(REGISTERED, 2)
+        with pytest.raises(PreconditionFailedError):
+            await claim_version(db, vendor, if_match=stale, etag=etag(vendor), message="Changed")
+        assert (await db.execute(sqlalchemy.select(models.Vendor.version))).scalar_one() == 3
+    await engine.dispose()
@@ -12,7 +12,8 @@ from typing import Any
 import pytest
 
 from spoolman.api.v1.filament import FilamentParameters
-from spoolman.api.v1.models import Filament, _sanitize_color_hex, _sanitize_multi_color_hexes
+from spoolman.api.v1.models import Filament
+from spoolman.colors import sanitize_color_hex, sanitize_multi_color_hexes
 
 
 def _params(**kwargs: Any) -> FilamentParameters:  # noqa: ANN401
@@ -63,7 +64,7 @@ def test_color_hex_fits_the_database_column():
     ],
 )
 def test_from_db_sanitizes_color_hex(stored: str | None, expected: str | None):
-    assert _sanitize_color_hex(stored) == expected
+    assert sanitize_color_hex(stored) == expected
 
 
 @pytest.mark.parametrize(
@@ -77,7 +78,7 @@ def test_from_db_sanitizes_color_hex(stored: str | None, expected: str | None):
     ],
 )
 def test_from_db_sanitizes_multi_color_hexes(stored: str | None, expected: str | None):
-    assert _sanitize_multi_color_hexes(stored) == expected
+    assert sanitize_multi_color_hexes(stored) == expected
 
 
 def test_from_db_survives_a_row_written_before_the_fix():
@@ -0,0 +1,73 @@
+"""Tests for the count cache of paginated searches, and the data version it is keyed by."""
+
+from datetime import datetime
+
+import pytest
+import sqlalchemy
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from spoolman.database import models
+from spoolman.database.count_cache import CountCache
+from spoolman.database.data_version import data_version
+
+KEY = ("SELECT count(*) FROM spool", "[]")
+
+
+def test_count_is_only_served_at_its_version():
+    cache = CountCache(10)
+    cache.put(KEY, 1, 42)
+    assert cache.get(KEY, 1) == 42
+    assert cache.get(KEY, 2) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_estimate_is_served_at_any_version():
+    cache = CountCache(10)
+    assert cache.get(KEY, None) is None
+    cache.put(KEY, 1, 42)
+    assert cache.get(KEY, None) == 42
+
+
+def test_older_count_does_not_replace_newer():
+    cache = CountCache(10)
+    cache.put(KEY, 2, 43)
+    cache.put(KEY, 1, 42)
+    assert cache.get(KEY, 2) == 43
+
+
+def test_least_recently_used_is_evicted():
+    cache = CountCache(2)
+    other, third = ("a", "[]"), ("b", "[]")
+    cache.put(KEY, 1, 1)
+    cache.put(other, 1, 2)
+    cache.get(KEY, 1)
+    cache.put(third, 1, 3)
+    assert set(cache.entries) == {KEY, third}
+
+
+@pytest.mark.asyncio
+async def test_data_version_is_bumped_by_committed_writes_only():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    start = data_version.value
+    async with session_maker() as db:
+        await db.execute(sqlalchemy.select(models.Vendor))
+        await db.commit()
+    assert data_version.value == start
+
+    async with session_maker() as db:
+        db.add(models.Vendor(name="Polymaker", registered=datetime(2026, 1, 1)))  # noqa: DTZ001
+        await db.flush()
+        assert data_version.value == start
+        await db.commit()
+    assert data_version.value == start + 1
+
+    async with session_maker() as db:
+        await db.execute(sqlalchemy.update(models.Vendor).values(comment="renamed"))
+        await db.commit()
+    assert data_version.value == start + 2
+
+    await engine.dispose()
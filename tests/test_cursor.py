@@ -0,0 +1,166 @@
+"""Tests for the cursors of keyset pagination.
+
+Walking a search page by page with cursors must visit every row once, in the order the search sorts
+them in, also when sort keys are NULL, which order_by_clauses puts last in both directions.
+"""
+
+from datetime import datetime
+
+import pytest
+import sqlalchemy
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+
+from spoolman.database.utils import (
+    ItemStream,
+    SortOrder,
+    after_cursor,
+    decode_cursor,
+    encode_cursor,
+    find_page,
+    order_by_clauses,
+)
+
+metadata = sqlalchemy.MetaData()
+items = sqlalchemy.Table(
+    "items",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("location", sqlalchemy.String, nullable=True),
+    sqlalchemy.Column("weight", sqlalchemy.Float, nullable=True),
+)
+ROWS = [
+    (1, "A", 10.0),
+    (2, None, 5.0),
+    (3, "B", None),
+    (4, "A", None),
+    (5, "A", 10.0),
+    (6, None, None),
+    (7, "B", 2.5),
+    (8, "A", 7.0),
+]
+
+
+@pytest.fixture(scope="module")
+def engine() -> sqlalchemy.Engine:
+    engine = sqlalchemy.create_engine("sqlite://")
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(items.insert(), [{"id": i, "location": loc, "weight": w} for i, loc, w in ROWS])
+    return engine
+
+
+def test_cursor_round_trip():
+    sort_by = {"last_used": SortOrder.DESC}
+    values = [datetime(2026, 1, 2, 3, 4, 5), None, "A", 1.5]  # noqa: DTZ001
+    cursor = encode_cursor(sort_by, values, 42)
+    assert decode_cursor(cursor, sort_by, 4) == (values, 42)
+
+
+def test_cursor_of_another_sort_is_rejected():
+    cursor = encode_cursor({"location": SortOrder.ASC}, ["A"], 1)
+    with pytest.raises(ValueError, match="another sort order"):
+        decode_cursor(cursor, {"location": SortOrder.DESC}, 1)
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", encode_cursor(None, [1], 1)[:-3]])
+def test_invalid_cursor_is_rejected(cursor: str):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor, None, 1)
+
+
+@pytest.mark.parametrize("location_order", list(SortOrder))
+@pytest.mark.parametrize("weight_order", list(SortOrder))
+def test_pages_visit_every_row_in_order(engine: sqlalchemy.Engine, location_order: SortOrder, weight_order: SortOrder):
+    sort_keys = [(items.c.location, location_order), (items.c.weight, weight_order)]
+    sort_by = {"location": location_order, "weight": weight_order}
+    order = [clause for expr, key_order in sort_keys for clause in order_by_clauses([expr], key_order)]
+    stmt = sqlalchemy.select(items.c.id, items.c.location, items.c.weight).order_by(*order, items.c.id)
+
+    with engine.connect() as conn:
+        expected = [row.id for row in conn.execute(stmt)]
+        seen: list[int] = []
+        cursor = None
+        while True:
+            page_stmt = stmt.limit(3)
+            if cursor is not None:
+                values, last_id = decode_cursor(cursor, sort_by, len(sort_keys))
+                page_stmt = page_stmt.where(after_cursor(sort_keys, items.c.id, values, last_id))
+            page = conn.execute(page_stmt).all()
+            seen.extend(row.id for row in page)
+            if len(page) < 3:
+                break
+            cursor = encode_cursor(sort_by, [page[-1].location, page[-1].weight], page[-1].id)
+
+    assert seen == expected
+    # NULLs are last in both directions.
+    assert [row[1] for row in ROWS if row[0] == expected[-1]] == [None]
+
+
+async def _stream(db: AsyncSession, location_order: SortOrder) -> tuple[ItemStream, int | None]:
+    sort_keys = [(items.c.location, location_order), (items.c.weight, SortOrder.DESC)]
+    stream, total, _ = await find_page(
+        db=db,
+        stmt=sqlalchemy.select(items.c.id, items.c.location, items.c.weight),
+        sort_by=None,
+        sort_keys=sort_keys,
+        id_column=items.c.id,
+        limit=None,
+        offset=1,
+        cursor=None,
+        entity=False,
+        stream=True,
+    )
+    assert isinstance(stream, ItemStream)
+    stream.batch_size = 3
+    return stream, total
+
+
+async def _async_engine() -> AsyncEngine:
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+        await conn.execute(items.insert(), [{"id": i, "location": loc, "weight": w} for i, loc, w in ROWS])
+    return engine
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("location_order", list(SortOrder))
+async def test_stream_reads_every_row_in_order(location_order: SortOrder):
+    engine = await _async_engine()
+    sort_keys = [(items.c.location, location_order), (items.c.weight, SortOrder.DESC)]
+    order = [clause for expr, key_order in sort_keys for clause in order_by_clauses([expr], key_order)]
+    stmt = sqlalchemy.select(items.c.id, items.c.location, items.c.weight).order_by(*order, items.c.id)
+
+    async with AsyncSession(engine) as db:
+        expected = [tuple(row) for row in await db.execute(stmt)]
+        stream, total = await _stream(db, location_order)
+        batches = [batch async for batch in stream.batches()]
+    await engine.dispose()
+
+    assert total == len(expected) - 1
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert [tuple(row) for batch in batches for row in batch] == expected[1:]
+
+
+@pytest.mark.asyncio
+async def test_stream_sends_each_row_once_while_rows_change():
+    engine = await _async_engine()
+    async with AsyncSession(engine) as db:
+        stream, total = await _stream(db, SortOrder.ASC)
+        order = list(stream.ids)
+        batches = stream.batches()
+        first = await anext(batches)
+
+        # Move a row that was sent to the end, one that was not to the start, and delete another.
+        sent, unsent, deleted = first[0][0], order[-1], order[-2]
+        async with engine.begin() as conn:
+            await conn.execute(items.update().where(items.c.id == sent).values(location="Z"))
+            await conn.execute(items.update().where(items.c.id == unsent).values(location="0"))
+            await conn.execute(items.delete().where(items.c.id == deleted))
+        rows = [*first, *[row async for batch in batches for row in batch]]
+    await engine.dispose()
+
+    assert total == len(order)
+    # Each row once, in the order of when the list was asked for, with the values it has when read.
+    assert [row[0] for row in rows] == [item_id for item_id in order if item_id != deleted]
+    assert rows[-1][1] == "0"
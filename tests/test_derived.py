@@ -0,0 +1,54 @@
+"""Tests for the derived spool columns, which have to hold the values a spool is sent with."""
+
+from datetime import datetime
+
+import pytest
+import sqlalchemy
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload
+
+from spoolman.api.v1.models import Spool
+from spoolman.database import derived, models
+
+REGISTERED = datetime(2026, 1, 1)  # noqa: DTZ001
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("filament_weight", [1000.0, None])
+@pytest.mark.parametrize("filament_price", [20.0, None])
+async def test_refresh_computes_what_spools_are_sent_with(filament_weight: float | None, filament_price: float | None):
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with session_maker() as db:
+        filament = models.Filament(
+            registered=REGISTERED,
+            density=1.24,
+            diameter=1.75,
+            weight=filament_weight,
+            price=filament_price,
+        )
+        spools = [
+            models.Spool(filament=filament, registered=REGISTERED, used_weight=250.0),
+            models.Spool(filament=filament, registered=REGISTERED, used_weight=1200.0, initial_weight=750.0),
+            models.Spool(filament=filament, registered=REGISTERED, used_weight=0.0, price=12.5),
+        ]
+        db.add_all(spools)
+        await db.flush()
+        await db.execute(derived.refresh(models.Spool.filament_id == filament.id))
+        await db.commit()
+
+        stmt = sqlalchemy.select(models.Spool).options(
+            joinedload(models.Spool.filament).joinedload(models.Filament.vendor)
+        )
+        rows = await db.execute(stmt, execution_options={"populate_existing": True})
+        for item in rows.scalars().all():
+            sent = Spool.from_db(item)
+            assert item.remaining_weight == pytest.approx(sent.remaining_weight)
+            assert item.remaining_length == pytest.approx(sent.remaining_length)
+            assert item.used_length == pytest.approx(sent.used_length)
+            assert item.effective_price == (sent.price if sent.price is not None else filament_price)
+
+    await engine.dispose()
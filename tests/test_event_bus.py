@@ -0,0 +1,181 @@
+"""Tests for carrying websocket events to the other processes that serve the database.
+
+Each process delivers its own events straight away, and receives those of the others once. With the
+unix bus, one of the processes relays, and another takes over when it stops. With the postgres bus,
+an event too large for a notification is passed on through the database.
+"""
+
+import asyncio
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from spoolman.api.v1.models import Event, EventType, Vendor, VendorEvent
+from spoolman.database import models
+from spoolman.event_bus import (
+    MAX_NOTIFY_SIZE,
+    STORED_PREFIX,
+    EventBus,
+    PostgresEventBus,
+    UnixSocketEventBus,
+    decode,
+    encode,
+)
+
+
+def vendor_event(name: str, extra: dict[str, str] | None = None) -> VendorEvent:
+    vendor = Vendor(
+        id=1,
+        registered=datetime(2026, 1, 1, tzinfo=timezone.utc),
+        name=name,
+        extra=extra if extra is not None else {"url": '"x"'},
+    )
+    return VendorEvent(
+        type=EventType.UPDATED,
+        resource="vendor",
+        date=datetime(2026, 1, 2, tzinfo=timezone.utc),
+        payload=vendor,
+    )
+
+
+class Process:
+    """The websocket manager of one process, as far as the event bus sees it."""
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.received: list[tuple[tuple[str, ...], Event]] = []
+
+    async def deliver(self, pool: tuple[str, ...], evt: Event) -> None:
+        """Receive an event."""
+        self.received.append((pool, evt))
+
+
+class FakeConnection:
+    """Just enough of an asyncpg connection for the postgres bus, on a channel shared with the others."""
+
+    def __init__(self, pid: int, notifications: list[tuple[int, str]]) -> None:
+        """Initialize."""
+        self.pid = pid
+        self.notifications = notifications
+
+    def get_server_pid(self) -> int:
+        """Get the process ID of the backend."""
+        return self.pid
+
+    async def execute(self, _query: str, _channel: str, payload: str) -> None:
+        """Notify."""
+        self.notifications.append((self.pid, payload))
+
+
+async def wait_for(condition) -> None:  # noqa: ANN001
+    for _ in range(500):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("Timed out")
+
+
+async def connected(bus: UnixSocketEventBus) -> None:
+    await wait_for(lambda: bus._writer is not None)  # noqa: SLF001
+
+
+def test_an_event_survives_being_sent():
+    evt = vendor_event("Polymaker")
+    pool, received = decode(encode(("vendor", "1"), evt))
+    assert pool == ("vendor", "1")
+    assert isinstance(received, VendorEvent)
+    assert received == evt
+
+
+@pytest.mark.asyncio
+async def test_the_local_bus_delivers_in_this_process():
+    process = Process()
+    bus = EventBus(process.deliver)
+    bus.start()
+    evt = vendor_event("Polymaker")
+    await bus.publish(("vendor", "1"), evt)
+    await bus.stop()
+    assert process.received == [(("vendor", "1"), evt)]
+
+
+@pytest.mark.asyncio
+async def test_the_unix_bus_delivers_in_every_process_once():
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "events.sock"
+        processes = [Process() for _ in range(3)]
+        buses = [UnixSocketEventBus(process.deliver, path) for process in processes]
+        for bus in buses:
+            bus.start()
+        try:
+            for bus in buses:
+                await connected(bus)
+            await buses[1].publish(("vendor", "1"), vendor_event("First"))
+            await buses[2].publish(("vendor", "1"), vendor_event("Second"))
+            await wait_for(lambda: all(len(process.received) == 2 for process in processes))
+            await asyncio.sleep(0.05)
+            for process in processes:
+                assert sorted(evt.payload.name for _, evt in process.received) == ["First", "Second"]
+        finally:
+            for bus in buses:
+                await bus.stop()
+
+
+@pytest.mark.asyncio
+async def test_another_process_relays_when_the_relaying_one_stops():
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "events.sock"
+        processes = [Process() for _ in range(3)]
+        buses = [UnixSocketEventBus(process.deliver, path) for process in processes]
+        buses[0].start()
+        await connected(buses[0])
+        for bus in buses[1:]:
+            bus.start()
+        try:
+            for bus in buses[1:]:
+                await connected(bus)
+            await buses[0].stop()
+            await wait_for(lambda: all(bus._writer is None for bus in buses[1:]))  # noqa: SLF001
+            for bus in buses[1:]:
+                await connected(bus)
+
+            await buses[1].publish(("vendor", "1"), vendor_event("After"))
+            await wait_for(lambda: len(processes[2].received) == 1)
+            assert processes[0].received == []
+        finally:
+            for bus in buses:
+                await bus.stop()
+
+
+@pytest.mark.asyncio
+async def test_the_postgres_bus_passes_large_events_on_through_the_database():
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/spoolman.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        notifications: list[tuple[int, str]] = []
+        processes = [Process() for _ in range(2)]
+        buses = [PostgresEventBus(process.deliver, engine) for process in processes]
+        connections = [FakeConnection(pid, notifications) for pid in (1, 2)]
+        for bus, connection in zip(buses, connections, strict=True):
+            bus._connection = connection  # noqa: SLF001
+            bus._delivery = asyncio.create_task(bus._deliver_notifications())  # noqa: SLF001
+        try:
+            # Many extra fields, as a spool with its filament and vendor can have.
+            large = vendor_event("Large", {f"field_{i}": f'"{"x" * 100}"' for i in range(MAX_NOTIFY_SIZE // 100)})
+            await buses[0].publish(("vendor", "1"), large)
+            await buses[0].publish(("vendor", "1"), vendor_event("Small"))
+            assert notifications[0][1].startswith(STORED_PREFIX)
+            assert len(notifications[1][1]) < MAX_NOTIFY_SIZE
+
+            for pid, payload in notifications:
+                buses[1]._notified(connections[1], pid, PostgresEventBus.CHANNEL, payload)  # noqa: SLF001
+            await wait_for(lambda: len(processes[1].received) == 2)
+            assert processes[1].received[0] == (("vendor", "1"), large)
+            assert processes[1].received[1][1].payload.name == "Small"
+        finally:
+            for bus in buses:
+                await bus.stop()
+            await engine.dispose()
@@ -0,0 +1,36 @@
+"""Tests for the typed copies of an extra field's value, which its filters and sorts use."""
+
+import json
+
+import pytest
+
+from spoolman.database import models
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        (json.dumps("PLA"), {"value_text": "PLA"}),
+        (json.dumps("2026-01-01T00:00:00.000Z"), {"value_text": "2026-01-01T00:00:00.000Z"}),
+        (json.dumps("x" * 300), {"value_text": "x" * models.VALUE_TEXT_LENGTH}),
+        ("42", {"value_num": 42.0}),
+        ("2.50", {"value_num": 2.5}),
+        ("true", {"value_bool": True}),
+        ("false", {"value_bool": False}),
+        ("[1, 2.5]", {"value_num": 1.0, "value_num_hi": 2.5}),
+        ("[1.26, null]", {"value_num": 1.26}),
+        (json.dumps(["a", "b"]), {}),
+        ("null", {}),
+        ("1e999", {}),
+        ("not json", {}),
+    ],
+)
+def test_field_values(value: str, expected: dict[str, object]):
+    assert models.field_values(value) == {column: expected.get(column) for column in models.VALUE_COLUMNS}
+
+
+def test_copies_follow_the_value():
+    field = models.SpoolField(key="price_range", value="[1, 2]")
+    assert (field.value_num, field.value_num_hi) == (1.0, 2.0)
+    field.value = json.dumps("text")
+    assert (field.value_text, field.value_num, field.value_num_hi) == ("text", None, None)
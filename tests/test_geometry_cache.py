@@ -0,0 +1,42 @@
+"""Tests for the filament geometry cache behind length-based usage."""
+
+from spoolman.database.geometry_cache import FilamentGeometry, FilamentGeometryCache
+
+PLA = FilamentGeometry(filament_id=1, diameter=1.75, density=1.24)
+PETG = FilamentGeometry(filament_id=2, diameter=1.75, density=1.27)
+
+
+def test_hits_and_misses_are_counted():
+    cache = FilamentGeometryCache(10)
+    assert cache.get(1) is None
+    cache.put(1, PLA, cache.generation)
+    assert cache.get(1) == PLA
+    assert cache.get(1) == PLA
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_least_recently_used_is_evicted():
+    cache = FilamentGeometryCache(2)
+    cache.put(1, PLA, cache.generation)
+    cache.put(2, PLA, cache.generation)
+    cache.get(1)
+    cache.put(3, PETG, cache.generation)
+    assert set(cache.entries) == {1, 3}
+
+
+def test_invalidate_filament_drops_all_of_its_spools():
+    cache = FilamentGeometryCache(10)
+    cache.put(1, PLA, cache.generation)
+    cache.put(2, PLA, cache.generation)
+    cache.put(3, PETG, cache.generation)
+    cache.invalidate_filament(PLA.filament_id)
+    assert set(cache.entries) == {3}
+
+
+def test_value_read_before_an_invalidation_is_not_cached():
+    """A value read while the filament was being edited may be the old one."""
+    cache = FilamentGeometryCache(10)
+    generation = cache.generation
+    cache.invalidate_filament(PLA.filament_id)
+    cache.put(1, PLA, generation)
+    assert cache.get(1) is None
@@ -0,0 +1,105 @@
+"""Tests for converting and serializing lists of spools for the list endpoints."""
+
+import json
+from collections.abc import AsyncIterator
+from datetime import datetime
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from spoolman.api.v1.models import (
+    FromDbMemo,
+    ModelResponse,
+    NormalizedSpoolList,
+    Spool,
+    normalize_spool,
+    stream_json_array,
+)
+from spoolman.database import models
+
+REGISTERED = datetime(2026, 1, 1)  # noqa: DTZ001
+
+
+def make_spools() -> list[models.Spool]:
+    vendor = models.Vendor(id=1, registered=REGISTERED, name="Polymaker", extra=[])
+    filament = models.Filament(
+        id=1,
+        registered=REGISTERED,
+        name="PolyTerra™ Charcoal Black",
+        vendor=vendor,
+        density=1.24,
+        diameter=1.75,
+        weight=1000,
+        extra=[models.FilamentField(key="finish", value='"matte"')],
+    )
+    return [
+        models.Spool(id=i, registered=REGISTERED, filament=filament, used_weight=i / 3, archived=False, extra=[])
+        for i in range(1, 4)
+    ]
+
+
+def test_memo_shares_filaments_and_vendors():
+    memo = FromDbMemo()
+    first, second, _ = (Spool.from_db(item, memo) for item in make_spools())
+    assert first.filament is second.filament
+    assert list(memo.filaments) == [1]
+    assert list(memo.vendors) == [1]
+
+
+def test_response_matches_jsonable_encoder():
+    items = make_spools()
+    expected = JSONResponse(content=jsonable_encoder([Spool.from_db(item) for item in items], exclude_none=True))
+    memo = FromDbMemo()
+    response = ModelResponse(content=[Spool.from_db(item, memo) for item in items])
+    assert response.body == expected.body
+    assert response.headers["content-type"] == expected.headers["content-type"]
+
+
+def test_normalized_list_has_each_filament_and_vendor_once():
+    memo = FromDbMemo()
+    spools = [Spool.from_db(item, memo) for item in make_spools()]
+    body = json.loads(ModelResponse(content=NormalizedSpoolList.from_spools(spools, memo)).body)
+
+    assert [spool["filament_id"] for spool in body["spools"]] == [1, 1, 1]
+    assert all("filament" not in spool for spool in body["spools"])
+    assert body["filaments"]["1"]["vendor_id"] == 1
+    assert "vendor" not in body["filaments"]["1"]
+    assert body["vendors"]["1"]["name"] == "Polymaker"
+
+
+def test_normalized_spool_keeps_the_field_order():
+    spool = Spool.from_db(make_spools()[0])
+    fields = list(normalize_spool(spool).model_dump(exclude_none=True))
+    assert fields == [name if name != "filament" else "filament_id" for name in spool.model_dump(exclude_none=True)]
+
+
+async def _iterate(*items: bytes) -> AsyncIterator[bytes]:
+    for item in items:
+        yield item
+
+
+async def _join(parts: AsyncIterator[bytes]) -> bytes:
+    return b"".join([part async for part in parts])
+
+
+@pytest.mark.asyncio
+async def test_streamed_arrays_are_joined():
+    assert await _join(stream_json_array(_iterate())) == b"[]"
+    assert await _join(stream_json_array(_iterate(b"[]", b"[1]", b"[]", b"[2,3]"))) == b"[1,2,3]"
+
+
+@pytest.mark.asyncio
+async def test_streamed_normalized_list_matches_response():
+    items = make_spools()
+    memo = FromDbMemo()
+    spools = [Spool.from_db(item, memo) for item in items]
+    expected = ModelResponse(content=NormalizedSpoolList.from_spools(spools, memo)).body
+
+    stream_memo = FromDbMemo()
+
+    async def batches() -> AsyncIterator[list[Spool]]:
+        yield [Spool.from_db(item, stream_memo) for item in items[:2]]
+        yield [Spool.from_db(item, stream_memo) for item in items[2:]]
+
+    assert await _join(NormalizedSpoolList.stream(batches(), stream_memo)) == expected
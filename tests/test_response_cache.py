@@ -0,0 +1,91 @@
+"""Tests for the response cache of the list endpoints."""
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from spoolman.database.data_version import data_version
+from spoolman.response_cache import CachedResponse, ResponseCache, ResponseCacheMiddleware, match, none_match
+
+
+def make_client(cache: ResponseCache) -> tuple[TestClient, list[str]]:
+    calls: list[str] = []
+
+    async def spools(request: Request) -> JSONResponse:
+        calls.append(str(request.query_params))
+        return JSONResponse([{"id": 1, "location": request.query_params.get("location")}])
+
+    app = Starlette(routes=[Route("/spool", spools), Route("/spool/{spool_id}", spools)])
+    app.add_middleware(ResponseCacheMiddleware, cache=cache)
+    return TestClient(app), calls
+
+
+def test_response_is_served_until_the_data_changes():
+    client, calls = make_client(ResponseCache(1024 * 1024))
+    first = client.get("/spool?location=A&allow_archived=true")
+    second = client.get("/spool?allow_archived=true&location=A")
+    assert second.json() == first.json()
+    assert second.headers["etag"] == first.headers["etag"]
+    assert len(calls) == 1
+
+    data_version.bump()
+    client.get("/spool?location=A&allow_archived=true")
+    assert len(calls) == 2
+
+
+def test_if_none_match_gets_not_modified():
+    client, _ = make_client(ResponseCache(1024 * 1024))
+    etag = client.get("/spool").headers["etag"]
+
+    result = client.get("/spool", headers={"if-none-match": f"W/{etag}"})
+    assert result.status_code == 304
+    assert result.content == b""
+    assert result.headers["etag"] == etag
+
+    # Still answered after a change, as long as the content is the same.
+    data_version.bump()
+    assert client.get("/spool", headers={"if-none-match": etag}).status_code == 304
+    assert client.get("/spool?location=B", headers={"if-none-match": etag}).status_code == 200
+
+
+def test_other_paths_are_not_cached():
+    client, calls = make_client(ResponseCache(1024 * 1024))
+    client.get("/spool/1")
+    result = client.get("/spool/1")
+    assert "etag" not in result.headers
+    assert len(calls) == 2
+
+
+def test_cache_is_bounded_by_size():
+    def entry(size: int) -> CachedResponse:
+        return CachedResponse(version=0, headers=[], body=b"x" * size, etag=b'"x"')
+
+    cache = ResponseCache(1000)
+    cache.put("a", entry(250))
+    cache.put("b", entry(250))
+    cache.get("a", 0)
+    cache.put("c", entry(250))
+    cache.put("d", entry(250))
+    cache.put("e", entry(250))
+    assert list(cache.entries) == ["a", "c", "d", "e"]
+    assert cache.size == 1000
+
+    cache.put("f", entry(300))
+    assert "f" not in cache.entries
+
+
+def test_if_none_match_uses_weak_comparison():
+    assert none_match('W/"a", "b"', '"a"')
+    assert none_match("*", '"a"')
+    assert not none_match('"b"', '"a"')
+    assert not none_match(None, '"a"')
+
+
+def test_if_match_uses_strong_comparison():
+    assert match('"b", "a"', '"a"')
+    assert match("*", '"a"')
+    assert match(None, '"a"')
+    assert not match('W/"a"', '"a"')
+    assert not match('"b"', '"a"')
@@ -0,0 +1,40 @@
+"""Tests for parsing the sparse fieldsets of the spool search."""
+
+import pytest
+
+from spoolman.database import models
+from spoolman.database.spool_fields import parse_fields
+
+
+def test_only_the_needed_columns_are_selected():
+    fieldset = parse_fields("id,remaining_weight,location")
+    assert list(fieldset.fields) == ["id", "remaining_weight", "location"]
+    assert fieldset.columns == [
+        models.Spool.id,
+        models.Spool.initial_weight,
+        models.Filament.weight,
+        models.Spool.used_weight,
+        models.Spool.location,
+    ]
+
+
+def test_objects_stand_for_all_of_their_fields():
+    fieldset = parse_fields("filament.vendor")
+    assert "filament.vendor.name" in fieldset.fields
+    assert "filament.name" not in fieldset.fields
+    assert fieldset.extra_fields == {"filament.vendor.extra": None}
+
+
+def test_extra_fields():
+    fieldset = parse_fields("extra.shelf,extra.dryer,filament.extra")
+    assert fieldset.extra_fields == {"extra": {"shelf", "dryer"}, "filament.extra": None}
+    assert models.Filament.id in fieldset.columns
+
+
+@pytest.mark.parametrize(
+    ("fields", "message"),
+    [("", "No fields"), ("id,filament.nope", "Unknown field"), ("extra.", "Unknown field")],
+)
+def test_invalid_fields(fields: str, message: str):
+    with pytest.raises(ValueError, match=message):
+        parse_fields(fields)
@@ -0,0 +1,118 @@
+"""Tests for evaluating the spool search filters in memory, for filtered websocket subscriptions."""
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from spoolman.api.v1.models import Filament, Spool, Vendor
+from spoolman.database.spool_filter import SpoolFilter
+from spoolman.extra_field_registry import EntityType, ExtraField, ExtraFieldType
+
+REGISTERED = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def make_spool(**fields: object) -> Spool:
+    vendor = Vendor(id=3, registered=REGISTERED, name="Polymaker", extra={})
+    filament = Filament(
+        id=2,
+        registered=REGISTERED,
+        name="PolyTerra Charcoal Black",
+        vendor=vendor,
+        material="PLA",
+        density=1.24,
+        diameter=1.75,
+        extra={},
+    )
+    values = {
+        "id": 1,
+        "registered": REGISTERED,
+        "filament": filament,
+        "used_weight": 0,
+        "used_length": 0,
+        "location": "Shelf A",
+        "archived": False,
+        "extra": {},
+    }
+    values.update(fields)
+    return Spool(**values)
+
+
+def with_fields(spool_filter: SpoolFilter, *fields: ExtraField) -> SpoolFilter:
+    spool_filter.extra_fields[EntityType.spool] = {extra_field.key: extra_field for extra_field in fields}
+    return spool_filter
+
+
+@pytest.mark.parametrize(
+    ("location", "matches"),
+    [
+        ("shelf", True),
+        ('"Shelf A"', True),
+        ('"shelf a"', False),
+        ("Shelf B,Shelf A", True),
+        ("", False),
+        ("Drawer", False),
+    ],
+)
+def test_location(location: str, matches: bool):  # noqa: FBT001
+    assert SpoolFilter(location=location).matches(make_spool()) is matches
+
+
+def test_empty_string_matches_unset():
+    assert SpoolFilter(location="").matches(make_spool(location=None))
+    assert SpoolFilter(lot_nr="").matches(make_spool())
+
+
+def test_related_fields():
+    spool = make_spool()
+    assert SpoolFilter(filament_material="pla", vendor_name='"Polymaker"').matches(spool)
+    assert SpoolFilter(filament_id=(2, 5), vendor_id=(3,)).matches(spool)
+    assert not SpoolFilter(vendor_id=(-1,)).matches(spool)
+    assert SpoolFilter(vendor_id=(-1,)).matches(make_spool(filament=spool.filament.model_copy(update={"vendor": None})))
+
+
+def test_archived_spools_need_allow_archived():
+    spool = make_spool(archived=True)
+    assert not SpoolFilter(location="Shelf").matches(spool)
+    assert SpoolFilter(location="Shelf", allow_archived=True).matches(spool)
+
+
+def test_datetime_range():
+    spool = make_spool(last_used=datetime(2026, 5, 1, 12, tzinfo=timezone.utc))
+    assert SpoolFilter(last_used="2026-05-01T00:00:00Z|").matches(spool)
+    assert not SpoolFilter(last_used="|2026-05-01T00:00:00Z").matches(spool)
+    assert not SpoolFilter(first_used="2026-05-01T00:00:00Z|").matches(spool)
+    assert SpoolFilter(first_used="").matches(spool)
+
+
+def test_extra_fields():
+    fields = (
+        ExtraField(key="shelf", name="Shelf", field_type=ExtraFieldType.text, entity_type=EntityType.spool),
+        ExtraField(key="slot", name="Slot", field_type=ExtraFieldType.integer, entity_type=EntityType.spool),
+        ExtraField(
+            key="tags",
+            name="Tags",
+            field_type=ExtraFieldType.choice,
+            choices=["dry", "open"],
+            multi_choice=True,
+            entity_type=EntityType.spool,
+        ),
+    )
+    spool = make_spool(extra={"shelf": json.dumps("Top"), "slot": "4", "tags": json.dumps(["dry"])})
+
+    assert with_fields(SpoolFilter(extra_field_filters=(("shelf", "top"),)), *fields).matches(spool)
+    assert with_fields(SpoolFilter(extra_field_filters=(("slot", "2:5"),)), *fields).matches(spool)
+    assert not with_fields(SpoolFilter(extra_field_filters=(("slot", "5"),)), *fields).matches(spool)
+    assert with_fields(SpoolFilter(extra_field_filters=(("tags", "open,dry"),)), *fields).matches(spool)
+    assert not with_fields(SpoolFilter(extra_field_filters=(("tags", "open"),)), *fields).matches(spool)
+    # Unset, and unknown fields are ignored like the search ignores them.
+    assert with_fields(SpoolFilter(extra_field_filters=(("shelf", ""), ("nope", "x"))), *fields).matches(
+        make_spool(),
+    )
+
+
+def test_equal_filters_are_shared():
+    first = SpoolFilter(location="Shelf A")
+    second = with_fields(SpoolFilter(location="Shelf A"))
+    assert first == second
+    assert len({first, second}) == 1
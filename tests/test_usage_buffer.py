@@ -0,0 +1,77 @@
+"""Tests for the write-behind usage buffer.
+
+Summing usage reports per spool is only equivalent to applying them one by one while nothing is
+clamped at zero, and the buffer has to wake its flusher early once too many reports are waiting.
+"""
+
+from collections.abc import AsyncIterator
+from datetime import datetime
+
+import pytest
+
+from spoolman.database import usage_buffer
+from spoolman.database.usage_buffer import UsageBuffer
+
+# Naive, like the UTC timestamps the spool columns store.
+T0 = datetime(2026, 1, 1, 12, 0, 0)  # noqa: DTZ001
+T1 = datetime(2026, 1, 1, 12, 0, 5)  # noqa: DTZ001
+
+
+def test_disabled_by_zero_interval():
+    assert UsageBuffer(0, 10).enabled is False
+    assert UsageBuffer(500, 10).enabled is True
+
+
+def test_reports_are_summed_per_spool():
+    buffer = UsageBuffer(500, 10)
+    buffer.add(1, 2.5, T0)
+    buffer.add(2, 1.0, T0)
+    pending = buffer.add(1, 0.5, T1)
+
+    assert pending.weight == pytest.approx(3.0)
+    assert pending.first_used == T0
+    assert pending.last_used == T1
+    assert buffer.pending[2].weight == pytest.approx(1.0)
+    assert buffer.pending_reports == 3
+
+
+def test_negative_usage_is_refused():
+    buffer = UsageBuffer(500, 10)
+    with pytest.raises(ValueError, match="non-negative"):
+        buffer.add(1, -1.0, T0)
+    assert buffer.pending == {}
+
+
+def test_pressure_wakes_the_flusher():
+    buffer = UsageBuffer(500, 3)
+    buffer.add(1, 1.0, T0)
+    buffer.add(1, 1.0, T0)
+    assert not buffer._wake.is_set()  # noqa: SLF001
+    buffer.add(2, 1.0, T0)
+    assert buffer._wake.is_set()  # noqa: SLF001
+
+
+@pytest.mark.asyncio
+async def test_flush_without_pending_usage_touches_nothing():
+    """A disabled buffer is flushed before every spool write, so this must not need a database."""
+    await UsageBuffer(0, 10).flush()
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_the_usage_and_its_reports(monkeypatch: pytest.MonkeyPatch):
+    async def unavailable() -> AsyncIterator[None]:
+        raise ConnectionError("Database unavailable")
+        yield
+
+    monkeypatch.setattr(usage_buffer, "get_db_session", unavailable)
+    buffer = UsageBuffer(500, 3)
+    buffer.add(1, 1.0, T0)
+    buffer.add(2, 1.0, T0)
+    with pytest.raises(ConnectionError):
+        await buffer.flush()
+
+    assert buffer.pending[1].weight == pytest.approx(1.0)
+    assert buffer.pending_reports == 2
+    # Still counted towards flushing early.
+    buffer.add(1, 1.0, T1)
+    assert buffer._wake.is_set()  # noqa: SLF001
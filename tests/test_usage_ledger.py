@@ -0,0 +1,42 @@
+"""Tests for how a usage query is split over the ledger and its hourly and daily rollups."""
+
+from datetime import datetime
+
+from spoolman.database.usage_ledger import split_range
+
+
+def dt(day: int, hour: int = 0, minute: int = 0) -> datetime:
+    return datetime(2026, 3, day, hour, minute)  # noqa: DTZ001
+
+
+def test_range_within_an_hour_reads_the_ledger():
+    assert split_range(dt(1, 10, 5), dt(1, 10, 50)) == [("ledger", dt(1, 10, 5), dt(1, 10, 50))]
+
+
+def test_range_within_a_day_reads_whole_hours_from_the_hourly_rollup():
+    assert split_range(dt(1, 10, 5), dt(1, 13, 20)) == [
+        ("ledger", dt(1, 10, 5), dt(1, 11)),
+        ("hour", dt(1, 11), dt(1, 13)),
+        ("ledger", dt(1, 13), dt(1, 13, 20)),
+    ]
+
+
+def test_range_over_days_reads_whole_days_from_the_daily_rollup():
+    assert split_range(dt(1, 22, 30), dt(5, 2)) == [
+        ("ledger", dt(1, 22, 30), dt(1, 23)),
+        ("hour", dt(1, 23), dt(2)),
+        ("day", dt(2), dt(5)),
+        ("hour", dt(5), dt(5, 2)),
+    ]
+
+
+def test_aligned_range_reads_only_the_daily_rollup():
+    assert split_range(dt(1), dt(31)) == [("day", dt(1), dt(31))]
+
+
+def test_open_start_reads_the_daily_rollup_from_the_beginning():
+    assert split_range(None, dt(5, 2, 15)) == [
+        ("day", None, dt(5)),
+        ("hour", dt(5), dt(5, 2)),
+        ("ledger", dt(5, 2), dt(5, 2, 15)),
+    ]
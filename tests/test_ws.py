@@ -0,0 +1,301 @@
+"""Tests for the websocket fan-out.
+
+A client that does not read its messages must not hold up the others, and must not make the
+server queue messages for it without bound. With a coalescing window, bursts of updates to one entity
+are sent as one, without reordering them against its other events. Subscriptions in delta mode get
+patches against the previous state of an item. A served connection lasts until the client goes away.
+"""
+
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+from starlette import status
+from starlette.websockets import WebSocketState
+
+from spoolman.api.v1.models import EventType, Vendor, VendorEvent, WebsocketMode
+from spoolman.env import WebsocketQueuePolicy
+from spoolman.ws import HEALTHY_MESSAGE, WebsocketManager, merge_patch
+
+
+class FakeWebSocket:
+    """Just enough of a starlette WebSocket for the websocket manager."""
+
+    def __init__(self, *, stalled: bool = False) -> None:
+        """Initialize. A stalled client never finishes receiving a message."""
+        self.client = None
+        self.client_state = WebSocketState.CONNECTED
+        self.application_state = WebSocketState.CONNECTED
+        self.sent: list[str] = []
+        self.close_code: int | None = None
+        self.stalled = stalled
+        self.incoming: asyncio.Queue[dict] = asyncio.Queue()
+
+    async def accept(self) -> None:
+        """Accept the connection."""
+
+    async def receive(self) -> dict:
+        """Wait for the client to send something."""
+        return await self.incoming.get()
+
+    async def send_text(self, data: str) -> None:
+        """Receive a message."""
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.sent.append(data)
+
+    async def close(self, code: int) -> None:
+        """Close the connection from the server side."""
+        self.close_code = code
+        self.application_state = WebSocketState.DISCONNECTED
+
+
+class FakeEvent:
+    """An event that counts how often it is serialized."""
+
+    def __init__(self, value: str, type: EventType = EventType.UPDATED) -> None:  # noqa: A002
+        """Initialize."""
+        self.value = value
+        self.type = type
+        self.serialized = 0
+
+    def model_dump_json(self, *, exclude_none: bool) -> str:  # noqa: ARG002
+        """Serialize the event."""
+        self.serialized += 1
+        return self.value
+
+
+async def settle() -> None:
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_event_is_serialized_once_for_all_clients():
+    manager = WebsocketManager(10, WebsocketQueuePolicy.DISCONNECT)
+    clients = [FakeWebSocket() for _ in range(3)]
+    manager.connect(("spool",), clients[0])
+    manager.connect(("spool", "1"), clients[1])
+    manager.connect((), clients[2])
+
+    evt = FakeEvent("a")
+    await manager.send(("spool", "1"), evt)
+    await settle()
+
+    assert evt.serialized == 1
+    assert [client.sent for client in clients] == [["a"], ["a"], ["a"]]
+
+
+@pytest.mark.asyncio
+async def test_stalled_client_does_not_hold_up_others():
+    manager = WebsocketManager(10, WebsocketQueuePolicy.DISCONNECT)
+    stalled, healthy = FakeWebSocket(stalled=True), FakeWebSocket()
+    manager.connect(("spool",), stalled)
+    manager.connect(("spool",), healthy)
+
+    for value in "abc":
+        await asyncio.wait_for(manager.send(("spool", "1"), FakeEvent(value)), timeout=1)
+    await settle()
+
+    assert healthy.sent == ["a", "b", "c"]
+    assert stalled.sent == []
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_oldest():
+    manager = WebsocketManager(2, WebsocketQueuePolicy.DROP_OLDEST)
+    client = FakeWebSocket(stalled=True)
+    manager.connect(("spool",), client)
+    # The first message is taken off the queue by the sender, which then stalls on it.
+    for value in "abcd":
+        await manager.send(("spool",), FakeEvent(value))
+        await settle()
+
+    connection = manager.connections[client]
+    assert [connection.queue.get_nowait() for _ in range(connection.queue.qsize())] == ["c", "d"]
+    assert client.close_code is None
+
+
+@pytest.mark.asyncio
+async def test_full_queue_disconnects():
+    manager = WebsocketManager(2, WebsocketQueuePolicy.DISCONNECT)
+    client = FakeWebSocket(stalled=True)
+    manager.connect(("spool",), client)
+    for value in "abcd":
+        await manager.send(("spool",), FakeEvent(value))
+        await settle()
+
+    assert client.close_code == status.WS_1013_TRY_AGAIN_LATER
+    # Dropped from the tree on the next event, and the handler's own disconnect is harmless.
+    await manager.send(("spool",), FakeEvent("e"))
+    assert manager.tree.children["spool"].subscribers == set()
+    manager.disconnect(("spool",), client)
+    assert manager.connections == {}
+
+
+@pytest.mark.asyncio
+async def test_updates_within_window_are_coalesced():
+    manager = WebsocketManager(10, WebsocketQueuePolicy.DISCONNECT, coalesce_window_ms=50)
+    client = FakeWebSocket()
+    manager.connect(("spool",), client)
+
+    events = [FakeEvent(value) for value in "abc"]
+    for evt in events:
+        await manager.send(("spool", "1"), evt)
+    await manager.send(("spool", "2"), FakeEvent("x"))
+    await settle()
+    # The first update of each entity is sent straight away, the rest waits for the window to end.
+    assert client.sent == ["a", "x"]
+
+    await asyncio.sleep(0.1)
+    await settle()
+    assert client.sent == ["a", "x", "c"]
+    assert events[1].serialized == 0
+
+    # Nothing was held back in the last window, so the next update goes out straight away again.
+    await asyncio.sleep(0.1)
+    await manager.send(("spool", "1"), FakeEvent("d"))
+    await settle()
+    assert client.sent == ["a", "x", "c", "d"]
+
+
+@pytest.mark.asyncio
+async def test_delete_flushes_pending_update_first():
+    manager = WebsocketManager(10, WebsocketQueuePolicy.DISCONNECT, coalesce_window_ms=1000)
+    client = FakeWebSocket()
+    manager.connect(("spool",), client)
+
+    await manager.send(("spool", "1"), FakeEvent("a"))
+    await manager.send(("spool", "1"), FakeEvent("b"))
+    await manager.send(("spool", "1"), FakeEvent("deleted", EventType.DELETED))
+    await settle()
+
+    assert client.sent == ["a", "b", "deleted"]
+    assert manager.windows == {}
+
+
+def vendor_event(typ: EventType, **fields: object) -> VendorEvent:
+    vendor = Vendor(id=1, registered=datetime(2026, 1, 1, tzinfo=timezone.utc), name="Polymaker", extra={}, **fields)
+    return VendorEvent(type=typ, resource="vendor", date=datetime(2026, 1, 2, tzinfo=timezone.utc), payload=vendor)
+
+
+def test_merge_patch():
+    old = {"a": 1, "b": 2, "nested": {"x": 1, "y": 2}, "gone": "z"}
+    new = {"a": 1, "b": 3, "nested": {"x": 1, "y": 5}, "list": [1]}
+    assert merge_patch(old, new) == {"b": 3, "nested": {"y": 5}, "list": [1], "gone": None}
+
+
+@pytest.mark.asyncio
+async def test_delta_subscription_gets_patches():
+    manager = WebsocketManager(10, WebsocketQueuePolicy.DISCONNECT)
+    full, delta = FakeWebSocket(), FakeWebSocket()
+    manager.connect(("vendor",), full)
+    manager.connect(("vendor", "1"), delta, WebsocketMode.DELTA)
+
+    await manager.send(("vendor", "1"), vendor_event(EventType.ADDED, comment="new"))
+    await manager.send(("vendor", "1"), vendor_event(EventType.UPDATED, empty_spool_weight=140))
+    await manager.send(("vendor", "1"), vendor_event(EventType.DELETED, empty_spool_weight=140))
+    await settle()
+
+    assert [json.loads(message)["payload"]["name"] for message in full.sent] == ["Polymaker"] * 3
+    added, updated, deleted = (json.loads(message) for message in delta.sent)
+    assert added["base_version"] is None
+    assert added["patch"]["comment"] == "new"
+    assert updated["id"] == "1"
+    assert updated["base_version"] == added["version"]
+    assert updated["patch"] == {"comment": None, "empty_spool_weight": 140}
+    assert deleted["base_version"] == updated["version"]
+    assert deleted["patch"] is None
+    assert manager.snapshots == {}
+    # Versions only compare within a process, which a restarted or other process tells apart.
+    assert added["epoch"] == updated["epoch"] == deleted["epoch"] == manager.epoch
+    assert WebsocketManager(10, WebsocketQueuePolicy.DISCONNECT).epoch != manager.epoch
+
+
+@pytest.mark.asyncio
+async def test_snapshots_are_only_kept_for_delta_subscriptions():
+    manager = WebsocketManager(10, WebsocketQueuePolicy.DISCONNECT)
+    client = FakeWebSocket()
+    manager.connect(("vendor",), client, WebsocketMode.DELTA)
+    await manager.send(("vendor", "1"), vendor_event(EventType.UPDATED))
+    assert list(manager.snapshots) == [("vendor", "1")]
+
+    manager.disconnect(("vendor",), client)
+    assert manager.snapshots == {}
+    await manager.send(("vendor", "1"), vendor_event(EventType.UPDATED))
+    assert manager.snapshots == {}
+
+
+@pytest.mark.asyncio
+async def test_serve_answers_client_until_it_disconnects():
+    manager = WebsocketManager(10, WebsocketQueuePolicy.DISCONNECT)
+    client = FakeWebSocket()
+    task = asyncio.create_task(manager.serve(client, ("spool", "1")))
+    await settle()
+    assert manager.connection_counts() == {("spool", "1"): 1}
+
+    await client.incoming.put({"type": "websocket.receive", "text": "ping"})
+    await settle()
+    assert client.sent == [HEALTHY_MESSAGE]
+
+    await client.incoming.put({"type": "websocket.disconnect", "code": 1000})
+    await asyncio.wait_for(task, timeout=1)
+    assert manager.connection_counts() == {}
+
+
+@pytest.mark.asyncio
+async def test_serve_closes_idle_client():
+    manager = WebsocketManager(10, WebsocketQueuePolicy.DISCONNECT, idle_timeout=0.05)
+    client = FakeWebSocket()
+    task = asyncio.create_task(manager.serve(client, ("spool",)))
+    await asyncio.sleep(0.03)
+    await client.incoming.put({"type": "websocket.receive", "text": "ping"})
+    await asyncio.sleep(0.03)
+    assert client.close_code is None
+
+    await asyncio.wait_for(task, timeout=1)
+    assert client.close_code == status.WS_1001_GOING_AWAY
+    assert manager.connections == {}
+
+
+class LocationFilter:
+    """Matches the items at one location."""
+
+    def __init__(self, location: str) -> None:
+        """Initialize."""
+        self.location = location
+
+    def __hash__(self) -> int:
+        """Hash by location, so equal filters are shared."""
+        return hash(self.location)
+
+    def __eq__(self, other: object) -> bool:
+        """Compare by location."""
+        return isinstance(other, LocationFilter) and other.location == self.location
+
+    def matches(self, item: Vendor) -> bool:
+        """Check the item's comment, which stands in for a location here."""
+        return item.comment == self.location
+
+
+@pytest.mark.asyncio
+async def test_filtered_subscription_sees_items_enter_and_leave():
+    manager = WebsocketManager(10, WebsocketQueuePolicy.DISCONNECT)
+    clients = [FakeWebSocket(), FakeWebSocket()]
+    for client in clients:
+        manager.connect(("vendor",), client, subscription_filter=LocationFilter("A"), members={"2"})
+    assert len(manager.filtered[("vendor",)]) == 1
+
+    await manager.send(("vendor", "1"), vendor_event(EventType.UPDATED, comment="B"))
+    await manager.send(("vendor", "1"), vendor_event(EventType.UPDATED, comment="A"))
+    await manager.send(("vendor", "1"), vendor_event(EventType.UPDATED, comment="A"))
+    await manager.send(("vendor", "1"), vendor_event(EventType.UPDATED, comment="B"))
+    await settle()
+
+    for client in clients:
+        assert [json.loads(message)["type"] for message in client.sent] == ["added", "updated", "deleted"]
+
+    for client in clients:
+        manager.disconnect(("vendor",), client)
+    assert manager.filtered == {}
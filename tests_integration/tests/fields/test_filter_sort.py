@@ -808,6 +808,97 @@ async def test_filter_on_one_field_sort_on_another(entity_type: str, random_fila
             httpx.delete(f"{URL}/api/v1/{entity_type}/{eid}").raise_for_status()
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize("entity_type", ["spool", "filament", "vendor"])
+async def test_filter_on_several_fields(entity_type: str, random_filament: dict[str, Any]) -> None:
+    """Filters on several custom fields all have to match, including one that matches empty values."""
+    text_key = "mf_text_field"
+    number_key = "mf_number_field"
+    empty_key = "mf_empty_field"
+    for key, field_type in ((text_key, "text"), (number_key, "integer"), (empty_key, "text")):
+        httpx.post(
+            f"{URL}/api/v1/field/{entity_type}/{key}",
+            json={"name": key, "field_type": field_type},
+        ).raise_for_status()
+    text = uuid.uuid4().hex[:8]
+    other = uuid.uuid4().hex[:8]
+    extras = [
+        {text_key: text, number_key: 5},
+        {text_key: text, number_key: 20},
+        {text_key: "elsewhere", number_key: 5},
+        {number_key: 5},
+        {text_key: text, number_key: 5, empty_key: "set"},
+        {text_key: other, number_key: 7, empty_key: ""},
+    ]
+    ids = [
+        _create_entity(entity_type, {key: json.dumps(value) for key, value in extra.items()}, random_filament)
+        for extra in extras
+    ]
+    try:
+        result = httpx.get(
+            f"{URL}/api/v1/{entity_type}",
+            params={
+                f"extra.{text_key}": f'"{text}","{other}"',
+                f"extra.{number_key}": "1:10",
+                f"extra.{empty_key}": "",
+            },
+        )
+        assert_httpx_success(result)
+        assert {item["id"] for item in result.json()} & set(ids) == {ids[0], ids[5]}
+    finally:
+        for key in (text_key, number_key, empty_key):
+            httpx.delete(f"{URL}/api/v1/field/{entity_type}/{key}").raise_for_status()
+        for eid in ids:
+            httpx.delete(f"{URL}/api/v1/{entity_type}/{eid}").raise_for_status()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("entity_type", ["spool", "filament", "vendor"])
+async def test_sort_on_several_fields(entity_type: str, random_filament: dict[str, Any]) -> None:
+    """Sort on two custom fields, the second breaking the ties of the first, across pages."""
+    filter_key = "ms_filter_field"
+    text_key = "ms_text_field"
+    number_key = "ms_number_field"
+    unique = uuid.uuid4().hex[:8]
+    for key, field_type in ((filter_key, "text"), (text_key, "text"), (number_key, "integer")):
+        httpx.post(
+            f"{URL}/api/v1/field/{entity_type}/{key}",
+            json={"name": key, "field_type": field_type},
+        ).raise_for_status()
+    values = [("b", 1), ("a", 2), ("b", None), ("a", 1), (None, 5)]
+    ids = []
+    for text, number in values:
+        extra = {filter_key: json.dumps(unique)}
+        if text is not None:
+            extra[text_key] = json.dumps(text)
+        if number is not None:
+            extra[number_key] = json.dumps(number)
+        ids.append(_create_entity(entity_type, extra, random_filament))
+    try:
+        ordered = []
+        for offset in (0, 2, 4):
+            result = httpx.get(
+                f"{URL}/api/v1/{entity_type}",
+                params={
+                    f"extra.{filter_key}": f'"{unique}"',
+                    "sort": f"extra.{text_key}:desc,extra.{number_key}:asc",
+                    "limit": 2,
+                    "offset": offset,
+                },
+            )
+            assert_httpx_success(result)
+            # Counted without the joins of the sort, which must not add or drop any items.
+            assert result.headers["x-total-count"] == "5"
+            ordered += [item["id"] for item in result.json()]
+        # Entities without a value sort last, for either direction.
+        assert ordered == [ids[0], ids[2], ids[3], ids[1], ids[4]]
+    finally:
+        for key in (filter_key, text_key, number_key):
+            httpx.delete(f"{URL}/api/v1/field/{entity_type}/{key}").raise_for_status()
+        for eid in ids:
+            httpx.delete(f"{URL}/api/v1/{entity_type}/{eid}").raise_for_status()
+
+
 @pytest.mark.asyncio
 @pytest.mark.parametrize("entity_type", ["spool", "filament", "vendor"])
 async def test_pagination_total_count_with_extra_filter(entity_type: str, random_filament: dict[str, Any]) -> None:
@@ -1296,3 +1387,33 @@ async def test_single_choice_filter_escapes_like_wildcards(entity_type: str, ran
         httpx.delete(f"{URL}/api/v1/field/{entity_type}/{field_key}").raise_for_status()
         httpx.delete(f"{URL}/api/v1/{entity_type}/{id_pct}").raise_for_status()
         httpx.delete(f"{URL}/api/v1/{entity_type}/{id_x}").raise_for_status()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("entity_type", ["spool", "filament", "vendor"])
+async def test_text_filter_on_long_values(entity_type: str, random_filament: dict[str, Any]) -> None:
+    """Text values longer than the indexed copy of them are still matched on the whole value."""
+    field_key = "long_text_field"
+    httpx.post(
+        f"{URL}/api/v1/field/{entity_type}/{field_key}",
+        json={"name": "Long text", "field_type": "text"},
+    ).raise_for_status()
+    prefix = "x" * 300
+    id1 = _create_entity(entity_type, {field_key: json.dumps(prefix + " needle")}, random_filament)
+    id2 = _create_entity(entity_type, {field_key: json.dumps(prefix + " other")}, random_filament)
+    try:
+        result = httpx.get(f"{URL}/api/v1/{entity_type}", params={f"extra.{field_key}": "NEEDLE"})
+        assert_httpx_success(result)
+        ids = {item["id"] for item in result.json()}
+        assert id1 in ids
+        assert id2 not in ids
+
+        result = httpx.get(f"{URL}/api/v1/{entity_type}", params={f"extra.{field_key}": f'"{prefix} other"'})
+        assert_httpx_success(result)
+        ids = {item["id"] for item in result.json()}
+        assert id1 not in ids
+        assert id2 in ids
+    finally:
+        httpx.delete(f"{URL}/api/v1/field/{entity_type}/{field_key}").raise_for_status()
+        httpx.delete(f"{URL}/api/v1/{entity_type}/{id1}").raise_for_status()
+        httpx.delete(f"{URL}/api/v1/{entity_type}/{id2}").raise_for_status()
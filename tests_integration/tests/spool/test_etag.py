@@ -0,0 +1,101 @@
+"""Integration tests for the ETag of a spool, and the conditional requests it allows."""
+
+import asyncio
+from typing import Any
+
+import httpx
+import pytest
+
+from ..conftest import URL
+
+
+def test_get_not_modified(random_filament: dict[str, Any]):
+    result = httpx.post(f"{URL}/api/v1/spool", json={"filament_id": random_filament["id"]})
+    result.raise_for_status()
+    spool_id = result.json()["id"]
+    try:
+        result = httpx.get(f"{URL}/api/v1/spool/{spool_id}")
+        result.raise_for_status()
+        etag = result.headers["etag"]
+
+        result = httpx.get(f"{URL}/api/v1/spool/{spool_id}", headers={"If-None-Match": etag})
+        assert result.status_code == 304
+        assert result.headers["etag"] == etag
+
+        # Using the spool changes it, as does changing the filament it embeds.
+        httpx.put(f"{URL}/api/v1/spool/{spool_id}/use", json={"use_weight": 1}).raise_for_status()
+        result = httpx.get(f"{URL}/api/v1/spool/{spool_id}", headers={"If-None-Match": etag})
+        assert result.status_code == 200
+        assert result.headers["etag"] != etag
+        etag = result.headers["etag"]
+
+        httpx.patch(
+            f"{URL}/api/v1/filament/{random_filament['id']}",
+            json={"comment": "changed"},
+        ).raise_for_status()
+        result = httpx.get(f"{URL}/api/v1/spool/{spool_id}", headers={"If-None-Match": etag})
+        assert result.status_code == 200
+        assert result.json()["filament"]["comment"] == "changed"
+    finally:
+        httpx.delete(f"{URL}/api/v1/spool/{spool_id}").raise_for_status()
+
+
+def test_update_if_match(random_filament: dict[str, Any]):
+    result = httpx.post(f"{URL}/api/v1/spool", json={"filament_id": random_filament["id"]})
+    result.raise_for_status()
+    spool_id = result.json()["id"]
+    try:
+        etag = httpx.get(f"{URL}/api/v1/spool/{spool_id}").headers["etag"]
+
+        result = httpx.patch(f"{URL}/api/v1/spool/{spool_id}", json={"comment": "first"}, headers={"If-Match": etag})
+        result.raise_for_status()
+        new_etag = result.headers["etag"]
+        assert new_etag != etag
+
+        # Made with the ETag from before the first update, so it would overwrite that.
+        result = httpx.patch(f"{URL}/api/v1/spool/{spool_id}", json={"comment": "second"}, headers={"If-Match": etag})
+        assert result.status_code == 412
+        assert httpx.get(f"{URL}/api/v1/spool/{spool_id}").json()["comment"] == "first"
+
+        result = httpx.patch(
+            f"{URL}/api/v1/spool/{spool_id}",
+            json={"comment": "second"},
+            headers={"If-Match": new_etag},
+        )
+        result.raise_for_status()
+        assert result.json()["comment"] == "second"
+    finally:
+        httpx.delete(f"{URL}/api/v1/spool/{spool_id}").raise_for_status()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_updates_if_match(random_filament: dict[str, Any]):
+    """Of concurrent updates made with the same ETag, only one is applied."""
+    result = httpx.post(f"{URL}/api/v1/spool", json={"filament_id": random_filament["id"]})
+    result.raise_for_status()
+    spool_id = result.json()["id"]
+    try:
+        for attempt in range(5):
+            etag = httpx.get(f"{URL}/api/v1/spool/{spool_id}").headers["etag"]
+            comments = [f"{attempt}-{i}" for i in range(8)]
+            async with httpx.AsyncClient() as client:
+                results = await asyncio.gather(
+                    *(
+                        client.patch(
+                            f"{URL}/api/v1/spool/{spool_id}",
+                            json={"comment": comment},
+                            headers={"If-Match": etag},
+                        )
+                        for comment in comments
+                    ),
+                )
+            assert sorted(result.status_code for result in results) == [200] + [412] * (len(comments) - 1)
+            applied = next(comment for comment, result in zip(comments, results, strict=True) if result.is_success)
+            assert httpx.get(f"{URL}/api/v1/spool/{spool_id}").json()["comment"] == applied
+    finally:
+        httpx.delete(f"{URL}/api/v1/spool/{spool_id}").raise_for_status()
+
+
+def test_not_found():
+    result = httpx.get(f"{URL}/api/v1/spool/123456789", headers={"If-None-Match": '"x"'})
+    assert result.status_code == 404
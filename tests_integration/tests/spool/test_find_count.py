@@ -0,0 +1,44 @@
+"""Integration tests for the count modes of the paginated spool search."""
+
+from typing import Any
+
+import httpx
+
+from ..conftest import URL
+
+
+def find(filament_id: int, count: str | None = None, limit: int = 1) -> httpx.Response:
+    params: dict[str, Any] = {"filament.id": filament_id, "limit": limit}
+    if count is not None:
+        params["count"] = count
+    result = httpx.get(f"{URL}/api/v1/spool", params=params)
+    result.raise_for_status()
+    return result
+
+
+def test_count_modes(random_filament: dict[str, Any]):
+    filament_id = random_filament["id"]
+    spool_ids = []
+    try:
+        for _ in range(2):
+            result = httpx.post(f"{URL}/api/v1/spool", json={"filament_id": filament_id})
+            result.raise_for_status()
+            spool_ids.append(result.json()["id"])
+
+        assert find(filament_id).headers["x-total-count"] == "2"
+        assert "x-total-count" not in find(filament_id, "none").headers
+
+        # The cached count is not served once the data changed, an estimate is.
+        httpx.delete(f"{URL}/api/v1/spool/{spool_ids.pop()}").raise_for_status()
+        assert find(filament_id, "estimate").headers["x-total-count"] == "2"
+        assert find(filament_id, "exact").headers["x-total-count"] == "1"
+        # Another page of the same search, so its response is not cached yet.
+        assert find(filament_id, "estimate", limit=2).headers["x-total-count"] == "1"
+    finally:
+        for spool_id in spool_ids:
+            httpx.delete(f"{URL}/api/v1/spool/{spool_id}").raise_for_status()
+
+
+def test_invalid_count_mode():
+    result = httpx.get(f"{URL}/api/v1/spool", params={"limit": 1, "count": "roughly"})
+    assert result.status_code == 422
@@ -0,0 +1,94 @@
+"""Integration tests for paging through the spool search with cursors."""
+
+from collections.abc import Iterable
+from typing import Any
+
+import httpx
+import pytest
+
+from ..conftest import URL
+
+# Location and used weight of each spool. Ties in both keys and NULL locations are included on purpose.
+SPOOLS = [("A", 100), ("A", 100), (None, 50), ("B", 10), (None, 50), ("B", 300), ("A", 0)]
+
+
+@pytest.fixture(scope="module")
+def spools(random_filament_mod: dict[str, Any]) -> Iterable[list[dict[str, Any]]]:
+    """Add spools with some equal sort keys."""
+    result = []
+    for location, used_weight in SPOOLS:
+        response = httpx.post(
+            f"{URL}/api/v1/spool",
+            json={"filament_id": random_filament_mod["id"], "location": location, "used_weight": used_weight},
+        )
+        response.raise_for_status()
+        result.append(response.json())
+
+    yield result
+
+    for spool in result:
+        httpx.delete(f"{URL}/api/v1/spool/{spool['id']}").raise_for_status()
+
+
+def walk(params: dict[str, Any], limit: int) -> list[int]:
+    """Get the IDs of all spools found, one page at a time."""
+    ids = []
+    cursor = None
+    while True:
+        page_params = {**params, "limit": limit}
+        if cursor is not None:
+            page_params["cursor"] = cursor
+        result = httpx.get(f"{URL}/api/v1/spool", params=page_params)
+        result.raise_for_status()
+        assert result.headers["x-total-count"] == str(len(SPOOLS))
+        ids.extend(spool["id"] for spool in result.json())
+        cursor = result.headers.get("x-next-cursor")
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("sort", ["location:desc,remaining_weight:asc", "location:asc,used_weight:desc", None])
+@pytest.mark.parametrize("limit", [1, 2, 7])
+def test_pages_visit_every_spool_once(spools: list[dict[str, Any]], sort: str | None, limit: int):
+    params = {"filament.id": spools[0]["filament"]["id"]}
+    if sort is not None:
+        params["sort"] = sort
+
+    result = httpx.get(f"{URL}/api/v1/spool", params=params)
+    result.raise_for_status()
+    assert "x-next-cursor" not in result.headers
+    expected = [spool["id"] for spool in result.json()]
+
+    assert walk(params, limit) == expected
+    if sort is not None and sort.startswith("location"):
+        # Spools without a location go last in both directions.
+        assert {spool["id"] for spool in spools if spool.get("location") is None} == set(expected[-2:])
+
+
+def test_cursor_with_other_sort(spools: list[dict[str, Any]]):
+    params = {"filament.id": spools[0]["filament"]["id"], "sort": "location:asc", "limit": 2}
+    result = httpx.get(f"{URL}/api/v1/spool", params=params)
+    result.raise_for_status()
+
+    result = httpx.get(
+        f"{URL}/api/v1/spool",
+        params={**params, "sort": "location:desc", "cursor": result.headers["x-next-cursor"]},
+    )
+    assert result.status_code == 400
+
+
+def test_cursor_with_offset(spools: list[dict[str, Any]]):
+    params = {"filament.id": spools[0]["filament"]["id"], "limit": 2}
+    result = httpx.get(f"{URL}/api/v1/spool", params=params)
+    result.raise_for_status()
+
+    result = httpx.get(
+        f"{URL}/api/v1/spool",
+        params={**params, "offset": 2, "cursor": result.headers["x-next-cursor"]},
+    )
+    assert result.status_code == 400
+
+
+def test_invalid_cursor():
+    result = httpx.get(f"{URL}/api/v1/spool", params={"cursor": "garbage"})
+    assert result.status_code == 400
@@ -0,0 +1,72 @@
+"""Integration tests for leaving the filaments and vendors out of the spools of a list."""
+
+from collections.abc import Iterable
+from typing import Any
+
+import httpx
+import pytest
+
+from ..conftest import URL
+
+
+@pytest.fixture
+def spools(random_filament: dict[str, Any]) -> Iterable[list[dict[str, Any]]]:
+    result = []
+    for _ in range(2):
+        response = httpx.post(f"{URL}/api/v1/spool", json={"filament_id": random_filament["id"]})
+        response.raise_for_status()
+        result.append(response.json())
+
+    yield result
+
+    for spool in result:
+        httpx.delete(f"{URL}/api/v1/spool/{spool['id']}").raise_for_status()
+
+
+def test_embed_ids(spools: list[dict[str, Any]]):
+    filament = spools[0]["filament"]
+    result = httpx.get(f"{URL}/api/v1/spool", params={"filament.id": filament["id"], "embed": "ids"})
+    result.raise_for_status()
+    body = result.json()
+
+    expected_spools = [{k: v for k, v in spool.items() if k != "filament"} for spool in spools]
+    assert body["spools"] == [{**spool, "filament_id": filament["id"]} for spool in expected_spools]
+    vendor = filament["vendor"]
+    assert body["filaments"] == {
+        str(filament["id"]): {**{k: v for k, v in filament.items() if k != "vendor"}, "vendor_id": vendor["id"]},
+    }
+    assert body["vendors"] == {str(vendor["id"]): vendor}
+
+
+def test_embed_none(spools: list[dict[str, Any]]):
+    filament_id = spools[0]["filament"]["id"]
+    result = httpx.get(f"{URL}/api/v1/spool", params={"filament.id": filament_id, "embed": "none"})
+    result.raise_for_status()
+    assert [spool["filament_id"] for spool in result.json()] == [filament_id, filament_id]
+    assert all("filament" not in spool for spool in result.json())
+
+
+def test_export_embed_ids(spools: list[dict[str, Any]]):
+    filament = spools[0]["filament"]
+    result = httpx.get(f"{URL}/api/v1/export/spools", params={"fmt": "json", "embed": "ids"})
+    result.raise_for_status()
+    body = result.json()
+
+    exported = {spool["id"]: spool for spool in body["spools"]}
+    for spool in spools:
+        assert exported[spool["id"]]["filament_id"] == filament["id"]
+        assert not any(key.startswith("filament.") for key in exported[spool["id"]])
+    assert body["filaments"][str(filament["id"])]["name"] == filament["name"]
+    assert body["vendors"][str(filament["vendor"]["id"])]["name"] == filament["vendor"]["name"]
+
+
+@pytest.mark.usefixtures("spools")
+def test_export_embed_none_csv():
+    result = httpx.get(f"{URL}/api/v1/export/spools", params={"fmt": "csv", "embed": "none"})
+    result.raise_for_status()
+    header = result.text.splitlines()[0].split(",")
+    assert "filament_id" in header
+    assert not any(column.startswith("filament.") for column in header)
+
+    result = httpx.get(f"{URL}/api/v1/export/spools", params={"fmt": "csv", "embed": "ids"})
+    assert result.status_code == 400
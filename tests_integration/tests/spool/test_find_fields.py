@@ -0,0 +1,90 @@
+"""Integration tests for only returning some fields of the spools found."""
+
+import json
+import uuid
+from collections.abc import Iterable
+from typing import Any
+
+import httpx
+import pytest
+
+from ..conftest import URL
+
+
+@pytest.fixture
+def shelf_key() -> Iterable[str]:
+    key = f"shelf_{uuid.uuid4().hex[:8]}"
+    httpx.post(f"{URL}/api/v1/field/spool/{key}", json={"name": "Shelf", "field_type": "text"}).raise_for_status()
+    yield key
+    httpx.delete(f"{URL}/api/v1/field/spool/{key}").raise_for_status()
+
+
+@pytest.fixture
+def spools(random_filament: dict[str, Any], shelf_key: str) -> Iterable[list[dict[str, Any]]]:
+    result = []
+    for body in (
+        {"initial_weight": 1000, "used_weight": 250, "location": "Dryer", "extra": {shelf_key: json.dumps("A1")}},
+        {"used_weight": 10},
+    ):
+        response = httpx.post(f"{URL}/api/v1/spool", json={"filament_id": random_filament["id"], **body})
+        response.raise_for_status()
+        result.append(response.json())
+
+    yield result
+
+    for spool in result:
+        httpx.delete(f"{URL}/api/v1/spool/{spool['id']}").raise_for_status()
+
+
+def find(filament_id: int, fields: str, **params: Any) -> httpx.Response:  # noqa: ANN401
+    return httpx.get(f"{URL}/api/v1/spool", params={"filament.id": filament_id, "fields": fields, **params})
+
+
+def test_fields_are_those_of_the_full_spools(spools: list[dict[str, Any]]):
+    filament_id = spools[0]["filament"]["id"]
+    result = find(filament_id, "id,remaining_weight,remaining_length,used_length,location,archived,registered")
+    result.raise_for_status()
+
+    fields = ("id", "remaining_weight", "remaining_length", "used_length", "location", "archived", "registered")
+    assert result.json() == [{key: spool[key] for key in fields if key in spool} for spool in spools]
+
+
+def test_nested_fields(spools: list[dict[str, Any]]):
+    filament = spools[0]["filament"]
+    result = find(filament["id"], "id,filament.name,filament.vendor")
+    result.raise_for_status()
+
+    assert result.json()[0] == {
+        "id": spools[0]["id"],
+        "filament": {"name": filament["name"], "vendor": filament["vendor"]},
+    }
+
+
+def test_extra_fields(spools: list[dict[str, Any]], shelf_key: str):
+    filament_id = spools[0]["filament"]["id"]
+    result = find(filament_id, f"id,extra.{shelf_key}")
+    result.raise_for_status()
+    assert result.json() == [{"id": spools[0]["id"], "extra": {shelf_key: '"A1"'}}, {"id": spools[1]["id"]}]
+
+    result = find(filament_id, "extra")
+    result.raise_for_status()
+    assert result.json() == [{"extra": spool["extra"]} for spool in spools]
+
+
+def test_fields_with_cursor(spools: list[dict[str, Any]]):
+    filament_id = spools[0]["filament"]["id"]
+    result = find(filament_id, "location", limit=1, sort="used_weight:desc")
+    result.raise_for_status()
+    assert result.json() == [{"location": "Dryer"}]
+    assert result.headers["x-total-count"] == "2"
+
+    result = find(filament_id, "used_weight", limit=1, sort="used_weight:desc", cursor=result.headers["x-next-cursor"])
+    result.raise_for_status()
+    assert result.json() == [{"used_weight": 10}]
+    assert "x-next-cursor" not in result.headers
+
+
+@pytest.mark.parametrize("params", [{"fields": "id,nope"}, {"fields": ""}, {"fields": "id", "embed": "ids"}])
+def test_invalid_fields(params: dict[str, str]):
+    result = httpx.get(f"{URL}/api/v1/spool", params=params)
+    assert result.status_code == 400
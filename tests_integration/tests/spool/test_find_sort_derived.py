@@ -0,0 +1,61 @@
+"""Integration tests for sorting spools by the values derived from them and their filament."""
+
+from typing import Any
+
+import httpx
+
+from ..conftest import URL
+
+
+def sorted_ids(filament_id: int, sort: str) -> list[int]:
+    result = httpx.get(f"{URL}/api/v1/spool", params={"filament.id": filament_id, "sort": sort})
+    result.raise_for_status()
+    return [spool["id"] for spool in result.json()]
+
+
+def add_spool(filament_id: int, **fields: float) -> int:
+    result = httpx.post(f"{URL}/api/v1/spool", json={"filament_id": filament_id, **fields})
+    result.raise_for_status()
+    return result.json()["id"]
+
+
+def test_sort_follows_spool_and_filament_writes(random_filament: dict[str, Any]):
+    filament_id = random_filament["id"]
+    a = add_spool(filament_id, used_weight=100, price=10)
+    b = add_spool(filament_id, used_weight=500)
+    c = add_spool(filament_id, used_weight=0, price=50)
+    try:
+        assert sorted_ids(filament_id, "remaining_weight:asc") == [b, a, c]
+        assert sorted_ids(filament_id, "remaining_length:desc") == [c, a, b]
+        assert sorted_ids(filament_id, "used_length:asc") == [c, a, b]
+        # Spool b has no price of its own, so it has the filament's price of 100.
+        assert sorted_ids(filament_id, "price:asc") == [a, c, b]
+
+        httpx.patch(f"{URL}/api/v1/filament/{filament_id}", json={"price": 20}).raise_for_status()
+        assert sorted_ids(filament_id, "price:asc") == [a, b, c]
+
+        httpx.put(f"{URL}/api/v1/spool/{c}/use", json={"use_weight": 800}).raise_for_status()
+        assert sorted_ids(filament_id, "remaining_weight:asc") == [c, b, a]
+
+        httpx.patch(f"{URL}/api/v1/spool/{a}", json={"remaining_weight": 50}).raise_for_status()
+        assert sorted_ids(filament_id, "remaining_weight:asc") == [a, c, b]
+    finally:
+        for spool_id in (a, b, c):
+            httpx.delete(f"{URL}/api/v1/spool/{spool_id}").raise_for_status()
+
+
+def test_sort_by_remaining_weight_of_filament_without_weight(random_empty_filament: dict[str, Any]):
+    filament_id = random_empty_filament["id"]
+    a = add_spool(filament_id, used_weight=100)
+    b = add_spool(filament_id, used_weight=300)
+    try:
+        # Neither spool has a remaining weight, so they are in ID order both ways.
+        assert sorted_ids(filament_id, "remaining_weight:asc") == [a, b]
+        assert sorted_ids(filament_id, "remaining_weight:desc") == [a, b]
+
+        httpx.patch(f"{URL}/api/v1/filament/{filament_id}", json={"weight": 1000}).raise_for_status()
+        assert sorted_ids(filament_id, "remaining_weight:asc") == [b, a]
+        assert sorted_ids(filament_id, "remaining_weight:desc") == [a, b]
+    finally:
+        for spool_id in (a, b):
+            httpx.delete(f"{URL}/api/v1/spool/{spool_id}").raise_for_status()
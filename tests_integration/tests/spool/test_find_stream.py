@@ -0,0 +1,43 @@
+"""Integration tests for the spool search without a limit, which is streamed."""
+
+from typing import Any
+
+import httpx
+
+from ..conftest import URL
+
+
+def find(params: dict[str, Any]) -> httpx.Response:
+    result = httpx.get(f"{URL}/api/v1/spool", params=params)
+    result.raise_for_status()
+    return result
+
+
+def test_full_list_matches_pages(random_filament: dict[str, Any]):
+    filament_id = random_filament["id"]
+    spool_ids = []
+    try:
+        for location in ("A", None, "B"):
+            result = httpx.post(f"{URL}/api/v1/spool", json={"filament_id": filament_id, "location": location})
+            result.raise_for_status()
+            spool_ids.append(result.json()["id"])
+
+        params = {"filament.id": filament_id, "sort": "location:desc"}
+        result = find(params)
+        assert result.headers["x-total-count"] == "3"
+        pages = [find({**params, "limit": 1, "offset": offset}).json()[0] for offset in range(3)]
+        assert result.json() == pages
+
+        result = find({**params, "offset": 1})
+        assert result.headers["x-total-count"] == "2"
+        assert result.json() == pages[1:]
+
+        # A spool without a location is sent without the field.
+        result = find({**params, "fields": "id,location"})
+        assert result.json() == [{key: spool[key] for key in ("id", "location") if key in spool} for spool in pages]
+
+        assert "x-total-count" not in find({**params, "count": "none"}).headers
+        assert find({"filament.id": filament_id, "location": '"C"'}).json() == []
+    finally:
+        for spool_id in spool_ids:
+            httpx.delete(f"{URL}/api/v1/spool/{spool_id}").raise_for_status()
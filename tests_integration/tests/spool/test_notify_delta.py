@@ -0,0 +1,51 @@
+"""Integration tests for websocket subscriptions in delta mode."""
+
+import asyncio
+import json
+from typing import Any
+
+import httpx
+import pytest
+from websockets.asyncio.client import connect
+
+from ..conftest import URL
+
+WS_URL = URL.replace("http://", "ws://", 1)
+
+
+@pytest.mark.asyncio
+async def test_spool_use_sends_patch(random_filament: dict[str, Any]) -> None:
+    """After the first event of a spool, only the fields that changed are sent."""
+    result = httpx.post(
+        f"{URL}/api/v1/spool",
+        json={"filament_id": random_filament["id"], "remaining_weight": 500},
+    )
+    result.raise_for_status()
+    spool = result.json()
+
+    try:
+        async with connect(f"{WS_URL}/api/v1/spool/{spool['id']}?mode=delta") as ws:
+            await asyncio.sleep(0.2)
+
+            events = []
+            for _ in range(2):
+                httpx.put(f"{URL}/api/v1/spool/{spool['id']}/use", json={"use_weight": 10}).raise_for_status()
+                events.append(json.loads(await asyncio.wait_for(ws.recv(), timeout=10)))
+    finally:
+        httpx.delete(f"{URL}/api/v1/spool/{spool['id']}").raise_for_status()
+
+    first, second = events
+    assert first["type"] == "updated"
+    assert first["resource"] == "spool"
+    assert first["id"] == str(spool["id"])
+    # The server had not sent this spool to a delta subscriber before, so the first patch is the whole spool.
+    assert first["base_version"] is None
+    assert first["patch"]["filament"]["id"] == random_filament["id"]
+    assert first["patch"]["used_weight"] == pytest.approx(spool["used_weight"] + 10)
+
+    assert second["epoch"] == first["epoch"]
+    assert second["base_version"] == first["version"]
+    assert "filament" not in second["patch"]
+    assert second["patch"]["used_weight"] == pytest.approx(spool["used_weight"] + 20)
+    assert second["patch"]["remaining_weight"] == pytest.approx(480)
+    assert set(second["patch"]) <= {"used_weight", "used_length", "remaining_weight", "remaining_length", "last_used"}
@@ -0,0 +1,71 @@
+"""Integration tests for websocket subscriptions with a spool search filter."""
+
+import asyncio
+import contextlib
+import json
+from typing import Any
+from urllib.parse import urlencode
+
+import httpx
+import pytest
+from websockets.asyncio.client import connect
+
+from ..conftest import URL
+
+WS_URL = URL.replace("http://", "ws://", 1)
+
+
+async def next_event(ws: Any) -> dict[str, Any]:  # noqa: ANN401
+    return json.loads(await asyncio.wait_for(ws.recv(), timeout=10))
+
+
+@pytest.mark.asyncio
+async def test_filtered_subscription_follows_spools_in_and_out(random_filament: dict[str, Any]) -> None:
+    """Only spools at the location are sent, as added when they arrive and as deleted when they leave."""
+    spools = []
+    for location in ("Kiosk Shelf", "Elsewhere"):
+        result = httpx.post(
+            f"{URL}/api/v1/spool",
+            json={"filament_id": random_filament["id"], "remaining_weight": 500, "location": location},
+        )
+        result.raise_for_status()
+        spools.append(result.json())
+    on_shelf, elsewhere = spools
+
+    try:
+        query = urlencode({"location": '"Kiosk Shelf"'})
+        async with connect(f"{WS_URL}/api/v1/spool?{query}") as ws:
+            await asyncio.sleep(0.2)
+
+            # Not at the location, so never sent.
+            httpx.put(f"{URL}/api/v1/spool/{elsewhere['id']}/use", json={"use_weight": 1}).raise_for_status()
+            httpx.put(f"{URL}/api/v1/spool/{on_shelf['id']}/use", json={"use_weight": 1}).raise_for_status()
+            event = await next_event(ws)
+            assert (event["type"], event["payload"]["id"]) == ("updated", on_shelf["id"])
+
+            httpx.patch(
+                f"{URL}/api/v1/spool/{elsewhere['id']}",
+                json={"location": "Kiosk Shelf"},
+            ).raise_for_status()
+            event = await next_event(ws)
+            assert (event["type"], event["payload"]["id"]) == ("added", elsewhere["id"])
+
+            httpx.patch(f"{URL}/api/v1/spool/{on_shelf['id']}", json={"location": "Elsewhere"}).raise_for_status()
+            event = await next_event(ws)
+            assert (event["type"], event["payload"]["id"]) == ("deleted", on_shelf["id"])
+            assert event["payload"]["location"] == "Elsewhere"
+
+            httpx.put(f"{URL}/api/v1/spool/{on_shelf['id']}/use", json={"use_weight": 1}).raise_for_status()
+            with contextlib.suppress(TimeoutError):
+                event = json.loads(await asyncio.wait_for(ws.recv(), timeout=1))
+                pytest.fail(f"a spool that left the location was still sent: {event}")
+    finally:
+        for spool in spools:
+            httpx.delete(f"{URL}/api/v1/spool/{spool['id']}").raise_for_status()
+
+
+@pytest.mark.asyncio
+async def test_invalid_filter_is_refused() -> None:
+    with pytest.raises(Exception):  # noqa: B017, PT011
+        async with connect(f"{WS_URL}/api/v1/spool?filament.id=abc"):
+            pass
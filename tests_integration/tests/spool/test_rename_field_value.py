@@ -86,6 +86,14 @@ def test_rename_extra_field_value(shelf_spools: Fixture):
     # The other group is untouched.
     assert _spool(shelf_spools.spools["Top"][0])["extra"][shelf_spools.field_key] == json.dumps("Top")
 
+    # And the spools are found by the new value.
+    result = httpx.get(
+        f"{URL}/api/v1/spool",
+        params={f"extra.{shelf_spools.field_key}": '"Lower"', "allow_archived": "true"},
+    )
+    result.raise_for_status()
+    assert sorted(spool["id"] for spool in result.json()) == sorted(shelf_spools.spools["Bottom"])
+
 
 def test_renamed_extra_field_value_is_visible_to_grouping(shelf_spools: Fixture):
     """After a rename the group endpoint reports the new key, and the old one is gone."""
@@ -100,6 +100,48 @@ def test_use_spool_length(random_filament: dict[str, Any], use_length: float):
     httpx.delete(f"{URL}/api/v1/spool/{spool['id']}").raise_for_status()
 
 
+def test_use_spool_length_follows_filament_changes(
+    random_filament: dict[str, Any],
+    random_empty_filament: dict[str, Any],
+):
+    """Test that length-based usage picks up edits of the filament and moving the spool to another filament."""
+
+    def weight_of(length: float, filament: dict[str, Any]) -> float:
+        return filament["density"] * (length * 1e-1) * math.pi * ((filament["diameter"] * 1e-1 / 2) ** 2)
+
+    # Setup
+    result = httpx.post(
+        f"{URL}/api/v1/spool",
+        json={"filament_id": random_filament["id"]},
+    )
+    result.raise_for_status()
+    spool = result.json()
+
+    def use_length(length: float) -> float:
+        result = httpx.put(f"{URL}/api/v1/spool/{spool['id']}/use", json={"use_length": length})
+        result.raise_for_status()
+        return result.json()["used_weight"]
+
+    # Execute and verify, twice per filament state so the second report can come from the cache
+    used = use_length(100)
+    assert used == pytest.approx(weight_of(100, random_filament))
+    assert use_length(100) - used == pytest.approx(weight_of(100, random_filament))
+
+    result = httpx.patch(f"{URL}/api/v1/filament/{random_filament['id']}", json={"diameter": 2.85})
+    result.raise_for_status()
+    edited_filament = result.json()
+    used = use_length(0)
+    assert use_length(100) - used == pytest.approx(weight_of(100, edited_filament))
+
+    result = httpx.patch(f"{URL}/api/v1/spool/{spool['id']}", json={"filament_id": random_empty_filament["id"]})
+    result.raise_for_status()
+    used = use_length(0)
+    assert use_length(100) - used == pytest.approx(weight_of(100, random_empty_filament))
+
+    # Clean up
+    httpx.delete(f"{URL}/api/v1/spool/{spool['id']}").raise_for_status()
+
+
 def test_use_spool_weight_and_length(random_filament: dict[str, Any]):
     """Test using a spool in the database."""
     # Setup
@@ -178,3 +220,112 @@ async def test_use_spool_concurrent(random_filament: dict[str, Any]):
 
     # Clean up
     httpx.delete(f"{URL}/api/v1/spool/{spool['id']}").raise_for_status()
+
+
+def test_use_spool_batch(random_filament: dict[str, Any]):
+    """Test using several spools in one request."""
+    # Setup
+    spools = []
+    for _ in range(3):
+        result = httpx.post(
+            f"{URL}/api/v1/spool",
+            json={"filament_id": random_filament["id"], "remaining_weight": 1000},
+        )
+        result.raise_for_status()
+        spools.append(result.json())
+
+    # Execute
+    result = httpx.put(
+        f"{URL}/api/v1/spool/use",
+        json=[
+            {"spool_id": spools[0]["id"], "use_weight": 10},
+            {"spool_id": spools[1]["id"], "use_length": 1000},
+            {"spool_id": spools[2]["id"], "use_weight": 5},
+            {"spool_id": spools[0]["id"], "use_weight": 2.5},
+        ],
+    )
+    result.raise_for_status()
+
+    # Verify
+    updated = result.json()
+    assert [item["id"] for item in updated] == [spool["id"] for spool in spools]
+
+    use_weight_1 = random_filament["density"] * 100 * math.pi * ((random_filament["diameter"] * 1e-1 / 2) ** 2)
+    assert updated[0]["used_weight"] == pytest.approx(12.5)
+    assert updated[1]["used_weight"] == pytest.approx(use_weight_1)
+    assert updated[2]["used_weight"] == pytest.approx(5)
+
+    for item in updated:
+        diff = abs((datetime.now(tz=timezone.utc) - datetime.fromisoformat(item["first_used"])).total_seconds())
+        assert diff < 60
+        diff = abs((datetime.now(tz=timezone.utc) - datetime.fromisoformat(item["last_used"])).total_seconds())
+        assert diff < 60
+
+    # The stored spools match the response
+    result = httpx.get(f"{URL}/api/v1/spool/{spools[0]['id']}")
+    result.raise_for_status()
+    assert result.json()["used_weight"] == pytest.approx(12.5)
+
+    # Clean up
+    for spool in spools:
+        httpx.delete(f"{URL}/api/v1/spool/{spool['id']}").raise_for_status()
+
+
+def test_use_spool_batch_not_found_changes_nothing(random_filament: dict[str, Any]):
+    """Test that a batch with an unknown spool is rejected as a whole."""
+    # Setup
+    result = httpx.post(
+        f"{URL}/api/v1/spool",
+        json={"filament_id": random_filament["id"], "remaining_weight": 1000},
+    )
+    result.raise_for_status()
+    spool = result.json()
+
+    # Execute
+    result = httpx.put(
+        f"{URL}/api/v1/spool/use",
+        json=[
+            {"spool_id": spool["id"], "use_weight": 10},
+            {"spool_id": 123456789, "use_weight": 10},
+        ],
+    )
+
+    # Verify
+    assert result.status_code == 404
+    assert "123456789" in result.json()["message"]
+
+    result = httpx.get(f"{URL}/api/v1/spool/{spool['id']}")
+    result.raise_for_status()
+    assert result.json()["used_weight"] == pytest.approx(0)
+    assert "last_used" not in result.json()
+
+    # Clean up
+    httpx.delete(f"{URL}/api/v1/spool/{spool['id']}").raise_for_status()
+
+
+@pytest.mark.parametrize(
+    "entry",
+    [
+        {"use_weight": 1, "use_length": 1},
+        {},
+    ],
+)
+def test_use_spool_batch_invalid_entry(random_filament: dict[str, Any], entry: dict[str, float]):
+    """Test that every entry must specify exactly one of use_weight and use_length."""
+    # Setup
+    result = httpx.post(f"{URL}/api/v1/spool", json={"filament_id": random_filament["id"]})
+    result.raise_for_status()
+    spool = result.json()
+
+    # Execute
+    result = httpx.put(
+        f"{URL}/api/v1/spool/use",
+        json=[{"spool_id": spool["id"], "use_weight": 1}, {"spool_id": spool["id"], **entry}],
+    )
+
+    # Verify
+    assert result.status_code == 400
+    assert "Entry 1" in result.json()["message"]
+
+    # Clean up
+    httpx.delete(f"{URL}/api/v1/spool/{spool['id']}").raise_for_status()
@@ -0,0 +1,123 @@
+"""Integration tests for the usage endpoint."""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import httpx
+import pytest
+
+from ..conftest import URL
+
+
+def _usage(group_by: str, **params: str) -> dict[str | None, float]:
+    result = httpx.get(f"{URL}/api/v1/usage", params={"group_by": group_by, **params})
+    result.raise_for_status()
+    return {item["key"]: item["used_weight"] for item in result.json()}
+
+
+def test_usage_per_material_spool_and_location(random_filament: dict[str, Any]):
+    """Test that usage reports and measurements are summed per material, spool and location."""
+    # Setup: a material and location no other test uses
+    material = f"Material {uuid.uuid4().hex}"
+    location = f"Location {uuid.uuid4().hex}"
+    httpx.patch(f"{URL}/api/v1/filament/{random_filament['id']}", json={"material": material}).raise_for_status()
+    start = (datetime.now(tz=timezone.utc) - timedelta(minutes=1)).isoformat()
+
+    spools = []
+    for _ in range(2):
+        result = httpx.post(
+            f"{URL}/api/v1/spool",
+            json={
+                "filament_id": random_filament["id"],
+                "initial_weight": 1000,
+                "spool_weight": 200,
+                "location": location,
+            },
+        )
+        result.raise_for_status()
+        spools.append(result.json())
+    first, second = spools
+
+    # Execute
+    httpx.put(f"{URL}/api/v1/spool/{first['id']}/use", json={"use_weight": 10}).raise_for_status()
+    # Clamped at zero, so this only takes back the 10 g used above
+    httpx.put(f"{URL}/api/v1/spool/{first['id']}/use", json={"use_weight": -15}).raise_for_status()
+    httpx.put(f"{URL}/api/v1/spool/{first['id']}/use", json={"use_weight": 30}).raise_for_status()
+    httpx.put(f"{URL}/api/v1/spool/{second['id']}/measure", json={"weight": 1150}).raise_for_status()
+    httpx.put(
+        f"{URL}/api/v1/spool/use",
+        json=[{"spool_id": second["id"], "use_weight": 5}, {"spool_id": first["id"], "use_weight": 2.5}],
+    ).raise_for_status()
+
+    # Verify
+    assert _usage("material", start=start)[material] == pytest.approx(32.5 + 55)
+    per_spool = _usage("spool", start=start)
+    assert per_spool[str(first["id"])] == pytest.approx(32.5)
+    assert per_spool[str(second["id"])] == pytest.approx(55)
+    assert _usage("location", start=start)[location] == pytest.approx(32.5 + 55)
+    assert material not in _usage("material", end=start)
+
+    # Clean up
+    for spool in spools:
+        httpx.delete(f"{URL}/api/v1/spool/{spool['id']}").raise_for_status()
+
+
+def test_usage_is_kept_when_the_spool_and_filament_are_deleted(random_vendor: dict[str, Any]):
+    """Test that deleting or editing a spool or its filament does not change the usage already recorded."""
+    # Setup
+    material = f"Material {uuid.uuid4().hex}"
+    location = f"Location {uuid.uuid4().hex}"
+    result = httpx.post(
+        f"{URL}/api/v1/filament",
+        json={"vendor_id": random_vendor["id"], "material": material, "density": 1.24, "diameter": 1.75},
+    )
+    result.raise_for_status()
+    filament = result.json()
+    result = httpx.post(
+        f"{URL}/api/v1/spool",
+        json={"filament_id": filament["id"], "initial_weight": 1000, "location": location},
+    )
+    result.raise_for_status()
+    spool = result.json()
+    start = (datetime.now(tz=timezone.utc) - timedelta(minutes=1)).isoformat()
+    httpx.put(f"{URL}/api/v1/spool/{spool['id']}/use", json={"use_weight": 12}).raise_for_status()
+
+    def totals() -> tuple[float | None, float | None, float | None]:
+        return (
+            _usage("material", start=start).get(material),
+            _usage("location", start=start).get(location),
+            _usage("filament", start=start).get(str(filament["id"])),
+        )
+
+    before = totals()
+    assert before == (pytest.approx(12), pytest.approx(12), pytest.approx(12))
+
+    # Execute
+    httpx.patch(f"{URL}/api/v1/spool/{spool['id']}", json={"location": f"Moved {uuid.uuid4().hex}"}).raise_for_status()
+    httpx.patch(f"{URL}/api/v1/filament/{filament['id']}", json={"material": "Renamed"}).raise_for_status()
+    httpx.delete(f"{URL}/api/v1/spool/{spool['id']}").raise_for_status()
+
+    # Verify
+    assert totals() == before
+    assert str(spool["id"]) not in _usage("spool", start=start)
+
+    httpx.delete(f"{URL}/api/v1/filament/{filament['id']}").raise_for_status()
+    assert _usage("material", start=start).get(material) == pytest.approx(12)
+    assert _usage("location", start=start).get(location) == pytest.approx(12)
+    assert str(filament["id"]) not in _usage("filament", start=start)
+
+
+def test_usage_invalid_range():
+    """Test that a time range that ends before it starts is refused."""
+    result = httpx.get(
+        f"{URL}/api/v1/usage",
+        params={"group_by": "spool", "start": "2026-02-01T00:00:00Z", "end": "2026-01-01T00:00:00Z"},
+    )
+    assert result.status_code == 400
+
+
+def test_usage_invalid_group_by():
+    """Test that usage can only be grouped by the supported fields."""
+    result = httpx.get(f"{URL}/api/v1/usage", params={"group_by": "vendor"})
+    assert result.status_code == 422